@@ -0,0 +1,175 @@
+"""
+**********************************************************************************
+UplinkCodec.py
+Created by: Debashis Das
+Argonne National Laboratory
+Transportation and Power Systems Division
+
+**********************************************************************************
+
+Description:
+------------
+Encodings of UPER payloads on the cloud uplink (`--uplink`):
+
+    hex     the payload as received (default; two characters per byte)
+    b64     raw bytes, base64 (4 characters per 3 bytes); the record gets
+            "encoding": "b64"
+    zlib    messages of a short window packed into one compressed blob
+    lzma    same, LZMA2 (smaller, slower; Python consumers only - Node.js
+            has no LZMA in its standard library)
+
+A batch record (written to /LatestV2XBatch) is
+
+    {"encoding": "zlib", "count": 3, "index": "53,412,39",
+     "blob": <base64 of the compressed concatenated payload bytes>,
+     "posix_timestamp": ..., "seq": 17, "epoch": <writer start, ms>}
+
+`index` holds the byte length of every payload, in order; the message type
+is the payload's own MessageFrame prefix, so it is not repeated. Every batch
+is compressed on its own, so a consumer can start at any record.
+
+Each batch overwrites the previous one, so a consumer that falls behind
+misses whole batches. UplinkBatcher numbers its batches (`seq`, from 1 per
+`epoch`, as in LatestSlots.py), and a jump in `seq` within one epoch is a
+missed batch (listener.js reports them).
+
+`decode_payload()` and `unpack_batch()` are the consumer side (listener.js
+has the same logic).
+**********************************************************************************
+"""
+
+import base64
+import lzma
+import time
+import zlib
+from typing import List, Optional, Tuple
+
+ENCODINGS = ("hex", "b64", "zlib", "lzma")
+BATCH_ENCODINGS = ("zlib", "lzma")
+BATCH_ROOT = "LatestV2XBatch"
+# Raw LZMA2 stream: no .xz container, which would add ~60 bytes per batch.
+LZMA_FILTERS = [{"id": lzma.FILTER_LZMA2, "preset": 6}]
+MESSAGE_TYPES = {"0012": "MAP", "0013": "SPaT", "0014": "BSM"}
+
+
+def record_encoding(uplink: str) -> str:
+    """Encoding of single-message records under `uplink` (batch modes use b64)."""
+    return "hex" if uplink == "hex" else "b64"
+
+
+def encode_payload(payload: str, encoding: str) -> str:
+    """Encode one hex payload for a single-message record."""
+    if encoding == "hex":
+        return payload
+    if encoding == "b64":
+        return base64.b64encode(bytes.fromhex(payload)).decode("ascii")
+    raise ValueError(f"Not a single-message encoding: {encoding}")
+
+
+def decode_payload(record: dict) -> str:
+    """Hex payload of a single-message record (records without `encoding` are hex)."""
+    encoding = record.get("encoding", "hex")
+    if encoding == "hex":
+        return record["payload"]
+    if encoding == "b64":
+        return base64.b64decode(record["payload"]).hex()
+    raise ValueError(f"Unknown payload encoding: {encoding}")
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    if encoding == "zlib":
+        return zlib.compress(data, 6)
+    if encoding == "lzma":
+        return lzma.compress(data, format=lzma.FORMAT_RAW, filters=LZMA_FILTERS)
+    raise ValueError(f"Not a batch encoding: {encoding}")
+
+
+def decompress(data: bytes, encoding: str) -> bytes:
+    if encoding == "zlib":
+        return zlib.decompress(data)
+    if encoding == "lzma":
+        return lzma.decompress(data, format=lzma.FORMAT_RAW, filters=LZMA_FILTERS)
+    raise ValueError(f"Not a batch encoding: {encoding}")
+
+
+def pack_batch(payloads: List[str], encoding: str, timestamp: Optional[float] = None) -> dict:
+    """Pack hex payloads into one compressed batch record."""
+    raw = [bytes.fromhex(payload) for payload in payloads]
+    return {
+        "encoding": encoding,
+        "count": len(raw),
+        "index": ",".join(str(len(data)) for data in raw),
+        "blob": base64.b64encode(compress(b"".join(raw), encoding)).decode("ascii"),
+        "posix_timestamp": time.time() if timestamp is None else timestamp,
+    }
+
+
+def unpack_batch(record: dict) -> List[Tuple[Optional[str], str]]:
+    """Return the (msg_type, hex payload) pairs of a batch record, in order.
+
+    Raises:
+        ValueError: If the index does not match the blob.
+    """
+    data = decompress(base64.b64decode(record["blob"]), record["encoding"])
+    messages = []
+    offset = 0
+    for length in map(int, record["index"].split(",")) if record["index"] else ():
+        payload = data[offset:offset + length].hex()
+        messages.append((MESSAGE_TYPES.get(payload[:4]), payload))
+        offset += length
+    if offset != len(data):
+        raise ValueError(f"Batch index covers {offset} of {len(data)} bytes")
+    return messages
+
+
+class UplinkBatcher:
+    """Collects payloads for `window_s` (or `max_messages`) and packs them into one record."""
+    def __init__(self, encoding: str, window_s: float = 0.1, max_messages: int = 256):
+        if encoding not in BATCH_ENCODINGS:
+            raise ValueError(f"Not a batch encoding: {encoding}")
+        self.encoding = encoding
+        self.window_s = window_s
+        self.max_messages = max_messages
+        self.payloads: List[str] = []
+        self.traces: List[str] = []
+        self.first_added = 0.0
+        self.epoch = int(time.time() * 1000)
+        self.batches = 0
+        self.raw_bytes = 0
+        self.sent_bytes = 0
+
+    def add(self, payload: str, trace: Optional[str] = None):
+        if not self.payloads:
+            self.first_added = time.monotonic()
+        self.payloads.append(payload)
+        if trace is not None:
+            self.traces.append(trace)
+
+    def due(self, now: Optional[float] = None) -> bool:
+        if not self.payloads:
+            return False
+        if len(self.payloads) >= self.max_messages:
+            return True
+        return (time.monotonic() if now is None else now) - self.first_added >= self.window_s
+
+    def timeout(self, idle_s: float) -> float:
+        """Socket timeout that wakes the caller when the open batch is due."""
+        if not self.payloads:
+            return idle_s
+        return max(0.001, self.first_added + self.window_s - time.monotonic())
+
+    def flush(self) -> Tuple[Optional[dict], List[str]]:
+        """Return (batch record, trace keys) of the open batch and start a new one."""
+        if not self.payloads:
+            return None, []
+        record = pack_batch(self.payloads, self.encoding)
+        if self.traces:
+            record["trace_keys"] = self.traces
+        traces = self.traces
+        self.batches += 1
+        record["seq"] = self.batches
+        record["epoch"] = self.epoch
+        self.raw_bytes += sum(len(payload) for payload in self.payloads)
+        self.sent_bytes += len(record["blob"]) + len(record["index"])
+        self.payloads, self.traces = [], []
+        return record, traces
@@ -16,13 +16,17 @@ It also updates a unified `/LatestV2XMessage` node with the latest message for r
 
 Usage:
     python3 bsm-sender.py               
+    python3 bsm-sender.py --uplink b64                   # base64 payloads instead of hex (UplinkCodec.py)
+    python3 bsm-sender.py --uplink zlib --batch-ms 500   # compressed batches to /LatestV2XBatch
 **********************************************************************************
 """
 import os
+import argparse
 import platform
 import time
 import firebase_admin
 from firebase_admin import credentials, db
+from UplinkCodec import BATCH_ENCODINGS, BATCH_ROOT, ENCODINGS, UplinkBatcher, encode_payload, record_encoding
 
 
 def load_config_paths():
@@ -48,7 +52,15 @@ def initialize_firebase(service_account_path: str):
     except ValueError:
         firebase_admin.initialize_app(cred, {'databaseURL': 'https://c-vision-7e1ec-default-rtdb.firebaseio.com/'})
 
-def main():
+def upload_batch(batcher: UplinkBatcher):
+    """Upload the open batch (if any) to /LatestV2XBatch."""
+    batch, _ = batcher.flush()
+    if batch is None:
+        return
+    db.reference(f'/{BATCH_ROOT}').set(batch)
+    print(f"Batch of {batch['count']} messages uploaded to Firebase at time {time.time():.6f}")
+
+def main(args):
 
     # --- setup paths & firebase ---
     service_account_path, config_file_path = load_config_paths()
@@ -61,6 +73,8 @@ def main():
     send_period = 0.1  # 10 Hz
     next_time = time.perf_counter()
 
+    encoding = record_encoding(args.uplink)
+    batcher = UplinkBatcher(args.uplink, args.batch_ms / 1000.0) if args.uplink in BATCH_ENCODINGS else None
 
     try:
         with open(file_name, "r") as file:
@@ -76,6 +90,14 @@ def main():
 
                 now = time.perf_counter()
                 sleep_s = next_time - now
+                if batcher is not None and batcher.payloads:
+                    # Do not hold a due batch until the next message is added.
+                    batch_sleep_s = batcher.timeout(sleep_s)
+                    if batch_sleep_s < sleep_s:
+                        time.sleep(batch_sleep_s)
+                        sleep_s -= batch_sleep_s
+                        if batcher.due():
+                            upload_batch(batcher)
                 if sleep_s > 0:
                     time.sleep(sleep_s)
                 next_time += send_period
@@ -84,18 +106,23 @@ def main():
                 msg_type = "BSM"
 
                  # Send to Firebase
-                ref.set({
+                record = {
                     "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
-                    "payload": payload
-                })
+                    "payload": encode_payload(payload, encoding)
+                }
+                if encoding != "hex":
+                    record["encoding"] = encoding
+                ref.set(record)
+
+                # Send to unified /LatestV2XMessage (or into the open batch)
+                if batcher is not None:
+                    batcher.add(payload)
+                    if batcher.due():
+                        upload_batch(batcher)
+                    continue
 
-                # Send to unified /LatestV2XMessage
                 ref_latest = db.reference('/LatestV2XMessage')
-                ref_latest.set({
-                    "type": msg_type,
-                    "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
-                    "payload": payload
-                })
+                ref_latest.set(dict(record, type=msg_type))
 
                 print(f"{msg_type} message uploaded to Firebase at time {time.time():.6f}")
 
@@ -105,5 +132,13 @@ def main():
     except KeyboardInterrupt:
         print("\nStopped by user.")
 
+    finally:
+        if batcher is not None:
+            upload_batch(batcher)
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="BSM file -> Firebase sender")
+    parser.add_argument("--uplink", choices=ENCODINGS, default="hex",
+                        help="Payload encoding to the cloud: hex, b64, or zlib/lzma batches to /LatestV2XBatch")
+    parser.add_argument("--batch-ms", type=float, default=100.0, help="--uplink zlib/lzma: batch window in milliseconds")
+    main(parser.parse_args())
\ No newline at end of file
@@ -0,0 +1,244 @@
+"""
+**********************************************************************************
+ControllerRouter.py
+Created by: Debashis Das
+Argonne National Laboratory
+Transportation and Power Systems Division
+
+**********************************************************************************
+
+Description:
+------------
+Multi-controller gateway mode of map-spat-sender.py (`--multi`): one process
+receives SPaT/MAP from many signal controllers and keeps state per
+intersection.
+
+    ControllerRouter   routes each datagram to its intersection, by the
+                       intersection ID inside the payload (default) or by the
+                       sender address (`--route source`, with an optional
+                       address -> intersection map), and keeps per-source
+                       and per-intersection statistics
+    SlotUploader       background thread that uploads the newest message of
+                       every intersection as one multi-path update into the
+                       per-source slots (LatestSlots.py)
+
+Uploads are coalesced: while one update is in flight, newer messages replace
+older pending ones of the same slot. The receive loop never waits for the
+cloud, and the upload rate adapts to the cloud round trip instead of
+queueing (100 controllers at 10 Hz with a 200 ms round trip = 5 updates/s
+of ~100 slots each). A slot record that replaces a pending one carries
+`coalesced`, the number of its slot's messages dropped this way, so
+`listener.js --slots` does not count them as lost.
+**********************************************************************************
+"""
+
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+from firebase_admin import db
+from PayloadInspector import peek, source_key
+
+STATS_ROOT = "gateway_stats"
+
+
+def source_name(address: Tuple[str, int]) -> str:
+    """RTDB-safe name of a sender address."""
+    return f"{address[0].replace('.', '-')}-{address[1]}"
+
+
+class SourceStats:
+    """Counters of one controller (sender address)."""
+    __slots__ = ("address", "received", "bytes", "by_type", "unroutable", "intersections",
+                 "first_seen", "last_seen")
+
+    def __init__(self, address: Tuple[str, int], now: float):
+        self.address = address
+        self.received = 0
+        self.bytes = 0
+        self.by_type: Dict[str, int] = {}
+        self.unroutable = 0
+        self.intersections = set()
+        self.first_seen = now
+        self.last_seen = now
+
+    def to_dict(self, now: float) -> dict:
+        elapsed = max(now - self.first_seen, 1e-3)
+        return {
+            "address": f"{self.address[0]}:{self.address[1]}",
+            "received": self.received,
+            "bytes": self.bytes,
+            "byType": dict(self.by_type),
+            "unroutable": self.unroutable,
+            "intersections": sorted(self.intersections),
+            "ratePerS": round(self.received / elapsed, 2),
+            "lastSeenAgoS": round(now - self.last_seen, 2),
+        }
+
+
+class IntersectionState:
+    """Latest known state of one intersection."""
+    __slots__ = ("key", "sources", "spat_received", "map_received", "last_seen")
+
+    def __init__(self, key: str):
+        self.key = key
+        self.sources = set()
+        self.spat_received = 0
+        self.map_received = 0
+        self.last_seen = 0.0
+
+
+class ControllerRouter:
+    """Routes controller datagrams to per-intersection state."""
+    def __init__(self, route_by: str = "payload", source_map: Optional[Dict[str, str]] = None):
+        """
+        Args:
+            route_by: "payload" (intersection ID read from the UPER payload,
+                falling back to the sender address) or "source" (sender
+                address only).
+            source_map: Optional "ip:port" or "ip" -> intersection ID, used
+                for source routing.
+        """
+        if route_by not in ("payload", "source"):
+            raise ValueError(f"Unknown route mode: {route_by}")
+        self.route_by = route_by
+        self.source_map = {str(k): str(v) for k, v in (source_map or {}).items()}
+        self.sources: Dict[Tuple[str, int], SourceStats] = {}
+        self.intersections: Dict[str, IntersectionState] = {}
+
+    def source_key(self, address: Tuple[str, int]) -> str:
+        mapped = self.source_map.get(f"{address[0]}:{address[1]}") or self.source_map.get(address[0])
+        return mapped if mapped is not None else f"source-{source_name(address)}"
+
+    def route(self, payload: str, address: Tuple[str, int], size: int = 0,
+              now: Optional[float] = None) -> Tuple[Optional[str], Optional[str], Optional[dict]]:
+        """Classify one payload and attribute it to its intersection (or vehicle).
+
+        Returns:
+            (msg_type, key, fields); msg_type is None for unknown payloads.
+            `fields` are the PayloadInspector fields (None if unreadable).
+        """
+        if now is None:
+            now = time.time()
+        source = self.sources.get(address)
+        if source is None:
+            source = self.sources[address] = SourceStats(address, now)
+        source.received += 1
+        source.bytes += size
+        source.last_seen = now
+
+        msg_type, fields = peek(payload)
+        if msg_type is None:
+            source.unroutable += 1
+            return None, None, None
+        source.by_type[msg_type] = source.by_type.get(msg_type, 0) + 1
+
+        key = source_key(msg_type, fields) if self.route_by == "payload" else None
+        if key is None:
+            if self.route_by == "payload":
+                source.unroutable += 1
+            key = self.source_key(address)
+        if msg_type == "BSM":
+            return msg_type, key, fields
+
+        state = self.intersections.get(key)
+        if state is None:
+            state = self.intersections[key] = IntersectionState(key)
+            print(f"New intersection {key} from {address[0]}:{address[1]}")
+        state.sources.add(address)
+        state.last_seen = now
+        source.intersections.add(key)
+        if msg_type == "SPaT":
+            state.spat_received += 1
+        else:
+            state.map_received += 1
+        return msg_type, key, fields
+
+    def stats(self, now: Optional[float] = None) -> dict:
+        """{"sources": {name: counters}, "intersections": {id: counters}}."""
+        if now is None:
+            now = time.time()
+        return {
+            "sources": {source_name(address): source.to_dict(now) for address, source in self.sources.items()},
+            "intersections": {
+                key: {"sources": [f"{a[0]}:{a[1]}" for a in sorted(state.sources)],
+                      "spatReceived": state.spat_received, "mapReceived": state.map_received,
+                      "lastSeenAgoS": round(now - state.last_seen, 2)}
+                for key, state in self.intersections.items()
+            },
+        }
+
+    def report(self, now: Optional[float] = None, silent_after_s: float = 5.0):
+        """Print a summary; controllers silent for `silent_after_s` are listed."""
+        if now is None:
+            now = time.time()
+        received = sum(source.received for source in self.sources.values())
+        unroutable = sum(source.unroutable for source in self.sources.values())
+        silent = [f"{a[0]}:{a[1]}" for a, source in self.sources.items() if now - source.last_seen > silent_after_s]
+        shared = [key for key, state in self.intersections.items() if len(state.sources) > 1]
+        print(f"Gateway report: {len(self.sources)} sources, {len(self.intersections)} intersections, "
+              f"{received} messages, {unroutable} unroutable")
+        if silent:
+            print(f"  silent > {silent_after_s:.0f}s: {', '.join(silent)}")
+        if shared:
+            print(f"  intersections received from several sources: {', '.join(shared)}")
+
+
+class SlotUploader:
+    """Coalescing background uploader of multi-path updates."""
+    def __init__(self, on_uploaded: Optional[Callable[[List[str]], None]] = None):
+        """
+        Args:
+            on_uploaded: Called with the trace keys of every finished update
+                (used for the `cloud_write` hop of `--trace`).
+        """
+        self.on_uploaded = on_uploaded
+        self.pending: Dict[str, dict] = {}
+        self.pending_traces: List[str] = []
+        self.uploads = 0
+        self.paths_uploaded = 0
+        self.coalesced = 0
+        self.condition = threading.Condition()
+        self.running = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def submit(self, update: dict, trace: Optional[str] = None):
+        """Queue a multi-path update; pending values of the same paths are replaced."""
+        with self.condition:
+            for path, value in update.items():
+                previous = self.pending.get(path)
+                if previous is not None:
+                    self.coalesced += 1
+                    if isinstance(previous, dict) and isinstance(value, dict) and "seq" in value:
+                        # Sequenced slot record: the skipped seq numbers were dropped on purpose.
+                        value = dict(value, coalesced=previous.get("coalesced", 0) + 1)
+                self.pending[path] = value
+            if trace is not None:
+                self.pending_traces.append(trace)
+            self.condition.notify()
+
+    def run(self):
+        while True:
+            with self.condition:
+                while self.running and not self.pending:
+                    self.condition.wait()
+                if not self.pending:
+                    return
+                update, self.pending = self.pending, {}
+                traces, self.pending_traces = self.pending_traces, []
+            try:
+                db.reference("/").update(update)
+                self.uploads += 1
+                self.paths_uploaded += len(update)
+            except Exception as e:
+                print(f"Gateway upload of {len(update)} paths failed: {e}")
+                continue
+            if self.on_uploaded is not None and traces:
+                self.on_uploaded(traces)
+
+    def stop(self, timeout: float = 5.0):
+        """Upload what is pending, then stop."""
+        with self.condition:
+            self.running = False
+            self.condition.notify()
+        self.thread.join(timeout)
@@ -0,0 +1,202 @@
+"""
+**********************************************************************************
+DeltaEncoder.py
+Created by: Debashis Das
+Argonne National Laboratory
+Transportation and Power Systems Division
+
+**********************************************************************************
+
+Description:
+------------
+Snapshot/patch encoding for `vehicle_status` and `intersection_status` records.
+
+The encoder remembers the last record sent for every path. The next record of
+the same path is reduced to a patch that only holds the leaves that changed,
+addressed by slash-separated sub-paths (lists are addressed by index, the way
+RTDB stores them):
+
+    {"timestamp": 1758223899284, "phaseStates/1/state": "yellow", "phaseStates/1/minEndTime": 3.1}
+
+A leaf that disappeared is sent as None (RTDB deletes it on update). A full
+snapshot is sent for the first record of a path and again every
+`snapshot_interval_s` seconds so late joiners and lossy consumers resync.
+Paths not written for `forget_after_s` are dropped (oldest first, O(1) per
+record), so rotating BSM temporary IDs do not grow the encoder without limit.
+
+The patch format is exactly what RTDB `update()` accepts, so DeltaSink can
+hand patches straight to Firebase, and `apply_patch` is the matching
+client-side applier. The same file is in infrastructure-to-cloud-interface/,
+where StatusMirror.py applies the publisher's updates with `apply_patch`.
+**********************************************************************************
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+SNAPSHOT_INTERVAL_S = 30.0
+FORGET_AFTER_S = 300.0
+
+
+def flatten(value, prefix: str = "", out: Optional[dict] = None) -> dict:
+    """Flatten nested dicts/lists into {"a/b/0/c": leaf}."""
+    if out is None:
+        out = {}
+    if isinstance(value, dict) and value:
+        for key, child in value.items():
+            flatten(child, f"{prefix}/{key}" if prefix else str(key), out)
+    elif isinstance(value, list) and value:
+        for index, child in enumerate(value):
+            flatten(child, f"{prefix}/{index}" if prefix else str(index), out)
+    else:
+        out[prefix] = value
+    return out
+
+
+def diff(previous_leaves: dict, current_leaves: dict) -> dict:
+    """Return the patch turning `previous_leaves` into `current_leaves`."""
+    patch = {path: value for path, value in current_leaves.items()
+             if path not in previous_leaves or previous_leaves[path] != value}
+    for path in previous_leaves.keys() - current_leaves.keys():
+        patch[path] = None
+    return patch
+
+
+def apply_patch(record, patch: dict):
+    """Apply a patch produced by DeltaEncoder to a local copy of the record.
+
+    Lists are kept as lists. Returns the updated record (a new dict if
+    `record` was None).
+    """
+    if record is None:
+        record = {}
+    for path, value in patch.items():
+        keys = path.split("/")
+        node = record
+        for index, key in enumerate(keys[:-1]):
+            next_is_index = keys[index + 1].isdigit()
+            node = _child(node, key, [] if next_is_index else {})
+        _assign(node, keys[-1], value)
+    return record
+
+
+def _child(node, key: str, default):
+    """Return node[key], creating it with `default` when missing."""
+    if isinstance(node, list):
+        index = int(key)
+        while len(node) <= index:
+            node.append(None)
+        if node[index] is None:
+            node[index] = default
+        return node[index]
+    if node.get(key) is None:
+        node[key] = default
+    return node[key]
+
+
+def _assign(node, key: str, value):
+    """Set (or delete, for None) one leaf."""
+    if isinstance(node, list):
+        index = int(key)
+        if value is None:
+            if index < len(node):
+                node[index] = None
+            return
+        while len(node) <= index:
+            node.append(None)
+        node[index] = value
+    elif value is None:
+        node.pop(key, None)
+    else:
+        node[key] = value
+
+
+class DeltaEncoder:
+    """Tracks the last-sent state per path and produces snapshots or patches."""
+    def __init__(self, snapshot_interval_s: float = SNAPSHOT_INTERVAL_S, forget_after_s: float = FORGET_AFTER_S):
+        self.snapshot_interval_s = snapshot_interval_s
+        self.forget_after_s = forget_after_s
+        self.last_leaves: Dict[str, dict] = {}
+        self.last_snapshot_time: Dict[str, float] = {}
+        # path -> time of its last record, least recently written first
+        self.last_written: "OrderedDict[str, float]" = OrderedDict()
+        self.expired = 0
+
+    def encode(self, path: str, record: dict, now: Optional[float] = None) -> Tuple[bool, dict]:
+        """Encode one record.
+
+        Returns:
+            (is_snapshot, payload): the full record when a snapshot is due,
+            otherwise the patch (which may be empty when nothing changed).
+        """
+        if now is None:
+            now = time.monotonic()
+        self.expire(now)
+        self.last_written[path] = now
+        self.last_written.move_to_end(path)
+        leaves = flatten(record)
+        previous = self.last_leaves.get(path)
+        self.last_leaves[path] = leaves
+
+        if previous is None or now - self.last_snapshot_time[path] >= self.snapshot_interval_s:
+            self.last_snapshot_time[path] = now
+            return True, record
+        return False, diff(previous, leaves)
+
+    def expire(self, now: float):
+        """Forget the paths that were not written for `forget_after_s`."""
+        cutoff = now - self.forget_after_s
+        while self.last_written:
+            path, written = next(iter(self.last_written.items()))
+            if written >= cutoff:
+                return
+            self.forget(path)
+            self.expired += 1
+
+    def forget(self, path: str):
+        """Drop the state of a path (its next record becomes a snapshot)."""
+        self.last_leaves.pop(path, None)
+        self.last_snapshot_time.pop(path, None)
+        self.last_written.pop(path, None)
+
+
+class DeltaSink:
+    """Sink wrapper that sends snapshots with `write` and patches with `update`.
+
+    The wrapped sink must provide `update(path, patch)` (FirebaseSink does).
+    Writes may come from several threads (e.g. the IntersectionAnalytics
+    timer); the encoder state is guarded by a lock.
+    """
+    def __init__(self, sink, snapshot_interval_s: float = SNAPSHOT_INTERVAL_S):
+        self.sink = sink
+        self.encoder = DeltaEncoder(snapshot_interval_s)
+        self.lock = threading.Lock()
+
+    def write(self, path: str, data: dict):
+        """Send `data` as a snapshot or, when possible, as a patch."""
+        with self.lock:
+            is_snapshot, payload = self.encoder.encode(path, data)
+        if is_snapshot:
+            self.sink.write(path, payload)
+        elif payload:
+            self.sink.update(path, payload)
+
+    def write_many(self, parent: str, records: dict):
+        """Send a batch as one multi-path update: snapshots replace their key, patches update leaves."""
+        update = {}
+        with self.lock:
+            for key, data in records.items():
+                is_snapshot, payload = self.encoder.encode(f"{parent}/{key}", data)
+                if is_snapshot:
+                    update[key] = payload
+                else:
+                    update.update((f"{key}/{leaf}", value) for leaf, value in payload.items())
+        if update:
+            self.sink.update(parent, update)
+
+    def forget(self, path: str):
+        """Drop the last-sent state of a path that will not be written again."""
+        with self.lock:
+            self.encoder.forget(path)
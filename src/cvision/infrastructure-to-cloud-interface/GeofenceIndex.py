@@ -0,0 +1,272 @@
+"""
+**********************************************************************************
+GeofenceIndex.py
+Created by: Debashis Das
+Argonne National Laboratory
+Transportation and Power Systems Division
+
+**********************************************************************************
+
+Description:
+------------
+Client-side spatial subscriptions over the mirrored `/vehicle_status` tree.
+
+GeofenceIndex keeps every vehicle in a uniform grid of square cells (metres,
+equirectangular projection around a reference latitude). A position update
+only touches the vehicle's old and new cells, and a region/radius query only
+visits the cells overlapping the region, so the cost does not grow with the
+fleet size.
+
+GeofenceSubscriptions registers named queries on top of the index:
+
+    add_radius("ego-150m", 150.0, callback, follow_vehicle="265012")
+    add_radius("stop-bar", 30.0, callback, center=(42.3004, -83.6979))
+    add_region("campus", 41.70, -88.00, 41.72, -87.98, callback)
+
+Each query is registered in the cells it covers. An update of vehicle V is
+only tested against the queries registered in V's old and new cell; a query
+that follows a vehicle is re-evaluated (and re-registered) when that vehicle
+moves. Callbacks receive `(name, event, vehicle_id, record)` with `event` in
+"enter", "update" and "leave".
+**********************************************************************************
+"""
+
+import math
+from typing import Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+METERS_PER_DEGREE = 111320.0
+
+Cell = Tuple[int, int]
+
+
+def distance_m(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Equirectangular distance in metres (accurate at intersection scale)."""
+    x = math.radians(lon2 - lon1) * math.cos(math.radians((lat1 + lat2) / 2.0))
+    y = math.radians(lat2 - lat1)
+    return math.hypot(x, y) * 6371000.0
+
+
+class GeofenceIndex:
+    """Uniform-grid index of vehicle positions."""
+    def __init__(self, cell_size_m: float = 100.0, reference_lat: Optional[float] = None):
+        """
+        Args:
+            cell_size_m: Edge length of a grid cell. Around the typical query
+                radius works best.
+            reference_lat: Latitude used for the east-west scale (default: the
+                first indexed position).
+        """
+        self.cell_size_m = cell_size_m
+        self.reference_lat = reference_lat
+        self.x_scale = 0.0
+        self.cells: Dict[Cell, Set[str]] = {}
+        self.positions: Dict[str, Tuple[float, float]] = {}
+        self.cell_by_vehicle: Dict[str, Cell] = {}
+        if reference_lat is not None:
+            self.set_reference(reference_lat)
+
+    def set_reference(self, reference_lat: float):
+        self.reference_lat = reference_lat
+        self.x_scale = METERS_PER_DEGREE * math.cos(math.radians(reference_lat)) / self.cell_size_m
+
+    def cell_of(self, lat: float, lon: float) -> Cell:
+        if self.reference_lat is None:
+            self.set_reference(lat)
+        return (math.floor(lon * self.x_scale), math.floor(lat * METERS_PER_DEGREE / self.cell_size_m))
+
+    def cells_in_box(self, min_lat: float, min_lon: float, max_lat: float, max_lon: float) -> Iterator[Cell]:
+        low_x, low_y = self.cell_of(min_lat, min_lon)
+        high_x, high_y = self.cell_of(max_lat, max_lon)
+        for x in range(low_x, high_x + 1):
+            for y in range(low_y, high_y + 1):
+                yield (x, y)
+
+    def cells_in_radius(self, lat: float, lon: float, radius_m: float) -> Iterator[Cell]:
+        d_lat = radius_m / METERS_PER_DEGREE
+        d_lon = radius_m / (METERS_PER_DEGREE * max(math.cos(math.radians(lat)), 1e-6))
+        return self.cells_in_box(lat - d_lat, lon - d_lon, lat + d_lat, lon + d_lon)
+
+    def update(self, vehicle_id: str, lat: float, lon: float) -> Tuple[Optional[Cell], Cell]:
+        """Move a vehicle to (lat, lon); return (old cell, new cell)."""
+        new_cell = self.cell_of(lat, lon)
+        old_cell = self.cell_by_vehicle.get(vehicle_id)
+        if old_cell != new_cell:
+            if old_cell is not None:
+                self.discard(old_cell, vehicle_id)
+            self.cells.setdefault(new_cell, set()).add(vehicle_id)
+            self.cell_by_vehicle[vehicle_id] = new_cell
+        self.positions[vehicle_id] = (lat, lon)
+        return old_cell, new_cell
+
+    def remove(self, vehicle_id: str) -> Optional[Cell]:
+        """Drop a vehicle; return the cell it was in."""
+        cell = self.cell_by_vehicle.pop(vehicle_id, None)
+        self.positions.pop(vehicle_id, None)
+        if cell is not None:
+            self.discard(cell, vehicle_id)
+        return cell
+
+    def discard(self, cell: Cell, vehicle_id: str):
+        members = self.cells.get(cell)
+        if members is not None:
+            members.discard(vehicle_id)
+            if not members:
+                del self.cells[cell]
+
+    def query_radius(self, lat: float, lon: float, radius_m: float) -> List[str]:
+        """Vehicles within `radius_m` of (lat, lon)."""
+        found = []
+        for cell in self.cells_in_radius(lat, lon, radius_m):
+            for vehicle_id in self.cells.get(cell, ()):
+                vehicle_lat, vehicle_lon = self.positions[vehicle_id]
+                if distance_m(lat, lon, vehicle_lat, vehicle_lon) <= radius_m:
+                    found.append(vehicle_id)
+        return found
+
+    def query_box(self, min_lat: float, min_lon: float, max_lat: float, max_lon: float) -> List[str]:
+        """Vehicles inside the lat/lon box."""
+        found = []
+        for cell in self.cells_in_box(min_lat, min_lon, max_lat, max_lon):
+            for vehicle_id in self.cells.get(cell, ()):
+                vehicle_lat, vehicle_lon = self.positions[vehicle_id]
+                if min_lat <= vehicle_lat <= max_lat and min_lon <= vehicle_lon <= max_lon:
+                    found.append(vehicle_id)
+        return found
+
+
+class Geofence:
+    """One registered query and its current members."""
+    def __init__(self, name: str, callback: Callable, radius_m: float = 0.0,
+                 center: Optional[Tuple[float, float]] = None, follow_vehicle: Optional[str] = None,
+                 box: Optional[Tuple[float, float, float, float]] = None):
+        self.name = name
+        self.callback = callback
+        self.radius_m = radius_m
+        self.center = center
+        self.follow_vehicle = follow_vehicle
+        self.box = box
+        self.members: Set[str] = set()
+        self.cells: Set[Cell] = set()
+
+    def contains(self, lat: float, lon: float) -> bool:
+        if self.box is not None:
+            min_lat, min_lon, max_lat, max_lon = self.box
+            return min_lat <= lat <= max_lat and min_lon <= lon <= max_lon
+        if self.center is None:
+            return False
+        return distance_m(self.center[0], self.center[1], lat, lon) <= self.radius_m
+
+
+class GeofenceSubscriptions:
+    """Named region/proximity queries evaluated incrementally on vehicle updates."""
+    def __init__(self, index: Optional[GeofenceIndex] = None):
+        self.index = index if index is not None else GeofenceIndex()
+        self.fences: Dict[str, Geofence] = {}
+        self.fences_by_cell: Dict[Cell, Set[str]] = {}
+        self.records: Dict[str, dict] = {}
+
+    def add_radius(self, name: str, radius_m: float, callback: Callable,
+                   center: Optional[Tuple[float, float]] = None, follow_vehicle: Optional[str] = None):
+        """Register "vehicles within `radius_m` of `center` / of vehicle `follow_vehicle`"."""
+        if (center is None) == (follow_vehicle is None):
+            raise ValueError("Give exactly one of center or follow_vehicle.")
+        fence = Geofence(name, callback, radius_m=radius_m, center=center,
+                         follow_vehicle=str(follow_vehicle) if follow_vehicle is not None else None)
+        if fence.follow_vehicle is not None and fence.follow_vehicle in self.index.positions:
+            fence.center = self.index.positions[fence.follow_vehicle]
+        self.register(fence)
+
+    def add_region(self, name: str, min_lat: float, min_lon: float, max_lat: float, max_lon: float,
+                   callback: Callable):
+        """Register "vehicles inside the lat/lon box"."""
+        self.register(Geofence(name, callback, box=(min_lat, min_lon, max_lat, max_lon)))
+
+    def remove(self, name: str):
+        fence = self.fences.pop(name, None)
+        if fence is not None:
+            self.set_cells(fence, set())
+
+    def members(self, name: str) -> Set[str]:
+        return set(self.fences[name].members)
+
+    def register(self, fence: Geofence):
+        self.remove(fence.name)
+        self.fences[fence.name] = fence
+        self.refresh(fence)
+
+    def set_cells(self, fence: Geofence, cells: Set[Cell]):
+        for cell in fence.cells - cells:
+            names = self.fences_by_cell.get(cell)
+            if names is not None:
+                names.discard(fence.name)
+                if not names:
+                    del self.fences_by_cell[cell]
+        for cell in cells - fence.cells:
+            self.fences_by_cell.setdefault(cell, set()).add(fence.name)
+        fence.cells = cells
+
+    def refresh(self, fence: Geofence):
+        """Recompute cells and members of a fence (new fence or moved center)."""
+        if fence.box is not None:
+            cells = set(self.index.cells_in_box(*fence.box))
+            members = set(self.index.query_box(*fence.box))
+        elif fence.center is not None:
+            cells = set(self.index.cells_in_radius(fence.center[0], fence.center[1], fence.radius_m))
+            members = set(self.index.query_radius(fence.center[0], fence.center[1], fence.radius_m))
+        else:
+            cells, members = set(), set()
+        # A followed vehicle is not its own neighbour.
+        members.discard(fence.follow_vehicle)
+        self.set_cells(fence, cells)
+
+        for vehicle_id in members - fence.members:
+            fence.callback(fence.name, "enter", vehicle_id, self.records.get(vehicle_id))
+        for vehicle_id in fence.members - members:
+            fence.callback(fence.name, "leave", vehicle_id, self.records.get(vehicle_id))
+        fence.members = members
+
+    def on_vehicle(self, vehicle_id: str, record: Optional[dict]):
+        """Apply one mirrored vehicle record (None = vehicle removed)."""
+        vehicle_id = str(vehicle_id)
+        if record is None or record.get("lat") is None or record.get("lon") is None:
+            self.on_vehicle_removed(vehicle_id)
+            return
+
+        self.records[vehicle_id] = record
+        lat, lon = record["lat"], record["lon"]
+        old_cell, new_cell = self.index.update(vehicle_id, lat, lon)
+
+        candidates = set(self.fences_by_cell.get(new_cell, ()))
+        if old_cell is not None and old_cell != new_cell:
+            candidates |= self.fences_by_cell.get(old_cell, set())
+
+        for fence in self.fences.values():
+            if fence.follow_vehicle == vehicle_id:
+                fence.center = (lat, lon)
+                self.refresh(fence)
+                candidates.discard(fence.name)
+
+        for name in candidates:
+            fence = self.fences[name]
+            if fence.follow_vehicle == vehicle_id:
+                continue
+            inside = fence.contains(lat, lon)
+            if inside:
+                event = "update" if vehicle_id in fence.members else "enter"
+                fence.members.add(vehicle_id)
+                fence.callback(name, event, vehicle_id, record)
+            elif vehicle_id in fence.members:
+                fence.members.discard(vehicle_id)
+                fence.callback(name, "leave", vehicle_id, record)
+
+    def on_vehicle_removed(self, vehicle_id: str):
+        vehicle_id = str(vehicle_id)
+        record = self.records.pop(vehicle_id, None)
+        self.index.remove(vehicle_id)
+        for fence in self.fences.values():
+            if fence.follow_vehicle == vehicle_id:
+                fence.center = None
+                self.refresh(fence)
+            elif vehicle_id in fence.members:
+                fence.members.discard(vehicle_id)
+                fence.callback(fence.name, "leave", vehicle_id, record)
@@ -0,0 +1,173 @@
+"""
+**********************************************************************************
+HistoryWriter.py
+Created by: Debashis Das
+Argonne National Laboratory
+Transportation and Power Systems Division
+
+**********************************************************************************
+
+Description:
+------------
+Message history in Firebase RTDB under time buckets:
+
+    v2x_data/<bucket>/<ms timestamp>-<source>-<seq>   -> record
+
+`<bucket>` is the UTC hour ("2026-10-19T14") or day ("2026-10-19"). Keys are
+zero-padded, so key order is time order, and the per-writer sequence keeps
+two messages of the same millisecond apart (the old `/v2x_data/<seconds>`
+keys overwrote each other within a second). Timestamps never go backwards
+within a writer, even if the wall clock does.
+
+Records are buffered and written as one multi-path update per flush. A bucket
+is read with one key-range query (`read_bucket`); retention (`expire`) deletes
+whole expired buckets - including legacy `/v2x_data/<seconds>` entries - in
+one update.
+**********************************************************************************
+"""
+
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+from firebase_admin import db
+
+HISTORY_ROOT = "v2x_data"
+BUCKET_FORMATS = {"hour": "%Y-%m-%dT%H", "day": "%Y-%m-%d"}
+BUCKET_SPANS = {"hour": timedelta(hours=1), "day": timedelta(days=1)}
+# Sorts after every key character used below ('-', digits, letters).
+KEY_END = "~"
+
+
+def bucket_name(timestamp_ms: int, bucket: str = "hour") -> str:
+    """Bucket of a millisecond POSIX timestamp."""
+    return datetime.fromtimestamp(timestamp_ms / 1000.0, timezone.utc).strftime(BUCKET_FORMATS[bucket])
+
+
+def bucket_start(name: str) -> Optional[datetime]:
+    """Start time of a bucket name (hour or day), None for other keys."""
+    for fmt in BUCKET_FORMATS.values():
+        try:
+            return datetime.strptime(name, fmt).replace(tzinfo=timezone.utc)
+        except ValueError:
+            continue
+    return None
+
+
+def bucket_end(name: str) -> Optional[datetime]:
+    start = bucket_start(name)
+    if start is None:
+        return None
+    return start + (BUCKET_SPANS["hour"] if "T" in name else BUCKET_SPANS["day"])
+
+
+def safe_source(source: str) -> str:
+    """RTDB keys may not contain . $ # [ ] / - and '-' separates the key parts."""
+    return "".join(c if c.isalnum() else "_" for c in source)
+
+
+class HistoryWriter:
+    """Buffers history records and writes them as bulk multi-path updates."""
+    def __init__(self, source: str, bucket: str = "hour", flush_interval_s: float = 1.0,
+                 max_pending: int = 500, root: str = HISTORY_ROOT):
+        """
+        Args:
+            source: Writer name in the keys (e.g. the device IP).
+            bucket: "hour" or "day".
+            flush_interval_s: Maximum age of a buffered record before
+                `append` flushes (0 = write every record at once).
+            max_pending: Flush when this many records are buffered.
+        """
+        if bucket not in BUCKET_FORMATS:
+            raise ValueError(f"Unknown bucket size: {bucket}")
+        self.source = safe_source(source)
+        self.bucket = bucket
+        self.flush_interval_s = flush_interval_s
+        self.max_pending = max_pending
+        self.root = root
+        self.sequence = 0
+        self.last_ms = 0
+        self.pending: Dict[str, dict] = {}
+        self.oldest_pending = 0.0
+        self.written = 0
+
+    def key(self, timestamp_ms: int) -> str:
+        """Next key for a record at `timestamp_ms` (clamped to be monotonic)."""
+        self.last_ms = max(timestamp_ms, self.last_ms)
+        self.sequence = (self.sequence + 1) % 1000000
+        return f"{self.last_ms:013d}-{self.source}-{self.sequence:06d}"
+
+    def append(self, record: dict, timestamp_ms: Optional[int] = None) -> str:
+        """Buffer one record; return its path relative to the history root."""
+        if timestamp_ms is None:
+            timestamp_ms = int(time.time() * 1000)
+        key = self.key(timestamp_ms)
+        path = f"{bucket_name(self.last_ms, self.bucket)}/{key}"
+        if not self.pending:
+            self.oldest_pending = time.monotonic()
+        self.pending[path] = record
+        if len(self.pending) >= self.max_pending or time.monotonic() - self.oldest_pending >= self.flush_interval_s:
+            self.flush()
+        return path
+
+    def flush(self) -> int:
+        """Write the buffered records in one update; return how many were written."""
+        if not self.pending:
+            return 0
+        update, self.pending = self.pending, {}
+        db.reference(self.root).update(update)
+        self.written += len(update)
+        return len(update)
+
+
+def list_buckets(root: str = HISTORY_ROOT) -> List[str]:
+    """Names of the buckets (and legacy keys) under the history root, without their data."""
+    children = db.reference(root).get(shallow=True)
+    return sorted(children) if children else []
+
+
+def read_bucket(name: str, start_ms: Optional[int] = None, end_ms: Optional[int] = None,
+                limit: Optional[int] = None, root: str = HISTORY_ROOT) -> Dict[str, dict]:
+    """Records of one bucket, optionally limited to [start_ms, end_ms], in key (time) order."""
+    query = db.reference(f"{root}/{name}").order_by_key()
+    if start_ms is not None:
+        query = query.start_at(f"{start_ms:013d}")
+    if end_ms is not None:
+        query = query.end_at(f"{end_ms:013d}{KEY_END}")
+    if limit is not None:
+        query = query.limit_to_first(limit)
+    return dict(sorted((query.get() or {}).items()))
+
+
+def read_range(start_ms: int, end_ms: int, bucket: str = "hour", root: str = HISTORY_ROOT) -> Dict[str, dict]:
+    """Records between two timestamps, one range query per bucket they span."""
+    records: Dict[str, dict] = {}
+    span = BUCKET_SPANS[bucket]
+    current = bucket_start(bucket_name(start_ms, bucket))
+    end = datetime.fromtimestamp(end_ms / 1000.0, timezone.utc)
+    while current <= end:
+        records.update(read_bucket(current.strftime(BUCKET_FORMATS[bucket]), start_ms, end_ms, root=root))
+        current += span
+    return records
+
+
+def expire(retention_s: float, now: Optional[float] = None, root: str = HISTORY_ROOT) -> List[str]:
+    """Delete every bucket that ended more than `retention_s` ago, in one update.
+
+    Legacy `/v2x_data/<seconds>` entries older than the cut-off go too.
+
+    Returns:
+        The deleted bucket names.
+    """
+    cutoff = datetime.fromtimestamp((time.time() if now is None else now) - retention_s, timezone.utc)
+    expired = []
+    for name in list_buckets(root):
+        if name.isdigit():
+            if int(name) < cutoff.timestamp():
+                expired.append(name)
+            continue
+        end = bucket_end(name)
+        if end is not None and end <= cutoff:
+            expired.append(name)
+    if expired:
+        db.reference(root).update({name: None for name in expired})
+    return expired
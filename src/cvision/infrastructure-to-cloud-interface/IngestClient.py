@@ -0,0 +1,118 @@
+"""
+**********************************************************************************
+IngestClient.py
+Created by: Debashis Das
+Argonne National Laboratory
+Transportation and Power Systems Division
+
+**********************************************************************************
+
+Description:
+------------
+Client mode of the gateway scripts (`--ingest URL`): payloads are collected
+for `window_s` (or `max_batch` messages) and posted as one batch to
+ingest-server.py over a kept-alive HTTP connection from a background thread,
+so the receive loop never waits for HTTP.
+
+A 503 (ingest queue full) or a connection error keeps the batch and retries
+after a short back-off; if the backlog exceeds `max_pending` the oldest
+messages are dropped (and counted) rather than growing without bound.
+**********************************************************************************
+"""
+
+import http.client
+import threading
+import time
+from typing import List, Optional
+from urllib.parse import urlparse
+import JsonCodec
+
+RETRY_S = 1.0
+
+
+class IngestClient:
+    """Batches payloads into POSTs to the ingest service."""
+    def __init__(self, url: str, window_s: float = 0.1, max_batch: int = 500,
+                 max_pending: int = 50000, timeout_s: float = 5.0):
+        parsed = urlparse(url)
+        self.host = parsed.hostname
+        self.port = parsed.port or 80
+        self.path = parsed.path if parsed.path not in ("", "/") else "/ingest"
+        self.window_s = window_s
+        self.max_batch = max_batch
+        self.max_pending = max_pending
+        self.timeout_s = timeout_s
+        self.connection: Optional[http.client.HTTPConnection] = None
+        self.pending: List[str] = []
+        self.condition = threading.Condition()
+        self.running = True
+        self.posted = 0
+        self.batches = 0
+        self.dropped = 0
+        self.retries = 0
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def submit(self, payload: str):
+        """Queue one hex payload for the next batch."""
+        with self.condition:
+            self.pending.append(payload)
+            if len(self.pending) > self.max_pending:
+                excess = len(self.pending) - self.max_pending
+                del self.pending[:excess]
+                self.dropped += excess
+            if len(self.pending) >= self.max_batch:
+                self.condition.notify()
+
+    def post(self, batch: List[str]) -> Optional[int]:
+        """POST one batch; return the HTTP status, or None on a connection error."""
+        body = JsonCodec.dumps({"messages": batch})
+        try:
+            if self.connection is None:
+                self.connection = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout_s)
+            self.connection.request("POST", self.path, body, {"Content-Type": "application/json"})
+            response = self.connection.getresponse()
+            response.read()
+            return response.status
+        except (OSError, http.client.HTTPException) as e:
+            print(f"Ingest POST to {self.host}:{self.port} failed: {e}")
+            if self.connection is not None:
+                self.connection.close()
+            self.connection = None
+            return None
+
+    def run(self):
+        while True:
+            with self.condition:
+                if self.running and len(self.pending) < self.max_batch:
+                    self.condition.wait(self.window_s)
+                if not self.pending:
+                    if not self.running:
+                        return
+                    continue
+                batch, self.pending = self.pending[:self.max_batch], self.pending[self.max_batch:]
+
+            status = self.post(batch)
+            if status == 202:
+                self.posted += len(batch)
+                self.batches += 1
+                continue
+            if status is not None and status != 503:
+                print(f"Ingest rejected a batch of {len(batch)} with HTTP {status}; dropping it")
+                self.dropped += len(batch)
+                continue
+            # Busy or unreachable: put the batch back in front and back off.
+            self.retries += 1
+            with self.condition:
+                self.pending[:0] = batch
+                if not self.running:
+                    self.dropped += len(self.pending)
+                    return
+            time.sleep(RETRY_S)
+
+    def stop(self, timeout: float = 5.0):
+        """Post what is pending, then stop."""
+        with self.condition:
+            self.running = False
+            self.condition.notify()
+        self.thread.join(timeout)
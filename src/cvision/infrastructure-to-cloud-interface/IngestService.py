@@ -0,0 +1,269 @@
+"""
+**********************************************************************************
+IngestService.py
+Created by: Debashis Das
+Argonne National Laboratory
+Transportation and Power Systems Division
+
+**********************************************************************************
+
+Description:
+------------
+Batch HTTP ingest (ingest-server.py), the local replacement of the
+`ingest-spat-data` cloud function, which took one POST per encoded SPaT.
+
+    POST /ingest    {"messages": ["0013...", {"payload": "...", "encoding": "b64"}, ...]}
+                    (a bare JSON list works too)
+                 -> 202 {"batch": "<id>", "ids": ["<id>-0", "<id>-1", ...]}
+    GET /status/<item id>   queued | ok | invalid: <reason>
+    GET /stats              counters
+    GET /health             liveness/readiness probe
+
+The response is sent as soon as the batch is parsed and queued. A worker
+thread validates every item (type prefix, payload walk with
+PayloadInspector.py) and hands the valid ones of a batch to the sinks
+together:
+
+    FirebaseSlotSink   one multi-path update into latest/<type>/<id>
+                       (LatestSlots.py; run `node listener.js --slots`)
+    UdpSink            hex payload per datagram (e.g. PortNumber.MessageDecoder)
+    NullSink           counts only (load tests)
+
+A full queue answers 503 with Retry-After instead of buffering without bound.
+**********************************************************************************
+"""
+
+import queue
+import socket
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler
+from typing import Callable, Dict, List, Optional, Tuple
+from firebase_admin import db
+import JsonCodec
+from LatestSlots import LatestSlotWriter
+from PayloadInspector import peek, source_key
+from UplinkCodec import decode_payload
+
+INGEST_PATH = "/ingest"
+MAX_BODY_BYTES = 8 * 1024 * 1024
+
+# (item id, msg_type, hex payload, PayloadInspector fields)
+Item = Tuple[str, str, str, dict]
+
+
+class IngestQueueFull(Exception):
+    """The worker is behind; the client should retry later."""
+
+
+def parse_batch(body: bytes) -> List[dict]:
+    """Items of a POST body as {"payload": ..., "encoding": ...} dicts.
+
+    Raises:
+        ValueError: If the body is not a JSON list or {"messages": list}.
+    """
+    data = JsonCodec.loads(body)
+    if isinstance(data, dict):
+        data = data.get("messages")
+    if not isinstance(data, list):
+        raise ValueError('Body must be a JSON list or {"messages": [...]}')
+    return [{"payload": item} if isinstance(item, str) else item for item in data]
+
+
+class IngestService:
+    """Queues posted batches and validates/fans them out on a worker thread."""
+    def __init__(self, sinks: List[Callable[[List[Item]], None]], queue_size: int = 1024,
+                 status_limit: int = 100000):
+        """
+        Args:
+            sinks: Called with the valid items of every batch.
+            queue_size: Batches waiting for the worker before 503.
+            status_limit: Item statuses kept for /status (oldest dropped).
+        """
+        self.sinks = sinks
+        self.queue: "queue.Queue[Tuple[str, List[dict]]]" = queue.Queue(queue_size)
+        self.status_limit = status_limit
+        self.statuses: "OrderedDict[str, str]" = OrderedDict()
+        self.lock = threading.Lock()
+        self.counters = {"batches": 0, "items": 0, "ok": 0, "invalid": 0, "rejected_batches": 0, "sink_errors": 0}
+        self.started = time.time()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def submit(self, items: List[dict]) -> Tuple[str, List[str]]:
+        """Queue a batch; return (batch id, item ids).
+
+        Raises:
+            IngestQueueFull: If the worker queue is full.
+        """
+        batch_id = uuid.uuid4().hex
+        ids = [f"{batch_id}-{index}" for index in range(len(items))]
+        # Statuses go in before the worker can see the batch.
+        with self.lock:
+            if self.queue.full():
+                self.counters["rejected_batches"] += 1
+                raise IngestQueueFull()
+            for item_id in ids:
+                self.set_status(item_id, "queued")
+            self.counters["batches"] += 1
+            self.counters["items"] += len(items)
+            # Only submitters put, and they hold the lock, so this cannot block.
+            self.queue.put_nowait((batch_id, items))
+        return batch_id, ids
+
+    def set_status(self, item_id: str, status: str):
+        # Caller holds self.lock.
+        self.statuses[item_id] = status
+        if len(self.statuses) > self.status_limit:
+            self.statuses.popitem(last=False)
+
+    def status(self, item_id: str) -> Optional[str]:
+        with self.lock:
+            return self.statuses.get(item_id)
+
+    def validate(self, item: dict) -> Tuple[Optional[str], Optional[str], Optional[dict], Optional[str]]:
+        """Return (msg_type, hex payload, fields, error) of one item."""
+        try:
+            payload = decode_payload(item).strip()
+        except (KeyError, ValueError, TypeError, AttributeError):
+            return None, None, None, "bad payload field"
+        msg_type, fields = peek(payload)
+        if msg_type is None:
+            return None, None, None, "unknown message type"
+        if fields is None:
+            return None, None, None, f"unreadable {msg_type} payload"
+        return msg_type, payload, fields, None
+
+    def run(self):
+        while True:
+            batch_id, items = self.queue.get()
+            valid: List[Item] = []
+            results = []
+            for index, item in enumerate(items):
+                item_id = f"{batch_id}-{index}"
+                msg_type, payload, fields, error = self.validate(item)
+                if error is None:
+                    valid.append((item_id, msg_type, payload, fields))
+                    results.append((item_id, "ok"))
+                else:
+                    results.append((item_id, f"invalid: {error}"))
+
+            for sink in self.sinks:
+                try:
+                    sink(valid)
+                except Exception as e:
+                    with self.lock:
+                        self.counters["sink_errors"] += 1
+                    print(f"Ingest sink {type(sink).__name__} failed for batch {batch_id}: {e}")
+
+            with self.lock:
+                for item_id, status in results:
+                    self.set_status(item_id, status)
+                self.counters["ok"] += len(valid)
+                self.counters["invalid"] += len(items) - len(valid)
+
+    def stats(self) -> dict:
+        with self.lock:
+            return dict(self.counters, queued_batches=self.queue.qsize(),
+                        uptime_s=round(time.time() - self.started, 1))
+
+
+class FirebaseSlotSink:
+    """Writes each batch into the per-source slots with one multi-path update."""
+    def __init__(self, ring_size: int = 0):
+        self.slot_writer = LatestSlotWriter(ring_size)
+
+    def __call__(self, items: List[Item]):
+        if not items:
+            return
+        update = {}
+        for item_id, msg_type, payload, fields in items:
+            key = source_key(msg_type, fields) or "unknown"
+            update.update(self.slot_writer.build_update(msg_type, key, payload, {"ingest_id": item_id}))
+        db.reference("/").update(update)
+
+
+class UdpSink:
+    """Forwards every valid payload as one hex datagram."""
+    def __init__(self, address: Tuple[str, int]):
+        self.address = address
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    def __call__(self, items: List[Item]):
+        sendto = self.socket.sendto
+        for _, _, payload, _ in items:
+            sendto(payload.encode(), self.address)
+
+
+class NullSink:
+    """Counts messages by type."""
+    def __init__(self):
+        self.by_type: Dict[str, int] = {}
+
+    def __call__(self, items: List[Item]):
+        for _, msg_type, _, _ in items:
+            self.by_type[msg_type] = self.by_type.get(msg_type, 0) + 1
+
+
+def make_handler(service: IngestService, verbose: bool = False):
+    """BaseHTTPRequestHandler class bound to `service` (HTTP/1.1, keep-alive)."""
+    class IngestHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # Headers and body are separate writes; with Nagle on, every keep-alive
+        # response waits ~40 ms for the client's delayed ACK.
+        disable_nagle_algorithm = True
+
+        def send_json(self, code: int, body, headers: Optional[Dict[str, str]] = None):
+            data = JsonCodec.dumps(body)
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            if self.path != INGEST_PATH:
+                self.rfile.read(length)
+                self.send_json(404, {"error": "not found"})
+                return
+            if length <= 0 or length > MAX_BODY_BYTES:
+                self.close_connection = True
+                self.send_json(413 if length > 0 else 411, {"error": f"body must be 1..{MAX_BODY_BYTES} bytes"})
+                return
+            try:
+                items = parse_batch(self.rfile.read(length))
+            except ValueError as e:
+                self.send_json(400, {"error": str(e)})
+                return
+            try:
+                batch_id, ids = service.submit(items)
+            except IngestQueueFull:
+                self.send_json(503, {"error": "ingest queue full"}, {"Retry-After": "1"})
+                return
+            self.send_json(202, {"batch": batch_id, "ids": ids})
+
+        def do_GET(self):
+            if self.path == "/health":
+                self.send_json(200, {"status": "ok"})
+            elif self.path == "/stats":
+                self.send_json(200, service.stats())
+            elif self.path.startswith("/status/"):
+                item_id = self.path[len("/status/"):]
+                status = service.status(item_id)
+                if status is None:
+                    self.send_json(404, {"id": item_id, "error": "unknown or expired id"})
+                else:
+                    self.send_json(200, {"id": item_id, "status": status})
+            else:
+                self.send_json(404, {"error": "not found"})
+
+        def log_message(self, format, *args):
+            if verbose:
+                super().log_message(format, *args)
+
+    return IngestHandler
@@ -0,0 +1,110 @@
+"""
+**********************************************************************************
+JsonCodec.py
+Created by: Debashis Das
+Argonne National Laboratory
+Transportation and Power Systems Division
+
+**********************************************************************************
+
+Description:
+------------
+One JSON layer for the publisher and the gateway. Uses orjson when it is
+installed (`pip install orjson`) and falls back to the standard library
+otherwise; `CVISION_JSON=json` forces the fallback.
+
+    loads(data)        bytes or str -> object
+    dumps(obj)         object -> compact UTF-8 bytes (what goes on the wire)
+    dumps_str(obj)     object -> compact str
+    PayloadCache       serialized bytes of static payloads, built once
+
+The stdlib fallback reuses one encoder and one decoder instance; `json.dumps`
+with `separators=` builds a new encoder on every call. Both backends produce
+compact output. orjson writes NaN/Infinity as null and rejects integers above
+64 bits; neither occurs in decoded V2X messages.
+
+The same file is in v2x-telemetry-publisher/ and infrastructure-to-cloud-interface/;
+test/test_shared_modules.py of the publisher fails when the copies differ.
+**********************************************************************************
+"""
+
+import json
+import os
+from typing import Any, Callable, Dict, Hashable, Tuple, Union
+
+BACKEND = "json"
+if os.environ.get("CVISION_JSON", "").lower() != "json":
+    try:
+        import orjson
+        BACKEND = "orjson"
+    except ImportError:
+        pass
+
+if BACKEND == "orjson":
+    _ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+    def loads(data: Union[bytes, str]) -> Any:
+        return orjson.loads(data)
+
+    def dumps(obj: Any) -> bytes:
+        return orjson.dumps(obj, option=_ORJSON_OPTIONS)
+
+    def dumps_str(obj: Any) -> str:
+        return orjson.dumps(obj, option=_ORJSON_OPTIONS).decode()
+
+else:
+    _ENCODER = json.JSONEncoder(separators=(",", ":"), ensure_ascii=False)
+    _DECODER = json.JSONDecoder()
+
+    def loads(data: Union[bytes, str]) -> Any:
+        if not isinstance(data, str):
+            data = data.decode()
+        return _DECODER.decode(data)
+
+    def dumps(obj: Any) -> bytes:
+        return _ENCODER.encode(obj).encode()
+
+    def dumps_str(obj: Any) -> str:
+        return _ENCODER.encode(obj)
+
+
+def load_file(path: str) -> Any:
+    """Parse a JSON file."""
+    with open(path, "rb") as f:
+        return loads(f.read())
+
+
+class PayloadCache:
+    """Serialized bytes of payloads that do not change between sends."""
+    def __init__(self):
+        self.entries: Dict[Hashable, bytes] = {}
+        self.files: Dict[str, Tuple[float, bytes]] = {}
+
+    def get(self, key: Hashable, build: Callable[[], Any]) -> bytes:
+        """Bytes of `build()`, serialized on the first call for `key` only."""
+        data = self.entries.get(key)
+        if data is None:
+            data = self.entries[key] = dumps(build())
+        return data
+
+    def file(self, path: str) -> bytes:
+        """Compact bytes of a JSON file, re-read only when the file changes.
+
+        Raises:
+            FileNotFoundError: If the file does not exist.
+            ValueError: If the file is not valid JSON.
+        """
+        mtime = os.stat(path).st_mtime
+        cached = self.files.get(path)
+        if cached is None or cached[0] != mtime:
+            cached = self.files[path] = (mtime, dumps(load_file(path)))
+        return cached[1]
+
+    def invalidate(self, key: Hashable = None):
+        """Forget one entry (or everything)."""
+        if key is None:
+            self.entries.clear()
+            self.files.clear()
+        else:
+            self.entries.pop(key, None)
+            self.files.pop(key, None)
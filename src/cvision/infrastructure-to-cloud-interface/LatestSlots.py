@@ -0,0 +1,87 @@
+"""
+**********************************************************************************
+LatestSlots.py
+Created by: Debashis Das
+Argonne National Laboratory
+Transportation and Power Systems Division
+
+**********************************************************************************
+
+Description:
+------------
+Per-source, per-type latest-value slots in Firebase RTDB, replacing the single
+contended `/LatestV2XMessage` node:
+
+    latest/<type>/<intersectionId or vehicleId>              -> newest message
+    latest_ring/<type>/<intersectionId or vehicleId>/<n>     -> last N messages (optional)
+
+Every message carries a per-slot `seq` and the writer's `epoch` (its start
+time), so consumers can detect gaps (seq jumps) and writer restarts (epoch
+changes). The slot and its ring entry go out in one multi-path update.
+A writer that drops messages on purpose (the coalescing SlotUploader of
+ControllerRouter.py) counts them in the record's `coalesced` field.
+With a non-hex `encoding` (UplinkCodec.py) the payload is stored encoded and
+the record names its encoding.
+**********************************************************************************
+"""
+
+import time
+from typing import Dict, Optional, Tuple
+from firebase_admin import db
+from PayloadInspector import peek, source_key
+from UplinkCodec import encode_payload
+
+LATEST_ROOT = "latest"
+RING_ROOT = "latest_ring"
+
+
+class LatestSlotWriter:
+    """Writes messages into their per-type, per-source slot with sequence numbers."""
+    def __init__(self, ring_size: int = 0, encoding: str = "hex"):
+        """
+        Args:
+            ring_size: Number of recent messages kept per slot (0 = no ring).
+            encoding: Payload encoding of the records ("hex" or "b64").
+        """
+        self.ring_size = ring_size
+        self.encoding = encoding
+        self.epoch = int(time.time() * 1000)
+        self.sequence_by_slot: Dict[Tuple[str, str], int] = {}
+
+    def build_update(self, msg_type: str, key: str, payload: str, extra: Optional[dict] = None) -> dict:
+        """Return the multi-path update for one message (also advances its sequence)."""
+        slot = (msg_type, key)
+        seq = self.sequence_by_slot.get(slot, 0) + 1
+        self.sequence_by_slot[slot] = seq
+
+        record = {
+            "msg_type": msg_type,
+            "source": key,
+            "seq": seq,
+            "epoch": self.epoch,
+            "posix_timestamp": time.time(),
+            "payload": encode_payload(payload, self.encoding),
+        }
+        if self.encoding != "hex":
+            record["encoding"] = self.encoding
+        if extra:
+            record.update(extra)
+
+        update = {f"{LATEST_ROOT}/{msg_type}/{key}": record}
+        if self.ring_size > 0:
+            update[f"{RING_ROOT}/{msg_type}/{key}/{seq % self.ring_size}"] = record
+        return update
+
+    def write(self, payload: str, extra: Optional[dict] = None) -> Optional[dict]:
+        """Classify `payload`, find its source and write it to its slot.
+
+        Returns:
+            The written record, or None if the payload type is unknown.
+        """
+        msg_type, fields = peek(payload)
+        if msg_type is None:
+            return None
+        key = source_key(msg_type, fields) or "unknown"
+        update = self.build_update(msg_type, key, payload, extra)
+        db.reference("/").update(update)
+        return update[f"{LATEST_ROOT}/{msg_type}/{key}"]
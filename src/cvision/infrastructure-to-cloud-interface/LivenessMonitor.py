@@ -0,0 +1,222 @@
+"""
+**********************************************************************************
+LivenessMonitor.py
+Created by: Debashis Das
+Argonne National Laboratory
+Transportation and Power Systems Division
+
+**********************************************************************************
+
+Description:
+------------
+Detects sources (signal controllers, intersections, vehicles) that went
+silent. Used by the gateway (map-spat-sender.py) and the telemetry
+publisher; the two copies of this file are identical.
+
+Every source has one timer in a hierarchical timer wheel (levels of 256, 64,
+64 and 64 slots, as in the Linux kernel), so nothing ever scans all sources:
+
+    seen()   O(1): stores the last-seen time; a timer is only scheduled for a
+             new or stale source, never moved per message
+    poll()   advances the wheel tick by tick; a timer that fires for a source
+             heard from in the meantime is re-armed at last_seen + timeout
+             (lazy re-arming), otherwise the source turns stale
+
+Status changes (alive/stale) go to `on_change(kind, source_id, status,
+last_seen_ms)`; `status_record` builds the record written under
+`source_status/{kind}/{id}`. Stale sources are forgotten after
+`forget_after_s`, which keeps memory bounded; `forget` drops one at once.
+**********************************************************************************
+"""
+
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+LIVENESS_ROOT = "source_status"
+ALIVE, STALE = "alive", "stale"
+LEVEL_BITS = (8, 6, 6, 6)
+FIRST_LEVEL_SLOTS = 1 << LEVEL_BITS[0]
+FIRST_LEVEL_MASK = FIRST_LEVEL_SLOTS - 1
+
+
+class TimerWheel:
+    """Hierarchical timer wheel over integer ticks; expired items come out of `advance`."""
+    def __init__(self, tick: int):
+        self.tick = tick
+        self.levels = [[[] for _ in range(1 << bits)] for bits in LEVEL_BITS]
+        self.shifts = [sum(LEVEL_BITS[:level]) for level in range(len(LEVEL_BITS))]
+        self.span = 1 << sum(LEVEL_BITS)
+
+    def schedule(self, expires: int, item):
+        """Fire `item` at tick `expires` (at the next tick if that has passed)."""
+        self.place(max(expires, self.tick + 1), item)
+
+    def place(self, expires: int, item):
+        delta = expires - self.tick
+        if 0 <= delta < FIRST_LEVEL_SLOTS:
+            self.levels[0][expires & FIRST_LEVEL_MASK].append((expires, item))
+            return
+        delta = max(0, min(delta, self.span - 1))
+        expires = self.tick + delta
+        for level, bits in enumerate(LEVEL_BITS):
+            shift = self.shifts[level]
+            # The lowest level whose range covers the delay.
+            if delta < (1 << (shift + bits)):
+                self.levels[level][(expires >> shift) & ((1 << bits) - 1)].append((expires, item))
+                return
+
+    def advance(self) -> List:
+        """Move to the next tick; return the items that expire on it."""
+        self.tick += 1
+        tick = self.tick
+        for level in range(1, len(LEVEL_BITS)):
+            shift = self.shifts[level]
+            if tick & ((1 << shift) - 1):
+                break
+            # A lower level wrapped: spread this level's current slot over the levels below.
+            slots = self.levels[level]
+            index = (tick >> shift) & ((1 << LEVEL_BITS[level]) - 1)
+            entries, slots[index] = slots[index], []
+            for expires, item in entries:
+                self.place(expires, item)
+        slots = self.levels[0]
+        index = tick & ((1 << LEVEL_BITS[0]) - 1)
+        entries, slots[index] = slots[index], []
+        return [item for _, item in entries]
+
+
+class SourceState:
+    """Last-seen time and status of one source."""
+    __slots__ = ("last_seen", "stale", "generation")
+
+    def __init__(self, now: float):
+        self.last_seen = now
+        self.stale = False
+        self.generation = 0
+
+
+class LivenessMonitor:
+    """Marks sources stale when they have not been seen for their kind's timeout."""
+    def __init__(self, timeout_s: float = 5.0, timeouts: Optional[Dict[str, float]] = None,
+                 on_change: Optional[Callable[[str, str, str, int], None]] = None,
+                 tick_s: float = 0.1, forget_after_s: float = 3600.0, now: Optional[float] = None):
+        """
+        Args:
+            timeout_s: Silence after which a source is stale.
+            timeouts: Per-kind overrides of `timeout_s`.
+            on_change: Called on every alive/stale transition (also for new sources).
+            tick_s: Timer resolution; staleness is detected up to one tick late.
+            forget_after_s: Stale sources are dropped after this much silence.
+        """
+        if tick_s <= 0:
+            raise ValueError("tick_s must be positive.")
+        self.tick_s = tick_s
+        self.timeout_ticks = {kind: self.ticks(seconds) for kind, seconds in (timeouts or {}).items()}
+        self.default_timeout_ticks = self.ticks(timeout_s)
+        self.forget_after_ticks = self.ticks(forget_after_s)
+        self.on_change = on_change
+        self.sources: Dict[str, Dict[str, SourceState]] = {}
+        self.wheel = TimerWheel(int((time.monotonic() if now is None else now) / tick_s))
+        self.stale_count = 0
+        self.changes = 0
+        self.forgotten = 0
+        # Timer generations are unique across sources, so a timer left behind
+        # by a forgotten source never matches the source that replaces it.
+        self.generation = 0
+
+    def ticks(self, seconds: float) -> int:
+        return max(1, int(round(seconds / self.tick_s)))
+
+    def seen(self, kind: str, source_id: str, now: Optional[float] = None):
+        """Record a message from `source_id`."""
+        if now is None:
+            now = time.monotonic()
+        sources = self.sources.get(kind)
+        if sources is None:
+            sources = self.sources[kind] = {}
+        state = sources.get(source_id)
+        if state is None:
+            state = sources[source_id] = SourceState(now)
+        elif state.stale:
+            state.last_seen = now
+            state.stale = False
+            self.stale_count -= 1
+        else:
+            state.last_seen = now  # the pending timer re-arms itself when it fires
+            return
+        self.arm(kind, source_id, state, int(now / self.tick_s) + self.timeout_ticks.get(kind, self.default_timeout_ticks))
+        self.emit(kind, source_id, ALIVE, state, now)
+
+    def arm(self, kind: str, source_id: str, state: SourceState, expires: int):
+        self.generation += 1
+        state.generation = self.generation
+        self.wheel.schedule(expires, (kind, source_id, state.generation))
+
+    def forget(self, kind: str, source_id: str):
+        """Drop a source now (e.g. an evicted intersection); its pending timer is ignored when it fires."""
+        state = self.sources.get(kind, {}).pop(source_id, None)
+        if state is None:
+            return
+        if state.stale:
+            self.stale_count -= 1
+        self.forgotten += 1
+
+    def poll(self, now: Optional[float] = None):
+        """Fire the timers that are due; call regularly, also when no messages arrive."""
+        if now is None:
+            now = time.monotonic()
+        target = int(now / self.tick_s)
+        wheel = self.wheel
+        while wheel.tick < target:
+            for timer in wheel.advance():
+                self.expire(timer, now)
+
+    def expire(self, timer: Tuple[str, str, int], now: float):
+        kind, source_id, generation = timer
+        sources = self.sources[kind]
+        state = sources.get(source_id)
+        if state is None or state.generation != generation:
+            return  # superseded timer
+        if state.stale:
+            del sources[source_id]
+            self.stale_count -= 1
+            self.forgotten += 1
+            return
+        expires = int(state.last_seen / self.tick_s) + self.timeout_ticks.get(kind, self.default_timeout_ticks)
+        if expires > self.wheel.tick:
+            # Still the only timer of this source: re-use it.
+            self.wheel.place(expires, timer)
+            return
+        state.stale = True
+        self.stale_count += 1
+        self.emit(kind, source_id, STALE, state, now)
+        self.arm(kind, source_id, state, expires + self.forget_after_ticks)
+
+    def emit(self, kind: str, source_id: str, status: str, state: SourceState, now: float):
+        self.changes += 1
+        if self.on_change is None:
+            return
+        last_seen_ms = int((time.time() - (now - state.last_seen)) * 1000)
+        try:
+            self.on_change(kind, source_id, status, last_seen_ms)
+        except Exception as e:
+            print(f"Liveness status change of {kind}/{source_id} failed: {e}")
+
+    def status(self, kind: str, source_id: str) -> Optional[str]:
+        state = self.sources.get(kind, {}).get(source_id)
+        if state is None:
+            return None
+        return STALE if state.stale else ALIVE
+
+    def stats(self) -> dict:
+        tracked = sum(len(sources) for sources in self.sources.values())
+        return {"tracked": tracked, "stale": self.stale_count, "changes": self.changes, "forgotten": self.forgotten}
+
+
+def status_record(status: str, last_seen_ms: int) -> dict:
+    """Record written to `source_status/{kind}/{id}` on a status change."""
+    return {"status": status, "lastSeen": last_seen_ms, "changedAt": int(time.time() * 1000)}
+
+
+def status_path(kind: str, source_id: str) -> str:
+    return f"{LIVENESS_ROOT}/{kind}/{source_id}"
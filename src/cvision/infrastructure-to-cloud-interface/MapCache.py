@@ -0,0 +1,113 @@
+"""
+**********************************************************************************
+MapCache.py
+Created by: Debashis Das
+Argonne National Laboratory
+Transportation and Power Systems Division
+
+**********************************************************************************
+
+Description:
+------------
+Content-hash cache of MAP messages, keyed by intersection.
+
+Controllers rebroadcast the same (static) MAP at several Hz. The gateway asks
+`observe()` whether a received MAP is new; only a new revision or a changed
+payload (or an optional periodic refresh for late joiners) needs to be
+uploaded. The cached MAP, with its identifying fields, stays available for
+local consumers through `lookup()` / `entries()`.
+**********************************************************************************
+"""
+
+import hashlib
+import time
+from typing import Dict, List, Optional
+
+
+class MapCacheEntry:
+    """Latest MAP of one intersection."""
+    __slots__ = ("key", "intersection_id", "revision", "digest", "payload",
+                 "first_seen", "last_seen", "last_upload", "receive_count", "upload_count")
+
+    def __init__(self, key: str, intersection_id: Optional[int], revision: Optional[int], digest: str, payload: str, now: float):
+        self.key = key
+        self.intersection_id = intersection_id
+        self.revision = revision
+        self.digest = digest
+        self.payload = payload
+        self.first_seen = now
+        self.last_seen = now
+        self.last_upload = 0.0
+        self.receive_count = 0
+        self.upload_count = 0
+
+    def to_dict(self) -> dict:
+        return {
+            "intersectionId": self.intersection_id,
+            "revision": self.revision,
+            "hash": self.digest,
+            "payload": self.payload,
+            "firstSeen": self.first_seen,
+            "lastSeen": self.last_seen,
+            "receiveCount": self.receive_count,
+            "uploadCount": self.upload_count,
+        }
+
+
+class MapCache:
+    """Decides which MAP messages need uploading and keeps the latest one per intersection."""
+    def __init__(self, refresh_interval_s: float = 0.0):
+        """
+        Args:
+            refresh_interval_s: Re-upload an unchanged MAP after this many
+                seconds so consumers that joined later still receive it
+                (0 = upload on change only).
+        """
+        self.refresh_interval_s = refresh_interval_s
+        self.entries_by_key: Dict[str, MapCacheEntry] = {}
+
+    @staticmethod
+    def digest(payload: str) -> str:
+        return hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+
+    def observe(self, key: str, payload: str, intersection_id: Optional[int] = None,
+                revision: Optional[int] = None, now: Optional[float] = None) -> bool:
+        """Record a received MAP.
+
+        Args:
+            key: Cache key (intersection ID, or the source address when the
+                intersection ID cannot be read from the payload).
+            payload: UPER hex payload.
+            intersection_id: Intersection ID read from the payload, if any.
+            revision: Intersection revision read from the payload, if any.
+
+        Returns:
+            True if the MAP should be uploaded (new, changed or refresh due).
+        """
+        if now is None:
+            now = time.time()
+        digest = self.digest(payload)
+        entry = self.entries_by_key.get(key)
+
+        if entry is None or entry.digest != digest or entry.revision != revision:
+            first_seen = entry.first_seen if entry is not None else now
+            entry = MapCacheEntry(key, intersection_id, revision, digest, payload, first_seen)
+            self.entries_by_key[key] = entry
+
+        entry.last_seen = now
+        entry.receive_count += 1
+
+        due = entry.upload_count == 0 or (
+            self.refresh_interval_s > 0 and now - entry.last_upload >= self.refresh_interval_s)
+        if due:
+            entry.last_upload = now
+            entry.upload_count += 1
+        return due
+
+    def lookup(self, key: str) -> Optional[MapCacheEntry]:
+        """Return the cached MAP of one intersection (or source)."""
+        return self.entries_by_key.get(str(key))
+
+    def entries(self) -> List[MapCacheEntry]:
+        """Return all cached MAPs."""
+        return list(self.entries_by_key.values())
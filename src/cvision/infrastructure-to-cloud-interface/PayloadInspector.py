@@ -0,0 +1,181 @@
+"""
+**********************************************************************************
+PayloadInspector.py
+Created by: Debashis Das
+Argonne National Laboratory
+Transportation and Power Systems Division
+
+**********************************************************************************
+
+Description:
+------------
+Reads the few identifying fields the gateway needs straight out of a UPER
+(J2735 MessageFrame) hex payload, without running the full decoder:
+
+    MAP  -> intersection ID, intersection revision, msgIssueRevision
+    SPaT -> intersection ID, revision (the decoder's `msgCnt`), moy/timeStamp
+    BSM  -> temporary ID, msgCnt, secMark
+
+Only the leading fields of each message are walked, so the cost is a handful
+of bit reads. All functions raise ValueError on payloads they cannot walk
+(truncated, fragmented, unexpected layout).
+**********************************************************************************
+"""
+
+from typing import Optional, Tuple
+
+MAP_IDENTIFIER = "0012"
+SPAT_IDENTIFIER = "0013"
+BSM_IDENTIFIER = "0014"
+
+MESSAGE_TYPES = {
+    MAP_IDENTIFIER: "MAP",
+    SPAT_IDENTIFIER: "SPaT",
+    BSM_IDENTIFIER: "BSM",
+}
+
+
+class BitReader:
+    """Sequential reader of big-endian bit fields from a byte string."""
+    def __init__(self, data: bytes, bit_offset: int = 0):
+        self.data = data
+        self.position = bit_offset
+
+    def read(self, bit_count: int) -> int:
+        end = self.position + bit_count
+        if end > len(self.data) * 8:
+            raise ValueError("Payload truncated.")
+        value = 0
+        for bit in range(self.position, end):
+            value = (value << 1) | ((self.data[bit >> 3] >> (7 - (bit & 7))) & 1)
+        self.position = end
+        return value
+
+    def skip(self, bit_count: int):
+        self.position += bit_count
+
+    def skip_descriptive_name(self):
+        """Skip a DescriptiveName (IA5String SIZE(1..63))."""
+        length = self.read(6) + 1
+        self.skip(7 * length)
+
+
+def message_type(payload: str) -> Optional[str]:
+    """Return "MAP", "SPaT", "BSM" or None from the hex payload prefix."""
+    return MESSAGE_TYPES.get(payload[:4])
+
+
+def open_message(payload: str) -> BitReader:
+    """Return a reader positioned at the start of the MessageFrame value."""
+    try:
+        data = bytes.fromhex(payload.strip())
+    except ValueError as e:
+        raise ValueError(f"Payload is not hex: {e}")
+    reader = BitReader(data, 16)  # extension bit + messageId
+    if reader.read(1) == 0:
+        reader.skip(7)   # length < 128
+    elif reader.read(1) == 0:
+        reader.skip(14)  # length < 16K
+    else:
+        raise ValueError("Fragmented payloads are not supported.")
+    return reader
+
+
+def read_intersection_reference(reader: BitReader) -> int:
+    """Read an IntersectionReferenceID and return the intersection ID."""
+    has_region = reader.read(1)
+    if has_region:
+        reader.skip(16)
+    return reader.read(16)
+
+
+def peek_map(payload: str) -> dict:
+    """Return {"intersectionId", "revision", "msgIssueRevision"} of the first intersection."""
+    reader = open_message(payload)
+    reader.skip(1)  # extension
+    has_timestamp, has_layer_type, has_layer_id, has_intersections = (reader.read(1) for _ in range(4))
+    reader.skip(4)  # roadSegments, dataParameters, restrictionList, regional
+    if has_timestamp:
+        reader.skip(20)
+    msg_issue_revision = reader.read(7)
+    if has_layer_type:
+        if reader.read(1):
+            raise ValueError("Extended layerType is not supported.")
+        reader.skip(3)
+    if has_layer_id:
+        reader.skip(7)
+    if not has_intersections:
+        raise ValueError("MAP has no intersections.")
+
+    reader.skip(5)  # number of intersections - 1
+    reader.skip(1)  # IntersectionGeometry extension
+    has_name = reader.read(1)
+    reader.skip(4)  # laneWidth, speedLimits, preemptPriorityData, regional
+    if has_name:
+        reader.skip_descriptive_name()
+    intersection_id = read_intersection_reference(reader)
+    revision = reader.read(7)
+    return {"intersectionId": intersection_id, "revision": revision, "msgIssueRevision": msg_issue_revision}
+
+
+def peek_spat(payload: str) -> dict:
+    """Return {"intersectionId", "revision", "minuteOfYear", "timeStamp"} of the first intersection."""
+    reader = open_message(payload)
+    reader.skip(1)  # extension
+    has_timestamp, has_name = reader.read(1), reader.read(1)
+    reader.skip(1)  # regional
+    if has_timestamp:
+        reader.skip(20)
+    if has_name:
+        reader.skip_descriptive_name()
+
+    reader.skip(5)  # number of intersections - 1
+    reader.skip(1)  # IntersectionState extension
+    has_name, has_moy, has_timestamp = reader.read(1), reader.read(1), reader.read(1)
+    reader.skip(3)  # enabledLanes, maneuverAssistList, regional
+    if has_name:
+        reader.skip_descriptive_name()
+    intersection_id = read_intersection_reference(reader)
+    revision = reader.read(7)
+    reader.skip(16)  # status
+    minute_of_year = reader.read(20) if has_moy else None
+    timestamp = reader.read(16) if has_timestamp else None
+    return {"intersectionId": intersection_id, "revision": revision, "minuteOfYear": minute_of_year, "timeStamp": timestamp}
+
+
+def peek_bsm(payload: str) -> dict:
+    """Return {"temporaryId", "msgCnt", "secMark"} from the BSM core data."""
+    reader = open_message(payload)
+    reader.skip(3)  # extension, partII, regional
+    msg_count = reader.read(7)
+    temporary_id = reader.read(32)
+    sec_mark = reader.read(16)
+    return {"temporaryId": temporary_id, "msgCnt": msg_count, "secMark": sec_mark}
+
+
+PEEKERS = {"MAP": peek_map, "SPaT": peek_spat, "BSM": peek_bsm}
+
+
+def peek(payload: str) -> Tuple[Optional[str], Optional[dict]]:
+    """Classify a payload and read its identifying fields.
+
+    Returns:
+        (msg_type, fields); fields is None when the type is unknown or the
+        payload cannot be walked.
+    """
+    msg_type = message_type(payload)
+    if msg_type is None:
+        return None, None
+    try:
+        return msg_type, PEEKERS[msg_type](payload)
+    except ValueError:
+        return msg_type, None
+
+
+def source_key(msg_type: str, fields: Optional[dict]) -> Optional[str]:
+    """Return the intersection ID (MAP/SPaT) or temporary ID (BSM) as a string."""
+    if fields is None:
+        return None
+    if msg_type == "BSM":
+        return str(fields["temporaryId"])
+    return str(fields["intersectionId"])
@@ -0,0 +1,156 @@
+"""
+**********************************************************************************
+RsuForwarder.py
+Created by: Debashis Das
+Argonne National Laboratory
+Transportation and Power Systems Division
+
+**********************************************************************************
+
+Description:
+------------
+Frames SPaT/MAP payloads for RSU broadcast and sends them to many RSUs.
+
+RSUs expect the immediate-forward text framing defined by the per-RSU files
+config/dsrc/<n>/spat.header and map.header:
+
+    Version=0.7
+    Type=SPAT
+    PSID=0x8002
+    ...
+    Payload=<UPER hex>
+
+The header of every RSU and message type is rendered once, at load time, to
+`bytes` ending in "Payload=". Per message the only work is one concatenation
+(header + payload) per distinct header; RSUs that share a header share the
+frame. A batch of payloads is framed first and then sent in one tight loop
+over a single socket.
+
+RSUs are listed in a JSON file (default config/rsu-config.json):
+
+    {"rsus": [{"name": "rsu-1", "ip": "10.0.0.21", "port": 1516,
+               "dsrc": "1", "intersections": [29080]}]}
+
+`dsrc` is the directory under config/dsrc with the header files;
+`intersections` limits an RSU to those intersection IDs (omit to send all).
+**********************************************************************************
+"""
+
+import json
+import os
+import socket
+from typing import Dict, Iterable, List, Optional, Tuple
+from PayloadInspector import peek
+
+PAYLOAD_FIELD = b"Payload="
+# UPER hex prefixes (MessageFrame messageId) of the forwarded types.
+MESSAGE_PREFIXES = {b"0013": "SPaT", b"0012": "MAP"}
+HEADER_FILES = {"SPaT": "spat.header", "MAP": "map.header"}
+
+
+def load_header(path: str) -> List[Tuple[str, str]]:
+    """Read a `Key=Value` header file, keeping the field order."""
+    fields = []
+    with open(path, "r") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                key, _, value = line.partition("=")
+                fields.append((key.strip(), value.strip()))
+    return fields
+
+
+def render_header(fields: List[Tuple[str, str]]) -> bytes:
+    """Render header fields once to the bytes that precede every payload."""
+    return "".join(f"{key}={value}\n" for key, value in fields).encode() + PAYLOAD_FIELD
+
+
+class Rsu:
+    """One roadside unit: address, pre-rendered headers and intersection filter."""
+    __slots__ = ("name", "address", "headers", "intersections", "sent", "errors")
+
+    def __init__(self, name: str, address: Tuple[str, int], headers: Dict[str, bytes],
+                 intersections: Optional[Iterable[int]] = None):
+        self.name = name
+        self.address = address
+        self.headers = headers
+        self.intersections = set(intersections) if intersections else None
+        self.sent = 0
+        self.errors = 0
+
+    def accepts(self, msg_type: str, intersection_id: Optional[int]) -> bool:
+        if msg_type not in self.headers:
+            return False
+        return self.intersections is None or intersection_id in self.intersections
+
+
+def load_rsus(config_path: str, dsrc_root: str) -> List[Rsu]:
+    """Load the RSU list and pre-render the headers of every RSU.
+
+    Raises:
+        FileNotFoundError: If the RSU config or a header file is missing.
+        ValueError: If an RSU has no header files.
+    """
+    with open(config_path, "r") as f:
+        entries = json.load(f)["rsus"]
+    rsus = []
+    for entry in entries:
+        directory = os.path.join(dsrc_root, str(entry["dsrc"]))
+        headers = {msg_type: render_header(load_header(os.path.join(directory, file_name)))
+                   for msg_type, file_name in HEADER_FILES.items()
+                   if os.path.exists(os.path.join(directory, file_name))}
+        if not headers:
+            raise ValueError(f"No header files for RSU {entry['name']} in {directory}")
+        rsus.append(Rsu(entry["name"], (entry["ip"], int(entry["port"])), headers, entry.get("intersections")))
+    return rsus
+
+
+class RsuForwarder:
+    """Frames payloads with pre-rendered headers and sends them to all matching RSUs."""
+    def __init__(self, rsus: List[Rsu], sock: Optional[socket.socket] = None):
+        self.rsus = rsus
+        self.socket = sock if sock is not None else socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        # Reading the intersection ID costs a payload walk; only needed with filters.
+        self.filtered = any(rsu.intersections is not None for rsu in rsus)
+        self.skipped = 0
+
+    def frames(self, payload: bytes) -> List[Tuple[bytes, List[Rsu]]]:
+        """Return (frame, RSUs) pairs for one hex payload; one frame per distinct header."""
+        msg_type = MESSAGE_PREFIXES.get(payload[:4])
+        if msg_type is None:
+            self.skipped += 1
+            return []
+        intersection_id = None
+        if self.filtered:
+            fields = peek(payload.decode())[1]
+            intersection_id = fields["intersectionId"] if fields is not None else None
+
+        by_header: Dict[bytes, List[Rsu]] = {}
+        for rsu in self.rsus:
+            if rsu.accepts(msg_type, intersection_id):
+                by_header.setdefault(rsu.headers[msg_type], []).append(rsu)
+        return [(header + payload, rsus) for header, rsus in by_header.items()]
+
+    def forward(self, payload: bytes) -> int:
+        """Frame and send one payload; return the number of datagrams sent."""
+        return self.forward_batch([payload])
+
+    def forward_batch(self, payloads: Iterable[bytes]) -> int:
+        """Frame a batch of payloads, then send all frames in one loop."""
+        outgoing = [item for payload in payloads for item in self.frames(payload)]
+        sendto = self.socket.sendto
+        sent = 0
+        for frame, rsus in outgoing:
+            for rsu in rsus:
+                try:
+                    sendto(frame, rsu.address)
+                    rsu.sent += 1
+                    sent += 1
+                except OSError as e:
+                    rsu.errors += 1
+                    if rsu.errors == 1:
+                        print(f"Send to RSU {rsu.name} {rsu.address[0]}:{rsu.address[1]} failed: {e}")
+        return sent
+
+    def stats(self) -> Dict[str, dict]:
+        return {rsu.name: {"sent": rsu.sent, "errors": rsu.errors} for rsu in self.rsus}
@@ -0,0 +1,328 @@
+"""
+**********************************************************************************
+SamplingProfiler.py
+Created by: Debashis Das
+Argonne National Laboratory
+Transportation and Power Systems Division
+
+**********************************************************************************
+
+Description:
+------------
+On-demand sampling profiler for the running gateway (map-spat-sender.py) and
+telemetry publisher; the two copies of this file are identical.
+
+Nothing runs until the process gets SIGUSR1 (`kill -USR1 <pid>`). Then an
+interval timer (SIGALRM) samples the stacks of all threads every
+`interval_s` for N seconds (a second SIGUSR1 stops it early) and writes
+
+    <name>-<time>.collapsed   one `thread;module.function;... count` line per
+                              stack, input for flamegraph.pl or speedscope
+    <name>-<time>.json        per-thread time per stage and the queue depths
+
+Samples are taken in the signal handler, i.e. on the main thread between two
+bytecodes, so the main loop is seen where it is. (A sampling thread would
+only get the GIL when the main thread releases it in recvfrom, and would see
+a busy loop as always waiting.) Other threads are seen at their last GIL
+release. Files are written by a short-lived thread after the profile ends.
+
+Stages are assigned from the samples, so the message path carries no
+timers: the innermost frame whose module (or `module.Class.function`) is in
+`stages` names the stage, or `other` if there is none. A thread blocked in a
+call counts as `<stage>:wait` (e.g. `firebase:wait` is time waiting for
+RTDB), or `wait` outside any stage. Blocked means the innermost frame is
+calling one of BLOCKING_CALLS (the call under way is found from the
+frame's current instruction, e.g. `read` in multiprocessing's
+`Connection._recv` for an idle `Queue.get()`), or is one of WAIT_FRAMES.
+Queue depths are read from the registered gauges every `gauge_every`
+samples while profiling. The signal handlers report with os.write, never
+print (print is not reentrant).
+**********************************************************************************
+"""
+
+import json
+import itertools
+import linecache
+import os
+import re
+import signal
+import socket
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Callable, Dict, Optional, Tuple
+
+# Names of callables that block; an innermost frame calling one of them is waiting.
+BLOCKING_CALLS = frozenset(("recv", "recvfrom", "recv_into", "recvfrom_into", "read", "readinto", "readline",
+                            "accept", "connect", "getaddrinfo", "select", "poll", "sleep", "acquire", "wait"))
+# (module, function) of innermost frames that only wait; used when the call under
+# way is unknown (Python < 3.11 or -X no_debug_ranges).
+WAIT_FRAMES = frozenset((("connection", "_recv"), ("connection", "_poll"), ("selectors", "select"),
+                         ("threading", "wait"), ("threading", "_wait_for_tstate_lock"), ("socket", "accept"),
+                         ("socket", "readinto"), ("ssl", "read"), ("ssl", "recv_into")))
+CALLEE_NAME = re.compile(r"(\w+)\s*$")
+
+
+def notice(message: str):
+    """Report from a signal handler: an unbuffered write to stderr, which cannot re-enter stdout's buffer."""
+    try:
+        os.write(2, (message + "\n").encode())
+    except OSError:
+        pass
+
+
+def called_name(code, lasti: int) -> Optional[str]:
+    """Name of the callable called by instruction `lasti` of `code` (None if that is not a call or unknown).
+
+    The source of the call expression is located with the instruction's
+    position, e.g. `self.sock.recvfrom(65535)` -> `recvfrom`.
+    """
+    positions = getattr(code, "co_positions", None)
+    if positions is None or lasti < 0:
+        return None
+    position = next(itertools.islice(positions(), lasti // 2, None), None)
+    if position is None or None in position:
+        return None
+    first, last, start, end = position
+    # Columns are UTF-8 byte offsets.
+    lines = [linecache.getline(code.co_filename, number).encode() for number in range(first, last + 1)]
+    if not lines[-1]:
+        return None
+    lines[-1] = lines[-1][:end]
+    lines[0] = lines[0][start:]
+    expression = b"".join(lines).decode(errors="replace").rstrip()
+    if not expression.endswith(")"):
+        return None
+    # The callee is what precedes the parenthesis that matches the last one.
+    depth = 0
+    for index in range(len(expression) - 1, -1, -1):
+        depth += {")": 1, "(": -1}.get(expression[index], 0)
+        if depth == 0:
+            match = CALLEE_NAME.search(expression, 0, index)
+            return match.group(1) if match else None
+    return None
+
+
+class SamplingProfiler:
+    """Samples all thread stacks for a while on request; idle otherwise."""
+    def __init__(self, name: str, output_dir: Optional[str] = None, interval_s: float = 0.01,
+                 stages: Optional[Dict[str, str]] = None, gauge_every: int = 10):
+        """
+        Args:
+            name: Prefix of the output files (e.g. the service name).
+            output_dir: Where profiles are written (default: current directory).
+            interval_s: Time between two samples.
+            stages: Module name or `module.Class.function` -> stage name.
+            gauge_every: Read the gauges every this many samples.
+        """
+        if interval_s <= 0:
+            raise ValueError("interval_s must be positive.")
+        self.name = name
+        self.output_dir = output_dir or os.getcwd()
+        self.interval_s = interval_s
+        self.stages = stages or {}
+        self.gauge_every = max(1, gauge_every)
+        self.gauges: Dict[str, Callable[[], Optional[int]]] = {}
+        self.active = False
+        self.writer_idents = set()
+        self.profiles = 0
+        # (code, instruction) -> blocked?; code -> (label, stage)
+        self.wait_points = {}
+        self.labels = {}
+
+    def add_gauge(self, name: str, read: Callable[[], Optional[int]]):
+        """Register a queue depth (or any count) reported with every profile."""
+        self.gauges[name] = read
+
+    @property
+    def running(self) -> bool:
+        return self.active
+
+    def start(self, seconds: float) -> bool:
+        """Profile for `seconds` (main thread only); False if a profile is already running."""
+        if self.active:
+            return False
+        self.active = True
+        self.names: Dict[int, str] = {}
+        self.stacks: Counter = Counter()
+        self.stage_samples: Dict[str, Counter] = {}
+        self.gauge_values: Dict[str, list] = {name: [] for name in self.gauges}
+        self.samples = 0
+        self.main_ident = threading.main_thread().ident
+        self.started = time.monotonic()
+        self.deadline = self.started + seconds
+        self.previous_handler = signal.signal(signal.SIGALRM, self.on_alarm)
+        signal.setitimer(signal.ITIMER_REAL, self.interval_s, self.interval_s)
+        notice(f"Profiling for {seconds:g} s (SIGUSR1 again to stop early)")
+        return True
+
+    def stop(self):
+        """End the running profile (main thread only); its files are written in the background."""
+        if not self.active:
+            return
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, self.previous_handler or signal.SIG_DFL)
+        self.active = False
+        writer = threading.Thread(target=self.write, name="sampling-profiler-writer", daemon=True,
+                                  args=(self.stacks, self.stage_samples, self.gauge_values, self.samples,
+                                        time.monotonic() - self.started))
+        writer.start()
+        self.writer_idents.add(writer.ident)
+
+    def toggle(self, seconds: float):
+        if not self.start(seconds):
+            self.stop()
+
+    def install_signal(self, seconds: float) -> bool:
+        """Toggle a `seconds` long profile on SIGUSR1 (main thread only; False where there is none)."""
+        if not hasattr(signal, "SIGUSR1"):
+            return False
+        signal.signal(signal.SIGUSR1, lambda signum, frame: self.toggle(seconds))
+        return True
+
+    def on_alarm(self, signum, frame):
+        if not self.active:
+            return
+        if time.monotonic() >= self.deadline:
+            self.stop()
+            return
+        # Runs inside whatever the main thread was doing: never let it raise there.
+        try:
+            self.sample(frame)
+        except Exception as e:
+            notice(f"Profiling stopped: {e!r}")
+            self.stop()
+
+    def label(self, code) -> Tuple[str, Optional[str]]:
+        """(`module.qualified_name`, stage) of a code object, cached."""
+        entry = self.labels.get(code)
+        if entry is None:
+            module = os.path.splitext(os.path.basename(code.co_filename))[0]
+            label = f"{module}.{getattr(code, 'co_qualname', code.co_name)}"
+            entry = self.labels[code] = (label, self.stages.get(label, self.stages.get(module)))
+        return entry
+
+    def waiting(self, frame) -> bool:
+        code = frame.f_code
+        key = (code, frame.f_lasti)
+        blocked = self.wait_points.get(key)
+        if blocked is None:
+            module = os.path.splitext(os.path.basename(code.co_filename))[0]
+            blocked = self.wait_points[key] = ((module, code.co_name) in WAIT_FRAMES
+                                               or called_name(code, frame.f_lasti) in BLOCKING_CALLS)
+        return blocked
+
+    def sample(self, main_frame):
+        """Add one sample of every thread; `main_frame` is where the main thread was interrupted."""
+        frames = sys._current_frames()
+        frames[self.main_ident] = main_frame
+        for ident, frame in frames.items():
+            if ident in self.writer_idents:
+                continue
+            thread_name = self.names.get(ident)
+            if thread_name is None:
+                self.names.update((thread.ident, thread.name) for thread in threading.enumerate())
+                thread_name = self.names.setdefault(ident, f"thread-{ident}")
+            leaf = frame
+            labels = []
+            stage = None
+            while frame is not None:
+                label, frame_stage = self.label(frame.f_code)
+                labels.append(label)
+                if stage is None:
+                    stage = frame_stage
+                frame = frame.f_back
+            if self.waiting(leaf):
+                stage = "wait" if stage is None else f"{stage}:wait"
+            elif stage is None:
+                stage = "other"
+            labels.append(thread_name)
+            self.stacks[";".join(reversed(labels))] += 1
+            stage_samples = self.stage_samples.get(thread_name)
+            if stage_samples is None:
+                stage_samples = self.stage_samples[thread_name] = Counter()
+            stage_samples[stage] += 1
+
+        if self.samples % self.gauge_every == 0:
+            for name, read in self.gauges.items():
+                try:
+                    value = read()
+                except Exception:
+                    value = None
+                if value is not None:
+                    self.gauge_values[name].append(value)
+        self.samples += 1
+
+    def write(self, stacks: Counter, stage_samples: Dict[str, Counter], gauge_values: Dict[str, list],
+              samples: int, duration_s: float):
+        """Write the collapsed stacks and the stage/queue summary of one profile."""
+        try:
+            self.write_files(stacks, stage_samples, gauge_values, samples, duration_s)
+        finally:
+            self.writer_idents.discard(threading.get_ident())
+
+    def write_files(self, stacks: Counter, stage_samples: Dict[str, Counter], gauge_values: Dict[str, list],
+                    samples: int, duration_s: float):
+        self.profiles += 1
+        base = os.path.join(self.output_dir, f"{self.name}-{time.strftime('%Y%m%d-%H%M%S')}")
+        summary = {
+            "name": self.name,
+            "pid": os.getpid(),
+            "durationS": round(duration_s, 3),
+            "samples": samples,
+            "intervalS": self.interval_s,
+            "stages": {thread_name: {stage: {"samples": count, "share": round(count / max(1, samples), 4),
+                                             "seconds": round(count * duration_s / max(1, samples), 3)}
+                                     for stage, count in counter.most_common()}
+                       for thread_name, counter in stage_samples.items()},
+            "queues": {name: {"last": values[-1], "mean": round(sum(values) / len(values), 1), "max": max(values)}
+                       for name, values in gauge_values.items() if values},
+        }
+        try:
+            os.makedirs(self.output_dir, exist_ok=True)
+            with open(base + ".collapsed", "w") as f:
+                for stack, count in stacks.most_common():
+                    f.write(f"{stack} {count}\n")
+            with open(base + ".json", "w") as f:
+                json.dump(summary, f, indent=2)
+        except OSError as e:
+            print(f"Could not write profile {base}: {e}")
+            return
+        print(f"Profile written to {base}.collapsed / .json ({samples} samples in {duration_s:.1f} s)")
+        for thread_name, stages in summary["stages"].items():
+            shares = ", ".join(f"{stage} {entry['share']:.0%}" for stage, entry in stages.items())
+            print(f"  {thread_name}: {shares}")
+        for name, entry in summary["queues"].items():
+            print(f"  queue {name}: last {entry['last']}, mean {entry['mean']}, max {entry['max']}")
+
+
+def install(name: str, seconds: float, output_dir: Optional[str] = None,
+            stages: Optional[Dict[str, str]] = None) -> Optional[SamplingProfiler]:
+    """SamplingProfiler toggled by SIGUSR1, or None when `seconds` is 0 or there is no SIGUSR1."""
+    if seconds <= 0:
+        return None
+    profiler = SamplingProfiler(name, output_dir, stages=stages)
+    if not profiler.install_signal(seconds):
+        print("Profiling on demand needs SIGUSR1 (not available on this platform).")
+        return None
+    print(f"kill -USR1 {os.getpid()} profiles {name} for {seconds:g} s")
+    return profiler
+
+
+def udp_receive_queue(sock: socket.socket) -> Optional[int]:
+    """Bytes waiting in the kernel receive queue of a UDP socket (Linux; None elsewhere)."""
+    try:
+        inode = str(os.fstat(sock.fileno()).st_ino)
+        for table in ("/proc/net/udp", "/proc/net/udp6"):
+            if not os.path.exists(table):
+                continue
+            with open(table) as f:
+                next(f)
+                for line in f:
+                    fields = line.split()
+                    if fields[9] == inode:
+                        return int(fields[4].split(":")[1], 16)
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
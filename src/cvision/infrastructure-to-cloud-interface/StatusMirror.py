@@ -0,0 +1,76 @@
+"""
+**********************************************************************************
+StatusMirror.py
+Created by: Debashis Das
+Argonne National Laboratory
+Transportation and Power Systems Division
+
+**********************************************************************************
+
+Description:
+------------
+Local mirror of an RTDB subtree (e.g. `/vehicle_status`) built from the
+events delivered by `db.reference(...).listen`.
+
+Firebase delivers a `put` (replace the node at `path`) or a `patch`
+(multi-path update below `path`). The publisher's `--delta` mode writes
+snapshots with `set` and changed fields with `update`, so applying both event
+kinds here always yields the full, current record per key. Paths below a
+record are applied with DeltaEncoder.apply_patch, the applier the publisher's
+patches are written for.
+**********************************************************************************
+"""
+
+from typing import Dict, List, Optional
+from DeltaEncoder import apply_patch
+
+
+class StatusMirror:
+    """In-memory copy of one RTDB subtree, keyed by child (e.g. vehicle ID)."""
+    def __init__(self):
+        self.records: Dict[str, dict] = {}
+
+    def apply_event(self, event_type: str, path: str, data) -> List[str]:
+        """Apply one listener event.
+
+        Args:
+            event_type: `put` or `patch` (Firebase event type).
+            path: Event path relative to the listened node, e.g. `/` or `/601/lat`.
+            data: Event payload.
+
+        Returns:
+            The keys (children of the listened node) whose records changed.
+        """
+        keys = [k for k in path.split("/") if k]
+
+        if event_type == "put":
+            if not keys:
+                self.records = dict(data) if isinstance(data, dict) else {}
+                return list(self.records.keys())
+            self.set_value(keys, data)
+            return [keys[0]]
+
+        if event_type == "patch":
+            changed = set()
+            for sub_path, value in (data or {}).items():
+                full_keys = keys + [k for k in sub_path.split("/") if k]
+                self.set_value(full_keys, value)
+                changed.add(full_keys[0])
+            return sorted(changed)
+
+        return []
+
+    def set_value(self, keys: List[str], value):
+        """Set (None deletes) the value at `keys` below the mirror root."""
+        if len(keys) == 1:
+            if value is None:
+                self.records.pop(keys[0], None)
+            else:
+                self.records[keys[0]] = value
+            return
+        # Below a record, the path is a DeltaEncoder patch path.
+        apply_patch(self.records.setdefault(keys[0], {}), {"/".join(keys[1:]): value})
+
+    def get(self, key: str) -> Optional[dict]:
+        """Return the mirrored record of one key."""
+        return self.records.get(str(key))
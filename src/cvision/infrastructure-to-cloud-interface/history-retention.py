@@ -0,0 +1,73 @@
+"""
+**********************************************************************************
+history-retention.py
+Created by: Debashis Das
+Argonne National Laboratory
+Transportation and Power Systems Division
+
+**********************************************************************************
+
+Description:
+------------
+Retention job and reader for the bucketed `/v2x_data` history (HistoryWriter.py).
+Expired buckets are deleted whole, in one multi-path update; only bucket names
+are listed (shallow read), never their records.
+
+Usage:
+    python3 history-retention.py --keep-hours 72             # one pass
+    python3 history-retention.py --keep-hours 72 --every 3600
+    python3 history-retention.py --list
+    python3 history-retention.py --read 2026-10-19T14 --limit 20
+**********************************************************************************
+"""
+
+import argparse
+import os
+import platform
+import time
+import firebase_admin
+from firebase_admin import credentials
+from HistoryWriter import expire, list_buckets, read_bucket
+
+
+def initialize_firebase():
+    current_os = platform.system()
+    if current_os not in ("Linux", "Windows"):
+        raise OSError(f"Unsupported operating system: {current_os}")
+    service_account_path = os.path.join(os.path.expanduser("~"), "Documents", "cvision-firebase-key.json")
+    firebase_admin.initialize_app(credentials.Certificate(service_account_path), {
+        'databaseURL': 'https://c-vision-7e1ec-default-rtdb.firebaseio.com/'
+    })
+
+
+def main(args):
+    initialize_firebase()
+
+    if args.list:
+        for name in list_buckets():
+            print(name)
+        return
+    if args.read:
+        for key, record in read_bucket(args.read, limit=args.limit).items():
+            print(key, record)
+        return
+
+    try:
+        while True:
+            expired = expire(args.keep_hours * 3600.0)
+            print(f"Expired {len(expired)} buckets" + (f": {', '.join(expired)}" if expired else ""))
+            if args.every <= 0:
+                break
+            time.sleep(args.every)
+    except KeyboardInterrupt:
+        print("Stopping the program...")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Retention and reads of the /v2x_data history")
+    parser.add_argument("--keep-hours", type=float, default=72.0, help="Delete buckets that ended more than this many hours ago")
+    parser.add_argument("--every", type=float, default=0.0, help="Repeat every N seconds (0 = one pass)")
+    parser.add_argument("--list", action="store_true", help="List bucket names and exit")
+    parser.add_argument("--read", help="Print the records of one bucket and exit")
+    parser.add_argument("--limit", type=int, help="--read: at most this many records")
+    main(parser.parse_args())
@@ -0,0 +1,91 @@
+"""
+**********************************************************************************
+ingest-server.py
+Created by: Debashis Das
+Argonne National Laboratory
+Transportation and Power Systems Division
+
+**********************************************************************************
+
+Description:
+------------
+Batch HTTP ingest service (IngestService.py), replacing the one-POST-per-SPaT
+`ingest-spat-data` cloud function. Runs locally or in a container (bind to
+0.0.0.0 and pass --config / --key paths mounted into it).
+
+Gateways post to it with `--ingest http://<host>:<port>` (IngestClient.py);
+`test/ingest-load.py` is the load test.
+
+Usage:
+    python3 ingest-server.py                          # Firebase slots sink
+    python3 ingest-server.py --sink udp               # forward to PortNumber.MessageDecoder
+    python3 ingest-server.py --sink null --port 8080  # load testing
+    python3 ingest-server.py --host 0.0.0.0 --config /etc/cvision/anl-master-config.json --key /etc/cvision/key.json
+**********************************************************************************
+"""
+
+import argparse
+import json
+import os
+import platform
+from http.server import ThreadingHTTPServer
+import firebase_admin
+from firebase_admin import credentials
+from IngestService import FirebaseSlotSink, IngestService, NullSink, UdpSink, make_handler
+
+
+def default_paths():
+    current_os = platform.system()
+    if current_os == "Linux":
+        config_file_path = os.path.join(os.path.expanduser("~"), "Desktop", "c-vision", "config", "anl-master-config.json")
+    elif current_os == "Windows":
+        config_file_path = os.path.join("C:\\", "Users", "ddas", "Documents", "c-vision", "config", "anl-master-config.json")
+    else:
+        raise OSError(f"Unsupported operating system: {current_os}")
+    return config_file_path, os.path.join(os.path.expanduser("~"), "Documents", "cvision-firebase-key.json")
+
+
+def main(args):
+    config_file_path, service_account_path = default_paths()
+    with open(args.config or config_file_path, "r") as config_file:
+        config = json.load(config_file)
+
+    host_ip = args.host or config["IPAddress"]["HostIp"]
+    port = args.port or config["PortNumber"]["IngestServer"]
+
+    sinks = []
+    if "firebase" in args.sink:
+        firebase_admin.initialize_app(credentials.Certificate(args.key or service_account_path), {
+            'databaseURL': 'https://c-vision-7e1ec-default-rtdb.firebaseio.com/'
+        })
+        sinks.append(FirebaseSlotSink(args.ring))
+    if "udp" in args.sink:
+        sinks.append(UdpSink((config["IPAddress"]["HostIp"], args.udp_port or config["PortNumber"]["MessageDecoder"])))
+    if "null" in args.sink:
+        sinks.append(NullSink())
+
+    service = IngestService(sinks, args.queue)
+    server = ThreadingHTTPServer((host_ip, port), make_handler(service, args.verbose))
+    print(f"Ingest service on http://{host_ip}:{port}/ingest, sinks: {', '.join(args.sink)}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("Stopping the program...")
+    finally:
+        server.server_close()
+        print(f"Ingest totals: {service.stats()}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Batch HTTP ingest for encoded V2X messages")
+    parser.add_argument("--host", help="Bind address (default: IPAddress.HostIp; 0.0.0.0 in a container)")
+    parser.add_argument("--port", type=int, help="HTTP port (default: PortNumber.IngestServer)")
+    parser.add_argument("--sink", nargs="+", choices=["firebase", "udp", "null"], default=["firebase"],
+                        help="Where valid messages go")
+    parser.add_argument("--udp-port", type=int, help="--sink udp: destination port (default: PortNumber.MessageDecoder)")
+    parser.add_argument("--ring", type=int, default=0, help="--sink firebase: keep the last N messages per slot")
+    parser.add_argument("--queue", type=int, default=1024, help="Batches waiting for validation before answering 503")
+    parser.add_argument("--config", help="Master config path")
+    parser.add_argument("--key", help="Firebase service account key path")
+    parser.add_argument("--verbose", action="store_true", help="Log every request")
+    main(parser.parse_args())
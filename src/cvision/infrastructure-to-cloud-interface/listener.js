@@ -13,15 +13,24 @@ the `/LatestV2XMessage` node. When a new message is received, it forwards it via
 to the configured receiver endpoint.
  
 Usage:
-  node listener.js
+  node listener.js            # unified /LatestV2XMessage node
+  node listener.js --slots    # per-source latest/<type>/<id> slots with gap detection
+  node listener.js --trace    # send hop timestamps of traced messages to latency-analyzer.py
+  node listener.js --batch    # also forward compressed batches from /LatestV2XBatch (UplinkCodec.py), reporting missed batches
+  node listener.js --rsu      # also send SPaT/MAP payloads to rsu-forwarder.py (PortNumber.RsuForwarder)
+
+Records with "encoding": "b64" are decoded to hex before forwarding, so the
+decoder always receives the hex payload.
 **********************************************************************************
  */
 
 const admin = require('firebase-admin');
 const fs = require('fs');
+const zlib = require('zlib');
 const dgram = require('dgram');
 const os = require('os');
 const path = require('path');
+const { performance } = require('perf_hooks');
 
 let configFilePath;
 let service_account_path;  // Define it here so it's accessible later
@@ -64,13 +73,50 @@ try {
 
 const host_ip = config?.IPAddress?.HostIp;
 const receiver_port = config?.PortNumber?.MessageDecoder;
+const trace_port = config?.PortNumber?.LatencyAnalyzer;
+const traceEnabled = process.argv.includes('--trace');
+const rsu_port = config?.PortNumber?.RsuForwarder;
+const rsuEnabled = process.argv.includes('--rsu');
 
-// Listen to unified /LatestV2XMessage
-const ref = db.ref('/LatestV2XMessage');
+if (rsuEnabled && !rsu_port) {
+  console.error('--rsu needs PortNumber.RsuForwarder in the config file');
+  process.exit(1);
+}
 
-ref.on('value', (snapshot) => {
-  const data = snapshot.val();
-  if (!data) return;
+// Hop record for latency-analyzer.py (see LatencyTrace.py for the format).
+function emitHop(key, hop) {
+  const record = Buffer.from(JSON.stringify({
+    key: key,
+    hop: hop,
+    wall: (performance.timeOrigin + performance.now()) / 1000,
+    mono: performance.now() / 1000,
+    source: 'listener.js'
+  }));
+  udpClient.send(record, 0, record.length, trace_port, host_ip, () => {});
+}
+
+// Hex payload of a record; see UplinkCodec.py for the encodings.
+function payloadHex(data) {
+  if (data.encoding === 'b64') return Buffer.from(data.payload, 'base64').toString('hex');
+  return data.payload;
+}
+
+// SPaT (0013) and MAP (0012) are the only messages rsu-forwarder.py broadcasts.
+const RSU_PREFIXES = ['0013', '0012'];
+
+// Send one hex payload to the decoder and, with --rsu, SPaT/MAP also to rsu-forwarder.py.
+function sendPayload(udpPayload, callback) {
+  udpClient.send(udpPayload, 0, udpPayload.length, receiver_port, host_ip, callback);
+  if (rsuEnabled && RSU_PREFIXES.includes(udpPayload.subarray(0, 4).toString())) {
+    udpClient.send(udpPayload, 0, udpPayload.length, rsu_port, host_ip, (err) => {
+      if (err) console.error('UDP send error (RSU forwarder):', err);
+    });
+  }
+}
+
+function forwardMessage(data) {
+  const traceKey = traceEnabled && data ? data.trace_key : undefined;
+  if (traceKey) emitHop(traceKey, 'listener_receive');
 
   if (data && data.posix_timestamp) {
     // const now = Date.now() / 1000; // current time in seconds
@@ -83,8 +129,108 @@ ref.on('value', (snapshot) => {
 
   // console.log('Latest V2X message received:', data);
   
-  const udpPayload = Buffer.from(data.payload); // Send only the payload field
-  udpClient.send(udpPayload, 0, udpPayload.length, receiver_port, host_ip, (err) => {
+  const udpPayload = Buffer.from(payloadHex(data)); // Send only the payload field
+  sendPayload(udpPayload, (err) => {
     if (err) console.error('UDP send error:', err);
+    else if (traceKey) emitHop(traceKey, 'listener_forward');
   });
-});
+}
+
+// Batch records: zlib-compressed concatenated payload bytes plus their lengths.
+let lzmaWarned = false;
+
+// Every batch overwrites the previous one; a seq jump within a writer's epoch is a missed batch.
+const lastBatchSeqByEpoch = new Map();
+let missedBatches = 0;
+
+function checkBatchSequence(data) {
+  if (data.seq === undefined) return;  // writer without batch numbers
+  const last = lastBatchSeqByEpoch.get(data.epoch);
+  if (last !== undefined && data.seq > last + 1) {
+    const missed = data.seq - last - 1;
+    missedBatches += missed;
+    console.log(`Batch gap (epoch ${data.epoch}): missed ${missed} batch(es), ${missedBatches} total`);
+  }
+  lastBatchSeqByEpoch.set(data.epoch, data.seq);
+}
+
+function forwardBatch(data) {
+  checkBatchSequence(data);
+  if (data.encoding !== 'zlib') {
+    if (!lzmaWarned) console.error(`Unsupported batch encoding ${data.encoding} (Node.js decodes zlib only)`);
+    lzmaWarned = true;
+    return;
+  }
+  const traceKeys = traceEnabled && data.trace_keys ? data.trace_keys : [];
+  for (const key of traceKeys) emitHop(key, 'listener_receive');
+
+  let raw;
+  try {
+    raw = zlib.inflateSync(Buffer.from(data.blob, 'base64'));
+  } catch (err) {
+    console.error('Batch decompress error:', err);
+    return;
+  }
+  const lengths = data.index ? data.index.split(',').map(Number) : [];
+  let offset = 0;
+  lengths.forEach((length, i) => {
+    const udpPayload = Buffer.from(raw.subarray(offset, offset + length).toString('hex'));
+    offset += length;
+    const last = i === lengths.length - 1;
+    sendPayload(udpPayload, (err) => {
+      if (err) console.error('UDP send error:', err);
+      else if (last) for (const key of traceKeys) emitHop(key, 'listener_forward');
+    });
+  });
+  if (data.posix_timestamp) {
+    console.log(`Batch of ${lengths.length}, latency: ${(Date.now() - data.posix_timestamp * 1000).toFixed(0)} ms`);
+  }
+}
+
+if (process.argv.includes('--batch')) {
+  db.ref('/LatestV2XBatch').on('value', (snapshot) => {
+    const data = snapshot.val();
+    if (data) forwardBatch(data);
+  });
+}
+
+if (process.argv.includes('--slots')) {
+  // Per-type, per-source slots written by LatestSlots.py: latest/<type>/<id>
+  // Each slot carries seq/epoch, so overwritten (missed) messages show up as gaps.
+  // Messages the writer replaced on purpose (SlotUploader) are in `coalesced`.
+  const lastSeqBySlot = new Map();
+  const gapsBySlot = new Map();
+
+  const onSlot = (type) => (snapshot) => {
+    const data = snapshot.val();
+    if (!data) return;
+
+    const slot = `${type}/${snapshot.key}`;
+    const last = lastSeqBySlot.get(slot);
+    const missed = last && last.epoch === data.epoch ? data.seq - last.seq - 1 - (data.coalesced || 0) : 0;
+    if (missed > 0) {
+      gapsBySlot.set(slot, (gapsBySlot.get(slot) || 0) + missed);
+      console.log(`Gap on ${slot}: missed ${missed} message(s), ${gapsBySlot.get(slot)} total`);
+    }
+    lastSeqBySlot.set(slot, { epoch: data.epoch, seq: data.seq });
+
+    forwardMessage(data);
+  };
+
+  for (const type of ['MAP', 'SPaT', 'BSM']) {
+    const typeRef = db.ref(`latest/${type}`);
+    typeRef.on('child_added', onSlot(type));
+    typeRef.on('child_changed', onSlot(type));
+  }
+}
+
+else {
+  // Listen to unified /LatestV2XMessage
+  const ref = db.ref('/LatestV2XMessage');
+
+  ref.on('value', (snapshot) => {
+    const data = snapshot.val();
+    if (!data) return;
+    forwardMessage(data);
+  });
+}
@@ -14,9 +14,28 @@ Identifies message type based on payload prefix, and
 Uploads structured data to Firebase Realtime Database. 
 It also updates a unified `/LatestV2XMessage` node with the latest message for real-time forwarding.
 
+MAP messages are static, so they go through a content-hash cache (MapCache.py):
+a MAP is uploaded only when its intersection revision or content changes, plus
+a periodic refresh for late joiners. The cached MAPs are also served locally:
+send `MAP?` (all) or `MAP?<intersectionId>` to the gateway port and it replies
+with JSON entries (intersectionId, revision, hash, payload).
+
 Usage:
     python3 map-spat-sender.py               # without header, payload only
     python3 map-spat-sender.py --header      # with 'Payload=' prefix header
+    python3 map-spat-sender.py --map-refresh 300
+    python3 map-spat-sender.py --no-map-cache   # upload every MAP (old behaviour)
+    python3 map-spat-sender.py --slots --ring 20   # per-source slots (LatestSlots.py) + /LatestV2XMessage
+    python3 map-spat-sender.py --slots-only
+    python3 map-spat-sender.py --trace       # send hop timestamps to latency-analyzer.py (LatencyTrace.py)
+    python3 map-spat-sender.py --multi --listen 50001 50021   # many controllers, slots only (ControllerRouter.py)
+    python3 map-spat-sender.py --multi --route source --source-map controllers.json
+    python3 map-spat-sender.py --rsu         # also broadcast SPaT/MAP through the RSUs (RsuForwarder.py)
+    python3 map-spat-sender.py --uplink b64  # base64 payloads instead of hex (UplinkCodec.py)
+    python3 map-spat-sender.py --uplink zlib --batch-ms 100   # compressed batches to /LatestV2XBatch
+    python3 map-spat-sender.py --ingest http://127.0.0.1:50011   # batch into ingest-server.py (IngestClient.py)
+    python3 map-spat-sender.py --liveness 3  # source_status/controllers/<id> goes stale after 3 s of silence (LivenessMonitor.py)
+    python3 map-spat-sender.py --profile-seconds 60   # `kill -USR1 <pid>` then samples for 60 s (SamplingProfiler.py)
 
 **********************************************************************************
 """
@@ -27,8 +46,32 @@ import socket
 import time
 import json
 import argparse
+import selectors
+from typing import Optional
 import firebase_admin
 from firebase_admin import credentials, db
+from MapCache import MapCache
+from LatestSlots import LatestSlotWriter
+from PayloadInspector import peek, peek_map, source_key
+import JsonCodec
+from LatencyTrace import TraceEmitter, controller_time, trace_key
+from ControllerRouter import ControllerRouter, SlotUploader, STATS_ROOT
+from RsuForwarder import RsuForwarder, load_rsus
+from IngestClient import IngestClient
+from LivenessMonitor import LivenessMonitor, status_path, status_record
+from SamplingProfiler import SamplingProfiler, install, udp_receive_queue
+from UplinkCodec import BATCH_ENCODINGS, BATCH_ROOT, ENCODINGS, UplinkBatcher, encode_payload, record_encoding
+
+MAP_REQUEST_PREFIX = "MAP?"
+PAYLOAD_PREFIX = "Payload="
+RECEIVE_BUFFER_BYTES = 4 * 1024 * 1024
+LIVENESS_TICK_S = 0.1
+# Modules of the message path -> stage in SamplingProfiler.py summaries.
+PROFILE_STAGES = {
+    "PayloadInspector": "inspect", "ControllerRouter.ControllerRouter.route": "route", "MapCache": "map_cache",
+    "LatestSlots": "slots", "UplinkCodec": "encode", "RsuForwarder": "rsu", "LatencyTrace": "trace",
+    "LivenessMonitor": "liveness", "IngestClient": "ingest", "JsonCodec": "json", "db": "firebase",
+}
 
 
 def load_config_paths():
@@ -55,6 +98,193 @@ def initialize_firebase(service_account_path: str):
         firebase_admin.initialize_app(cred, {'databaseURL': 'https://c-vision-7e1ec-default-rtdb.firebaseio.com/'})
 
 
+def map_cache_key(payload: str, address):
+    """Return (cache key, intersection id, revision) for a MAP payload.
+
+    Falls back to the sender address when the payload cannot be walked.
+    """
+    try:
+        fields = peek_map(payload)
+    except ValueError:
+        return f"source-{address[0].replace('.', '-')}-{address[1]}", None, None
+    return str(fields["intersectionId"]), fields["intersectionId"], fields["revision"]
+
+
+def serve_map_request(sock, request: str, address, map_cache: MapCache):
+    """Reply to a local `MAP?` / `MAP?<intersectionId>` request with cached MAPs."""
+    key = request[len(MAP_REQUEST_PREFIX):].strip()
+    if key:
+        entry = map_cache.lookup(key)
+        entries = [entry] if entry is not None else []
+    else:
+        entries = map_cache.entries()
+    sock.sendto(JsonCodec.dumps([entry.to_dict() for entry in entries]), address)
+
+
+def strip_header(decoded_data: str, header: bool) -> Optional[str]:
+    """Return the hex payload of a datagram (None if a required header is missing)."""
+    if not header:
+        return decoded_data.strip()
+    prefix_index = decoded_data.find(PAYLOAD_PREFIX)
+    if prefix_index == -1:
+        return None
+    return decoded_data[prefix_index + len(PAYLOAD_PREFIX):].strip()
+
+
+def build_rsu_forwarder(args, config_file_path: str) -> Optional[RsuForwarder]:
+    """Return an RsuForwarder when `--rsu` is set (RSU list next to the master config by default)."""
+    if not args.rsu:
+        return None
+    config_dir = os.path.dirname(config_file_path)
+    rsus = load_rsus(args.rsu_config or os.path.join(config_dir, "rsu-config.json"), os.path.join(config_dir, "dsrc"))
+    print(f"Broadcasting SPaT/MAP through {len(rsus)} RSUs")
+    return RsuForwarder(rsus)
+
+
+def build_liveness(args, write) -> Optional[LivenessMonitor]:
+    """LivenessMonitor for `--liveness`; status changes go to `write(path, record)`."""
+    if args.liveness <= 0:
+        return None
+    return LivenessMonitor(args.liveness, tick_s=LIVENESS_TICK_S, on_change=lambda kind, source_id, status, last_seen_ms:
+                           write(status_path(kind, source_id), status_record(status, last_seen_ms)))
+
+
+def liveness_kind(msg_type: str) -> str:
+    return "vehicles" if msg_type == "BSM" else "controllers"
+
+
+def upload_batch(batcher: UplinkBatcher, tracer):
+    """Upload the open batch (if any) to /LatestV2XBatch."""
+    record, traces = batcher.flush()
+    if record is None:
+        return
+    db.reference(f'/{BATCH_ROOT}').set(record)
+    if tracer is not None:
+        for trace in traces:
+            tracer.emit(trace, "cloud_write")
+    print(f"Batch of {record['count']} messages uploaded to Firebase ({len(record['blob'])} bytes)")
+
+
+def build_profiler(args, ingest_client=None) -> Optional[SamplingProfiler]:
+    """SamplingProfiler toggled by SIGUSR1 unless `--profile-seconds 0`."""
+    profiler = install("map-spat-sender", args.profile_seconds, args.profile_dir, PROFILE_STAGES)
+    if profiler is not None and ingest_client is not None:
+        profiler.add_gauge("ingest_pending", lambda: len(ingest_client.pending))
+    return profiler
+
+
+def run_multi(args, config: dict, host_ip: str, tracer, rsu_forwarder=None, ingest_client=None,
+              profiler: Optional[SamplingProfiler] = None):
+    """Multi-controller mode: many sockets, routing per intersection, batched slot uploads."""
+    ports = args.listen or [config["PortNumber"]["V2XDataSender"]]
+    # Only V2XDataSender is ours; the other configured ports belong to other components.
+    reserved = {port: name for name, port in config["PortNumber"].items() if name != "V2XDataSender"}
+    taken = [f"{port} ({reserved[port]})" for port in ports if port in reserved]
+    if taken:
+        raise ValueError(f"--listen ports already assigned in the config: {', '.join(taken)}")
+
+    source_map = None
+    if args.source_map:
+        with open(args.source_map, "r") as f:
+            source_map = json.load(f)
+    router = ControllerRouter(args.route, source_map)
+    map_cache = None if args.no_map_cache else MapCache(args.map_refresh)
+    slot_writer = LatestSlotWriter(args.ring, record_encoding(args.uplink))
+    on_uploaded = None
+    if tracer is not None:
+        on_uploaded = lambda traces: [tracer.emit(trace, "cloud_write") for trace in traces]
+    uploader = SlotUploader(on_uploaded)
+    liveness = build_liveness(args, lambda path, record: uploader.submit({path: record}))
+    if profiler is not None:
+        profiler.add_gauge("slot_uploader_pending", lambda: len(uploader.pending))
+
+    selector = selectors.DefaultSelector()
+    sockets = []
+    for port in ports:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, RECEIVE_BUFFER_BYTES)
+        sock.bind((host_ip, port))
+        sock.setblocking(False)
+        selector.register(sock, selectors.EVENT_READ)
+        sockets.append(sock)
+        if profiler is not None:
+            profiler.add_gauge(f"socket_rx_bytes/{port}", lambda sock=sock: udp_receive_queue(sock))
+        print(f"Listening on {host_ip}:{port}")
+    print(f"Multi-controller mode, routing by {args.route}. Press Ctrl+C to quit.")
+
+    next_report = time.monotonic() + args.report_interval
+    try:
+        while True:
+            for key, _ in selector.select(timeout=LIVENESS_TICK_S if liveness is not None else 1.0):
+                sock = key.fileobj
+                while True:
+                    try:
+                        data, address = sock.recvfrom(2048)
+                    except BlockingIOError:
+                        break
+                    receive_wall, receive_mono = time.time(), time.monotonic()
+                    decoded_data = data.decode(errors='ignore')
+
+                    if map_cache is not None and decoded_data.startswith(MAP_REQUEST_PREFIX):
+                        serve_map_request(sock, decoded_data, address, map_cache)
+                        continue
+                    payload = strip_header(decoded_data, args.header)
+                    if payload is None:
+                        continue
+
+                    msg_type, source, fields = router.route(payload, address, len(data), receive_wall)
+                    if msg_type is None:
+                        continue
+                    if liveness is not None:
+                        liveness.seen(liveness_kind(msg_type), source, receive_mono)
+                    if rsu_forwarder is not None:
+                        rsu_forwarder.forward(payload.encode())
+
+                    trace = None
+                    if tracer is not None and fields is not None:
+                        trace = trace_key(msg_type, fields)
+                        if trace is not None:
+                            if msg_type == "SPaT":
+                                tracer.emit(trace, "controller", controller_time(fields["minuteOfYear"], fields["timeStamp"]))
+                            tracer.emit(trace, "gateway_receive", receive_wall, receive_mono)
+
+                    if msg_type == "MAP" and map_cache is not None:
+                        revision = fields["revision"] if fields is not None else None
+                        intersection_id = fields["intersectionId"] if fields is not None else None
+                        if not map_cache.observe(source, payload, intersection_id, revision, receive_wall):
+                            continue  # unchanged MAP, already uploaded
+                        uploader.submit({f"MapCache/{source}": {
+                            "intersectionId": intersection_id,
+                            "revision": revision,
+                            "hash": map_cache.lookup(source).digest,
+                            "posix_timestamp": receive_wall,
+                            "payload": payload,
+                        }})
+
+                    if ingest_client is not None:
+                        ingest_client.submit(payload)
+                        continue
+                    extra = {"trace_key": trace} if trace is not None else None
+                    uploader.submit(slot_writer.build_update(msg_type, source, payload, extra), trace)
+
+            if liveness is not None:
+                liveness.poll()
+            if time.monotonic() >= next_report:
+                next_report = time.monotonic() + args.report_interval
+                router.report()
+                print(f"  uploads {uploader.uploads}, paths {uploader.paths_uploaded}, coalesced {uploader.coalesced}")
+                uploader.submit({f"{STATS_ROOT}/{name}": stats
+                                 for name, stats in router.stats()["sources"].items()})
+
+    except KeyboardInterrupt:
+        print("Stopping the program...")
+    finally:
+        uploader.stop()
+        for sock in sockets:
+            selector.unregister(sock)
+            sock.close()
+
+
 def main(args):
     """
     Main function for the MAP & SPaT sende
@@ -72,42 +302,64 @@ def main(args):
     host_ip = config["IPAddress"]["HostIp"]
     port = config["PortNumber"]["V2XDataSender"]
 
+    tracer = None
+    if args.trace:
+        tracer = TraceEmitter((host_ip, config["PortNumber"]["LatencyAnalyzer"]), "map-spat-sender")
+    rsu_forwarder = build_rsu_forwarder(args, config_file_path)
+    ingest_client = IngestClient(args.ingest, args.batch_ms / 1000.0) if args.ingest else None
+    profiler = build_profiler(args, ingest_client)
+    if args.multi:
+        try:
+            run_multi(args, config, host_ip, tracer, rsu_forwarder, ingest_client, profiler)
+        finally:
+            if ingest_client is not None:
+                ingest_client.stop()
+        return
+
     # --- UDP socket ---
     map_spat_sender_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
     map_spat_sender_socket.bind((host_ip, port))
     map_spat_sender_socket.settimeout(1.0)
 
     # --- identifiers & constants ---
-    payload_prefix = "Payload="
     map_identifier = "0012"
     spat_identifier = "0013"
     bsm_identifier = "0014"
 
+    map_cache = None if args.no_map_cache else MapCache(args.map_refresh)
+    slot_writer = LatestSlotWriter(args.ring, record_encoding(args.uplink)) if (args.slots or args.slots_only) else None
+    batcher = UplinkBatcher(args.uplink, args.batch_ms / 1000.0) if args.uplink in BATCH_ENCODINGS else None
+    liveness = build_liveness(args, lambda path, record: db.reference(path).set(record))
+    if liveness is not None:
+        map_spat_sender_socket.settimeout(LIVENESS_TICK_S)
+    if profiler is not None:
+        profiler.add_gauge("socket_rx_bytes", lambda: udp_receive_queue(map_spat_sender_socket))
+        if batcher is not None:
+            profiler.add_gauge("uplink_batch", lambda: len(batcher.payloads))
     print(f"Listening on {host_ip}:{port}")
     print("Press Ctrl+C to quit.")
 
     try:
         while True:
+            if liveness is not None:
+                liveness.poll()
+            if batcher is not None:
+                if batcher.due():
+                    upload_batch(batcher, tracer)
+                map_spat_sender_socket.settimeout(batcher.timeout(LIVENESS_TICK_S if liveness is not None else 1.0))
             try:
-                data, _ = map_spat_sender_socket.recvfrom(2048)
+                data, address = map_spat_sender_socket.recvfrom(2048)
+                receive_wall, receive_mono = time.time(), time.monotonic()
                 decoded_data = data.decode(errors='ignore')
 
-                # Check if data contains header or just the payload
-                if args.header:
-                    # Process with header
-                    prefix_index = decoded_data.find(payload_prefix)
-                    if prefix_index == -1:
-                        continue  # No Payload prefix found, skip this message
-
-                    payload = decoded_data[prefix_index + len(payload_prefix):].strip()
-                    # print(f"Received payload (with header): {payload}")
-                    # print("Received payload (with header)")
+                if map_cache is not None and decoded_data.startswith(MAP_REQUEST_PREFIX):
+                    serve_map_request(map_spat_sender_socket, decoded_data, address, map_cache)
+                    continue
 
-                else:
-                    # Process without header (only payload)
-                    payload = decoded_data.strip()
-                    # print(f"Received payload (without header): {payload}")
-                    # print("Received payload (without header)")
+                # Check if data contains header or just the payload
+                payload = strip_header(decoded_data, args.header)
+                if payload is None:
+                    continue  # No Payload prefix found, skip this message
 
                 # Detect payload type
                 if payload.startswith(map_identifier):
@@ -126,20 +378,74 @@ def main(args):
                     print("Unknown payload type, skipping...")
                     continue
 
+                # Local broadcast first; it must not wait for the cloud.
+                if rsu_forwarder is not None:
+                    rsu_forwarder.forward(payload.encode())
+
+                traced_fields = None
+                if tracer is not None or liveness is not None:
+                    _, traced_fields = peek(payload)
+                if liveness is not None:
+                    source = source_key(msg_type, traced_fields) or f"source-{address[0].replace('.', '-')}-{address[1]}"
+                    liveness.seen(liveness_kind(msg_type), source, receive_mono)
+
+                trace = None
+                if tracer is not None:
+                    trace = trace_key(msg_type, traced_fields)
+                    if trace is not None:
+                        if msg_type == "SPaT":
+                            tracer.emit(trace, "controller", controller_time(traced_fields["minuteOfYear"], traced_fields["timeStamp"]))
+                        tracer.emit(trace, "gateway_receive", receive_wall, receive_mono)
+
+                if msg_type == "MAP" and map_cache is not None:
+                    key, intersection_id, revision = map_cache_key(payload, address)
+                    if not map_cache.observe(key, payload, intersection_id, revision):
+                        continue  # unchanged MAP, already uploaded
+                    db.reference(f'/MapCache/{key}').set({
+                        "intersectionId": intersection_id,
+                        "revision": revision,
+                        "hash": map_cache.lookup(key).digest,
+                        "posix_timestamp": time.time(),
+                        "payload": payload
+                    })
+
+                # Batch into the ingest service instead of writing Firebase directly
+                if ingest_client is not None:
+                    ingest_client.submit(payload)
+                    continue
+
                 # Send to Firebase
                 # ref.set({
                 #     "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
                 #     "payload": payload
                 # })
 
-                # Send to unified /LatestV2XMessage
-                ref_latest = db.reference('/LatestV2XMessage')
-                ref_latest.set({
-                    "msg_type": msg_type,
-                    "posix_timestamp": time.time(),
-                    # "verbose_timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
-                    "payload": payload
-                })
+                # Send to the per-type, per-source slot (latest/<type>/<id>)
+                if slot_writer is not None:
+                    slot_writer.write(payload, {"trace_key": trace} if trace is not None else None)
+
+                # Send to unified /LatestV2XMessage (or into the open batch)
+                if batcher is not None:
+                    if not args.slots_only:
+                        batcher.add(payload, trace)
+                    continue
+
+                if not args.slots_only:
+                    ref_latest = db.reference('/LatestV2XMessage')
+                    latest = {
+                        "msg_type": msg_type,
+                        "posix_timestamp": time.time(),
+                        # "verbose_timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+                        "payload": encode_payload(payload, args.uplink)
+                    }
+                    if args.uplink != "hex":
+                        latest["encoding"] = args.uplink
+                    if trace is not None:
+                        latest["trace_key"] = trace
+                    ref_latest.set(latest)
+
+                if trace is not None:
+                    tracer.emit(trace, "cloud_write")
 
                 print(f"{msg_type} message uploaded to Firebase")
 
@@ -149,12 +455,41 @@ def main(args):
     except KeyboardInterrupt:
         print("Stopping the program...")
     finally:
+        if ingest_client is not None:
+            ingest_client.stop()
+            print(f"Ingest: {ingest_client.posted} posted in {ingest_client.batches} batches, "
+                  f"{ingest_client.dropped} dropped, {ingest_client.retries} retries")
+        if batcher is not None:
+            upload_batch(batcher, tracer)
+            if batcher.raw_bytes:
+                print(f"Uplink {args.uplink}: {batcher.batches} batches, {batcher.raw_bytes} hex characters "
+                      f"sent as {batcher.sent_bytes} ({batcher.sent_bytes / batcher.raw_bytes:.0%})")
         map_spat_sender_socket.close()
 
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="MAP/SPaT UDP → Firebase sender")
     parser.add_argument("--header", action="store_true", help="Incoming UDP has 'Payload=' prefix header")
+    parser.add_argument("--slots", action="store_true", help="Also write latest/<type>/<id> slots with sequence numbers")
+    parser.add_argument("--slots-only", action="store_true", help="Write only the per-source slots, not /LatestV2XMessage")
+    parser.add_argument("--ring", type=int, default=0, help="Keep the last N messages per slot under latest_ring/ (0 = off)")
+    parser.add_argument("--trace", action="store_true", help="Send per-hop timestamps to latency-analyzer.py")
+    parser.add_argument("--no-map-cache", action="store_true", help="Upload every received MAP")
+    parser.add_argument("--multi", action="store_true", help="Serve many controllers: route per intersection, batched slot uploads (implies --slots-only)")
+    parser.add_argument("--listen", type=int, nargs="+", help="UDP ports to receive on in --multi mode (default: PortNumber.V2XDataSender)")
+    parser.add_argument("--route", choices=["payload", "source"], default="payload", help="--multi: route by the intersection ID in the payload or by sender address")
+    parser.add_argument("--source-map", help="--multi: JSON file mapping 'ip:port' or 'ip' to an intersection ID")
+    parser.add_argument("--report-interval", type=float, default=30.0, help="--multi: seconds between per-source statistics reports")
+    parser.add_argument("--rsu", action="store_true", help="Also send SPaT/MAP to the RSUs with their DSRC headers (RsuForwarder.py)")
+    parser.add_argument("--rsu-config", help="RSU list for --rsu (default: rsu-config.json next to the master config)")
+    parser.add_argument("--uplink", choices=ENCODINGS, default="hex",
+                        help="Payload encoding to the cloud: hex, b64, or zlib/lzma batches to /LatestV2XBatch (slots use b64 then)")
+    parser.add_argument("--batch-ms", type=float, default=100.0, help="--uplink zlib/lzma and --ingest: batch window in milliseconds")
+    parser.add_argument("--ingest", help="Post SPaT/MAP in batches to ingest-server.py at this URL instead of writing Firebase")
+    parser.add_argument("--liveness", type=float, default=0.0, help="Publish source_status/<controllers|vehicles>/<id> and mark sources stale after N silent seconds (0 = off)")
+    parser.add_argument("--profile-seconds", type=float, default=30.0, help="Length of the profile started by SIGUSR1 (SamplingProfiler.py; 0 = ignore SIGUSR1)")
+    parser.add_argument("--profile-dir", help="Directory for profiles (default: current directory)")
+    parser.add_argument("--map-refresh", type=float, default=60.0, help="Re-upload an unchanged MAP after this many seconds (0 = only on change)")
     args = parser.parse_args()
     main(args)
 
@@ -0,0 +1,110 @@
+"""
+**********************************************************************************
+rsu-forwarder.py
+Created by: Debashis Das
+Argonne National Laboratory
+Transportation and Power Systems Division
+
+**********************************************************************************
+
+Description:
+------------
+Standalone RSU broadcast stage (RsuForwarder.py). Receives SPaT/MAP hex
+payloads over UDP on `PortNumber.RsuForwarder` - from `node listener.js
+--rsu` (cloud path) or any other sender - frames them with the per-RSU DSRC
+headers and sends them to every configured RSU. The gateway can do the same in-process
+with `map-spat-sender.py --rsu`.
+
+Datagrams that arrived together are framed and sent as one batch.
+
+Usage:
+    python3 rsu-forwarder.py
+    python3 rsu-forwarder.py --rsu-config ../../../config/rsu-config.json --header
+**********************************************************************************
+"""
+
+import argparse
+import json
+import os
+import platform
+import socket
+import time
+from RsuForwarder import RsuForwarder, load_rsus
+
+
+def load_config_path() -> str:
+    current_os = platform.system()
+    if current_os == "Linux":
+        return os.path.join(os.path.expanduser("~"), "Desktop", "c-vision", "config", "anl-master-config.json")
+    if current_os == "Windows":
+        return os.path.join("C:\\", "Users", "ddas", "Documents", "c-vision", "config", "anl-master-config.json")
+    raise OSError(f"Unsupported operating system: {current_os}")
+
+
+def strip_payload(data: bytes, header: bool) -> bytes:
+    """Return the hex payload of a datagram (after `Payload=` when `header` is set)."""
+    if header:
+        index = data.find(b"Payload=")
+        if index == -1:
+            return b""
+        data = data[index + len(b"Payload="):]
+    return data.strip()
+
+
+def main(args):
+    config_file_path = load_config_path()
+    with open(config_file_path, "r") as config_file:
+        config = json.load(config_file)
+    config_dir = os.path.dirname(config_file_path)
+
+    rsus = load_rsus(args.rsu_config or os.path.join(config_dir, "rsu-config.json"), os.path.join(config_dir, "dsrc"))
+    forwarder = RsuForwarder(rsus)
+    for rsu in rsus:
+        print(f"RSU {rsu.name} at {rsu.address[0]}:{rsu.address[1]} "
+              f"({', '.join(sorted(rsu.headers))}; intersections {sorted(rsu.intersections) if rsu.intersections else 'all'})")
+
+    host_ip = config["IPAddress"]["HostIp"]
+    port = config["PortNumber"]["RsuForwarder"]
+    receive_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    receive_socket.bind((host_ip, port))
+    print(f"Listening on {host_ip}:{port}")
+
+    next_report = time.monotonic() + args.report_interval
+    try:
+        while True:
+            receive_socket.settimeout(1.0)
+            try:
+                data, _ = receive_socket.recvfrom(4096)
+            except socket.timeout:
+                data = None
+            batch = [strip_payload(data, args.header)] if data else []
+
+            # Drain whatever else is already queued into the same batch.
+            receive_socket.setblocking(False)
+            while batch and len(batch) < args.batch:
+                try:
+                    data, _ = receive_socket.recvfrom(4096)
+                except BlockingIOError:
+                    break
+                batch.append(strip_payload(data, args.header))
+            if batch:
+                forwarder.forward_batch(batch)
+
+            if time.monotonic() >= next_report:
+                next_report = time.monotonic() + args.report_interval
+                summary = ", ".join(f"{name} {s['sent']} sent/{s['errors']} errors" for name, s in forwarder.stats().items())
+                print(f"RSU report: {summary}; {forwarder.skipped} non-SPaT/MAP skipped")
+
+    except KeyboardInterrupt:
+        print("Stopping the program...")
+    finally:
+        receive_socket.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Frame SPaT/MAP payloads with DSRC headers and send them to RSUs")
+    parser.add_argument("--rsu-config", help="RSU list (default: rsu-config.json next to the master config)")
+    parser.add_argument("--header", action="store_true", help="Incoming UDP has a 'Payload=' prefix header")
+    parser.add_argument("--batch", type=int, default=256, help="Maximum datagrams framed and sent per batch")
+    parser.add_argument("--report-interval", type=float, default=30.0, help="Seconds between RSU statistics reports")
+    main(parser.parse_args())
@@ -21,6 +21,10 @@ Run with `--seed` to write one demo BSM and SPaT to Firebase for testing the web
 Usage (normal mode):
     python3 sender.py (without header, only payload)
     python3 sender.py --header (with header)
+    python3 sender.py --slots --ring 20 (also write per-source latest/<type>/<id> slots)
+    python3 sender.py --uplink b64 (base64 payloads instead of hex, UplinkCodec.py)
+    python3 sender.py --uplink zlib --batch-ms 100 (compressed batches to /LatestV2XBatch)
+    python3 sender.py --ingest http://127.0.0.1:50011 (batch into ingest-server.py, IngestClient.py)
 
 **********************************************************************************
 """
@@ -38,6 +42,9 @@ from datetime import datetime
 from typing import Dict, List
 import firebase_admin
 from firebase_admin import credentials, db
+from LatestSlots import LatestSlotWriter
+from IngestClient import IngestClient
+from UplinkCodec import BATCH_ENCODINGS, BATCH_ROOT, ENCODINGS, UplinkBatcher, encode_payload, record_encoding
 
 # Load the Firebase service account key
 current_os = platform.system()
@@ -66,6 +73,15 @@ firebase_admin.initialize_app(cred, {
 msgReceiverSocket = None
 
 
+def upload_batch(batcher: UplinkBatcher):
+    """Upload the open batch (if any) to /LatestV2XBatch."""
+    record, _ = batcher.flush()
+    if record is None:
+        return
+    db.reference(f'/{BATCH_ROOT}').set(record)
+    print(f"Batch of {record['count']} messages uploaded to Firebase")
+
+
 def exit_gracefully(signum, frame):
     """
     Signal handler to close the socket and exit the program.
@@ -94,6 +110,11 @@ def main(args):
     # Add this line here
     msgReceiverSocket.settimeout(1.0)
 
+    encoding = record_encoding(args.uplink)
+    slot_writer = LatestSlotWriter(args.ring, encoding) if (args.slots or args.slots_only) else None
+    batcher = UplinkBatcher(args.uplink, args.batch_ms / 1000.0) if args.uplink in BATCH_ENCODINGS else None
+    ingest_client = IngestClient(args.ingest, args.batch_ms / 1000.0) if args.ingest else None
+
     payload_prefix = "Payload="
     map_identifier = "0012"
     spat_identifier = "0013"
@@ -107,68 +128,90 @@ def main(args):
     print(f"📡 Listening on {host_ip}:{port}")
     print("Press Ctrl+C to quit.")
 
-    while True:
-        try:
-            data, _ = msgReceiverSocket.recvfrom(1024)
-            decoded_data = data.decode(errors='ignore')
-
-            # Check if data contains header or just the payload
-            if args.header:
-                # Process with header
-                prefix_index = decoded_data.find(payload_prefix)
-                if prefix_index == -1:
-                    continue  # No Payload prefix found, skip this message
-
-                payload = decoded_data[prefix_index + len(payload_prefix):].strip()
-                print(f"Received payload (with header): {payload}")
-
-            else:
-                # Process without header (only payload)
-                payload = decoded_data.strip()
-                print(f"Received payload (without header): {payload}")
-
-            # Detect payload type
-            if payload.startswith(map_identifier):
-                ref = db.reference('/MAPData')
-                msg_type = "MAP"
-
-            elif payload.startswith(spat_identifier):
-                ref = db.reference('/SPaTData')
-                msg_type = "SPaT"
-
-            elif payload.startswith(bsm_identifier):
-                ref = db.reference('/BSMData')
-                msg_type = "BSM"
-
-            else:
-                print("Unknown payload type, skipping...")
+    # Also on Ctrl+C: exit_gracefully raises SystemExit, which runs the finally block.
+    try:
+        while True:
+            if batcher is not None:
+                if batcher.due():
+                    upload_batch(batcher)
+                msgReceiverSocket.settimeout(batcher.timeout(1.0))
+            try:
+                data, _ = msgReceiverSocket.recvfrom(1024)
+                decoded_data = data.decode(errors='ignore')
+
+                # Check if data contains header or just the payload
+                if args.header:
+                    # Process with header
+                    prefix_index = decoded_data.find(payload_prefix)
+                    if prefix_index == -1:
+                        continue  # No Payload prefix found, skip this message
+
+                    payload = decoded_data[prefix_index + len(payload_prefix):].strip()
+                    print(f"Received payload (with header): {payload}")
+
+                else:
+                    # Process without header (only payload)
+                    payload = decoded_data.strip()
+                    print(f"Received payload (without header): {payload}")
+
+                # Detect payload type
+                if payload.startswith(map_identifier):
+                    ref = db.reference('/MAPData')
+                    msg_type = "MAP"
+
+                elif payload.startswith(spat_identifier):
+                    ref = db.reference('/SPaTData')
+                    msg_type = "SPaT"
+
+                elif payload.startswith(bsm_identifier):
+                    ref = db.reference('/BSMData')
+                    msg_type = "BSM"
+
+                else:
+                    print("Unknown payload type, skipping...")
+                    continue
+
+                # Batch into the ingest service instead of writing Firebase directly
+                if ingest_client is not None:
+                    ingest_client.submit(payload)
+                    continue
+
+                # Send to Firebase
+                record = {
+                    "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+                    "payload": encode_payload(payload, encoding)
+                }
+                if encoding != "hex":
+                    record["encoding"] = encoding
+                ref.set(record)
+
+                # Send to the per-type, per-source slot (latest/<type>/<id>)
+                if slot_writer is not None:
+                    slot_writer.write(payload)
+
+                # Send to unified /LatestV2XMessage (or into the open batch)
+                if batcher is not None:
+                    if not args.slots_only:
+                        batcher.add(payload)
+                elif not args.slots_only:
+                    ref_latest = db.reference('/LatestV2XMessage')
+                    ref_latest.set(dict(record, type=msg_type))
+
+                print(f"{msg_type} message uploaded to Firebase")
+
+            except socket.timeout:
+                # This is where your program checks for signals
                 continue
-
-            # Send to Firebase
-            ref.set({
-                "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
-                "payload": payload
-            })
-
-            # Send to unified /LatestV2XMessage
-            ref_latest = db.reference('/LatestV2XMessage')
-            ref_latest.set({
-                "type": msg_type,
-                "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
-                "payload": payload
-            })
-
-            print(f"{msg_type} message uploaded to Firebase")
-
-        except socket.timeout:
-            # This is where your program checks for signals
-            continue
-        except KeyboardInterrupt:
-            break
-        except Exception as e:
-            print("Error:", e)
-
-    msgReceiverSocket.close()
+            except KeyboardInterrupt:
+                break
+            except Exception as e:
+                print("Error:", e)
+    finally:
+        if batcher is not None:
+            upload_batch(batcher)
+        if ingest_client is not None:
+            ingest_client.stop()
+        msgReceiverSocket.close()
 
 # ------------------------------------------------------------------------------
 # Seed demo BSM/SPaT for the web UI (/bsm, /spat)
@@ -250,6 +293,13 @@ def seed_test_records(loop: bool = False, period_sec: int = 5) -> None:
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="V2X sender")
     parser.add_argument("--header", action="store_true", help="Specify if data has a header.")
+    parser.add_argument("--slots", action="store_true", help="Also write latest/<type>/<id> slots with sequence numbers.")
+    parser.add_argument("--slots-only", action="store_true", help="Write only the per-source slots, not /LatestV2XMessage.")
+    parser.add_argument("--ring", type=int, default=0, help="Keep the last N messages per slot under latest_ring/ (0 = off).")
+    parser.add_argument("--uplink", choices=ENCODINGS, default="hex",
+                        help="Payload encoding to the cloud: hex, b64, or zlib/lzma batches to /LatestV2XBatch.")
+    parser.add_argument("--batch-ms", type=float, default=100.0, help="--uplink zlib/lzma and --ingest: batch window in milliseconds.")
+    parser.add_argument("--ingest", help="Post messages in batches to ingest-server.py at this URL instead of writing Firebase.")
     parser.add_argument("--seed", action="store_true", help="Write one demo BSM and SPaT to Firebase and exit.")
     args = parser.parse_args()
     # args.seed = True
@@ -0,0 +1,144 @@
+"""
+**********************************************************************************
+controller-swarm.py
+Created by: Debashis Das
+Argonne National Laboratory
+Transportation and Power Systems Division
+
+**********************************************************************************
+Description:
+------------
+Load generator for the multi-controller gateway (`map-spat-sender.py --multi`):
+N simulated controllers, each with its own UDP socket (source port) and its
+own intersection ID, send the SPaT payload from spat.txt at 10 Hz. The
+intersection ID is patched into the UPER payload, so routing by payload can
+be checked, and one MAP per controller is sent at 1 Hz when --map is given.
+
+Usage:
+    python3 controller-swarm.py --controllers 100
+    python3 controller-swarm.py --controllers 200 --rate 10 --seconds 60 --port 50001
+**********************************************************************************
+"""
+
+import argparse
+import json
+import os
+import platform
+import socket
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, ".."))
+from PayloadInspector import peek  # noqa: E402
+
+FIRST_INTERSECTION_ID = 10000
+
+
+def load_config() -> dict:
+    current_os = platform.system()
+    if current_os == "Linux":
+        config_file_path = os.path.join(os.path.expanduser("~"), "Desktop", "c-vision", "config", "anl-master-config.json")
+    elif current_os == "Windows":
+        config_file_path = os.path.join("C:\\", "Users", "ddas", "Documents", "c-vision", "config", "anl-master-config.json")
+    else:
+        raise OSError(f"Unsupported operating system: {current_os}")
+    with open(config_file_path, "r") as config_file:
+        return json.load(config_file)
+
+
+def read_bits(data: bytes, offset: int, count: int) -> int:
+    value = 0
+    for bit in range(offset, offset + count):
+        value = (value << 1) | ((data[bit >> 3] >> (7 - (bit & 7))) & 1)
+    return value
+
+
+def write_bits(data: bytearray, offset: int, count: int, value: int):
+    for index, bit in enumerate(range(offset, offset + count)):
+        mask = 1 << (7 - (bit & 7))
+        if (value >> (count - 1 - index)) & 1:
+            data[bit >> 3] |= mask
+        else:
+            data[bit >> 3] &= ~mask
+
+
+def intersection_id_offset(payload: str) -> int:
+    """Bit offset of the first intersection ID in a SPaT/MAP payload."""
+    msg_type, fields = peek(payload)
+    if fields is None or "intersectionId" not in fields:
+        raise ValueError("Payload has no readable intersection ID.")
+    data = bytes.fromhex(payload)
+    for offset in range(len(data) * 8 - 16):
+        if read_bits(data, offset, 16) != fields["intersectionId"]:
+            continue
+        probe = bytearray(data)
+        write_bits(probe, offset, 16, fields["intersectionId"] ^ 0x5A5A)
+        if peek(probe.hex())[1] == dict(fields, intersectionId=fields["intersectionId"] ^ 0x5A5A):
+            return offset
+    raise ValueError("Intersection ID not found in payload.")
+
+
+def with_intersection_id(payload: str, offset: int, intersection_id: int) -> bytes:
+    data = bytearray.fromhex(payload)
+    write_bits(data, offset, 16, intersection_id)
+    return data.hex().encode()
+
+
+def main(args):
+    config = load_config()
+    host_ip = config["IPAddress"]["HostIp"]
+    gateway = (host_ip, args.port or config["PortNumber"]["V2XDataSender"])
+
+    with open(os.path.join(HERE, "spat.txt")) as f:
+        spat = f.readline().strip()
+    with open(os.path.join(HERE, "map.txt")) as f:
+        map_payload = f.readline().strip()
+    spat_offset = intersection_id_offset(spat)
+    map_offset = intersection_id_offset(map_payload) if args.map else None
+
+    controllers = []
+    for index in range(args.controllers):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.bind((host_ip, 0))
+        intersection_id = FIRST_INTERSECTION_ID + index
+        controllers.append((sock, with_intersection_id(spat, spat_offset, intersection_id),
+                            with_intersection_id(map_payload, map_offset, intersection_id) if args.map else None))
+    print(f"{args.controllers} controllers -> {gateway[0]}:{gateway[1]}, "
+          f"{args.controllers * args.rate:.0f} SPaT/s")
+
+    period = 1.0 / args.rate
+    start = next_time = time.perf_counter()
+    ticks = sent = late = 0
+    try:
+        while args.seconds <= 0 or time.perf_counter() - start < args.seconds:
+            now = time.perf_counter()
+            if next_time > now:
+                time.sleep(next_time - now)
+            elif now - next_time > period:
+                late += 1
+            for index, (sock, spat_bytes, map_bytes) in enumerate(controllers):
+                sock.sendto(spat_bytes, gateway)
+                if map_bytes is not None and ticks % int(round(args.rate)) == index % int(round(args.rate)):
+                    sock.sendto(map_bytes, gateway)
+                sent += 1
+            ticks += 1
+            next_time += period
+            if ticks % int(round(args.rate * 10)) == 0:
+                elapsed = time.perf_counter() - start
+                print(f"{elapsed:6.1f}s sent {sent} SPaT ({sent / elapsed:,.0f}/s), late ticks {late}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for sock, _, _ in controllers:
+            sock.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simulate many signal controllers sending SPaT")
+    parser.add_argument("--controllers", type=int, default=100, help="Number of simulated controllers.")
+    parser.add_argument("--rate", type=float, default=10.0, help="SPaT per second per controller.")
+    parser.add_argument("--seconds", type=float, default=0.0, help="Stop after this many seconds (0 = run until Ctrl+C).")
+    parser.add_argument("--port", type=int, help="Gateway port (default: PortNumber.V2XDataSender).")
+    parser.add_argument("--map", action="store_true", help="Also send one MAP per controller per second.")
+    main(parser.parse_args())
@@ -0,0 +1,130 @@
+"""
+**********************************************************************************
+ingest-load.py
+Created by: Debashis Das
+Argonne National Laboratory
+Transportation and Power Systems Division
+
+**********************************************************************************
+Description:
+------------
+HTTP load test of ingest-server.py: C concurrent clients, each on a kept-alive
+connection, post batches of B SPaT/MAP payloads (spat.txt/map.txt) as fast as
+the server answers, for every batch size given. Reports requests/s,
+messages/s and response latency percentiles of accepted (202) batches, the
+number of 503s (validation queue full) and the rate the server actually
+validated (from /stats, after its queue drained). Batch size 1 is the old
+one-POST-per-SPaT pattern.
+
+Start the server first, e.g. `python3 ingest-server.py --sink null`.
+
+Usage:
+    python3 ingest-load.py
+    python3 ingest-load.py --url http://127.0.0.1:50011/ingest --clients 8 --batch 1 10 100 --seconds 10
+**********************************************************************************
+"""
+
+import argparse
+import http.client
+import json
+import os
+import platform
+import threading
+import time
+from urllib.parse import urlparse
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def default_url() -> str:
+    current_os = platform.system()
+    if current_os == "Linux":
+        config_file_path = os.path.join(os.path.expanduser("~"), "Desktop", "c-vision", "config", "anl-master-config.json")
+    elif current_os == "Windows":
+        config_file_path = os.path.join("C:\\", "Users", "ddas", "Documents", "c-vision", "config", "anl-master-config.json")
+    else:
+        raise OSError(f"Unsupported operating system: {current_os}")
+    with open(config_file_path, "r") as config_file:
+        config = json.load(config_file)
+    return f"http://{config['IPAddress']['HostIp']}:{config['PortNumber']['IngestServer']}/ingest"
+
+
+def percentile(values, fraction: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def server_stats(url) -> dict:
+    parsed = urlparse(url)
+    connection = http.client.HTTPConnection(parsed.hostname, parsed.port or 80, timeout=10)
+    connection.request("GET", "/stats")
+    stats = json.loads(connection.getresponse().read())
+    connection.close()
+    return stats
+
+
+def client(url, body: bytes, deadline: float, latencies: list, busy: list, errors: list):
+    parsed = urlparse(url)
+    connection = http.client.HTTPConnection(parsed.hostname, parsed.port or 80, timeout=10)
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        try:
+            connection.request("POST", parsed.path, body, {"Content-Type": "application/json"})
+            response = connection.getresponse()
+            response.read()
+        except (OSError, http.client.HTTPException) as e:
+            errors.append(str(e))
+            connection.close()
+            connection = http.client.HTTPConnection(parsed.hostname, parsed.port or 80, timeout=10)
+            continue
+        if response.status == 202:
+            latencies.append(time.perf_counter() - start)
+        elif response.status == 503:
+            busy.append(start)
+        else:
+            errors.append(f"HTTP {response.status}")
+    connection.close()
+
+
+def main(args):
+    url = args.url or default_url()
+    with open(os.path.join(HERE, "spat.txt")) as f:
+        spats = [line.strip() for line in f if line.strip()]
+    with open(os.path.join(HERE, "map.txt")) as f:
+        maps = [line.strip() for line in f if line.strip()]
+    # Mostly SPaT with an occasional MAP, like a gateway with MAP caching off.
+    mix = spats * 5 + maps[:1]
+
+    print(f"{url}: {args.clients} clients, {args.seconds:.0f} s per batch size")
+    for batch_size in args.batch:
+        body = json.dumps({"messages": [mix[i % len(mix)] for i in range(batch_size)]}).encode()
+        latencies, busy, errors = [], [], []
+        before = server_stats(url)
+        start = time.perf_counter()
+        deadline = start + args.seconds
+        threads = [threading.Thread(target=client, args=(url, body, deadline, latencies, busy, errors))
+                   for _ in range(args.clients)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        after = server_stats(url)
+        while after["queued_batches"] > 0:
+            time.sleep(0.05)
+            after = server_stats(url)
+        validated = (after["ok"] + after["invalid"] - before["ok"] - before["invalid"]) / (time.perf_counter() - start)
+        requests = len(latencies)
+        print(f"  batch {batch_size:4d}: {requests / args.seconds:8,.0f} req/s {requests * batch_size / args.seconds:10,.0f} msg/s | "
+              f"p50 {percentile(latencies, 0.5) * 1e3:6.2f} ms  p99 {percentile(latencies, 0.99) * 1e3:6.2f} ms | "
+              f"503 {len(busy):6d}  errors {len(errors)} | validated {validated:9,.0f} msg/s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test for ingest-server.py")
+    parser.add_argument("--url", help="Ingest URL (default: IPAddress.HostIp and PortNumber.IngestServer)")
+    parser.add_argument("--clients", type=int, default=4, help="Concurrent connections.")
+    parser.add_argument("--batch", type=int, nargs="+", default=[1, 10, 100, 500], help="Messages per POST.")
+    parser.add_argument("--seconds", type=float, default=5.0, help="Duration per batch size.")
+    main(parser.parse_args())
@@ -0,0 +1,114 @@
+"""
+**********************************************************************************
+uplink-encoding.py
+Created by: Debashis Das
+Argonne National Laboratory
+Transportation and Power Systems Division
+
+**********************************************************************************
+Description:
+------------
+Bandwidth and CPU of the `--uplink` encodings (UplinkCodec.py) for typical
+message mixes, per second of traffic:
+
+    intersection      10 SPaT + 1 MAP (gateway without MAP cache)
+    intersection-mc   10 SPaT (MAP cache on, MAP uploads are rare)
+    vehicles          100 BSM (10 vehicles at 10 Hz)
+    mixed             10 SPaT + 1 MAP + 100 BSM
+
+SPaT/MAP come from spat.txt/map.txt, BSMs from the connected-vehicle sample
+(bsm-hex.txt). Consecutive SPaTs of a real controller differ in their timers,
+so `--churn` (default 10%) of every SPaT's bytes are randomized; without it
+zlib/lzma would only see identical copies. Bytes are payload characters as
+stored in the database (record keys and timestamps excluded).
+
+Usage:
+    python3 uplink-encoding.py
+    python3 uplink-encoding.py --window-ms 1000 --churn 0.2
+**********************************************************************************
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, ".."))
+from UplinkCodec import decode_payload, encode_payload, pack_batch, unpack_batch  # noqa: E402
+
+BSM_FILE = os.path.join(HERE, "..", "..", "conneted-vehicle-to-cloud-interface", "bsm-hex.txt")
+
+
+def read_lines(path: str):
+    # Decoded payloads come back lower-case.
+    with open(path) as f:
+        return [line.strip().lower() for line in f if line.strip()]
+
+
+def churned(payload: str, churn: float, rng: random.Random) -> str:
+    data = bytearray.fromhex(payload)
+    # Keep the MessageFrame prefix so the type stays readable.
+    for index in rng.sample(range(3, len(data)), int((len(data) - 3) * churn)):
+        data[index] = rng.randrange(256)
+    return data.hex()
+
+
+def build_mixes(churn: float, rng: random.Random) -> dict:
+    spat, maps, bsms = read_lines(os.path.join(HERE, "spat.txt")), read_lines(os.path.join(HERE, "map.txt")), read_lines(BSM_FILE)
+    spats = [churned(spat[i % len(spat)], churn, rng) for i in range(10)]
+    vehicles = bsms[:100]
+    return {
+        "intersection": spats + maps[:1],
+        "intersection-mc": spats,
+        "vehicles": vehicles,
+        "mixed": spats + maps[:1] + vehicles,
+    }
+
+
+def per_second(messages, window_s: float):
+    """Split one second of messages into batch windows (arrival order interleaved)."""
+    batches = max(1, int(round(1.0 / window_s)))
+    return [messages[i::batches] for i in range(batches) if messages[i::batches]]
+
+
+def measure(function, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - start) / repeat
+
+
+def main(args):
+    rng = random.Random(1)
+    for name, messages in build_mixes(args.churn, rng).items():
+        hex_bytes = sum(len(payload) for payload in messages)
+        print(f"{name}: {len(messages)} messages/s, {hex_bytes} hex characters/s")
+
+        b64 = [encode_payload(payload, "b64") for payload in messages]
+        assert [decode_payload({"encoding": "b64", "payload": p}) for p in b64] == messages
+        encode_s = measure(lambda: [encode_payload(payload, "b64") for payload in messages], args.repeat)
+        decode_s = measure(lambda: [decode_payload({"encoding": "b64", "payload": p}) for p in b64], args.repeat)
+        size = sum(len(p) for p in b64)
+        print(f"  {'hex':<5} {hex_bytes:7d} B/s  100%  writes/s {len(messages):4d}")
+        print(f"  {'b64':<5} {size:7d} B/s {size / hex_bytes:4.0%}  writes/s {len(messages):4d}  "
+              f"encode {encode_s / len(messages) * 1e6:5.2f} us/msg  decode {decode_s / len(messages) * 1e6:5.2f} us/msg")
+
+        for encoding in ("zlib", "lzma"):
+            windows = per_second(messages, args.window_ms / 1000.0)
+            records = [pack_batch(window, encoding) for window in windows]
+            assert [p for record in records for _, p in unpack_batch(record)] == [p for w in windows for p in w]
+            size = sum(len(record["blob"]) + len(record["index"]) for record in records)
+            encode_s = measure(lambda: [pack_batch(window, encoding) for window in windows], args.repeat)
+            decode_s = measure(lambda: [unpack_batch(record) for record in records], args.repeat)
+            print(f"  {encoding:<5} {size:7d} B/s {size / hex_bytes:4.0%}  writes/s {len(records):4d}  "
+                  f"encode {encode_s / len(messages) * 1e6:5.2f} us/msg  decode {decode_s / len(messages) * 1e6:5.2f} us/msg")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Uplink encoding bandwidth/CPU comparison")
+    parser.add_argument("--window-ms", type=float, default=100.0, help="Batch window of zlib/lzma.")
+    parser.add_argument("--churn", type=float, default=0.1, help="Fraction of SPaT bytes randomized per message.")
+    parser.add_argument("--repeat", type=int, default=200, help="Repetitions per CPU measurement.")
+    main(parser.parse_args())
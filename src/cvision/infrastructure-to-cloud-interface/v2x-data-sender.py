@@ -6,6 +6,8 @@ import socket
 import time
 import os
 import platform
+import argparse
+from HistoryWriter import HistoryWriter
 
 # Load the Firebase service account key
 current_os = platform.system()
@@ -52,29 +54,38 @@ def generate_v2x_data():
     return payload_bsm
 
 # Function to send data to Firebase
-def send_to_firebase(payload, local_ip):
-    ref = db.reference('/v2x_data')
-    timestamp = int(time.time())  # Use current timestamp as unique key for messages
-    
-    # Push the data to Firebase
-    ref.child(str(timestamp)).set({
+def send_to_firebase(payload, local_ip, history):
+    # Keys are <ms>-<source>-<seq> inside hour/day buckets (HistoryWriter.py),
+    # so messages of the same second no longer overwrite each other.
+    timestamp_ms = int(time.time() * 1000)
+    path = history.append({
         'message': payload,  # The V2X data payload (e.g., BSM, SPaT, MAP)
         'wifi_ip': local_ip,  # The local Wi-Fi IP address of the device
-        'timestamp': timestamp
-    })
-    print(f"Data published to Firebase with timestamp: {timestamp}")
+        'timestamp': timestamp_ms // 1000
+    }, timestamp_ms)
+    print(f"Data queued for Firebase at /v2x_data/{path}")
 
 # Main function to run the process
-def main():
+def main(args):
     # Get local Wi-Fi IP address
     local_ip = get_local_ip()
+    history = HistoryWriter(local_ip, args.bucket)
     
     # Generate V2X data (e.g., BSM, SPaT, MAP)
     v2x_data = generate_v2x_data()
     
     # Send the V2X data along with the Wi-Fi IP address to Firebase
-    send_to_firebase(v2x_data, local_ip)
+    for _ in range(args.count):
+        send_to_firebase(v2x_data, local_ip, history)
+        if args.period > 0:
+            time.sleep(args.period)
+    history.flush()
+    print(f"{history.written} messages published to Firebase")
 
 # Run the main function
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Publish V2X data to the /v2x_data history")
+    parser.add_argument("--count", type=int, default=1, help="Number of messages to publish")
+    parser.add_argument("--period", type=float, default=0.0, help="Seconds between messages")
+    parser.add_argument("--bucket", choices=["hour", "day"], default="hour", help="History bucket size")
+    main(parser.parse_args())
@@ -1,7 +1,33 @@
+"""
+**********************************************************************************
+vehicle-listener.py
+Created by: Debashis Das
+Argonne National Laboratory
+Transportation and Power Systems Division
+
+**********************************************************************************
+Description:
+------------
+Mirrors `/vehicle_status` locally (StatusMirror.py) and runs geofenced
+subscriptions over it (GeofenceIndex.py). By default it reports vehicles
+entering/leaving a radius around the ego vehicle (`EgoVehicleId` in the config).
+
+Usage:
+    python3 vehicle-listener.py                       # vehicles within 150 m of the ego vehicle
+    python3 vehicle-listener.py --radius 300
+    python3 vehicle-listener.py --region 41.70 -88.00 41.72 -87.98
+    python3 vehicle-listener.py --verbose             # also print every vehicle update
+**********************************************************************************
+"""
+
+import argparse
+import json
 import firebase_admin
 from firebase_admin import credentials, db
 import os
 import platform
+from StatusMirror import StatusMirror
+from GeofenceIndex import GeofenceSubscriptions
 
 # Load the Firebase service account key
 current_os = platform.system()
@@ -27,15 +53,39 @@ firebase_admin.initialize_app(cred, {
     'databaseURL': 'https://c-vision-7e1ec-default-rtdb.firebaseio.com/'
 })
 
+def print_fence_event(name, event, vehicle_id, record):
+    if event == "leave":
+        print(f"[{name}] vehicle {vehicle_id} left")
+    elif event == "enter":
+        print(f"[{name}] vehicle {vehicle_id} entered: {record}")
+
+
 # Function to listen for updates
-def listen_for_updates():
+def listen_for_updates(args):
     ref = db.reference('/vehicle_status')
 
+    # Full records, rebuilt from put/patch events (the publisher may send patches only)
+    mirror = StatusMirror()
+
+    # Region and proximity queries, evaluated only against the touched grid cells
+    subscriptions = GeofenceSubscriptions()
+    with open(config_file_path, "r") as config_file:
+        config = json.load(config_file)
+    ego_vehicle_id = str(config["VehicleInformation"]["EgoVehicleId"])
+    if args.radius > 0:
+        subscriptions.add_radius(f"within-{args.radius:g}m-of-{ego_vehicle_id}", args.radius,
+                                 print_fence_event, follow_vehicle=ego_vehicle_id)
+    if args.region:
+        subscriptions.add_region("region", *args.region, print_fence_event)
+
     # Set up a listener to respond to any new updates in the Firebase database
     def listener(event):
         # The data published to Firebase (message from the cloud)
-        update_data = event.data
-        print(f"Received update from cloud: {update_data}")
+        for vehicle_id in mirror.apply_event(event.event_type, event.path, event.data):
+            update_data = mirror.get(vehicle_id)
+            subscriptions.on_vehicle(vehicle_id, update_data)
+            if args.verbose:
+                print(f"Received update from cloud for vehicle {vehicle_id}: {update_data}")
         # Here, you can process the data (e.g., update navigation, apply changes, etc.)
         # Example: Display new route instructions
         # if 'route' in update_data:
@@ -47,4 +97,8 @@ def listen_for_updates():
     ref.listen(listener)
 
 # Example usage (Vehicle listens for cloud updates)
-listen_for_updates()
+parser = argparse.ArgumentParser(description="Vehicle status listener with geofenced subscriptions")
+parser.add_argument("--radius", type=float, default=150.0, help="Report vehicles within this many metres of the ego vehicle (0 = off)")
+parser.add_argument("--region", type=float, nargs=4, metavar=("MIN_LAT", "MIN_LON", "MAX_LAT", "MAX_LON"), help="Report vehicles inside this box")
+parser.add_argument("--verbose", action="store_true", help="Print every vehicle update")
+listen_for_updates(parser.parse_args())
@@ -12,23 +12,60 @@ Description:
 Handles ingestion of Basic Safety Messages (BSM) and writes structured records
 to Firebase Realtime Database (RTDB). Ensures Firebase is initialized exactly once
 for the current process.
+
+With a TrajectoryBuffer, the published position/speed/heading are the smoothed
+state dead-reckoned to the publish time, and uploads can be downsampled per
+vehicle (`upload_interval_s`) without visible jumps.
+
+`manage_bsm_batch` is the columnar alternative for many BSMs at once (see
+BsmBatch.py); with `batch_window_s`, `manage_bsm_data` buffers BSMs and
+publishes them in batches.
 **********************************************************************************
 """
 import time
 import os
 import platform
 import firebase_admin
-from firebase_admin import credentials, db
+from firebase_admin import credentials
+from TelemetrySink import FirebaseSink, write_many
 
 class BsmManager:
     """Manages BSM data lifecycle and persistence to Firebase RTDB."""
-    def __init__(self):
+    def __init__(self, sink=None, trajectory=None, upload_interval_s: float = 0.0, sequence_tracker=None,
+                 batch_window_s: float = 0.0, liveness=None):
         """
         Initialize the BSM manager and ensure Firebase is ready.
-        This constructor calls :meth:`get_firebase_credential` to guarantee a
-        single Firebase app instance exists for the process.
+        When no sink is given, this constructor calls :meth:`get_firebase_credential`
+        to guarantee a single Firebase app instance exists for the process.
+
+        Args:
+            sink: Destination for vehicle records (see TelemetrySink.py).
+                Defaults to Firebase RTDB.
+            trajectory: Optional TrajectoryBuffer used to smooth and
+                dead-reckon published positions.
+            upload_interval_s: Minimum time between two records of the same
+                vehicle (requires `trajectory`; 0 = publish every BSM).
+            sequence_tracker: Optional SequenceTracker; duplicate and stale
+                BSMs are dropped before they are written.
+            batch_window_s: Buffer BSMs for this many seconds and publish them
+                through `manage_bsm_batch` (0 = publish every BSM directly).
+            liveness: Optional LivenessMonitor; every accepted BSM marks its
+                vehicle as seen.
         """
-        self.get_firebase_credential()
+        if sink is None:
+            self.get_firebase_credential()
+            sink = FirebaseSink()
+        self.sink = sink
+        self.trajectory = trajectory
+        self.upload_interval_s = upload_interval_s
+        self.sequence_tracker = sequence_tracker
+        self.liveness = liveness
+        if batch_window_s > 0 and trajectory is not None:
+            raise ValueError("Batched BSMs cannot be combined with trajectory smoothing.")
+        self.batch_window_s = batch_window_s
+        self.batch = []
+        self.batch_deadline = 0.0
+        self.batch_processor = None
 
     def get_firebase_credential(self):
         """
@@ -70,12 +107,32 @@ class BsmManager:
             None
 
         Side Effects:
-            Persists data to Firebase Realtime Database at `vehicle_status/{temporaryID}`.
+            Writes the record to the sink (Firebase RTDB by default) at `vehicle_status/{temporaryID}`.
 
         Raises:
             KeyError: If required fields are missing from `jsonString`.
             TypeError: If `jsonString` is not a dict or contains unexpected types.
         """
+        if self.liveness is not None:
+            self.liveness.poll()
+
+        if self.sequence_tracker is not None:
+            accepted = self.sequence_tracker.accept_bsm(jsonString)
+            self.sequence_tracker.maybe_report()
+            if not accepted:
+                return
+
+        # Duplicates do not count as a sign of life.
+        if self.liveness is not None:
+            self.liveness.seen("vehicles", str(jsonString['BasicVehicle']['temporaryID']))
+
+        if self.batch_window_s > 0:
+            if not self.batch:
+                self.batch_deadline = time.monotonic() + self.batch_window_s
+            self.batch.append(jsonString)
+            self.flush_batch()
+            return
+
         vehicle_id = jsonString['BasicVehicle']['temporaryID']
         lattitude = jsonString['BasicVehicle']['position']['latitude_DecimalDegree']
         longitude = jsonString['BasicVehicle']['position']['longitude_DecimalDegree']
@@ -88,7 +145,17 @@ class BsmManager:
         signal_group = jsonString['BasicVehicle']['signalGroup']
         signal_status = jsonString['BasicVehicle']['signalStatus']
 
-        now_ms = int(time.time() * 1000)
+        now = time.time()
+        now_ms = int(now * 1000)
+
+        if self.trajectory is not None:
+            self.trajectory.add(vehicle_id, jsonString['BasicVehicle']['secMark_Second'],
+                                lattitude, longitude, speed_mps, heading_degree, now)
+            if not self.trajectory.publish_due(vehicle_id, now, self.upload_interval_s):
+                return
+            estimate = self.trajectory.estimate(vehicle_id, now)
+            lattitude, longitude = estimate["lat"], estimate["lon"]
+            speed_mps, heading_degree = estimate["speed"], estimate["heading"]
 
         vehicle_data_dictionary = {
             "lat": lattitude,
@@ -104,5 +171,31 @@ class BsmManager:
             "timestamp": now_ms,
         }
 
-        db.reference(
-            f"vehicle_status/{vehicle_id}").set(vehicle_data_dictionary)
+        self.sink.write(f"vehicle_status/{vehicle_id}", vehicle_data_dictionary)
+
+    def manage_bsm_batch(self, messages):
+        """
+        Publish many BSMs at once through the columnar path (BsmBatch.py).
+
+        Args:
+            messages: Decoded BSMs (dicts) or raw JSON records (str/bytes).
+
+        Returns:
+            Number of vehicle records written.
+
+        Side Effects:
+            One batched write of the changed vehicles below `vehicle_status`.
+        """
+        if self.batch_processor is None:
+            # Imported here so the per-message path does not need numpy.
+            from BsmBatch import BsmBatchProcessor
+            self.batch_processor = BsmBatchProcessor()
+        records = self.batch_processor.process(messages)
+        write_many(self.sink, "vehicle_status", records)
+        return len(records)
+
+    def flush_batch(self, force: bool = False):
+        """Publish the buffered BSMs once the batch window has elapsed (or now, with `force`)."""
+        if self.batch and (force or time.monotonic() >= self.batch_deadline):
+            batch, self.batch = self.batch, []
+            self.manage_bsm_batch(batch)
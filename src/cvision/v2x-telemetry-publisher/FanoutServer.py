@@ -0,0 +1,268 @@
+"""
+**********************************************************************************
+FanoutServer.py
+Created by: Debashis Das
+Argonne National Laboratory
+Transportation and Power Systems Division
+
+**********************************************************************************
+
+Description:
+------------
+Edge fan-out of `vehicle_status` and `intersection_status` records to local
+UDP clients, so vehicles do not have to wait for the Firebase round trip.
+
+Clients subscribe by sending a JSON datagram to the server port:
+
+    {"type": "subscribe",
+     "filters": {"paths": ["vehicle_status", "intersection_status"],
+                 "intersectionIds": ["29080"],
+                 "vehicleIds": ["601"],
+                 "near": {"lat": 41.71, "lon": -87.99, "radius_m": 300}}}
+
+All filter entries are optional; an entry narrows the stream only for the
+record types it applies to. Subscriptions expire after `SUBSCRIPTION_TTL_S`
+unless renewed (clients simply resend the subscribe message), and
+`{"type": "unsubscribe"}` drops one immediately.
+
+On subscribe the client receives a full snapshot of every matching record.
+After that it only receives deltas (the leaves that changed since the previous
+record of the same key, in the patch format of DeltaEncoder.py):
+
+    {"path": "vehicle_status/601", "snapshot": true,  "data": {...}}
+    {"path": "vehicle_status/601", "snapshot": false, "data": {"lat": ..., "timestamp": ...}}
+    {"path": "intersection_status/29080", "snapshot": false, "data": {"phaseStates/1/state": "yellow"}}
+
+A renewal with different filters sends a snapshot of the records that match
+the new filters but did not match the old ones. Because deltas travel over UDP
+and a lost one leaves the client's copy wrong, every subscriber is also sent a
+full snapshot every `SNAPSHOT_INTERVAL_S` (like DeltaEncoder.py does for
+Firebase). Records not written for `FORGET_AFTER_S` are dropped.
+**********************************************************************************
+"""
+
+import math
+import socket
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Tuple
+from DeltaEncoder import diff, flatten
+import JsonCodec
+
+SUBSCRIPTION_TTL_S = 30.0
+SNAPSHOT_INTERVAL_S = 30.0
+FORGET_AFTER_S = 300.0
+SERVICE_PERIOD_S = 1.0
+EARTH_RADIUS_M = 6371000.0
+
+
+def distance_m(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Equirectangular distance in meters (accurate enough at intersection scale)."""
+    x = math.radians(lon2 - lon1) * math.cos(math.radians((lat1 + lat2) / 2.0))
+    y = math.radians(lat2 - lat1)
+    return EARTH_RADIUS_M * math.hypot(x, y)
+
+
+def encode_update(path: str, snapshot: bool, data: dict) -> bytes:
+    """Datagram of one update (see the module docstring for the format)."""
+    return JsonCodec.dumps({"path": path, "snapshot": snapshot, "data": data})
+
+
+class Subscription:
+    """One client address and the filters it registered."""
+    def __init__(self, address: Tuple[str, int], filters: dict):
+        self.address = address
+        self.resync_at = time.monotonic() + SNAPSHOT_INTERVAL_S
+        self.update(filters)
+
+    def update(self, filters: dict):
+        """Replace the filters and renew the expiry time."""
+        self.filters = filters
+        self.paths = set(filters.get("paths") or ["vehicle_status", "intersection_status"])
+        intersection_ids = filters.get("intersectionIds")
+        vehicle_ids = filters.get("vehicleIds")
+        self.intersection_ids = {str(i) for i in intersection_ids} if intersection_ids else None
+        self.vehicle_ids = {str(v) for v in vehicle_ids} if vehicle_ids else None
+        self.near = filters.get("near")
+        self.expires_at = time.monotonic() + SUBSCRIPTION_TTL_S
+
+    def matches(self, kind: str, key: str, record: dict) -> bool:
+        """Check a full record (not a delta) against the filters."""
+        if kind not in self.paths:
+            return False
+
+        if kind == "intersection_status":
+            return self.intersection_ids is None or key in self.intersection_ids
+
+        if self.vehicle_ids is not None and key not in self.vehicle_ids:
+            return False
+        if self.intersection_ids is not None and str(record.get("intersection_id")) not in self.intersection_ids:
+            return False
+        if self.near is not None:
+            lat, lon = record.get("lat"), record.get("lon")
+            if lat is None or lon is None:
+                return False
+            if distance_m(self.near["lat"], self.near["lon"], lat, lon) > self.near["radius_m"]:
+                return False
+        return True
+
+
+class FanoutServer:
+    """UDP fan-out server. Also usable as a sink (see TelemetrySink.py)."""
+    def __init__(self, host_ip: str, port: int):
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.bind((host_ip, port))
+        self.socket.settimeout(1.0)
+
+        self.lock = threading.Lock()
+        self.subscriptions: Dict[Tuple[str, int], Subscription] = {}
+        # Latest full record per path; used for deltas and subscribe snapshots.
+        self.records: Dict[str, dict] = {}
+        # path -> time of the last write, least recently written first.
+        self.written_at: "OrderedDict[str, float]" = OrderedDict()
+        self.expired = 0
+        self.next_service = 0.0
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        """Start the background thread that handles (un)subscribe requests."""
+        self.running = True
+        self.thread = threading.Thread(target=self.serve_subscriptions, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Stop the subscription thread and close the socket."""
+        self.running = False
+        if self.thread is not None:
+            self.thread.join()
+        self.socket.close()
+
+    def serve_subscriptions(self):
+        """Receive subscribe/unsubscribe datagrams until stopped."""
+        while self.running:
+            now = time.monotonic()
+            if now >= self.next_service:
+                self.service(now)
+                self.next_service = now + SERVICE_PERIOD_S
+            try:
+                data, address = self.socket.recvfrom(4096)
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+
+            try:
+                request = JsonCodec.loads(data)
+            except ValueError:
+                continue
+
+            if request.get("type") == "subscribe":
+                self.subscribe(address, request.get("filters") or {})
+            elif request.get("type") == "unsubscribe":
+                with self.lock:
+                    self.subscriptions.pop(address, None)
+
+    def subscribe(self, address: Tuple[str, int], filters: dict):
+        """Register or renew a subscription.
+
+        New subscribers get a snapshot of every matching record. A renewal with
+        different filters gets a snapshot of the records that only the new
+        filters match; the client has no baseline for their deltas otherwise.
+        """
+        previous = None
+        with self.lock:
+            subscription = self.subscriptions.get(address)
+            if subscription is not None:
+                if filters == subscription.filters:
+                    subscription.update(filters)
+                    return
+                previous = Subscription(address, subscription.filters)
+                subscription.update(filters)
+            else:
+                subscription = Subscription(address, filters)
+                self.subscriptions[address] = subscription
+            records = list(self.records.items())
+
+        self.send_snapshot(subscription, records, previous)
+
+    def send_snapshot(self, subscription: Subscription, records: list, previous: Subscription = None):
+        """Send every record matching `subscription` in full, except those `previous` already matched."""
+        for path, record in records:
+            kind, _, key = path.partition("/")
+            if not subscription.matches(kind, key, record):
+                continue
+            if previous is not None and previous.matches(kind, key, record):
+                continue
+            self.send(subscription.address, encode_update(path, True, record))
+
+    def service(self, now: float):
+        """Periodic upkeep: resync snapshots, expired subscriptions and records."""
+        self.resync_subscriptions(now)
+        self.expire_subscriptions(now)
+        self.expire_records(now)
+
+    def resync_subscriptions(self, now: float):
+        """Send a full snapshot to every subscriber whose last one is `SNAPSHOT_INTERVAL_S` old."""
+        with self.lock:
+            due = [s for s in self.subscriptions.values() if s.resync_at <= now]
+            for subscription in due:
+                subscription.resync_at = now + SNAPSHOT_INTERVAL_S
+            records = list(self.records.items()) if due else []
+
+        for subscription in due:
+            self.send_snapshot(subscription, records)
+
+    def expire_subscriptions(self, now: float):
+        """Drop subscriptions that were not renewed in time."""
+        with self.lock:
+            for address in [a for a, s in self.subscriptions.items() if s.expires_at < now]:
+                del self.subscriptions[address]
+
+    def expire_records(self, now: float):
+        """Forget records not written for `FORGET_AFTER_S` (vehicles that left)."""
+        cutoff = now - FORGET_AFTER_S
+        with self.lock:
+            while self.written_at:
+                path, written_at = next(iter(self.written_at.items()))
+                if written_at >= cutoff:
+                    break
+                del self.written_at[path]
+                del self.records[path]
+                self.expired += 1
+
+    def write(self, path: str, data: dict):
+        """Publish one record: send its delta to every matching subscriber."""
+        kind, _, key = path.partition("/")
+        with self.lock:
+            previous = self.records.get(path)
+            self.records[path] = data
+            self.written_at[path] = time.monotonic()
+            self.written_at.move_to_end(path)
+            subscriptions = list(self.subscriptions.values())
+
+        if not subscriptions:
+            return
+        delta = diff(flatten(previous), flatten(data)) if previous is not None else data
+        if not delta:
+            return
+
+        # Serialized once per update, not once per subscriber.
+        encoded = {}
+        for subscription in subscriptions:
+            if not subscription.matches(kind, key, data):
+                continue
+            # A record that was filtered out before (e.g. vehicle just entered the
+            # radius) must arrive in full, otherwise the client has no baseline.
+            snapshot = not (previous is not None and subscription.matches(kind, key, previous))
+            if snapshot not in encoded:
+                encoded[snapshot] = encode_update(path, snapshot, data if snapshot else delta)
+            self.send(subscription.address, encoded[snapshot])
+
+    def send(self, address: Tuple[str, int], message: bytes):
+        """Send one encoded update datagram to a subscriber."""
+        try:
+            self.socket.sendto(message, address)
+        except OSError as e:
+            print(f"Fan-out send to {address} failed: {e}")
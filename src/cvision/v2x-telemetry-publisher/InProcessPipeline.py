@@ -0,0 +1,179 @@
+"""
+**********************************************************************************
+InProcessPipeline.py
+Created by: Debashis Das
+Argonne National Laboratory
+Transportation and Power Systems Division
+
+**********************************************************************************
+
+Description:
+------------
+Stages of the single-process pipeline (v2x-pipeline.py). The default
+deployment (terminal-setup.txt) is a chain of processes with loopback UDP
+in between, where every hop serializes, copies and re-parses the message:
+
+    gateway --UDP hex--> message decoder --UDP JSON--> vehicle server / publisher
+
+Here the same steps are functions in one process:
+
+    classify (raw/hex datagram -> frame)  ->  decode (UperDecoder.py)  ->  publish (dispatch_message)
+
+Each stage runs on its own thread and is fed by a bounded queue.Queue; a full
+queue blocks the stage in front of it (as ShardedDispatcher.dispatch does), so
+overload ends up as drops on the ingress socket instead of memory growth. With
+`queue_size=0` the stages run inline on the submitting thread, which avoids
+the thread hand-offs (GIL) and is the cheaper choice for one core.
+
+UDP stays available at each boundary: a UdpForwarder stage sends to the next
+process (e.g. the C++ decoder), and a UdpReceiver feeds the answers back into
+a later stage.
+**********************************************************************************
+"""
+
+import queue
+import socket
+import threading
+from typing import Callable, List, Optional, Tuple
+import JsonCodec
+from UperDecoder import BSM_PREFIX, MAP_PREFIX, SPAT_PREFIX
+
+FRAME_TYPES = {SPAT_PREFIX: "SPaT", BSM_PREFIX: "BSM", MAP_PREFIX: "MAP"}
+_STOP = object()
+
+
+def classify(datagram: bytes) -> Optional[Tuple[str, bytes]]:
+    """(msg_type, UPER frame) of a raw or hex datagram, None if it is not SPaT/BSM/MAP.
+
+    The gateway and listener.js send hex text ("0013..."); signal controllers
+    and RSUs send the frame bytes ("\\x00\\x13...").
+    """
+    frame = datagram if datagram[:1] == b"\x00" else bytes.fromhex(datagram.strip().decode())
+    msg_type = FRAME_TYPES.get(frame[:2])
+    if msg_type is None:
+        return None
+    return msg_type, frame
+
+
+class InProcessPipeline:
+    """A chain of named stages; each returns the input of the next (None ends the item)."""
+    def __init__(self, stages: List[Tuple[str, Callable]], queue_size: int = 1000):
+        """
+        Args:
+            stages: (name, function) pairs in order.
+            queue_size: Items waiting in front of every stage; 0 runs the
+                stages inline on the thread that calls `submit`.
+        """
+        if not stages:
+            raise ValueError("A pipeline needs at least one stage.")
+        self.names = [name for name, _ in stages]
+        self.functions = [function for _, function in stages]
+        self.queues = [queue.Queue(queue_size) for _ in stages] if queue_size > 0 else None
+        self.threads: List[threading.Thread] = []
+        # Per stage; each counter is only written by the thread running that stage.
+        self.processed = [0] * len(stages)
+        self.errors = [0] * len(stages)
+
+    def stage_index(self, name: str) -> int:
+        return self.names.index(name)
+
+    def start(self):
+        if self.queues is None:
+            return
+        for index, name in enumerate(self.names):
+            thread = threading.Thread(target=self.run_stage, args=(index,), name=f"pipeline-{name}", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def submit(self, item, stage: int = 0):
+        """Hand `item` to `stage` (blocks while that stage's queue is full)."""
+        if self.queues is None:
+            for index in range(stage, len(self.functions)):
+                item = self.call(index, item)
+                if item is None:
+                    return
+        else:
+            self.queues[stage].put(item)
+
+    def call(self, index: int, item):
+        self.processed[index] += 1
+        try:
+            return self.functions[index](item)
+        except Exception as e:
+            self.errors[index] += 1
+            print(f"Pipeline stage {self.names[index]} failed: {e}")
+            return None
+
+    def run_stage(self, index: int):
+        inbox = self.queues[index]
+        outbox = self.queues[index + 1] if index + 1 < len(self.queues) else None
+        while True:
+            item = inbox.get()
+            if item is _STOP:
+                if outbox is not None:
+                    outbox.put(_STOP)
+                return
+            item = self.call(index, item)
+            if item is not None and outbox is not None:
+                outbox.put(item)
+
+    def stop(self, timeout: float = 5.0):
+        """Let queued items drain through all stages, then stop the threads."""
+        if self.queues is None:
+            return
+        self.queues[0].put(_STOP)
+        for thread in self.threads:
+            thread.join(timeout)
+
+    def depths(self) -> List[int]:
+        return [q.qsize() for q in self.queues] if self.queues is not None else [0] * len(self.names)
+
+    def stats(self) -> dict:
+        return {name: {"processed": self.processed[index], "errors": self.errors[index],
+                       "queued": depth}
+                for index, (name, depth) in enumerate(zip(self.names, self.depths()))}
+
+
+class UdpForwarder:
+    """Final stage of one process: send `encode(item)` as one datagram to the next."""
+    def __init__(self, address: Tuple[str, int], encode: Callable[..., bytes] = JsonCodec.dumps):
+        self.address = address
+        self.encode = encode
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    def __call__(self, item):
+        self.socket.sendto(self.encode(item), self.address)
+        return None
+
+
+class UdpReceiver:
+    """Feeds datagrams from a bound socket into a pipeline stage, from its own thread."""
+    def __init__(self, address: Tuple[str, int], pipeline: InProcessPipeline, stage: int,
+                 decode: Callable[[bytes], object] = JsonCodec.loads):
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.bind(address)
+        self.pipeline = pipeline
+        self.stage = stage
+        self.decode = decode
+        self.received = 0
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def run(self):
+        while True:
+            try:
+                data, _ = self.socket.recvfrom(65535)
+            except OSError:
+                return  # socket closed
+            self.received += 1
+            try:
+                item = self.decode(data)
+            except ValueError as e:
+                print(f"Dropping undecodable datagram: {e}")
+                continue
+            self.pipeline.submit(item, self.stage)
+
+    def close(self):
+        self.socket.close()
@@ -0,0 +1,333 @@
+"""
+**********************************************************************************
+IntersectionAnalytics.py
+Created by: Debashis Das
+Argonne National Laboratory
+Transportation and Power Systems Division
+
+**********************************************************************************
+
+Description:
+------------
+Streaming per-intersection analytics over the publisher's own output.
+
+IntersectionAnalytics is a sink (see TelemetrySink.py): it keeps the latest
+`vehicle_status/{id}` and `intersection_status/{id}` records in memory and,
+every `interval_s`, publishes `intersection_analytics/{id}` with:
+
+    redLightRisk     vehicles approaching a lane whose signal groups are all
+                     red, closer to the stop bar than their stopping distance
+                     (reaction time + comfortable deceleration)
+    queues           stopped vehicles and queue length (m) per ingress approach
+    arrivalOnGreen   share of vehicles arriving (entering the last 100 m before
+                     the stop bar) on green, per signal group, over 15 minutes
+
+The lane model comes from the intersection geojson files (config/maps): the
+ingress lanes are the ones with signalized `connections`, their polylines
+start at the stop bar, and the `box` polygons give their approach.
+
+Vehicles are matched to lanes in one NumPy batch per intersection: the
+distance from every vehicle to every ingress lane segment, masked by heading,
+so the per-tick cost is O(vehicles x lane segments), i.e. linear in the
+number of vehicles.
+
+The tick runs on its own timer thread (`start`/`close`), so `write` on the
+message path only stores the record. An intersection's result is only
+published when it differs from the previous one (ignoring the timestamp).
+**********************************************************************************
+"""
+
+import glob
+import json
+import math
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+import numpy as np
+
+METERS_PER_DEGREE = 111320.0
+# Kinematics for the stopping distance (ITE yellow-interval defaults).
+REACTION_TIME_S = 1.0
+DECELERATION_MPS2 = 3.4
+# Matching and classification thresholds.
+LANE_MATCH_M = 4.0
+HEADING_MATCH_COS = math.cos(math.radians(45.0))
+STOPPED_SPEED_MPS = 2.0
+MOVING_SPEED_MPS = 1.0
+ARRIVAL_ZONE_M = 100.0
+ARRIVAL_WINDOW_S = 900.0
+VEHICLE_TIMEOUT_S = 10.0
+
+RED_STATES = {"stopAndRemain"}
+GREEN_STATES = {"permissiveMovementAllowed", "protectedMovementAllowed"}
+
+
+def point_in_polygon(x: float, y: float, polygon: List[List[float]]) -> bool:
+    inside = False
+    for (x1, y1), (x2, y2) in zip(polygon, polygon[1:] + polygon[:1]):
+        if (y1 > y) != (y2 > y) and x < (x2 - x1) * (y - y1) / (y2 - y1) + x1:
+            inside = not inside
+    return inside
+
+
+class IntersectionModel:
+    """Ingress lanes of one intersection as flat segment arrays (local metres)."""
+    def __init__(self, intersection_id: str, revision: int, ref_lat: float, ref_lon: float, lanes: List[dict]):
+        """
+        Args:
+            lanes: [{"laneId", "approachId", "signalGroups", "points": [(lat, lon), ...]}],
+                points ordered from the stop bar outwards.
+        """
+        self.intersection_id = intersection_id
+        self.revision = revision
+        self.ref_lat = ref_lat
+        self.ref_lon = ref_lon
+        self.x_scale = METERS_PER_DEGREE * math.cos(math.radians(ref_lat))
+        self.lanes = lanes
+        self.lane_ids = [lane["laneId"] for lane in lanes]
+        self.lane_approaches = [lane["approachId"] for lane in lanes]
+        self.lane_groups = [lane["signalGroups"] for lane in lanes]
+
+        starts, vectors, offsets, lane_index = [], [], [], []
+        for index, lane in enumerate(lanes):
+            points = self.to_local(np.array([p[0] for p in lane["points"]]), np.array([p[1] for p in lane["points"]]))
+            along = 0.0
+            for start, end in zip(points[:-1], points[1:]):
+                starts.append(start)
+                vectors.append(end - start)
+                offsets.append(along)
+                lane_index.append(index)
+                along += float(np.hypot(*(end - start)))
+
+        self.segment_start = np.array(starts).reshape(-1, 2)
+        self.segment_vector = np.array(vectors).reshape(-1, 2)
+        self.segment_length_sq = np.maximum((self.segment_vector ** 2).sum(axis=1), 1e-9)
+        self.segment_offset = np.array(offsets)
+        self.segment_lane = np.array(lane_index, dtype=np.int64)
+        # Travel direction on an ingress lane is towards the stop bar.
+        self.segment_direction = -self.segment_vector / np.sqrt(self.segment_length_sq)[:, None]
+        self.radius_m = float(np.hypot(self.segment_start[:, 0], self.segment_start[:, 1]).max()
+                              + np.sqrt(self.segment_length_sq).max() + LANE_MATCH_M) if starts else 0.0
+
+    def to_local(self, lat: np.ndarray, lon: np.ndarray) -> np.ndarray:
+        return np.column_stack(((lon - self.ref_lon) * self.x_scale, (lat - self.ref_lat) * METERS_PER_DEGREE))
+
+    def match(self, lat: np.ndarray, lon: np.ndarray, heading: np.ndarray, speed: np.ndarray):
+        """Match vehicles to ingress lanes.
+
+        Returns:
+            (lane index per vehicle, -1 = not on an ingress lane; distance to
+            the stop bar along the lane in metres)
+        """
+        points = self.to_local(lat, lon)                                 # (n, 2)
+        relative = points[:, None, :] - self.segment_start[None, :, :]   # (n, m, 2)
+        t = np.clip((relative * self.segment_vector[None]).sum(axis=2) / self.segment_length_sq[None], 0.0, 1.0)
+        closest = self.segment_start[None] + t[:, :, None] * self.segment_vector[None]
+        lateral = np.hypot(points[:, None, 0] - closest[:, :, 0], points[:, None, 1] - closest[:, :, 1])
+
+        # Moving vehicles must head towards the stop bar; stopped ones can't be checked.
+        heading_rad = np.radians(heading)
+        direction = np.column_stack((np.sin(heading_rad), np.cos(heading_rad)))
+        alignment = direction @ self.segment_direction.T                 # (n, m)
+        valid = (lateral <= LANE_MATCH_M) & ((alignment >= HEADING_MATCH_COS) | (speed[:, None] < MOVING_SPEED_MPS))
+        lateral = np.where(valid, lateral, np.inf)
+
+        best = lateral.argmin(axis=1)
+        rows = np.arange(len(points))
+        matched = np.isfinite(lateral[rows, best])
+        lane = np.where(matched, self.segment_lane[best], -1)
+        distance = self.segment_offset[best] + t[rows, best] * np.sqrt(self.segment_length_sq[best])
+        return lane, distance
+
+
+def load_intersection_model(path: str) -> Optional[IntersectionModel]:
+    """Build the model from one intersection geojson (None if it has no ingress lanes)."""
+    with open(path, "r", encoding="utf-8") as geojson_file:
+        document = json.load(geojson_file)
+
+    reference = json.loads(document["vectors"])["features"][0]["properties"]
+    boxes = json.loads(document["box"])["features"] if document.get("box") else []
+    lanes = []
+    for feature in json.loads(document["lanes"])["features"]:
+        properties = feature["properties"]
+        groups = sorted({int(c["signal_id"]) for c in properties.get("connections", []) if str(c.get("signal_id", "")).strip()})
+        if not groups:
+            continue  # egress or unsignalized lane
+        start_x, start_y = feature["geometry"]["coordinates"][0]
+        approach = next((box["properties"]["approachID"] for box in boxes
+                         if point_in_polygon(start_x, start_y, box["geometry"]["coordinates"][0])),
+                        properties["laneNumber"])
+        lanes.append({
+            "laneId": properties["laneNumber"],
+            "approachId": approach,
+            "signalGroups": groups,
+            "points": [(p["latlon"]["lat"], p["latlon"]["lon"]) for p in properties["elevation"]],
+        })
+    if not lanes:
+        return None
+    return IntersectionModel(str(reference["intersectionID"]), int(reference.get("revisionNum") or 0),
+                             reference["LonLat"]["lat"], reference["LonLat"]["lon"], lanes)
+
+
+def load_intersection_models(map_directory: str) -> Dict[str, IntersectionModel]:
+    """Load every geojson below `map_directory`, keeping the newest revision per intersection."""
+    models: Dict[str, IntersectionModel] = {}
+    for path in sorted(glob.glob(os.path.join(map_directory, "**", "*.geojson"), recursive=True)):
+        model = load_intersection_model(path)
+        if model is None:
+            continue
+        current = models.get(model.intersection_id)
+        if current is None or model.revision >= current.revision:
+            models[model.intersection_id] = model
+    return models
+
+
+class IntersectionAnalytics:
+    """Sink that mirrors vehicle/intersection records and publishes analytics per tick."""
+    def __init__(self, models: Dict[str, IntersectionModel], output=None, interval_s: float = 1.0):
+        """
+        Args:
+            models: Lane models by intersection ID (see `load_intersection_models`).
+            output: Sink receiving `intersection_analytics/{id}` records.
+            interval_s: Tick period of the timer thread.
+        """
+        self.models = models
+        self.output = output
+        self.interval_s = interval_s
+        # Guards the mirrored records, which the message path writes and the tick reads.
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.thread = None
+        self.vehicles: Dict[str, dict] = {}
+        self.phase_states: Dict[str, Dict[int, str]] = {}
+        # Per intersection: vehicles currently inside the arrival zone.
+        self.in_arrival_zone: Dict[str, set] = {}
+        # Per (intersection, signal group): [(time, on green)] within the window.
+        self.arrivals: Dict[tuple, List[tuple]] = {}
+        # Last published result per intersection, without its timestamp.
+        self.last_results: Dict[str, dict] = {}
+        self.skipped = 0
+
+    def start(self):
+        """Start the timer thread that runs `tick` every `interval_s`."""
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def close(self):
+        """Stop the timer thread (called through TelemetrySink.close at shutdown)."""
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+
+    def run(self):
+        while not self.stopped.wait(self.interval_s):
+            try:
+                self.tick(time.time())
+            except Exception as e:
+                print(f"Intersection analytics tick failed: {e!r}")
+
+    def write(self, path: str, data: dict):
+        """Record one publisher record; the timer thread picks it up on its next tick."""
+        kind, _, key = path.partition("/")
+        if kind == "vehicle_status":
+            with self.lock:
+                self.vehicles[key] = data
+        elif kind == "intersection_status":
+            phase_states = {p["phase"]: p["state"] for p in data.get("phaseStates", [])}
+            with self.lock:
+                self.phase_states[key] = phase_states
+
+    def tick(self, now: float):
+        """Compute the analytics of every intersection with known signal state; publish the changed ones."""
+        with self.lock:
+            expired = [key for key, record in self.vehicles.items()
+                       if now - record.get("timestamp", 0) / 1000.0 > VEHICLE_TIMEOUT_S]
+            for key in expired:
+                del self.vehicles[key]
+            vehicle_ids = list(self.vehicles)
+            records = [self.vehicles[key] for key in vehicle_ids]
+            phase_states = dict(self.phase_states)
+
+        fleet = np.array([(r["lat"], r["lon"], r.get("speed") or 0.0, r.get("heading") or 0.0) for r in records],
+                         dtype=float).reshape(-1, 4)
+
+        for intersection_id, model in self.models.items():
+            states = phase_states.get(intersection_id)
+            if states is None:
+                continue
+            result = self.analyze(model, states, vehicle_ids, fleet, now)
+            comparable = {field: value for field, value in result.items() if field != "timestamp"}
+            if comparable == self.last_results.get(intersection_id):
+                self.skipped += 1
+                continue
+            self.last_results[intersection_id] = comparable
+            if self.output is not None:
+                self.output.write(f"intersection_analytics/{intersection_id}", result)
+
+    def analyze(self, model: IntersectionModel, states: Dict[int, str], vehicle_ids: List[str],
+                fleet: np.ndarray, now: float) -> dict:
+        # Only vehicles near the intersection go through lane matching.
+        local = model.to_local(fleet[:, 0], fleet[:, 1])
+        nearby = np.flatnonzero(np.hypot(local[:, 0], local[:, 1]) <= model.radius_m)
+        lat, lon, speed, heading = (fleet[nearby, column] for column in range(4))
+        lane, distance = model.match(lat, lon, heading, speed)
+        on_lane = lane >= 0
+
+        lane_red = np.array([all(states.get(g) in RED_STATES for g in groups) for groups in model.lane_groups])
+        safe_lane = np.where(on_lane, lane, 0)
+
+        # Red-light risk: cannot stop before the stop bar.
+        stopping = speed * REACTION_TIME_S + speed ** 2 / (2.0 * DECELERATION_MPS2)
+        at_risk = on_lane & lane_red[safe_lane] & (speed >= MOVING_SPEED_MPS) & (stopping > distance)
+        red_light_risk = [{
+            "vehicleId": vehicle_ids[nearby[i]],
+            "laneId": model.lane_ids[lane[i]],
+            "distanceM": round(float(distance[i]), 1),
+            "speedMps": round(float(speed[i]), 1),
+            "stoppingDistanceM": round(float(stopping[i]), 1),
+        } for i in np.flatnonzero(at_risk)]
+
+        # Queues: stopped vehicles per approach, length = farthest stopped vehicle.
+        queues = []
+        approach_of_vehicle = np.array(model.lane_approaches, dtype=object)[safe_lane]
+        stopped = on_lane & (speed < STOPPED_SPEED_MPS)
+        for approach in sorted(set(model.lane_approaches)):
+            members = stopped & (approach_of_vehicle == approach)
+            queues.append({
+                "approachId": approach,
+                "vehicles": int(members.sum()),
+                "lengthM": round(float(distance[members].max()), 1) if members.any() else 0.0,
+            })
+
+        # Arrivals: vehicles newly inside the zone before the stop bar.
+        in_zone = on_lane & (distance <= ARRIVAL_ZONE_M)
+        previous = self.in_arrival_zone.get(model.intersection_id, set())
+        current = set()
+        for i in np.flatnonzero(in_zone):
+            vehicle_id = vehicle_ids[nearby[i]]
+            current.add(vehicle_id)
+            if vehicle_id not in previous:
+                for group in model.lane_groups[lane[i]]:
+                    self.arrivals.setdefault((model.intersection_id, group), []).append((now, states.get(group) in GREEN_STATES))
+        self.in_arrival_zone[model.intersection_id] = current
+
+        arrival_on_green = []
+        for group in sorted({g for groups in model.lane_groups for g in groups}):
+            history = self.arrivals.get((model.intersection_id, group), [])
+            history[:] = [entry for entry in history if now - entry[0] <= ARRIVAL_WINDOW_S]
+            on_green = sum(1 for _, green in history if green)
+            arrival_on_green.append({
+                "signalGroup": group,
+                "arrivals": len(history),
+                "onGreen": on_green,
+                "ratio": round(on_green / len(history), 3) if history else None,
+            })
+
+        return {
+            "timestamp": int(now * 1000),
+            "vehicles": int(on_lane.sum()),
+            "redLightRisk": red_light_risk,
+            "queues": queues,
+            "arrivalOnGreen": arrival_on_green,
+        }
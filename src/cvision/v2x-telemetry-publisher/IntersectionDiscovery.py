@@ -0,0 +1,126 @@
+"""
+**********************************************************************************
+IntersectionDiscovery.py
+Created by: Debashis Das
+Argonne National Laboratory
+Transportation and Power Systems Division
+
+**********************************************************************************
+
+Description:
+------------
+Intersections that send SPaT but are not in intersections-config.json are
+registered on their first message instead of being rejected. Their phases
+are the `phaseNo`s seen so far (the union over all their messages).
+
+The store is bounded two ways, so a stream of unknown IDs cannot grow memory:
+
+    max_size    least recently seen intersection is evicted beyond this
+    ttl_s       intersections silent this long are expired
+
+Entries are kept in an OrderedDict in last-seen order, so both checks only
+look at its head. Every new (or returning, after eviction) intersection is
+written to the sink as a discovery event under
+`intersection_discovery/{id}`.
+**********************************************************************************
+"""
+
+import time
+from collections import OrderedDict
+from typing import Callable, List, Optional, Tuple
+
+
+class DiscoveredIntersection:
+    """Inferred phases and timestamps of one discovered intersection."""
+    __slots__ = ("phases", "first_seen_ms", "last_seen", "messages")
+
+    def __init__(self, phases: List[int], now_ms: int, now: float):
+        self.phases = phases
+        self.first_seen_ms = now_ms
+        self.last_seen = now
+        self.messages = 0
+
+
+class IntersectionDiscovery:
+    """Size- and age-bounded LRU store of intersections learned from SPaT."""
+    def __init__(self, sink=None, max_size: int = 1000, ttl_s: float = 3600.0,
+                 on_evict: Optional[Callable[[str], None]] = None):
+        """
+        Args:
+            sink: Where discovery events are written (None = print only).
+            max_size: Discovered intersections kept at most.
+            ttl_s: Seconds without a SPaT after which an intersection is dropped.
+            on_evict: Called with the ID of every evicted/expired intersection
+                (SpatManager drops its record and predictor state).
+        """
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1.")
+        self.sink = sink
+        self.max_size = max_size
+        self.ttl_s = ttl_s
+        self.on_evict = on_evict
+        self.entries: "OrderedDict[str, DiscoveredIntersection]" = OrderedDict()
+        self.discovered = 0
+        self.evicted = 0
+        self.expired = 0
+
+    def observe(self, intersection_id: str, phase_numbers, now: Optional[float] = None) -> Tuple[List[int], bool]:
+        """Record one SPaT of `intersection_id`.
+
+        Returns:
+            (phases, is_new): the inferred phases, and True on first sight.
+        """
+        if now is None:
+            now = time.monotonic()
+        self.expire(now)
+
+        entry = self.entries.get(intersection_id)
+        if entry is None:
+            entry = DiscoveredIntersection(sorted(set(phase_numbers)), int(time.time() * 1000), now)
+            self.entries[intersection_id] = entry
+            self.discovered += 1
+            self.emit(intersection_id, entry)
+            while len(self.entries) > self.max_size:
+                self.drop(self.entries.popitem(last=False)[0])
+                self.evicted += 1
+            is_new = True
+        else:
+            self.entries.move_to_end(intersection_id)
+            entry.last_seen = now
+            if not set(phase_numbers).issubset(entry.phases):
+                entry.phases = sorted(set(entry.phases).union(phase_numbers))
+            is_new = False
+        entry.messages += 1
+        return entry.phases, is_new
+
+    def expire(self, now: float):
+        """Drop intersections that were silent for more than `ttl_s`."""
+        cutoff = now - self.ttl_s
+        while self.entries:
+            intersection_id, entry = next(iter(self.entries.items()))
+            if entry.last_seen >= cutoff:
+                return
+            del self.entries[intersection_id]
+            self.drop(intersection_id)
+            self.expired += 1
+
+    def drop(self, intersection_id: str):
+        print(f"Forgetting discovered intersection {intersection_id}")
+        if self.on_evict is not None:
+            self.on_evict(intersection_id)
+
+    def emit(self, intersection_id: str, entry: DiscoveredIntersection):
+        print(f"Discovered intersection {intersection_id} with phases {entry.phases}")
+        if self.sink is not None:
+            self.sink.write(f"intersection_discovery/{intersection_id}", {
+                "intersectionId": intersection_id,
+                "phases": entry.phases,
+                "firstSeen": entry.first_seen_ms,
+            })
+
+    def get(self, intersection_id: str) -> Optional[DiscoveredIntersection]:
+        return self.entries.get(intersection_id)
+
+    def stats(self) -> dict:
+        return {"known": len(self.entries), "discovered": self.discovered,
+                "evicted": self.evicted, "expired": self.expired}
@@ -0,0 +1,121 @@
+"""
+**********************************************************************************
+LatencyTrace.py
+Created by: Debashis Das
+Argonne National Laboratory
+Transportation and Power Systems Division
+
+**********************************************************************************
+
+Description:
+------------
+Hop timestamps for end-to-end latency tracing. The same file is used by the
+gateway (infrastructure-to-cloud-interface) and the telemetry publisher.
+
+Messages are correlated across hops by a natural trace key that every stage
+can compute from what it already has, so nothing has to be threaded through
+the C++ decoder:
+
+    SPaT: SPaT:<intersectionId>:<minuteOfYear>:<msOfMinute>
+    BSM:  BSM:<temporaryId>:<secMark>
+    MAP:  MAP:<intersectionId>:<revision>
+
+Each hop sends one small UDP datagram to latency-analyzer.py:
+
+    {"key": ..., "hop": "gateway_receive", "wall": <epoch s>, "mono": <monotonic s>, "source": ...}
+
+Hops, in pipeline order:
+    controller        SPaT timestamp set by the controller (wall only)
+    gateway_receive   map-spat-sender.py received the datagram
+    cloud_write       map-spat-sender.py finished the RTDB write
+    listener_receive  listener.js got the RTDB event
+    listener_forward  listener.js sent the payload to the decoder
+    decoder           decoder stamp (`Timestamp_posix`, wall only)
+    publisher_receive telemetry publisher received the decoded JSON
+    rtdb_write        telemetry publisher finished its sink write
+**********************************************************************************
+"""
+
+import calendar
+import socket
+import time
+from typing import Optional, Tuple
+import JsonCodec
+
+HOPS = [
+    "controller",
+    "gateway_receive",
+    "cloud_write",
+    "listener_receive",
+    "listener_forward",
+    "decoder",
+    "publisher_receive",
+    "rtdb_write",
+]
+
+
+def trace_key(msg_type: Optional[str], fields: Optional[dict]) -> Optional[str]:
+    """Build the trace key from identifying fields (PayloadInspector shape)."""
+    if msg_type is None or fields is None:
+        return None
+    if msg_type == "SPaT":
+        if fields.get("minuteOfYear") is None or fields.get("timeStamp") is None:
+            return None
+        return f"SPaT:{fields['intersectionId']}:{fields['minuteOfYear']}:{fields['timeStamp']}"
+    if msg_type == "BSM":
+        return f"BSM:{fields['temporaryId']}:{fields['secMark']}"
+    if msg_type == "MAP":
+        return f"MAP:{fields['intersectionId']}:{fields['revision']}"
+    return None
+
+
+def fields_from_message(message: dict) -> Tuple[Optional[str], Optional[dict]]:
+    """Extract (msg_type, fields) from a decoded JSON message (decoder output)."""
+    msg_type = message.get("MsgType")
+    try:
+        if msg_type == "SPaT":
+            spat = message["Spat"]
+            return msg_type, {
+                "intersectionId": spat["intersectionState"]["intersectionID"],
+                "minuteOfYear": spat.get("minuteOfYear"),
+                "timeStamp": spat.get("msOfMinute"),
+            }
+        if msg_type == "BSM":
+            vehicle = message["BasicVehicle"]
+            return msg_type, {
+                "temporaryId": vehicle["temporaryID"],
+                "secMark": int(round(vehicle["secMark_Second"] * 1000)),
+            }
+    except (KeyError, TypeError):
+        pass
+    return msg_type, None
+
+
+def controller_time(minute_of_year: int, ms_of_minute: int, now: Optional[float] = None) -> float:
+    """Convert a J2735 MinuteOfTheYear + DSecond (UTC) to epoch seconds."""
+    if now is None:
+        now = time.time()
+    year = time.gmtime(now).tm_year
+    value = calendar.timegm((year, 1, 1, 0, 0, 0)) + minute_of_year * 60 + ms_of_minute / 1000.0
+    if value > now + 86400:  # message from the end of last year
+        value = calendar.timegm((year - 1, 1, 1, 0, 0, 0)) + minute_of_year * 60 + ms_of_minute / 1000.0
+    return value
+
+
+class TraceEmitter:
+    """Sends hop records to the latency analyzer (fire-and-forget UDP)."""
+    def __init__(self, collector_address: Tuple[str, int], source: str):
+        self.collector_address = collector_address
+        self.source = source
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    def emit(self, key: str, hop: str, wall: Optional[float] = None, mono: Optional[float] = None):
+        """Record that message `key` passed `hop` (now, unless `wall` is given)."""
+        if wall is None:
+            wall = time.time()
+            mono = time.monotonic()
+        record = {"key": key, "hop": hop, "wall": wall, "mono": mono, "source": self.source}
+        try:
+            self.socket.sendto(JsonCodec.dumps(record), self.collector_address)
+        except OSError:
+            pass  # tracing must never break the pipeline
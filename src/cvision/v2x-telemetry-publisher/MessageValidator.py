@@ -0,0 +1,290 @@
+"""
+**********************************************************************************
+MessageValidator.py
+Created by: Debashis Das
+Argonne National Laboratory
+Transportation and Power Systems Division
+
+**********************************************************************************
+
+Description:
+------------
+Schema validation of decoded SPaT/BSM/MAP messages before they reach the
+managers, so a malformed message is rejected with a structured error instead
+of raising KeyError/TypeError halfway through record building.
+
+The schemas below follow the decoder output (message-decoder/sample-spat.json,
+sample-bsm.json, MsgDecoder.cpp) plus the fields the vehicle server adds to
+BSMs. At startup each schema is turned into the source of one plain Python
+function (nested `if` checks, no loops over the schema) and compiled once;
+per message only that function runs.
+
+Errors are ValidationError(code, path, msg_type), e.g.
+`missing_field Spat.phaseState[3].phaseNo`. Codes:
+
+    not_an_object         the message (or a nested object) is not a dict
+    unknown_message_type  MsgType missing or not SPaT/BSM/MAP
+    missing_field         a required field is absent
+    wrong_type            a field has the wrong JSON type
+    out_of_range          a number is outside its valid range (or NaN)
+**********************************************************************************
+"""
+
+import time
+from collections import Counter
+from typing import Callable, Dict, List, Optional
+
+NOT_AN_OBJECT = "not_an_object"
+UNKNOWN_MESSAGE_TYPE = "unknown_message_type"
+MISSING_FIELD = "missing_field"
+WRONG_TYPE = "wrong_type"
+OUT_OF_RANGE = "out_of_range"
+
+
+class Field:
+    """Schema of one scalar field."""
+    def __init__(self, kind: type, low: Optional[float] = None, high: Optional[float] = None,
+                 required: bool = True):
+        """
+        Args:
+            kind: int, float (int or float accepted) or str.
+            low, high: Inclusive numeric range (None = unbounded).
+            required: Whether the field must be present.
+        """
+        self.kind = kind
+        self.low = low
+        self.high = high
+        self.required = required
+
+
+SPAT_SCHEMA = {
+    "Timestamp_posix": Field(float, 0.0, None, required=False),
+    "Spat": {
+        "intersectionState": {
+            "intersectionID": Field(int, 0, 65535),
+        },
+        "msgCnt": Field(int, 0, 255, required=False),
+        "minuteOfYear": Field(int, 0, 527040, required=False),
+        "msOfMinute": Field(int, 0, 60999, required=False),
+        "phaseState": [{
+            "phaseNo": Field(int, 1, 255),
+            "currState": Field(str, required=False),
+            # -1 when unknown; negative when the phase started in the previous hour.
+            "startTime": Field(float, -3600.0, 36001.0, required=False),
+            "minEndTime": Field(float, 0.0, 36001.0, required=False),
+            "maxEndTime": Field(float, 0.0, 36001.0, required=False),
+            "elapsedTime": Field(float, None, None, required=False),
+        }],
+    },
+}
+
+BSM_SCHEMA = {
+    "Timestamp_posix": Field(float, 0.0, None, required=False),
+    "BasicVehicle": {
+        "temporaryID": Field(int, 0, 4294967295),
+        "secMark_Second": Field(float, 0.0, 65.535),
+        "position": {
+            "latitude_DecimalDegree": Field(float, -90.0, 90.0),
+            "longitude_DecimalDegree": Field(float, -180.0, 180.0),
+            "elevation_Meter": Field(float, -409.6, 6143.9),
+        },
+        "speed_MeterPerSecond": Field(float, 0.0, 163.82),
+        "heading_Degree": Field(float, 0.0, 360.0),
+        # Added by the vehicle server (0 when the vehicle is not on a mapped lane).
+        "intersectionID": Field(int, 0, 65535),
+        "laneID": Field(int, 0, 255),
+        "approachID": Field(int, 0, 255),
+        "signalGroup": Field(int, 0, 255),
+        "signalStatus": Field(str),
+    },
+}
+
+MAP_SCHEMA = {
+    "IntersectionID": Field(int, 0, 65535),
+    "IntersectionName": Field(str, required=False),
+    "MapPayload": Field(str),
+}
+
+SCHEMAS = {"SPaT": SPAT_SCHEMA, "BSM": BSM_SCHEMA, "MAP": MAP_SCHEMA}
+
+
+class ValidationError:
+    """Why a message was rejected."""
+    __slots__ = ("code", "path", "msg_type")
+
+    def __init__(self, code: str, path: str, msg_type: Optional[str] = None):
+        self.code = code
+        self.path = path
+        self.msg_type = msg_type
+
+    def to_dict(self) -> dict:
+        return {"code": self.code, "path": self.path, "msgType": self.msg_type}
+
+    def __str__(self):
+        return f"{self.msg_type or '?'} {self.code} {self.path}".rstrip()
+
+
+class _CodeWriter:
+    """Emits the body of one validator function."""
+    def __init__(self):
+        self.lines: List[str] = []
+        self.names = 0
+
+    def variable(self) -> str:
+        self.names += 1
+        return f"v{self.names}"
+
+    def emit(self, depth: int, line: str):
+        self.lines.append("    " * depth + line)
+
+    def fail(self, depth: int, code: str, path: str):
+        self.emit(depth, f"return ({code!r}, {path})")
+
+
+def _path_literal(parts: List[str]) -> str:
+    """Source of an expression building the dotted path (list indices are runtime variables)."""
+    pieces, text = [], ""
+    for part in parts:
+        if part.startswith("["):
+            pieces.append(repr(text))
+            pieces.append(f"'[' + str({part[1:-1]}) + ']'")
+            text = ""
+        else:
+            text += ("." if text or pieces else "") + part
+    pieces.append(repr(text))
+    return " + ".join(piece for piece in pieces if piece != "''") or "''"
+
+
+def _emit_field(writer: _CodeWriter, depth: int, value: str, field: Field, path: List[str]):
+    path_source = _path_literal(path)
+    if field.kind is str:
+        writer.emit(depth, f"if type({value}) is not str:")
+        writer.fail(depth + 1, WRONG_TYPE, path_source)
+        return
+    if field.kind is int:
+        writer.emit(depth, f"if type({value}) is not int:")
+    else:
+        # bool is a subclass of int, so compare exact types.
+        writer.emit(depth, f"if type({value}) is not float and type({value}) is not int:")
+    writer.fail(depth + 1, WRONG_TYPE, path_source)
+    if field.low is not None and field.high is not None:
+        condition = f"not ({field.low!r} <= {value} <= {field.high!r})"
+    elif field.low is not None:
+        condition = f"not ({value} >= {field.low!r})"
+    elif field.high is not None:
+        condition = f"not ({value} <= {field.high!r})"
+    elif field.kind is float:
+        condition = f"{value} != {value}"  # NaN
+    else:
+        return
+    writer.emit(depth, f"if {condition}:")
+    writer.fail(depth + 1, OUT_OF_RANGE, path_source)
+
+
+def _emit_object(writer: _CodeWriter, depth: int, value: str, schema: dict, path: List[str]):
+    for key, child in schema.items():
+        child_path = path + [key]
+        # Nested objects and lists are always required.
+        required = child.required if isinstance(child, Field) else True
+
+        child_value = writer.variable()
+        writer.emit(depth, f"{child_value} = {value}.get({key!r}, MISSING)")
+        if required:
+            writer.emit(depth, f"if {child_value} is MISSING:")
+            writer.fail(depth + 1, MISSING_FIELD, _path_literal(child_path))
+            inner = depth
+        else:
+            writer.emit(depth, f"if {child_value} is not MISSING:")
+            inner = depth + 1
+        _emit_value(writer, inner, child_value, child, child_path)
+
+
+def _emit_value(writer: _CodeWriter, depth: int, value: str, schema, path: List[str]):
+    if isinstance(schema, Field):
+        _emit_field(writer, depth, value, schema, path)
+    elif isinstance(schema, dict):
+        writer.emit(depth, f"if type({value}) is not dict:")
+        writer.fail(depth + 1, NOT_AN_OBJECT, _path_literal(path))
+        _emit_object(writer, depth, value, schema, path)
+    elif isinstance(schema, list):
+        writer.emit(depth, f"if type({value}) is not list:")
+        writer.fail(depth + 1, WRONG_TYPE, _path_literal(path))
+        index, item = writer.variable(), writer.variable()
+        writer.emit(depth, f"for {index}, {item} in enumerate({value}):")
+        _emit_value(writer, depth + 1, item, schema[0], path + [f"[{index}]"])
+    else:
+        raise TypeError(f"Unsupported schema node at {'.'.join(path)}: {schema!r}")
+
+
+def compile_validator(schema: dict, name: str = "message") -> Callable[[dict], Optional[tuple]]:
+    """Generate and compile the validator function of `schema`.
+
+    The returned function takes a decoded message and returns None when it is
+    valid, otherwise `(code, path)` of the first problem.
+    """
+    writer = _CodeWriter()
+    writer.emit(1, "if type(message) is not dict:")
+    writer.fail(2, NOT_AN_OBJECT, "''")
+    _emit_object(writer, 1, "message", schema, [])
+    writer.emit(1, "return None")
+    source = f"def validate_{name}(message):\n" + "\n".join(writer.lines) + "\n"
+    namespace = {"MISSING": object()}
+    exec(compile(source, f"<validator {name}>", "exec"), namespace)
+    validator = namespace[f"validate_{name}"]
+    validator.source = source
+    return validator
+
+
+class MessageValidator:
+    """Validates decoded messages by MsgType and keeps rejection counters."""
+    def __init__(self, schemas: Optional[Dict[str, dict]] = None, report_interval_s: float = 30.0):
+        """
+        Args:
+            schemas: MsgType -> schema (default: SCHEMAS).
+            report_interval_s: Seconds between two printed rejection summaries.
+        """
+        self.validators = {msg_type: compile_validator(schema, msg_type)
+                           for msg_type, schema in (schemas or SCHEMAS).items()}
+        self.report_interval_s = report_interval_s
+        self.next_report = time.monotonic() + report_interval_s
+        self.accepted = 0
+        self.rejected: Counter = Counter()
+
+    def check(self, message) -> Optional[ValidationError]:
+        """Return None if `message` is valid, otherwise the ValidationError."""
+        if type(message) is not dict:
+            error = ValidationError(NOT_AN_OBJECT, "")
+        else:
+            msg_type = message.get("MsgType")
+            validator = self.validators.get(msg_type)
+            if validator is None:
+                error = ValidationError(UNKNOWN_MESSAGE_TYPE, "MsgType", None)
+            else:
+                problem = validator(message)
+                if problem is None:
+                    self.accepted += 1
+                    return None
+                error = ValidationError(problem[0], problem[1], msg_type)
+        key = (error.msg_type, error.code, error.path)
+        if key not in self.rejected:
+            print(f"Rejected message: {error}")
+        self.rejected[key] += 1
+        self.maybe_report()
+        return error
+
+    def stats(self) -> dict:
+        return {"accepted": self.accepted, "rejected": sum(self.rejected.values()),
+                "byError": {f"{msg_type or '?'} {code} {path}": count
+                            for (msg_type, code, path), count in self.rejected.items()}}
+
+    def maybe_report(self, now: Optional[float] = None):
+        """Print the rejection counters if the report interval has elapsed."""
+        if now is None:
+            now = time.monotonic()
+        if now < self.next_report:
+            return
+        self.next_report = now + self.report_interval_s
+        total = sum(self.rejected.values())
+        print(f"Validation report: {self.accepted} accepted, {total} rejected")
+        for (msg_type, code, path), count in self.rejected.most_common(10):
+            print(f"  {count:>6} {msg_type or '?'} {code} {path}")
@@ -0,0 +1,165 @@
+"""
+**********************************************************************************
+PhasePredictor.py
+Created by: Debashis Das
+Argonne National Laboratory
+Transportation and Power Systems Division
+
+**********************************************************************************
+
+Description:
+------------
+Incremental per-intersection, per-phase signal model built from the SPaT
+stream. For every phase it keeps running statistics (Welford mean/variance,
+min, max) of the observed durations of each signal state, and predicts the
+time until the current state changes, with confidence bounds.
+
+The decoder reports `minEndTime`/`maxEndTime` as seconds remaining and
+`elapsedTime` as seconds since the state started (-1 when unknown). When the
+controller gives a min/max window, predictions are clamped into it.
+
+Every update touches a fixed amount of state per phase (no history is kept),
+so the cost per SPaT message is O(number of phases), i.e. O(1) per message.
+**********************************************************************************
+"""
+
+import math
+from typing import Dict, Optional
+
+# Width of the confidence band in standard deviations (~90% for a normal fit).
+CONFIDENCE_Z = 1.645
+# Completed durations required before the statistics are trusted.
+MIN_SAMPLES = 2
+
+
+class RunningStats:
+    """Welford running mean/variance with min/max."""
+    __slots__ = ("count", "mean", "m2", "minimum", "maximum")
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.minimum = math.inf
+        self.maximum = -math.inf
+
+    def add(self, value: float):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        self.minimum = min(self.minimum, value)
+        self.maximum = max(self.maximum, value)
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else 0.0
+
+
+class PhaseTrack:
+    """State of one phase of one intersection."""
+    __slots__ = ("state", "start_time", "start_known", "durations")
+
+    def __init__(self):
+        self.state: Optional[str] = None
+        self.start_time = 0.0
+        # False while the first observed state started before we were listening.
+        self.start_known = False
+        self.durations: Dict[str, RunningStats] = {}
+
+
+class PhasePredictor:
+    """Running phase-duration model and time-to-change predictor."""
+    def __init__(self, confidence_z: float = CONFIDENCE_Z):
+        self.confidence_z = confidence_z
+        # intersection id -> phase -> track, so an intersection is dropped in one step.
+        self.tracks: Dict[str, Dict[int, PhaseTrack]] = {}
+
+    def update(self, intersection_id: str, phase: int, state: str, message_time: float,
+               min_end: Optional[float] = None, max_end: Optional[float] = None,
+               elapsed: Optional[float] = None) -> dict:
+        """Feed one phase observation and return its prediction.
+
+        Args:
+            intersection_id: Intersection the phase belongs to.
+            phase: Phase number.
+            state: Signal state of the phase (e.g. `protected_green`).
+            message_time: Time of the SPaT message in seconds (any monotonic base).
+            min_end: Seconds until the earliest possible change, if known.
+            max_end: Seconds until the latest possible change, if known.
+            elapsed: Seconds since the current state started, if known (< 0 = unknown).
+
+        Returns:
+            {"timeToChange", "lower", "upper", "samples"} in seconds; the
+            values are None when nothing is known yet.
+        """
+        phase_tracks = self.tracks.get(intersection_id)
+        if phase_tracks is None:
+            phase_tracks = self.tracks[intersection_id] = {}
+        track = phase_tracks.get(phase)
+        if track is None:
+            track = phase_tracks[phase] = PhaseTrack()
+
+        elapsed_known = elapsed is not None and elapsed >= 0
+        if state != track.state:
+            # The new state started `elapsed` seconds ago (or now, if unknown).
+            change_time = message_time - elapsed if elapsed_known else message_time
+            if track.state is not None and track.start_known:
+                stats = track.durations.get(track.state)
+                if stats is None:
+                    stats = track.durations[track.state] = RunningStats()
+                stats.add(change_time - track.start_time)
+
+            # A transition observed live has a known start even without `elapsed`.
+            track.start_known = elapsed_known or track.state is not None
+            track.state = state
+            track.start_time = change_time
+
+        elif elapsed_known:
+            # Controller-reported start is more accurate than our first sighting.
+            track.start_time = message_time - elapsed
+            track.start_known = True
+
+        return self.predict(track, message_time, min_end, max_end)
+
+    def forget(self, intersection_id: str):
+        """Drop the tracks of an intersection that is no longer followed."""
+        self.tracks.pop(intersection_id, None)
+
+    def predict(self, track: PhaseTrack, message_time: float,
+                min_end: Optional[float], max_end: Optional[float]) -> dict:
+        """Predict the remaining time of the track's current state."""
+        stats = track.durations.get(track.state)
+        samples = stats.count if stats is not None else 0
+
+        if samples >= MIN_SAMPLES and track.start_known:
+            elapsed = message_time - track.start_time
+            estimate = stats.mean - elapsed
+            spread = self.confidence_z * stats.std
+            # Observed extremes are hard limits for the band.
+            lower = max(estimate - spread, stats.minimum - elapsed)
+            upper = min(estimate + spread, stats.maximum - elapsed)
+        else:
+            estimate, lower, upper = min_end, min_end, max_end
+
+        if min_end is not None and max_end is not None and max_end >= min_end:
+            estimate, lower, upper = (self.clamp(v, min_end, max_end) for v in (estimate, lower, upper))
+
+        return {
+            "timeToChange": self.non_negative(estimate),
+            "lower": self.non_negative(lower),
+            "upper": self.non_negative(upper),
+            "samples": samples,
+        }
+
+    @staticmethod
+    def clamp(value: Optional[float], low: float, high: float) -> Optional[float]:
+        if value is None:
+            return None
+        return min(max(value, low), high)
+
+    @staticmethod
+    def non_negative(value: Optional[float]) -> Optional[float]:
+        if value is None:
+            return None
+        return round(max(0.0, float(value)), 1)
@@ -0,0 +1,290 @@
+"""
+**********************************************************************************
+PublishScheduler.py
+Created by: Debashis Das
+Argonne National Laboratory
+Transportation and Power Systems Division
+
+**********************************************************************************
+
+Description:
+------------
+Priority-aware write scheduler in front of the cloud sink, enforcing a global
+write budget (writes/s, matched to the RTDB quota).
+
+Every record is put in a priority class:
+
+    phase_change  intersection_status whose phase states changed
+    active        other SPaT updates, vehicles near an intersection
+    background    idle or unassociated vehicles, analytics
+    bulk          everything else (MAP, link quality, ...)
+
+Pending records are coalesced per path (only the newest one is kept), and
+each class has a minimum interval between two writes of the same path. Once a
+second the scheduler compares the offered load with the budget and hands the
+budget out top-down: when it is short, the intervals of the lowest classes
+are stretched first (up to `MAX_INTERVAL_S`), so SPaT phase changes are only
+delayed when they alone exceed the budget. A token bucket (burst of one
+second) enforces the budget itself.
+
+Writes are issued from one background thread. Records that are due at the
+same time are sent together: one multi-path `write_many` per parent (e.g.
+`vehicle_status`), still one budget token per record. `write_many` on the
+scheduler itself queues every record of a batch (BsmBatch) under one lock.
+Paths not sent for `forget_after_s` are forgotten, so rotating BSM temporary
+IDs do not accumulate, and `stop()` writes what is still pending.
+**********************************************************************************
+"""
+
+import heapq
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+PHASE_CHANGE, ACTIVE, BACKGROUND, BULK = range(4)
+CLASS_NAMES = ["phase_change", "active", "background", "bulk"]
+# Minimum seconds between two writes of one path, per class, when under budget.
+BASE_INTERVALS_S = [0.0, 0.1, 1.0, 5.0]
+MAX_INTERVAL_S = 30.0
+IDLE_SPEED_MPS = 0.5
+ADAPT_PERIOD_S = 1.0
+# Paths not sent for this long are forgotten (well above MAX_INTERVAL_S).
+FORGET_AFTER_S = 300.0
+# Records sent together at most (one multi-path write per parent).
+MAX_SEND_BATCH = 500
+
+
+class PublishScheduler:
+    """Sink wrapper that schedules writes by priority under a write budget."""
+    def __init__(self, sink, budget_per_s: float, base_intervals_s: Optional[List[float]] = None,
+                 forget_after_s: float = FORGET_AFTER_S):
+        """
+        Args:
+            sink: Downstream sink (usually Firebase, possibly delta-encoded).
+            budget_per_s: Maximum records per second written to `sink`.
+            base_intervals_s: Per-class minimum write interval (see BASE_INTERVALS_S).
+            forget_after_s: Forget paths that were not sent for this long.
+        """
+        if budget_per_s <= 0:
+            raise ValueError("budget_per_s must be positive.")
+        self.sink = sink
+        self.budget_per_s = budget_per_s
+        self.forget_after_s = forget_after_s
+        self.base_intervals = list(base_intervals_s or BASE_INTERVALS_S)
+        self.intervals = list(self.base_intervals)
+
+        self.tokens = budget_per_s
+        self.last_refill = time.monotonic()
+
+        # path -> (class, data); per class heap of (due time, seq, path)
+        self.pending: Dict[str, Tuple[int, dict]] = {}
+        self.queues: List[list] = [[] for _ in CLASS_NAMES]
+        self.sequence = itertools.count()
+        # path -> time of its last write, least recently sent first
+        self.last_sent: "OrderedDict[str, float]" = OrderedDict()
+        self.last_phases: Dict[str, list] = {}
+
+        # Offered load in the current adaptation window.
+        self.offered = [0] * len(CLASS_NAMES)
+        self.offered_paths = [set() for _ in CLASS_NAMES]
+        self.next_adapt = time.monotonic() + ADAPT_PERIOD_S
+        self.sent = [0] * len(CLASS_NAMES)
+        self.coalesced = [0] * len(CLASS_NAMES)
+        self.stretched = False
+
+        self.condition = threading.Condition()
+        self.running = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def classify(self, path: str, data: dict) -> int:
+        kind, _, key = path.partition("/")
+        if kind == "intersection_status":
+            phases = [(p.get("phase"), p.get("state")) for p in data.get("phaseStates", [])]
+            changed = self.last_phases.get(key) != phases
+            self.last_phases[key] = phases
+            return PHASE_CHANGE if changed else ACTIVE
+        if kind == "vehicle_status":
+            if (data.get("speed") or 0.0) < IDLE_SPEED_MPS:
+                return BACKGROUND
+            return ACTIVE if data.get("intersection_id") else BACKGROUND
+        if kind == "intersection_analytics":
+            return BACKGROUND
+        return BULK
+
+    def write(self, path: str, data: dict):
+        """Queue a record; an older pending record of the same path is replaced."""
+        with self.condition:
+            self.queue(path, data)
+            self.condition.notify()
+
+    def write_many(self, parent: str, records: dict):
+        """Queue `parent/{key}` for every record (one lock acquisition for the batch)."""
+        with self.condition:
+            for key, record in records.items():
+                self.queue(f"{parent}/{key}", record)
+            self.condition.notify()
+
+    def queue(self, path: str, data: dict):
+        """Add one record to the pending set (caller holds the condition)."""
+        priority = self.classify(path, data)
+        self.offered[priority] += 1
+        self.offered_paths[priority].add(path)
+
+        previous = self.pending.get(path)
+        if previous is not None:
+            self.coalesced[previous[0]] += 1
+            # Keep the queue position; an upgrade (e.g. to phase_change) gets its own entry.
+            priority = min(priority, previous[0])
+            self.pending[path] = (priority, data)
+            if priority == previous[0]:
+                return
+        else:
+            self.pending[path] = (priority, data)
+        heapq.heappush(self.queues[priority], (self.due_time(path, priority), next(self.sequence), path))
+
+    def due_time(self, path: str, priority: int) -> float:
+        return self.last_sent.get(path, -MAX_INTERVAL_S) + self.intervals[priority]
+
+    def refill(self, now: float):
+        self.tokens = min(self.budget_per_s, self.tokens + (now - self.last_refill) * self.budget_per_s)
+        self.last_refill = now
+
+    def adapt(self):
+        """Share the budget top-down and stretch the intervals of classes that do not fit."""
+        remaining = self.budget_per_s
+        for priority in range(len(CLASS_NAMES)):
+            base = self.base_intervals[priority]
+            paths = len(self.offered_paths[priority])
+            demand = min(self.offered[priority], paths / base) if base > 0 else self.offered[priority]
+            if demand <= remaining or priority == PHASE_CHANGE:
+                self.intervals[priority] = base
+                remaining = max(0.0, remaining - demand)
+            else:
+                self.intervals[priority] = min(MAX_INTERVAL_S, max(base, paths / max(remaining, 1e-3)))
+                remaining = 0.0
+            self.offered[priority] = 0
+            self.offered_paths[priority].clear()
+
+        stretched = self.intervals != self.base_intervals
+        if stretched != self.stretched:
+            summary = ", ".join(f"{name} {interval:.2f}s" for name, interval in zip(CLASS_NAMES, self.intervals))
+            print(f"Publish scheduler {'over' if stretched else 'back within'} budget: {summary}")
+        self.stretched = stretched
+
+    def next_item(self, now: float) -> Tuple[Optional[str], float]:
+        """Pop the highest-priority due path; otherwise return the next due time."""
+        next_due = now + ADAPT_PERIOD_S
+        for priority, queue in enumerate(self.queues):
+            while queue and queue[0][0] <= now:
+                _, _, path = heapq.heappop(queue)
+                entry = self.pending.get(path)
+                if entry is None or entry[0] != priority:
+                    continue  # already sent, or moved to a higher class
+                due = self.due_time(path, priority)
+                if due > now:
+                    # The interval was stretched since the entry was queued.
+                    heapq.heappush(queue, (due, next(self.sequence), path))
+                    continue
+                return path, now
+            if queue:
+                next_due = min(next_due, queue[0][0])
+        return None, next_due
+
+    def expire(self, now: float):
+        """Forget the paths that were not sent for `forget_after_s` (caller holds the condition)."""
+        cutoff = now - self.forget_after_s
+        while self.last_sent:
+            path, sent = next(iter(self.last_sent.items()))
+            if sent >= cutoff:
+                return
+            self.forget_state(path)
+
+    def forget_state(self, path: str):
+        self.last_sent.pop(path, None)
+        kind, _, key = path.partition("/")
+        if kind == "intersection_status":
+            self.last_phases.pop(key, None)
+
+    def run(self):
+        while True:
+            with self.condition:
+                if not self.running:
+                    break
+                now = time.monotonic()
+                self.refill(now)
+                if now >= self.next_adapt:
+                    self.adapt()
+                    self.expire(now)
+                    self.next_adapt = now + ADAPT_PERIOD_S
+
+                if self.tokens < 1.0:
+                    self.condition.wait((1.0 - self.tokens) / self.budget_per_s)
+                    continue
+                path, next_due = self.next_item(now)
+                if path is None:
+                    self.condition.wait(max(0.0, min(next_due, self.next_adapt) - now))
+                    continue
+                # Everything else that is due and within budget goes out with it.
+                batch = []
+                while path is not None:
+                    priority, data = self.pending.pop(path)
+                    self.last_sent[path] = now
+                    self.last_sent.move_to_end(path)
+                    self.tokens -= 1.0
+                    self.sent[priority] += 1
+                    batch.append((path, data))
+                    if self.tokens < 1.0 or len(batch) >= MAX_SEND_BATCH:
+                        break
+                    path, _ = self.next_item(now)
+            self.send(batch)
+
+        # Stopped: write what is still pending, highest class first, ignoring the budget.
+        with self.condition:
+            batch = sorted(self.pending.items(), key=lambda item: item[1][0])
+            self.pending.clear()
+        self.send([(path, data) for path, (_, data) in batch])
+
+    def send(self, batch: List[Tuple[str, dict]]):
+        """Write records, one multi-path write per parent where the sink supports it."""
+        by_parent: Dict[str, Dict[str, dict]] = {}
+        for path, data in batch:
+            parent, _, key = path.rpartition("/")
+            by_parent.setdefault(parent, {})[key] = data
+        for parent, records in by_parent.items():
+            try:
+                if len(records) > 1 and hasattr(self.sink, "write_many"):
+                    self.sink.write_many(parent, records)
+                else:
+                    for key, data in records.items():
+                        self.sink.write(f"{parent}/{key}", data)
+            except Exception as e:
+                print(f"Publish scheduler failed to write {parent}/ ({len(records)} records): {e}")
+
+    def forget(self, path: str):
+        """Drop the state of a path that will not be written again, including a pending record."""
+        with self.condition:
+            self.pending.pop(path, None)  # its queue entry is skipped when it comes up
+            self.forget_state(path)
+        if hasattr(self.sink, "forget"):
+            self.sink.forget(path)
+
+    def stats(self) -> dict:
+        with self.condition:
+            return {name: {"sent": self.sent[i], "coalesced": self.coalesced[i], "intervalS": self.intervals[i]}
+                    for i, name in enumerate(CLASS_NAMES)}
+
+    def stop(self, timeout: float = 10.0):
+        """Write the pending records and stop the writer thread."""
+        with self.condition:
+            self.running = False
+            self.condition.notify()
+        self.thread.join(timeout=timeout)
+
+    def close(self):
+        """Sink shutdown (TelemetrySink.close): flush, stop, then close the wrapped sink."""
+        self.stop()
+        if hasattr(self.sink, "close"):
+            self.sink.close()
@@ -0,0 +1,204 @@
+"""
+**********************************************************************************
+SequenceTracker.py
+Created by: Debashis Das
+Argonne National Laboratory
+Transportation and Power Systems Division
+
+**********************************************************************************
+
+Description:
+------------
+Per-source duplicate, reordering and loss detection for the telemetry
+publisher, so repeated and stale frames are dropped before they cost a cloud
+write.
+
+Every message is ordered by the time its source stamped on it:
+
+    SPaT -> minuteOfYear * 60000 + msOfMinute       (per intersection)
+    BSM  -> secMark (ms within the minute, wraps)   (per vehicle)
+
+The SPaT `msgCnt` the decoder reports is the intersection revision, which only
+changes with the content, so it is not usable for loss counting. Loss is
+instead estimated from timestamp gaps against the shortest interval seen from
+that source (100 ms for 10 Hz streams): a 300 ms gap counts two missing
+frames.
+
+Per-source counters are printed and written to the sink under
+`link_quality/intersections/{id}` and `link_quality/vehicles/{id}` every
+`report_interval_s`. The report runs on the message path, so each kind goes
+out as one multi-path write (`TelemetrySink.write_many`), not one write per
+source.
+**********************************************************************************
+"""
+
+import time
+from typing import Dict, Optional, Tuple
+from TelemetrySink import write_many
+
+# Intervals shorter than this are treated as jitter, not as the source rate.
+MIN_INTERVAL_MS = 50
+MINUTE_MS = 60000
+SEC_MARK_UNAVAILABLE_MS = 65535
+
+
+class SourceSequence:
+    """Ordering state and counters of one source."""
+    __slots__ = ("last_time_ms", "last_receive", "interval_ms",
+                 "received", "accepted", "duplicates", "stale", "missed", "resets")
+
+    def __init__(self):
+        self.last_time_ms: Optional[int] = None
+        self.last_receive = 0.0
+        self.interval_ms: Optional[int] = None
+        self.received = 0
+        self.accepted = 0
+        self.duplicates = 0
+        self.stale = 0
+        self.missed = 0
+        self.resets = 0
+
+    def to_dict(self) -> dict:
+        expected = self.accepted + self.missed
+        return {
+            "received": self.received,
+            "accepted": self.accepted,
+            "duplicates": self.duplicates,
+            "stale": self.stale,
+            "missed": self.missed,
+            "resets": self.resets,
+            "lossRate": round(self.missed / expected, 4) if expected else 0.0,
+            "intervalMs": self.interval_ms,
+        }
+
+
+class SequenceTracker:
+    """Drops duplicate/stale frames and counts lost ones, per source."""
+    def __init__(self, sink=None, report_interval_s: float = 30.0, reset_after_s: float = 30.0,
+                 forget_after_s: float = 300.0):
+        """
+        Args:
+            sink: Where `link_quality/...` records are written (None = print only).
+            report_interval_s: Seconds between two reports.
+            reset_after_s: A source that was silent this long, or whose
+                timestamp jumps by more than this, starts over (restart,
+                clock change) instead of counting as stale or lossy.
+            forget_after_s: Sources silent this long are dropped after a report.
+        """
+        self.sink = sink
+        self.report_interval_s = report_interval_s
+        self.reset_after_ms = reset_after_s * 1000.0
+        self.forget_after_s = forget_after_s
+        self.sources: Dict[Tuple[str, str], SourceSequence] = {}
+        self.next_report = time.monotonic() + report_interval_s
+
+    def accept(self, kind: str, source_id: str, time_ms: int, wrap_ms: Optional[int] = None,
+               now: Optional[float] = None) -> bool:
+        """Check one frame of `source_id`.
+
+        Args:
+            kind: "intersections" or "vehicles".
+            time_ms: Source timestamp of the frame in milliseconds.
+            wrap_ms: Period after which `time_ms` wraps (None = no wrap).
+
+        Returns:
+            True if the frame is new and should be published.
+        """
+        if now is None:
+            now = time.monotonic()
+        key = (kind, source_id)
+        source = self.sources.get(key)
+        if source is None:
+            source = self.sources[key] = SourceSequence()
+        source.received += 1
+
+        if source.last_time_ms is None or (now - source.last_receive) * 1000.0 > self.reset_after_ms:
+            return self.restart(source, time_ms, now)
+
+        delta = time_ms - source.last_time_ms
+        if wrap_ms is not None:
+            delta %= wrap_ms
+            if delta > wrap_ms // 2:
+                delta -= wrap_ms
+
+        if delta == 0:
+            source.duplicates += 1
+            return False
+        if abs(delta) > self.reset_after_ms:
+            return self.restart(source, time_ms, now)
+        if delta < 0:
+            # Usually a frame already counted as missed that arrived late:
+            # it was reordered, not lost.
+            source.stale += 1
+            source.missed = max(0, source.missed - 1)
+            return False
+
+        if delta >= MIN_INTERVAL_MS and (source.interval_ms is None or delta < source.interval_ms):
+            source.interval_ms = delta
+        if source.interval_ms is not None:
+            source.missed += max(0, round(delta / source.interval_ms) - 1)
+
+        source.last_time_ms = time_ms
+        source.last_receive = now
+        source.accepted += 1
+        return True
+
+    @staticmethod
+    def restart(source: SourceSequence, time_ms: int, now: float) -> bool:
+        if source.last_time_ms is not None:
+            source.resets += 1
+        source.last_time_ms = time_ms
+        source.last_receive = now
+        source.accepted += 1
+        return True
+
+    def accept_spat(self, message: dict) -> bool:
+        """Check a decoded SPaT message (messages without a timestamp always pass)."""
+        spat = message["Spat"]
+        if spat.get("minuteOfYear") is None or spat.get("msOfMinute") is None:
+            return True
+        time_ms = spat["minuteOfYear"] * MINUTE_MS + spat["msOfMinute"]
+        return self.accept("intersections", str(spat["intersectionState"]["intersectionID"]), time_ms)
+
+    def accept_bsm(self, message: dict) -> bool:
+        """Check a decoded BSM (messages without a secMark always pass)."""
+        vehicle = message["BasicVehicle"]
+        sec_mark_ms = int(round(vehicle.get("secMark_Second", SEC_MARK_UNAVAILABLE_MS / 1000.0) * 1000))
+        if sec_mark_ms >= SEC_MARK_UNAVAILABLE_MS:
+            return True
+        return self.accept("vehicles", str(vehicle["temporaryID"]), sec_mark_ms, MINUTE_MS)
+
+    def forget(self, kind: str, source_id: str):
+        """Drop a source that is no longer followed (its next frame starts over)."""
+        self.sources.pop((kind, str(source_id)), None)
+
+    def stats(self, kind: str, source_id: str) -> Optional[dict]:
+        source = self.sources.get((kind, str(source_id)))
+        return source.to_dict() if source is not None else None
+
+    def maybe_report(self, now: Optional[float] = None):
+        """Report all sources if the report interval has elapsed."""
+        if now is None:
+            now = time.monotonic()
+        if now < self.next_report:
+            return
+        self.next_report = now + self.report_interval_s
+        self.report(now)
+
+    def report(self, now: float):
+        lossy = []
+        records_by_kind: Dict[str, Dict[str, dict]] = {}
+        for (kind, source_id), source in list(self.sources.items()):
+            record = source.to_dict()
+            records_by_kind.setdefault(kind, {})[source_id] = record
+            if record["missed"] or record["duplicates"] or record["stale"]:
+                lossy.append(f"{kind}/{source_id}: loss {record['lossRate']:.1%}, "
+                             f"dup {record['duplicates']}, stale {record['stale']}")
+            if now - source.last_receive > self.forget_after_s:
+                del self.sources[(kind, source_id)]
+        if self.sink is not None:
+            for kind, records in records_by_kind.items():
+                write_many(self.sink, f"link_quality/{kind}", records)
+        print(f"Sequence report: {len(self.sources)} sources, {len(lossy)} with loss/duplicates/reordering")
+        for line in lossy:
+            print("  " + line)
@@ -0,0 +1,304 @@
+"""
+**********************************************************************************
+ShardedDispatcher.py
+Created by: Debashis Das
+Argonne National Laboratory
+Transportation and Power Systems Division
+
+**********************************************************************************
+
+Description:
+------------
+Spreads incoming V2X datagrams over N worker processes so JSON parsing and
+record building are no longer bound to a single interpreter (GIL).
+
+The receiving process only peeks the shard key out of the raw bytes
+(`intersectionID` for SPaT, `temporaryID` for BSM) and hands the datagram to
+the worker that owns that key. Every key always maps to the same worker and
+each worker consumes its queue in FIFO order, so per-intersection and
+per-vehicle ordering is preserved.
+**********************************************************************************
+"""
+
+import multiprocessing
+import re
+import zlib
+from queue import Empty
+from typing import List, Optional
+import JsonCodec
+
+# Timer resolution of LivenessMonitor and the idle wake-up interval when it is on.
+LIVENESS_POLL_S = 0.1
+
+# Modules of the message path -> stage in SamplingProfiler.py summaries.
+PROFILE_STAGES = {
+    "JsonCodec": "json", "MessageValidator": "validate", "SpatManager": "spat", "BsmManager": "bsm",
+    "PhasePredictor": "predict", "IntersectionDiscovery": "discovery", "SequenceTracker": "sequence",
+    "TrajectoryBuffer": "smooth", "BsmBatch": "bsm_batch", "LivenessMonitor": "liveness",
+    "IntersectionAnalytics": "analytics", "DeltaEncoder": "delta", "PublishScheduler": "schedule",
+    "FanoutServer": "fanout", "LatencyTrace": "trace", "ShardedDispatcher.ShardedDispatcher.dispatch": "shard",
+    "TelemetrySink": "sink", "db": "firebase",
+}
+
+# Raw-bytes patterns for the shard keys (no JSON parsing in the dispatcher).
+SPAT_KEY_PATTERN = re.compile(rb'"intersectionID"\s*:\s*(-?\d+)')
+BSM_KEY_PATTERN = re.compile(rb'"temporaryID"\s*:\s*"?(-?\w+)')
+
+
+def extract_shard_key(data: bytes) -> Optional[bytes]:
+    """Return the shard key of a raw datagram, or None if none is present.
+
+    BSMs from the vehicle server also carry an `intersectionID` (the one the
+    vehicle is approaching), so `temporaryID` is looked up first.
+    """
+    match = BSM_KEY_PATTERN.search(data)
+    if match is None:
+        match = SPAT_KEY_PATTERN.search(data)
+    if match is None:
+        return None
+    return match.group(1)
+
+
+def shard_index(key: Optional[bytes], worker_count: int) -> int:
+    """Map a shard key to a worker index (stable across processes and runs)."""
+    if key is None:
+        return 0
+    return zlib.crc32(key) % worker_count
+
+
+def dispatch_message(received_message, spat_manager, bsm_manager, tracer=None, validator=None):
+    """Route one decoded message to the SPaT or BSM manager.
+
+    With a `validator` (MessageValidator.py), malformed messages are dropped
+    before any other work. With a `tracer` (LatencyTrace.TraceEmitter), the
+    decoder, receive and write hops of the message are reported to the
+    latency analyzer.
+    """
+    if validator is not None and validator.check(received_message) is not None:
+        return
+
+    trace = None
+    if tracer is not None:
+        from LatencyTrace import fields_from_message, trace_key
+        trace = trace_key(*fields_from_message(received_message))
+        if trace is not None:
+            if "Timestamp_posix" in received_message:
+                tracer.emit(trace, "decoder", received_message["Timestamp_posix"])
+            tracer.emit(trace, "publisher_receive")
+
+    if received_message["MsgType"] == "SPaT":
+        spat_manager.manage_spat_data(received_message)
+
+    elif received_message["MsgType"] == "BSM":
+        bsm_manager.manage_bsm_data(received_message)
+
+    if trace is not None:
+        tracer.emit(trace, "rtdb_write")
+
+
+def build_managers(options: dict, local_sinks: List):
+    """Create the SPaT and BSM managers for this process.
+
+    Args:
+        options: Manager options shared by the single-process and worker
+            modes. Every key is optional:
+
+            use_cloud: Write to Firebase (default True).
+            delta: Snapshot/patch writes (DeltaEncoder.py).
+            predict: Attach phase countdown predictions (PhasePredictor.py).
+            smooth: TrajectoryBuffer for BSM positions.
+            bsm_interval: Per-vehicle upload interval in seconds (implies smooth).
+            sequence: Drop duplicate/stale frames and report loss (SequenceTracker.py).
+            analytics: Geojson map directory for IntersectionAnalytics.py.
+            budget: Firebase writes per second for this process (PublishScheduler.py).
+            bsm_batch: Seconds of BSMs published as one columnar batch (BsmBatch.py).
+            discovery_limit: Unconfigured intersections kept at most; 0 rejects
+                them (IntersectionDiscovery.py).
+            discovery_ttl: Seconds after which a silent unconfigured intersection
+                is forgotten.
+            liveness: Seconds of silence after which an intersection or vehicle
+                is reported stale; 0 = off (LivenessMonitor.py).
+
+            Read by the other builders of this module, not here:
+
+            trace_address: Latency analyzer address (`build_tracer`).
+            validate: Schema checks before dispatch, on by default (`build_validator`).
+            profile_seconds: SIGUSR1 profile length; 0 = no profiling (`build_profiler`).
+            profile_dir: Output directory of the profiles (`build_profiler`).
+        local_sinks: Extra sinks that receive every record.
+    """
+    # Imported here so the dispatcher process does not pay for Firebase setup.
+    from SpatManager import SpatManager
+    from BsmManager import BsmManager
+    from TelemetrySink import FirebaseSink, build_sink
+
+    analytics = None
+    if options.get("analytics"):
+        from IntersectionAnalytics import IntersectionAnalytics, load_intersection_models
+        analytics = IntersectionAnalytics(load_intersection_models(options["analytics"]))
+        local_sinks = list(local_sinks) + [analytics]
+
+    sink = build_sink(options.get("use_cloud", True), local_sinks, options.get("delta", False), options.get("budget", 0.0))
+    if analytics is not None:
+        # Results go to the same destinations as the records (analytics ignores them).
+        analytics.output = sink
+        analytics.start()
+    phase_predictor = None
+    if options.get("predict", False):
+        from PhasePredictor import PhasePredictor
+        phase_predictor = PhasePredictor()
+    trajectory = None
+    if options.get("smooth", False) or options.get("bsm_interval", 0.0) > 0:
+        from TrajectoryBuffer import TrajectoryBuffer
+        trajectory = TrajectoryBuffer()
+    sequence_tracker = None
+    if options.get("sequence", False):
+        from SequenceTracker import SequenceTracker
+        sequence_tracker = SequenceTracker(sink if sink is not None else FirebaseSink())
+    liveness = None
+    if options.get("liveness", 0.0) > 0:
+        from LivenessMonitor import LivenessMonitor
+        liveness = LivenessMonitor(options["liveness"], tick_s=LIVENESS_POLL_S)
+    bsm_manager = BsmManager(sink, trajectory=trajectory, upload_interval_s=options.get("bsm_interval", 0.0),
+                             sequence_tracker=sequence_tracker, batch_window_s=options.get("bsm_batch", 0.0),
+                             liveness=liveness)
+    spat_manager = SpatManager(sink, phase_predictor=phase_predictor, sequence_tracker=sequence_tracker,
+                               discovery_limit=options.get("discovery_limit", 1000),
+                               discovery_ttl_s=options.get("discovery_ttl", 3600.0), liveness=liveness)
+    if liveness is not None:
+        from LivenessMonitor import STALE, status_path, status_record
+
+        def publish_status(kind: str, source_id: str, status: str, last_seen_ms: int):
+            # The managers' sink: Firebase by default, also when `sink` is None here.
+            spat_manager.sink.write(status_path(kind, source_id), status_record(status, last_seen_ms))
+            if kind == "intersections" and status == STALE:
+                spat_manager.mark_stale(source_id)
+        liveness.on_change = publish_status
+    return spat_manager, bsm_manager
+
+
+def idle_timeout(options: dict) -> Optional[float]:
+    """How long a publisher loop may block before `service_idle` is due (None = forever)."""
+    timeouts = [options.get("bsm_batch", 0.0), LIVENESS_POLL_S if options.get("liveness", 0.0) > 0 else 0.0]
+    timeouts = [timeout for timeout in timeouts if timeout > 0]
+    return min(timeouts) if timeouts else None
+
+
+def service_idle(spat_manager, bsm_manager):
+    """Time-driven work when no message arrived: partial BSM batches, stale sources."""
+    bsm_manager.flush_batch()
+    if spat_manager.liveness is not None:
+        spat_manager.liveness.poll()
+
+
+def shutdown_managers(spat_manager, bsm_manager):
+    """Publish what is still buffered: the open BSM batch, then the scheduler's pending writes."""
+    from TelemetrySink import close
+    bsm_manager.flush_batch(force=True)
+    close(spat_manager.sink)
+
+
+def build_validator(options: dict):
+    """Return a MessageValidator unless validation is disabled in `options`."""
+    if not options.get("validate", True):
+        return None
+    from MessageValidator import MessageValidator
+    return MessageValidator()
+
+
+def build_profiler(options: dict, name: str, bsm_manager=None):
+    """Return a SamplingProfiler toggled by SIGUSR1, or None when profiling is off in `options`."""
+    if options.get("profile_seconds", 0.0) <= 0:
+        return None
+    from SamplingProfiler import install
+    profiler = install(name, options["profile_seconds"], options.get("profile_dir"), PROFILE_STAGES)
+    if profiler is not None and bsm_manager is not None:
+        profiler.add_gauge("bsm_batch", lambda: len(bsm_manager.batch))
+    return profiler
+
+
+def build_tracer(options: dict, source: str):
+    """Return a TraceEmitter when tracing is enabled in `options`, else None."""
+    if options.get("trace_address") is None:
+        return None
+    from LatencyTrace import TraceEmitter
+    return TraceEmitter(tuple(options["trace_address"]), source)
+
+
+def worker_main(worker_index: int, queue, options: dict, record_queue=None):
+    """Worker process loop: parse and publish every datagram of its shard.
+
+    Managers are created inside the worker so each process owns its own
+    Firebase app and in-memory intersection store. When `record_queue` is
+    given, built records are also sent back to the parent process (used to
+    feed the local fan-out server, which lives in the parent).
+    """
+    from TelemetrySink import QueueSink
+
+    local_sinks = [QueueSink(record_queue)] if record_queue is not None else []
+    spat_manager, bsm_manager = build_managers(options, local_sinks)
+    tracer = build_tracer(options, f"publisher-worker-{worker_index}")
+    validator = build_validator(options)
+    profiler = build_profiler(options, f"publisher-worker-{worker_index}", bsm_manager)
+    if profiler is not None:
+        profiler.add_gauge("input_queue", queue.qsize)
+    timeout = idle_timeout(options)
+    print(f"Worker {worker_index} ready")
+
+    while True:
+        try:
+            data = queue.get(timeout=timeout)
+        except Empty:
+            service_idle(spat_manager, bsm_manager)
+            continue
+        if data is None:
+            shutdown_managers(spat_manager, bsm_manager)
+            break
+        try:
+            dispatch_message(JsonCodec.loads(data), spat_manager, bsm_manager, tracer, validator)
+        except Exception as e:
+            print(f"Worker {worker_index} failed to process message: {e}")
+
+
+class ShardedDispatcher:
+    """Owns the worker processes and routes raw datagrams to them by key."""
+    def __init__(self, worker_count: int, options: dict, queue_size: int = 10000, record_queue=None):
+        """
+        Args:
+            worker_count: Number of worker processes to start.
+            options: Manager options, see `build_managers`.
+            queue_size: Maximum number of pending datagrams per worker. When a
+                worker falls behind, `dispatch` blocks instead of growing memory.
+            record_queue: Optional queue receiving `(path, data)` of every record.
+        """
+        if worker_count < 1:
+            raise ValueError("worker_count must be at least 1.")
+
+        self.worker_count = worker_count
+        self.queues: List[multiprocessing.Queue] = []
+        self.workers: List[multiprocessing.Process] = []
+
+        for worker_index in range(worker_count):
+            queue = multiprocessing.Queue(maxsize=queue_size)
+            worker = multiprocessing.Process(target=worker_main, args=(worker_index, queue, options, record_queue), daemon=True)
+            self.queues.append(queue)
+            self.workers.append(worker)
+
+    def start(self):
+        """Start all worker processes."""
+        for worker in self.workers:
+            worker.start()
+
+    def dispatch(self, data: bytes):
+        """Hand a raw datagram to the worker that owns its shard key."""
+        index = shard_index(extract_shard_key(data), self.worker_count)
+        self.queues[index].put(data)
+
+    def stop(self, timeout: float = 5.0):
+        """Drain the queues and stop all workers."""
+        for queue in self.queues:
+            queue.put(None)
+        for worker in self.workers:
+            worker.join(timeout)
+            if worker.is_alive():
+                worker.terminate()
@@ -12,6 +12,10 @@ Description:
 Parses SPaT-like JSON messages, normalizes phase states to a canonical schema,
 and prepares intersection dictionaries for publishing to Firebase RTDB. Also
 ensures Firebase is initialized exactly once for the current process.
+
+Intersections missing from intersections-config.json are registered on their
+first SPaT with the phases they report (IntersectionDiscovery.py) instead of
+being rejected.
 **********************************************************************************
 """
 
@@ -22,7 +26,9 @@ import platform
 import warnings 
 from typing import Dict, List, Tuple
 import firebase_admin
-from firebase_admin import credentials, db
+from firebase_admin import credentials
+from IntersectionDiscovery import IntersectionDiscovery
+from TelemetrySink import FirebaseSink, forget
 
 # Map J2735 (lower-cased, hyphenated) states to canonical output states.
 STATE_MAP: Dict[str, str] = {
@@ -39,18 +45,43 @@ STATE_MAP: Dict[str, str] = {
 
 class SpatManager:
     """Manages SPaT processing and intersection phase state publishing."""
-    def __init__(self):
+    def __init__(self, sink=None, phase_predictor=None, sequence_tracker=None,
+                 discovery_limit: int = 1000, discovery_ttl_s: float = 3600.0, liveness=None):
         """
         Initialize the SPaT manager, Firebase, and static intersection data.
 
         This constructor:
-          1) Ensures Firebase is initialized (once).
+          1) Ensures Firebase is initialized (once) when no sink is given.
           2) Loads configured phases and human-readable names for intersections.
           3) Initializes any required RTDB structure for intersection storage.
+
+        Args:
+            sink: Destination for intersection records (see TelemetrySink.py).
+                Defaults to Firebase RTDB.
+            phase_predictor: Optional PhasePredictor; when given, every phase
+                state carries a time-to-change `prediction`.
+            sequence_tracker: Optional SequenceTracker; duplicate and stale
+                SPaT frames are dropped before they are written.
+            discovery_limit: Unconfigured intersections kept at most (least
+                recently seen evicted first); 0 rejects them with KeyError.
+            discovery_ttl_s: Unconfigured intersections silent this long are
+                forgotten.
+            liveness: Optional LivenessMonitor; every accepted SPaT
+                marks its intersection as seen.
         """
-        self.get_firebase_credential()
+        if sink is None:
+            self.get_firebase_credential()
+            sink = FirebaseSink()
+        self.sink = sink
+        self.phase_predictor = phase_predictor
+        self.sequence_tracker = sequence_tracker
+        self.liveness = liveness
         self.phases_by_intersection_id, self.intersections_name = self.load_phases_and_names()
         self.init_intersections_store()
+        self.discovery = None
+        if discovery_limit > 0:
+            self.discovery = IntersectionDiscovery(sink, discovery_limit, discovery_ttl_s,
+                                                   on_evict=self.forget_intersection)
         
     def get_firebase_credential(self):
         """
@@ -154,28 +185,35 @@ class SpatManager:
             A tuple (intersection_id, intersection_data_dictionary)
         
         Raises:
-            KeyError: If the intersection ID is unknown to the local config.
+            KeyError: If the intersection ID is unknown to the local config and
+                discovery is disabled.
             TypeError: If fields are missing or not in the expected type/shape.
 
         Notes:
+            - Each phase carries its own minEndTime/maxEndTime (None when missing).
             - Unknown or missing phases (relative to config) are filled as 'unknown'.
             - Extra phases present in the message but not in the config are ignored
               (a warning is emitted).
+            - Unconfigured intersections use the phases observed so far.
         """
         intersection_id = str(jsonString["Spat"]["intersectionState"]["intersectionID"])
         # intersection_id = str(2351)
-        phases_config = self.phases_by_intersection_id.get(intersection_id)
-        if phases_config is None:
-            raise KeyError(f"Unknown intersection id: {intersection_id}")
 
-        # Build lookup: phaseNo -> raw state from message
+        # Build lookup: phaseNo -> (raw state, min end, max end, elapsed) from message
         incoming_by_phase = {}
         for phase_data in jsonString["Spat"]["phaseState"]:
             phases = int(phase_data["phaseNo"])
             raw_state = str(phase_data.get("currState", "unknown")).lower()
             min_end = phase_data.get("minEndTime")
             max_end = phase_data.get("maxEndTime")
-            incoming_by_phase[phases] = (raw_state, min_end, max_end)
+            elapsed = phase_data.get("elapsedTime")
+            incoming_by_phase[phases] = (raw_state, min_end, max_end, elapsed)
+
+        phases_config = self.phases_by_intersection_id.get(intersection_id)
+        if phases_config is None:
+            if self.discovery is None:
+                raise KeyError(f"Unknown intersection id: {intersection_id}")
+            phases_config, _ = self.discovery.observe(intersection_id, list(incoming_by_phase))
 
         # --- Warnings for extras/missing (non-fatal) ---
         intersection_configuration_set = set(phases_config)
@@ -195,12 +233,21 @@ class SpatManager:
                 RuntimeWarning,
             )
 
+        # SPaT time (seconds) for the predictor; falls back to local time
+        message_time = time.time()
+        if self.phase_predictor is not None and "minuteOfYear" in jsonString["Spat"]:
+            message_time = jsonString["Spat"]["minuteOfYear"] * 60.0 + jsonString["Spat"].get("msOfMinute", 0) / 1000.0
+
         # Build and publish only configured phases, in configured order
         phase_states = []
         for phases in phases_config:
-            raw_state = incoming_by_phase.get(phases, ("unknown", None, None))[0]  # Get the first element ('protected_green')
+            raw_state, min_end, max_end, elapsed = incoming_by_phase.get(phases, ("unknown", None, None, None))
             mapped_state = STATE_MAP.get(raw_state, "stopAndRemain")
-            phase_states.append({"phase": phases, "state": mapped_state, "minEndTime": min_end, "maxEndTime": max_end,})
+            phase_state = {"phase": phases, "state": mapped_state, "minEndTime": min_end, "maxEndTime": max_end}
+            if self.phase_predictor is not None:
+                phase_state["prediction"] = self.phase_predictor.update(
+                    intersection_id, phases, raw_state, message_time, min_end, max_end, elapsed)
+            phase_states.append(phase_state)
 
         intersection_data_dictionary = {
             "timestamp": int(time.time() * 1000),   # ms
@@ -221,21 +268,67 @@ class SpatManager:
             self._init_intersections_store()
         return self.intersections_store.get(str(intersection_id))
     
+    def forget_intersection(self, intersection_id: str):
+        """Drop the in-memory state of an evicted/expired discovered intersection.
+
+        This includes the per-path state of the sink (delta encoding, write
+        scheduling) and the sequence and liveness state of the intersection.
+        """
+        self.intersections_store.pop(intersection_id, None)
+        if self.phase_predictor is not None:
+            self.phase_predictor.forget(intersection_id)
+        if self.sequence_tracker is not None:
+            self.sequence_tracker.forget("intersections", intersection_id)
+        if self.liveness is not None:
+            self.liveness.forget("intersections", intersection_id)
+        for kind in ("intersection_status", "intersection_discovery", "link_quality/intersections"):
+            forget(self.sink, f"{kind}/{intersection_id}")
+
+    def mark_stale(self, intersection_id: str):
+        """Re-write the last record of a silent intersection with `stale: True`.
+
+        The next SPaT of the intersection overwrites it without the flag.
+        """
+        intersection_store = self.intersections_store.get(intersection_id)
+        if intersection_store is None or "phaseStates" not in intersection_store:
+            return
+        self.sink.write(f"intersection_status/{intersection_id}", {
+            "timestamp": intersection_store["timestamp"],
+            "phaseStates": intersection_store["phaseStates"],
+            "stale": True,
+        })
+
     def manage_spat_data(self, jsonString):
         """
         Map incoming SPaT JSON into payload and write to Firebase.
         Uses direct indexing (fast) and emits only configured phases.
         Also keeps an in-memory store in sync (no duplicated logic).
         """
-        # Build payload once via helper
-        intersection_id, intersection_data_dictionary = self.generate_intersection_data_dictionary(jsonString)
+        if self.liveness is not None:
+            self.liveness.poll()
 
-        if intersection_id in self.intersections_store:
-            self.intersections_store[intersection_id]["timestamp"] = intersection_data_dictionary["timestamp"]
-            self.intersections_store[intersection_id]["phaseStates"] = intersection_data_dictionary["phaseStates"]
+        if self.sequence_tracker is not None:
+            accepted = self.sequence_tracker.accept_spat(jsonString)
+            self.sequence_tracker.maybe_report()
+            if not accepted:
+                return
 
-        # Write to Firebase (your existing path)
-        db.reference(f"intersection_status/{intersection_id}").set(intersection_data_dictionary)
+        # Build payload once via helper
+        intersection_id, intersection_data_dictionary = self.generate_intersection_data_dictionary(jsonString)
+        # Only accepted SPaT counts as a sign of life (not duplicates or rejected IDs).
+        if self.liveness is not None:
+            self.liveness.seen("intersections", intersection_id)
+
+        intersection_store = self.intersections_store.get(intersection_id)
+        if intersection_store is None:
+            # Discovered: generate_intersection_data_dictionary just registered it.
+            intersection_store = self.intersections_store[intersection_id] = {
+                "intersectionId": intersection_id, "name": None, "discovered": True}
+        intersection_store["timestamp"] = intersection_data_dictionary["timestamp"]
+        intersection_store["phaseStates"] = intersection_data_dictionary["phaseStates"]
+
+        # Write to the sink (Firebase by default)
+        self.sink.write(f"intersection_status/{intersection_id}", intersection_data_dictionary)
 
         
 '''##############################################
@@ -0,0 +1,166 @@
+"""
+**********************************************************************************
+TelemetrySink.py
+Created by: Debashis Das
+Argonne National Laboratory
+Transportation and Power Systems Division
+
+**********************************************************************************
+
+Description:
+------------
+Destinations for the records built by SpatManager and BsmManager. A sink only
+needs a `write(path, data)` method, where `path` is the RTDB-style location of
+the record (e.g. `vehicle_status/601`). The managers default to FirebaseSink,
+so the existing behaviour is unchanged unless another sink is passed in.
+**********************************************************************************
+"""
+
+import os
+from typing import Iterable, List
+import firebase_admin
+from firebase_admin import credentials, db
+
+
+def initialize_firebase():
+    """Initialize the default Firebase app if it does not exist yet."""
+    service_account_path = os.path.join(os.path.expanduser("~"), "Documents", "cvision-firebase-key.json")
+    cred = credentials.Certificate(service_account_path)
+    try:
+        firebase_admin.get_app()
+    except ValueError:
+        firebase_admin.initialize_app(cred, {
+            'databaseURL': 'https://c-vision-7e1ec-default-rtdb.firebaseio.com/'
+        })
+
+
+def build_sink(use_cloud: bool, local_sinks: List, delta: bool = False, budget_per_s: float = 0.0):
+    """Combine Firebase (optional) and local sinks into the sink handed to the managers.
+
+    Args:
+        use_cloud: Write to Firebase.
+        local_sinks: Additional sinks (fan-out server, queues, ...).
+        delta: Send snapshot/patch updates to Firebase instead of full objects
+            (see DeltaEncoder.py).
+        budget_per_s: Schedule Firebase writes by priority within this many
+            writes per second (see PublishScheduler.py; 0 = write immediately).
+
+    Returns None when only plain Firebase is requested, so the managers keep
+    their default Firebase setup.
+    """
+    if use_cloud and not local_sinks and not delta and not budget_per_s:
+        return None
+
+    sinks = list(local_sinks)
+    if use_cloud:
+        initialize_firebase()
+        firebase_sink = FirebaseSink()
+        if delta:
+            # Imported here: DeltaEncoder has no Firebase dependency of its own.
+            from DeltaEncoder import DeltaSink
+            firebase_sink = DeltaSink(firebase_sink)
+        if budget_per_s > 0:
+            from PublishScheduler import PublishScheduler
+            firebase_sink = PublishScheduler(firebase_sink, budget_per_s)
+        sinks.insert(0, firebase_sink)
+    if len(sinks) == 1:
+        return sinks[0]
+    return MultiSink(sinks)
+
+
+def write_many(sink, parent: str, records: dict):
+    """Write `{key: record}` below `parent` in one batch when the sink supports it.
+
+    Sinks without a `write_many` get one `write` per record.
+    """
+    if hasattr(sink, "write_many"):
+        sink.write_many(parent, records)
+    else:
+        for key, record in records.items():
+            sink.write(f"{parent}/{key}", record)
+
+
+def forget(sink, path: str):
+    """Tell the sink that `path` will not be written again.
+
+    Sinks that keep per-path state (DeltaSink, PublishScheduler) drop it;
+    sinks without a `forget` keep nothing and are skipped.
+    """
+    if hasattr(sink, "forget"):
+        sink.forget(path)
+
+
+def close(sink):
+    """Flush and stop a sink that buffers writes (PublishScheduler) at shutdown; others are skipped."""
+    if hasattr(sink, "close"):
+        sink.close()
+
+
+class FirebaseSink:
+    """Writes every record to Firebase RTDB (Firebase must already be initialized)."""
+    def write(self, path: str, data: dict):
+        """Overwrite the RTDB node at `path` with `data`."""
+        db.reference(path).set(data)
+
+    def update(self, path: str, patch: dict):
+        """Apply a multi-path patch (`{"a/b": value}`) below `path`."""
+        db.reference(path).update(patch)
+
+    def write_many(self, parent: str, records: dict):
+        """Overwrite `parent/{key}` for every record in one multi-path update."""
+        if records:
+            db.reference(parent).update(records)
+
+
+class MultiSink:
+    """Writes every record to several sinks, in order."""
+    def __init__(self, sinks: Iterable):
+        self.sinks = list(sinks)
+
+    def write(self, path: str, data: dict):
+        """Forward the record to every configured sink."""
+        for sink in self.sinks:
+            sink.write(path, data)
+
+    def write_many(self, parent: str, records: dict):
+        """Forward a batch to every configured sink."""
+        for sink in self.sinks:
+            write_many(sink, parent, records)
+
+    def forget(self, path: str):
+        """Forward the end of a path to every configured sink."""
+        for sink in self.sinks:
+            forget(sink, path)
+
+    def close(self):
+        """Close every configured sink that buffers writes."""
+        for sink in self.sinks:
+            close(sink)
+
+
+class QueueSink:
+    """Pushes records onto a queue, e.g. from a worker process to the parent."""
+    def __init__(self, queue):
+        self.queue = queue
+
+    def write(self, path: str, data: dict):
+        """Enqueue `(path, data)` for a consumer on the other side of the queue."""
+        self.queue.put((path, data))
+
+
+class MemorySink:
+    """Keeps the latest record of every path in memory (benchmarks, local tooling)."""
+    def __init__(self):
+        self.records = {}
+        self.writes = 0
+
+    def write(self, path: str, data: dict):
+        """Store `data` as the record at `path`."""
+        self.records[path] = data
+        self.writes += 1
+
+    def write_many(self, parent: str, records: dict):
+        """Store `parent/{key}` for every record."""
+        for key, record in records.items():
+            self.records[f"{parent}/{key}"] = record
+        self.writes += len(records)
@@ -0,0 +1,220 @@
+"""
+**********************************************************************************
+TrajectoryBuffer.py
+Created by: Debashis Das
+Argonne National Laboratory
+Transportation and Power Systems Division
+
+**********************************************************************************
+
+Description:
+------------
+Fixed-size per-vehicle history of BSM samples with kinematic smoothing and
+dead-reckoning.
+
+All samples live in one preallocated numpy array of shape
+(max_vehicles, history, 5) holding (time, lat, lon, speed, heading), so the
+memory footprint is fixed at construction (10k vehicles x 20 samples is
+~8 MB) no matter how many vehicles come and go. A vehicle gets a slot on its
+first BSM; when all slots are taken, the least recently updated vehicle is
+evicted.
+
+Sample times come from `secMark_Second` (seconds within the UTC minute),
+unwrapped against the receive time, so samples are ordered by when the
+vehicle generated them; duplicates and out-of-order samples are rejected.
+
+Smoothing projects every sample of the window forward to the newest sample
+time with its own speed/heading and takes an exponentially weighted average
+(position and velocity). Dead-reckoning then moves the smoothed state forward
+to the requested time (capped at `max_extrapolation_s`). Both are vectorized
+over the window and, with `estimate_all`, over all vehicles at once.
+**********************************************************************************
+"""
+
+import collections
+import math
+import time
+from typing import List, Optional, Tuple
+import numpy as np
+
+TIME, LAT, LON, SPEED, HEADING = range(5)
+FIELD_COUNT = 5
+EARTH_RADIUS_M = 6371000.0
+# Below this speed (m/s) the heading of the velocity vector is meaningless.
+STANDSTILL_SPEED = 0.2
+# J2735 DSecond 65535 = unavailable.
+SEC_MARK_UNAVAILABLE = 65.535
+
+
+def sec_mark_time(sec_mark_s: float, now: float) -> float:
+    """Convert a secMark (seconds within the minute) to epoch seconds near `now`."""
+    if sec_mark_s >= SEC_MARK_UNAVAILABLE:
+        return now
+    value = math.floor(now / 60.0) * 60.0 + sec_mark_s
+    if value > now + 30.0:
+        value -= 60.0
+    elif value < now - 30.0:
+        value += 60.0
+    return value
+
+
+class TrajectoryBuffer:
+    """Ring buffers of recent BSM samples for a bounded number of vehicles."""
+    def __init__(self, history: int = 20, max_vehicles: int = 10000,
+                 smoothing_tau_s: float = 0.3, max_extrapolation_s: float = 1.0):
+        """
+        Args:
+            history: Samples kept per vehicle (2 s at 10 Hz by default).
+            max_vehicles: Number of preallocated vehicle slots.
+            smoothing_tau_s: Time constant of the exponential sample weights.
+            max_extrapolation_s: Dead-reckoning horizon limit.
+        """
+        self.history = history
+        self.max_vehicles = max_vehicles
+        self.smoothing_tau_s = smoothing_tau_s
+        self.max_extrapolation_s = max_extrapolation_s
+
+        self.data = np.full((max_vehicles, history, FIELD_COUNT), np.nan)
+        self.head = np.zeros(max_vehicles, dtype=np.int32)
+        self.count = np.zeros(max_vehicles, dtype=np.int32)
+        self.last_time = np.full(max_vehicles, -np.inf)
+        self.last_publish = np.zeros(max_vehicles)
+
+        # Least recently updated vehicle first.
+        self.slot_by_vehicle: "collections.OrderedDict[str, int]" = collections.OrderedDict()
+        self.free_slots = list(range(max_vehicles - 1, -1, -1))
+
+    def __len__(self) -> int:
+        return len(self.slot_by_vehicle)
+
+    def slot(self, vehicle_id: str) -> int:
+        """Return the vehicle's slot, allocating (or evicting for) a new one."""
+        slot = self.slot_by_vehicle.get(vehicle_id)
+        if slot is not None:
+            self.slot_by_vehicle.move_to_end(vehicle_id)
+            return slot
+
+        if self.free_slots:
+            slot = self.free_slots.pop()
+        else:
+            _, slot = self.slot_by_vehicle.popitem(last=False)
+        self.data[slot] = np.nan
+        self.head[slot] = 0
+        self.count[slot] = 0
+        self.last_time[slot] = -np.inf
+        self.last_publish[slot] = 0.0
+        self.slot_by_vehicle[vehicle_id] = slot
+        return slot
+
+    def remove(self, vehicle_id: str):
+        slot = self.slot_by_vehicle.pop(vehicle_id, None)
+        if slot is not None:
+            self.free_slots.append(slot)
+
+    def add(self, vehicle_id: str, sec_mark_s: float, lat: float, lon: float,
+            speed: float, heading: float, now: Optional[float] = None) -> bool:
+        """Append one BSM sample.
+
+        Returns:
+            False if the sample is a duplicate or older than the newest one.
+        """
+        if now is None:
+            now = time.time()
+        sample_time = sec_mark_time(sec_mark_s, now)
+        slot = self.slot(str(vehicle_id))
+        if sample_time <= self.last_time[slot]:
+            return False
+
+        head = self.head[slot]
+        self.data[slot, head] = (sample_time, lat, lon, speed, heading)
+        self.head[slot] = (head + 1) % self.history
+        self.count[slot] = min(self.count[slot] + 1, self.history)
+        self.last_time[slot] = sample_time
+        return True
+
+    def samples(self, vehicle_id: str) -> np.ndarray:
+        """Return the vehicle's samples, oldest first, as a (k, 5) array."""
+        slot = self.slot_by_vehicle.get(str(vehicle_id))
+        if slot is None:
+            return np.empty((0, FIELD_COUNT))
+        count = self.count[slot]
+        indices = (self.head[slot] - count + np.arange(count)) % self.history
+        return self.data[slot, indices].copy()
+
+    def publish_due(self, vehicle_id: str, now: float, interval_s: float) -> bool:
+        """Return True (and restart the interval) if the vehicle may be published at `now`."""
+        slot = self.slot_by_vehicle.get(str(vehicle_id))
+        if slot is None:
+            return False
+        if now - self.last_publish[slot] < interval_s:
+            return False
+        self.last_publish[slot] = now
+        return True
+
+    def estimate(self, vehicle_id: str, at_time: Optional[float] = None) -> Optional[dict]:
+        """Smoothed, dead-reckoned state of one vehicle at `at_time` (default: newest sample)."""
+        slot = self.slot_by_vehicle.get(str(vehicle_id))
+        if slot is None or self.count[slot] == 0:
+            return None
+        row = self.estimate_slots(np.array([slot]), at_time)[0]
+        return {
+            "time": float(row[TIME]),
+            "lat": float(row[LAT]),
+            "lon": float(row[LON]),
+            "speed": float(row[SPEED]),
+            "heading": float(row[HEADING]),
+        }
+
+    def estimate_all(self, at_time: Optional[float] = None) -> Tuple[List[str], np.ndarray]:
+        """Smoothed, dead-reckoned states of all vehicles.
+
+        Returns:
+            (vehicle ids, (n, 5) array of time, lat, lon, speed, heading).
+        """
+        vehicle_ids = list(self.slot_by_vehicle)
+        slots = np.fromiter(self.slot_by_vehicle.values(), dtype=np.int64, count=len(vehicle_ids))
+        return vehicle_ids, self.estimate_slots(slots, at_time)
+
+    def estimate_slots(self, slots: np.ndarray, at_time: Optional[float]) -> np.ndarray:
+        window = self.data[slots]                      # (n, history, 5)
+        valid = ~np.isnan(window[:, :, TIME])
+        last_time = self.last_time[slots]
+        newest = window[np.arange(len(slots)), (self.head[slots] - 1) % self.history]
+
+        # Local east/north metres around each vehicle's newest sample.
+        ref_lat, ref_lon = newest[:, LAT], newest[:, LON]
+        cos_ref = np.cos(np.radians(ref_lat))[:, None]
+        x = np.radians(window[:, :, LON] - ref_lon[:, None]) * EARTH_RADIUS_M * cos_ref
+        y = np.radians(window[:, :, LAT] - ref_lat[:, None]) * EARTH_RADIUS_M
+        heading = np.radians(window[:, :, HEADING])
+        vx = window[:, :, SPEED] * np.sin(heading)
+        vy = window[:, :, SPEED] * np.cos(heading)
+
+        age = last_time[:, None] - window[:, :, TIME]
+        weights = np.where(valid, np.exp(-np.where(valid, age, 0.0) / self.smoothing_tau_s), 0.0)
+        weights /= weights.sum(axis=1, keepdims=True)
+
+        # Project each sample to the newest sample time, then average.
+        smoothed_x = np.nansum(weights * (x + vx * age), axis=1)
+        smoothed_y = np.nansum(weights * (y + vy * age), axis=1)
+        smoothed_vx = np.nansum(weights * vx, axis=1)
+        smoothed_vy = np.nansum(weights * vy, axis=1)
+
+        if at_time is None:
+            horizon = np.zeros(len(slots))
+        else:
+            horizon = np.clip(at_time - last_time, 0.0, self.max_extrapolation_s)
+        x_out = smoothed_x + smoothed_vx * horizon
+        y_out = smoothed_y + smoothed_vy * horizon
+
+        speed = np.hypot(smoothed_vx, smoothed_vy)
+        heading_out = np.where(speed >= STANDSTILL_SPEED,
+                               np.degrees(np.arctan2(smoothed_vx, smoothed_vy)) % 360.0,
+                               newest[:, HEADING])
+        return np.column_stack((
+            last_time + horizon,
+            ref_lat + np.degrees(y_out / EARTH_RADIUS_M),
+            ref_lon + np.degrees(x_out / (EARTH_RADIUS_M * cos_ref[:, 0])),
+            speed,
+            heading_out,
+        ))
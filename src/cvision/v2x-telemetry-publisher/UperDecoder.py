@@ -0,0 +1,234 @@
+"""
+**********************************************************************************
+UperDecoder.py
+Created by: Debashis Das
+Argonne National Laboratory
+Transportation and Power Systems Division
+
+**********************************************************************************
+
+Description:
+------------
+In-process decoder of J2735 UPER SPaT and BSM payloads for the pipeline
+runner (v2x-pipeline.py). It produces the same JSON objects as the C++
+message decoder (MsgDecoder.cpp) sends over UDP, so the result goes straight
+into dispatch_message():
+
+    SPaT  {"MsgType": "SPaT", "Spat": {"intersectionState": {...}, "msgCnt",
+           "minuteOfYear", "msOfMinute", "status", "phaseState": [...]}}
+    BSM   {"MsgType": "BSM", "BasicVehicle": {"temporaryID", "secMark_Second",
+           "position": {...}, "speed_MeterPerSecond", "heading_Degree", ...}}
+
+Only the first intersection of a SPaT and signal groups 1-8 (phases) are
+decoded, as in the C++ decoder. There is no MAP matching in process: BSMs carry
+the fields the vehicle server adds for a vehicle that is on no MAP
+(intersectionID/laneID/approachID/signalGroup 0, signalStatus ""). Movement events with advisory speeds or
+regional extensions, and extended (fragmented) frames, raise ValueError.
+Phase times are converted like MsgDecoder::get_min_max_elapsed_time_in_seconds.
+**********************************************************************************
+"""
+
+import time
+from datetime import datetime
+from typing import Optional
+
+MAP_PREFIX, SPAT_PREFIX, BSM_PREFIX = b"\x00\x12", b"\x00\x13", b"\x00\x14"
+# eventState -> currState, as MsgDecoder.cpp names them (RED = 3 ... PROTECTED_YELLOW = 8);
+# other states carry no currState.
+PHASE_STATES = {3: "red", 4: "flashing_red", 5: "protected_green", 6: "permissive_green",
+                7: "permissive_yellow", 8: "protected_yellow"}
+# VehicleServer::updateBsmJsonString values for a vehicle on no MAP.
+OFF_MAP_FIELDS = {"intersectionID": 0, "laneID": 0, "approachID": 0, "signalGroup": 0, "signalStatus": ""}
+UNKNOWN_TIME = 36001
+TIME_EPSILON_S = 1e-3
+
+
+class BitReader:
+    """Sequential reader of big-endian bit fields (one int conversion per payload)."""
+    __slots__ = ("value", "remaining")
+
+    def __init__(self, data: bytes, bit_offset: int = 0):
+        self.value = int.from_bytes(data, "big")
+        self.remaining = len(data) * 8 - bit_offset
+
+    def read(self, bit_count: int) -> int:
+        self.remaining -= bit_count
+        if self.remaining < 0:
+            raise ValueError("Payload truncated.")
+        return (self.value >> self.remaining) & ((1 << bit_count) - 1)
+
+    def skip(self, bit_count: int):
+        self.remaining -= bit_count
+
+    def skip_descriptive_name(self):
+        self.skip(7 * (self.read(6) + 1))  # IA5String SIZE(1..63), 7 bits per character
+
+
+def open_frame(data: bytes) -> BitReader:
+    """Return a reader positioned at the start of the MessageFrame value."""
+    reader = BitReader(data, 16)  # messageId
+    if reader.read(1) == 0:
+        reader.skip(7)   # length < 128
+    elif reader.read(1) == 0:
+        reader.skip(14)  # length < 16K
+    else:
+        raise ValueError("Fragmented payloads are not supported.")
+    return reader
+
+
+def phase_times(minute_of_year: int, ms_of_minute: int, start: Optional[int], min_end: int, max_end: Optional[int]):
+    """(startTime, minEndTime, maxEndTime, elapsedTime) in seconds, as the C++ decoder reports them."""
+    now_s = (minute_of_year % 60) * 60.0 + ms_of_minute / 1000.0
+    min_end_s = max(0.0, min_end / 10.0 - now_s + TIME_EPSILON_S)
+    max_end_s = max(0.0, (max_end if max_end is not None else UNKNOWN_TIME) / 10.0 - now_s + TIME_EPSILON_S)
+    if start is not None and start != UNKNOWN_TIME:
+        start_s = start / 10.0
+        if start_s > now_s:
+            start_s -= 3600.0  # began in the previous hour
+        return start_s, min_end_s, max_end_s, max(0.0, now_s - start_s)
+    return -1.0, min_end_s, max_end_s, -1.0
+
+
+def decoder_timestamps(message: dict, now: float) -> dict:
+    message["Timestamp_verbose"] = datetime.fromtimestamp(now).strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
+    message["Timestamp_posix"] = now
+    return message
+
+
+def decode_spat(data: bytes, now: Optional[float] = None) -> dict:
+    """Decode the first intersection of a SPaT MessageFrame."""
+    reader = open_frame(data)
+    reader.skip(1)  # extension
+    has_timestamp, has_name = reader.read(1), reader.read(1)
+    reader.skip(1)  # regional
+    if has_timestamp:
+        reader.skip(20)
+    if has_name:
+        reader.skip_descriptive_name()
+
+    reader.skip(5)  # number of intersections - 1
+    reader.skip(1)  # IntersectionState extension
+    has_name, has_moy, has_timestamp, has_lanes = reader.read(1), reader.read(1), reader.read(1), reader.read(1)
+    reader.skip(2)  # maneuverAssistList, regional (after the movements)
+    if has_name:
+        reader.skip_descriptive_name()
+    regional_id = reader.read(16) if reader.read(1) else 0
+    intersection_id = reader.read(16)
+    revision = reader.read(7)
+    status = reader.read(16)
+    minute_of_year = reader.read(20) if has_moy else 0
+    ms_of_minute = reader.read(16) if has_timestamp else 0
+    if has_lanes:
+        reader.skip(8 * (reader.read(4) + 1))
+
+    phases = []
+    for _ in range(reader.read(8) + 1):
+        reader.skip(1)  # MovementState extension
+        has_movement_name, has_assist, has_regional = reader.read(1), reader.read(1), reader.read(1)
+        if has_assist or has_regional:
+            raise ValueError("Movement maneuver assist / regional data is not supported.")
+        if has_movement_name:
+            reader.skip_descriptive_name()
+        signal_group = reader.read(8)
+        event = None
+        for event_index in range(reader.read(4) + 1):
+            reader.skip(1)  # MovementEvent extension
+            has_timing, has_speeds, has_event_regional = reader.read(1), reader.read(1), reader.read(1)
+            if has_speeds or has_event_regional:
+                raise ValueError("Advisory speeds / regional event data is not supported.")
+            state = reader.read(4)
+            start = min_end = max_end = None
+            if has_timing:
+                has_start, has_max, has_likely, has_confidence, has_next = (reader.read(1) for _ in range(5))
+                start = reader.read(16) if has_start else None
+                min_end = reader.read(16)
+                max_end = reader.read(16) if has_max else None
+                if has_likely:
+                    reader.skip(16)
+                if has_confidence:
+                    reader.skip(4)
+                if has_next:
+                    reader.skip(16)
+            if event_index == 0:
+                event = (state, start, min_end, max_end)
+        if not 1 <= signal_group <= 8:
+            continue
+        state, start, min_end, max_end = event
+        start_s, min_end_s, max_end_s, elapsed_s = phase_times(
+            minute_of_year, ms_of_minute, start, min_end if min_end is not None else UNKNOWN_TIME, max_end)
+        phase = {
+            "phaseNo": signal_group,
+            "startTime": start_s,
+            "minEndTime": min_end_s,
+            "maxEndTime": max_end_s,
+            "elapsedTime": elapsed_s,
+        }
+        if state in PHASE_STATES:
+            phase["currState"] = PHASE_STATES[state]
+        phases.append(phase)
+    phases.sort(key=lambda phase: phase["phaseNo"])
+
+    return decoder_timestamps({
+        "MsgType": "SPaT",
+        "Spat": {
+            "intersectionState": {"regionalID": regional_id, "intersectionID": intersection_id},
+            "msgCnt": revision,
+            "minuteOfYear": minute_of_year,
+            "msOfMinute": ms_of_minute,
+            # std::bitset indexed by ASN.1 bit number, printed from bit 15 down.
+            "status": format(status, "016b")[::-1],
+            "phaseState": phases,
+        },
+    }, time.time() if now is None else now)
+
+
+def decode_bsm(data: bytes, now: Optional[float] = None) -> dict:
+    """Decode the core data of a BSM MessageFrame."""
+    reader = open_frame(data)
+    reader.skip(3)  # extension, partII, regional
+    reader.skip(7)  # msgCnt
+    temporary_id = reader.read(32)
+    sec_mark = reader.read(16)
+    latitude = reader.read(31) - 900000000
+    longitude = reader.read(32) - 1799999999
+    elevation = reader.read(16) - 4096
+    reader.skip(32)  # accuracy
+    reader.skip(3)   # transmission
+    speed = reader.read(13)
+    heading = reader.read(15)
+    reader.skip(8 + 12 + 12 + 8 + 16)       # angle, accelSet
+    reader.skip(5 + 2 + 2 + 2 + 2 + 2)      # brakes
+    width = reader.read(10)
+    length = reader.read(12)
+    return decoder_timestamps({
+        "MsgType": "BSM",
+        "BasicVehicle": {
+            "temporaryID": temporary_id,
+            "secMark_Second": sec_mark / 1000.0,
+            "position": {
+                "latitude_DecimalDegree": latitude / 1e7,
+                "longitude_DecimalDegree": longitude / 1e7,
+                "elevation_Meter": elevation / 10.0,
+            },
+            "speed_MeterPerSecond": float(round(speed * 0.02)),
+            "heading_Degree": float(round(heading * 0.0125)),
+            "type": "0",
+            "size": {"length_cm": length, "width_cm": width},
+            **OFF_MAP_FIELDS,
+        },
+    }, time.time() if now is None else now)
+
+
+def decode(data: bytes, now: Optional[float] = None) -> Optional[dict]:
+    """Decode a raw UPER SPaT/BSM frame; None for other message types (e.g. MAP)."""
+    prefix = data[:2]
+    if prefix == SPAT_PREFIX:
+        return decode_spat(data, now)
+    if prefix == BSM_PREFIX:
+        return decode_bsm(data, now)
+    return None
+
+
+def decode_hex(payload, now: Optional[float] = None) -> Optional[dict]:
+    """decode() for a hex payload (str or bytes), as received from listener.js."""
+    return decode(bytes.fromhex(payload.decode() if isinstance(payload, bytes) else payload), now)
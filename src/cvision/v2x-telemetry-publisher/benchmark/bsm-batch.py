@@ -0,0 +1,136 @@
+"""
+**********************************************************************************
+bsm-batch.py
+Created by: Debashis Das
+Argonne National Laboratory
+Transportation and Power Systems Division
+
+**********************************************************************************
+Description:
+------------
+Per-message vs columnar BSM publishing (BsmManager.manage_bsm_data vs
+BsmManager.manage_bsm_batch) from 10 to 10k BSMs per batch, into a sink that
+only counts writes. Both paths start from raw JSON datagrams, as received
+from the decoder. Every round moves each vehicle a little, so the batch path
+cannot skip vehicles through change detection.
+
+CPU time is the best of --repeat interleaved runs of each path (a single run
+is too noisy to compare the two), and the last line gives the crossover: the
+smallest batch size from which the batch path costs less CPU per BSM. Below
+it the fixed cost of a batch (numpy setup of the columns) outweighs the
+saving. With `--write-ms` each sink call is additionally charged that
+round-trip time (modelled, not slept) to show the effect on a remote RTDB.
+
+Usage:
+    python3 bsm-batch.py
+    python3 bsm-batch.py --batch-sizes 1000 10000 --rounds 20 --repeat 9
+**********************************************************************************
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from BsmManager import BsmManager  # noqa: E402
+import BsmBatch  # noqa: E402,F401  (numpy import outside the timed section)
+
+
+class CountingSink:
+    """Sink that only counts records."""
+    def __init__(self):
+        self.records = 0
+
+    def write(self, path, data):
+        self.records += 1
+
+    def write_many(self, parent, records):
+        self.records += len(records)
+
+
+def make_bsm(vehicle_id: int, step: int) -> bytes:
+    return json.dumps({
+        "MsgType": "BSM",
+        "BasicVehicle": {
+            "temporaryID": vehicle_id,
+            "secMark_Second": (step % 600) / 10.0,
+            "speed_MeterPerSecond": 10.0 + vehicle_id % 7,
+            "heading_Degree": float(vehicle_id % 360),
+            "position": {
+                "latitude_DecimalDegree": 42.30 + vehicle_id * 1e-6 + step * 1e-5,
+                "longitude_DecimalDegree": -83.70 - vehicle_id * 1e-6,
+                "elevation_Meter": 250.0,
+            },
+            "intersectionID": 1000 + vehicle_id % 20,
+            "laneID": vehicle_id % 8 + 1,
+            "approachID": vehicle_id % 4 + 1,
+            "signalGroup": vehicle_id % 8 + 1,
+            "signalStatus": "green",
+        },
+    }).encode()
+
+
+def per_message(batches) -> tuple:
+    """(CPU seconds, sink records) of publishing every BSM on its own."""
+    sink = CountingSink()
+    manager = BsmManager(sink)
+    start = time.process_time()
+    for batch in batches:
+        for data in batch:
+            manager.manage_bsm_data(json.loads(data))
+    return time.process_time() - start, sink.records
+
+
+def batched(batches) -> tuple:
+    """(CPU seconds, sink records) of publishing every batch with manage_bsm_batch."""
+    sink = CountingSink()
+    manager = BsmManager(sink)
+    start = time.process_time()
+    for batch in batches:
+        manager.manage_bsm_batch(batch)
+    return time.process_time() - start, sink.records
+
+
+def run(batch_size: int, rounds: int, repeat: int, write_ms: float) -> float:
+    """Print one comparison and return the CPU speedup of the batch path."""
+    batches = [[make_bsm(vehicle_id, step) for vehicle_id in range(batch_size)] for step in range(rounds)]
+
+    per_message_s = batch_s = float("inf")
+    for _ in range(repeat):
+        seconds, per_message_records = per_message(batches)
+        per_message_s = min(per_message_s, seconds)
+        seconds, batch_records = batched(batches)
+        batch_s = min(batch_s, seconds)
+    per_message_total_s = per_message_s + per_message_records * write_ms / 1000.0
+    batch_total_s = batch_s + rounds * write_ms / 1000.0
+
+    messages = batch_size * rounds
+    print(f"{batch_size:>6} BSMs/batch | per message {messages / per_message_s:>9,.0f} BSM/s "
+          f"({per_message_records} writes) | batch {messages / batch_s:>9,.0f} BSM/s "
+          f"({batch_records} records, {rounds} writes) | CPU speedup x{per_message_s / batch_s:.1f}")
+    if write_ms > 0:
+        print(f"{'':>6} with {write_ms:g} ms/write | per message {messages / per_message_total_s:>9,.0f} BSM/s"
+              f" | batch {messages / batch_total_s:>9,.0f} BSM/s")
+    return per_message_s / batch_s
+
+
+def main(args):
+    batched(([make_bsm(1, 0)],))  # numpy warm-up outside the timed runs
+    speedups = {batch_size: run(batch_size, args.rounds, args.repeat, args.write_ms)
+                for batch_size in sorted(args.batch_sizes)}
+    faster = [size for size in speedups if all(speedups[larger] >= 1.0 for larger in speedups if larger >= size)]
+    if faster:
+        print(f"Batch path uses less CPU from {faster[0]} BSMs per batch")
+    else:
+        print("Batch path uses more CPU at every measured batch size")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-message vs columnar BSM publishing")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[10, 30, 100, 300, 1000, 10000], help="BSMs per batch.")
+    parser.add_argument("--rounds", type=int, default=10, help="Batches per size.")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs of each path (the best one counts).")
+    parser.add_argument("--write-ms", type=float, default=5.0, help="Modelled round-trip time per sink call (0 = CPU only).")
+    main(parser.parse_args())
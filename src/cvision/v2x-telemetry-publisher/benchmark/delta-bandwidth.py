@@ -0,0 +1,142 @@
+"""
+**********************************************************************************
+delta-bandwidth.py
+Created by: Debashis Das
+Argonne National Laboratory
+Transportation and Power Systems Division
+
+**********************************************************************************
+Description:
+------------
+Compares bytes on the wire per second for full-object writes versus the
+snapshot/patch protocol (DeltaEncoder.py), using synthetic traffic shaped like
+the publisher's output: every vehicle and intersection updates at 10 Hz,
+vehicles move, speed/heading change slowly, SPaT countdowns tick every message
+and phases follow a fixed green/yellow/red cycle.
+
+Bytes are counted as the JSON request body plus the RTDB path, which is what
+`set()` / `update()` send to Firebase.
+
+Usage:
+    python3 delta-bandwidth.py
+    python3 delta-bandwidth.py --vehicles 500 --intersections 50 --seconds 60
+**********************************************************************************
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from DeltaEncoder import DeltaEncoder, SNAPSHOT_INTERVAL_S  # noqa: E402
+
+RATE_HZ = 10
+PHASES = [1, 2, 3, 4, 5, 6, 7, 8]
+# (state, duration in seconds) of each phase's cycle
+CYCLE = [("protectedMovementAllowed", 25.0), ("yellow", 4.0), ("stopAndRemain", 61.0)]
+CYCLE_LENGTH_S = sum(duration for _, duration in CYCLE)
+
+
+def wire_bytes(path: str, body: dict) -> int:
+    return len(path) + len(json.dumps(body, separators=(",", ":")))
+
+
+def vehicle_record(vehicle: dict, now_ms: int) -> dict:
+    return {
+        "lat": round(vehicle["lat"], 7),
+        "lon": round(vehicle["lon"], 7),
+        "elev": vehicle["elev"],
+        "speed": round(vehicle["speed"]),
+        "heading": round(vehicle["heading"]),
+        "intersection_id": vehicle["intersection_id"],
+        "lane_id": vehicle["lane_id"],
+        "approach_id": vehicle["approach_id"],
+        "signal_group": vehicle["signal_group"],
+        "signal_status": vehicle["signal_status"],
+        "timestamp": now_ms,
+    }
+
+
+def phase_state(phase: int, t: float) -> dict:
+    offset = (t + phase * CYCLE_LENGTH_S / len(PHASES)) % CYCLE_LENGTH_S
+    for state, duration in CYCLE:
+        if offset < duration:
+            remaining = round(duration - offset, 1)
+            return {"phase": phase, "state": state, "minEndTime": remaining, "maxEndTime": round(remaining + 5.0, 1)}
+        offset -= duration
+    raise AssertionError("unreachable")
+
+
+def intersection_record(t: float, now_ms: int) -> dict:
+    return {"timestamp": now_ms, "phaseStates": [phase_state(p, t) for p in PHASES]}
+
+
+def main(args):
+    random.seed(1)
+    vehicles = {
+        str(600 + i): {
+            "lat": 41.70 + random.random() * 0.02, "lon": -87.99 + random.random() * 0.02, "elev": 227.9,
+            "speed": random.uniform(0.0, 15.0), "heading": random.uniform(0.0, 360.0),
+            "intersection_id": 29080, "lane_id": random.randint(1, 8), "approach_id": random.randint(1, 4),
+            "signal_group": random.choice([2, 4, 6]), "signal_status": "stopAndRemain",
+        }
+        for i in range(args.vehicles)
+    }
+    intersections = [str(3000 + i) for i in range(args.intersections)]
+
+    encoder = DeltaEncoder(args.snapshot_interval)
+    full_bytes = {"vehicle_status": 0, "intersection_status": 0}
+    delta_bytes = {"vehicle_status": 0, "intersection_status": 0}
+    writes = {"full": 0, "delta": 0}
+
+    steps = int(args.seconds * RATE_HZ)
+    for step in range(steps):
+        t = step / RATE_HZ
+        now_ms = 1758223899000 + step * 100
+
+        for vehicle_id, vehicle in vehicles.items():
+            vehicle["speed"] = min(20.0, max(0.0, vehicle["speed"] + random.uniform(-0.3, 0.3)))
+            vehicle["heading"] = (vehicle["heading"] + random.uniform(-1.0, 1.0)) % 360.0
+            vehicle["lat"] += vehicle["speed"] * 0.1 / 111000.0
+            path = f"vehicle_status/{vehicle_id}"
+            record = vehicle_record(vehicle, now_ms)
+            full_bytes["vehicle_status"] += wire_bytes(path, record)
+            writes["full"] += 1
+            is_snapshot, payload = encoder.encode(path, record, now=t)
+            if is_snapshot or payload:
+                delta_bytes["vehicle_status"] += wire_bytes(path, payload)
+                writes["delta"] += 1
+
+        for intersection_id in intersections:
+            path = f"intersection_status/{intersection_id}"
+            record = intersection_record(t + int(intersection_id), now_ms)
+            full_bytes["intersection_status"] += wire_bytes(path, record)
+            writes["full"] += 1
+            is_snapshot, payload = encoder.encode(path, record, now=t)
+            if is_snapshot or payload:
+                delta_bytes["intersection_status"] += wire_bytes(path, payload)
+                writes["delta"] += 1
+
+    print(f"{args.vehicles} vehicles, {args.intersections} intersections, {RATE_HZ} Hz, "
+          f"{args.seconds:.0f} s simulated, snapshot every {args.snapshot_interval:.0f} s")
+    print(f"{'':22}{'full (B/s)':>14}{'delta (B/s)':>14}{'ratio':>8}")
+    for kind in ("vehicle_status", "intersection_status"):
+        full_rate = full_bytes[kind] / args.seconds
+        delta_rate = delta_bytes[kind] / args.seconds
+        print(f"{kind:22}{full_rate:14,.0f}{delta_rate:14,.0f}{delta_rate / full_rate:8.2f}")
+    full_total = sum(full_bytes.values()) / args.seconds
+    delta_total = sum(delta_bytes.values()) / args.seconds
+    print(f"{'total':22}{full_total:14,.0f}{delta_total:14,.0f}{delta_total / full_total:8.2f}")
+    print(f"writes/s: full {writes['full'] / args.seconds:,.0f}, delta {writes['delta'] / args.seconds:,.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Full-object vs snapshot/patch bandwidth")
+    parser.add_argument("--vehicles", type=int, default=500)
+    parser.add_argument("--intersections", type=int, default=50)
+    parser.add_argument("--seconds", type=float, default=60.0)
+    parser.add_argument("--snapshot-interval", type=float, default=SNAPSHOT_INTERVAL_S)
+    args = parser.parse_args()
+    main(args)
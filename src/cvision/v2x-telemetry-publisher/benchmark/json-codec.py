@@ -0,0 +1,88 @@
+"""
+**********************************************************************************
+json-codec.py
+Created by: Debashis Das
+Argonne National Laboratory
+Transportation and Power Systems Division
+
+**********************************************************************************
+Description:
+------------
+Encode/decode cost per message of the JSON backends JsonCodec.py can use, on
+the decoder SPaT/BSM samples:
+
+    json (per call)    json.dumps(obj, separators=...) / json.loads(str), as
+                       the code did before JsonCodec
+    json (reused)      the JsonCodec fallback: one encoder/decoder instance
+    orjson             when installed
+    cached             PayloadCache: bytes of a static payload
+
+Usage:
+    python3 json-codec.py
+    python3 json-codec.py --iterations 200000
+**********************************************************************************
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, ".."))
+from JsonCodec import PayloadCache  # noqa: E402
+
+SAMPLES = os.path.join(HERE, "..", "..", "message-decoder")
+
+
+def backends():
+    encoder = json.JSONEncoder(separators=(",", ":"), ensure_ascii=False)
+    decoder = json.JSONDecoder()
+    found = {
+        "json (per call)": (lambda obj: json.dumps(obj, separators=(",", ":")).encode(),
+                            lambda data: json.loads(data.decode())),
+        "json (reused)": (lambda obj: encoder.encode(obj).encode(),
+                          lambda data: decoder.decode(data.decode())),
+    }
+    try:
+        import orjson
+        found["orjson"] = (orjson.dumps, orjson.loads)
+    except ImportError:
+        print("orjson not installed; skipping it (pip install orjson)")
+    return found
+
+
+def per_call_us(function, argument, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        function(argument)
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def main(args):
+    samples = {}
+    for msg_type, name in (("SPaT", "sample-spat.json"), ("BSM", "sample-bsm.json")):
+        with open(os.path.join(SAMPLES, name)) as f:
+            samples[msg_type] = json.load(f)
+
+    for msg_type, message in samples.items():
+        print(f"{msg_type} ({len(json.dumps(message, separators=(',', ':')))} bytes)")
+        baseline = None
+        for name, (encode, decode) in backends().items():
+            data = encode(message)
+            encode_us = per_call_us(encode, message, args.iterations)
+            decode_us = per_call_us(decode, data, args.iterations)
+            if baseline is None:
+                baseline = encode_us + decode_us
+            print(f"  {name:<16} dumps {encode_us:5.2f} us | loads {decode_us:5.2f} us | "
+                  f"x{baseline / (encode_us + decode_us):.1f}")
+        cache = PayloadCache()
+        cached_us = per_call_us(lambda obj: cache.get(msg_type, lambda: obj), message, args.iterations)
+        print(f"  {'cached':<16} dumps {cached_us:5.2f} us")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="JSON backend comparison on SPaT/BSM samples")
+    parser.add_argument("--iterations", type=int, default=100000, help="Calls per measurement.")
+    main(parser.parse_args())
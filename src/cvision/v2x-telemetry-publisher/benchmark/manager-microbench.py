@@ -0,0 +1,289 @@
+"""
+**********************************************************************************
+manager-microbench.py
+Created by: Debashis Das
+Argonne National Laboratory
+Transportation and Power Systems Division
+
+**********************************************************************************
+Description:
+------------
+Microbenchmarks of the per-message functions of SpatManager.py and
+BsmManager.py, with stored baselines and regression thresholds:
+
+    load_phases_and_names                  repo config (5) and a generated 1k config
+    generate_intersection_data_dictionary  configured and discovered intersection
+    manage_spat_data                       one intersection, 1k intersections in turn
+    manage_bsm_data                        one vehicle, 1k vehicles in turn
+
+Messages are the decoder samples (sample-spat.json, sample-bsm.json; the BSM
+gets the lane fields the vehicle server adds), written to a MemorySink so no
+Firebase work is measured. The managers run in a temporary directory with the
+repo's intersections-config.json plus 1000 generated 8-phase intersections.
+Phase mismatch warnings are ignored (the filter check still runs).
+
+Per case:
+
+    ns/op         best of --repeat timed runs, gc off while timing
+    norm          ns/op divided by the ns/op of a fixed pure-Python reference
+                  workload timed in between those runs; this is what is
+                  compared, so a busy or throttled machine does not read as
+                  a regression
+    peak B/op     peak traced allocation of one call (tracemalloc, median)
+    kept blk/op   memory blocks still allocated per call after a warm-up
+                  (steady state should be 0; anything else is a leak)
+
+Results are compared with benchmark/baselines/manager-microbench.json; the
+script exits with 1 when a case is slower than its baseline by more than
+--time-threshold (normalized), or allocates more than --alloc-threshold
+above it. The stored values are from one machine and Python version:
+re-record them with --update before comparing on another one.
+
+Usage:
+    python3 manager-microbench.py
+    python3 manager-microbench.py --filter manage_spat_data
+    python3 manager-microbench.py --update        # record new baselines
+    python3 manager-microbench.py --time-threshold 0.5
+**********************************************************************************
+"""
+
+import argparse
+import contextlib
+import copy
+import gc
+import itertools
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+import warnings
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, ".."))
+from BsmManager import BsmManager  # noqa: E402
+from SpatManager import SpatManager  # noqa: E402
+from TelemetrySink import MemorySink  # noqa: E402
+
+PUBLISHER = os.path.join(HERE, "..")
+SAMPLES = os.path.join(HERE, "..", "..", "message-decoder")
+BASELINES = os.path.join(HERE, "baselines", "manager-microbench.json")
+GENERATED_COUNT = 1000
+GENERATED_FIRST_ID = 100000
+# Fields the vehicle server adds to a BSM after MAP matching.
+VEHICLE_SERVER_FIELDS = {"intersectionID": 29080, "laneID": 3, "approachID": 1,
+                         "signalGroup": 2, "signalStatus": "red"}
+# Below these, differences are measurement noise (dict resizes, free lists).
+PEAK_SLACK_BYTES = 256
+KEPT_SLACK_BLOCKS = 0.5
+
+
+def load_json(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def write_configs(directory):
+    """intersections-config.json (repo config + 1k generated) and config-1k.json (generated only)."""
+    repo_config = load_json(os.path.join(PUBLISHER, "intersections-config.json"))
+    generated = [{"id": str(GENERATED_FIRST_ID + index), "name": f"Generated {index}", "phases": list(range(1, 9))}
+                 for index in range(GENERATED_COUNT)]
+    with open(os.path.join(directory, "intersections-config.json"), "w") as f:
+        json.dump({"intersections": repo_config["intersections"] + generated}, f)
+    with open(os.path.join(directory, "config-1k.json"), "w") as f:
+        json.dump({"intersections": generated}, f)
+
+
+def spat_for(sample, intersection_id):
+    message = copy.deepcopy(sample)
+    message["Spat"]["intersectionState"]["intersectionID"] = intersection_id
+    return message
+
+
+def bsm_for(sample, vehicle_id):
+    message = copy.deepcopy(sample)
+    message["BasicVehicle"]["temporaryID"] = vehicle_id
+    message["BasicVehicle"].update(VEHICLE_SERVER_FIELDS)
+    return message
+
+
+@contextlib.contextmanager
+def working_directory(path):
+    previous = os.getcwd()
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(previous)
+
+
+def build_cases(directory):
+    """Name -> zero-argument callable running one operation."""
+    spat_sample = load_json(os.path.join(SAMPLES, "sample-spat.json"))            # 29080, configured
+    discovered_sample = load_json(os.path.join(PUBLISHER, "sample-spat.json"))    # 2351, not configured
+    bsm_sample = load_json(os.path.join(SAMPLES, "sample-bsm.json"))
+
+    with working_directory(directory):
+        spat_manager = SpatManager(MemorySink())
+    bsm_manager = BsmManager(MemorySink())
+
+    repo_config = os.path.join(PUBLISHER, "intersections-config.json")
+    large_config = os.path.join(directory, "config-1k.json")
+    spat = spat_for(spat_sample, spat_sample["Spat"]["intersectionState"]["intersectionID"])
+    discovered = spat_for(discovered_sample, discovered_sample["Spat"]["intersectionState"]["intersectionID"])
+    many_spats = itertools.cycle([spat_for(spat_sample, GENERATED_FIRST_ID + index) for index in range(GENERATED_COUNT)])
+    bsm = bsm_for(bsm_sample, bsm_sample["BasicVehicle"]["temporaryID"])
+    many_bsms = itertools.cycle([bsm_for(bsm_sample, 1000 + index) for index in range(GENERATED_COUNT)])
+
+    return {
+        "load_phases_and_names/5": lambda: spat_manager.load_phases_and_names(repo_config),
+        "load_phases_and_names/1k": lambda: spat_manager.load_phases_and_names(large_config),
+        "generate_intersection_data_dictionary/configured": lambda: spat_manager.generate_intersection_data_dictionary(spat),
+        "generate_intersection_data_dictionary/discovered": lambda: spat_manager.generate_intersection_data_dictionary(discovered),
+        "manage_spat_data/1-intersection": lambda: spat_manager.manage_spat_data(spat),
+        "manage_spat_data/1k-intersections": lambda: spat_manager.manage_spat_data(next(many_spats)),
+        "manage_bsm_data/1-vehicle": lambda: bsm_manager.manage_bsm_data(bsm),
+        "manage_bsm_data/1k-vehicles": lambda: bsm_manager.manage_bsm_data(next(many_bsms)),
+    }
+
+
+def reference():
+    """Fixed workload of the same kind as the managers (small dicts, strings, lists)."""
+    return [{"phase": phase, "state": str(phase).lower(), "minEndTime": phase * 10} for phase in range(1, 9)]
+
+
+def calibrate(function, min_run_s):
+    """Calls per timed run so that one run takes at least `min_run_s` (also warms up)."""
+    number = 1
+    while time_calls(function, number) < min_run_s:
+        number *= 2
+    return number
+
+
+def time_calls(function, number):
+    start = time.perf_counter()
+    for _ in range(number):
+        function()
+    return time.perf_counter() - start
+
+
+def measure(function, repeat, min_run_s=0.02):
+    """ns/op (raw and normalized), peak bytes/op and kept blocks/op of `function`."""
+    # The cheap 1k cases go through all their messages while calibrating.
+    number = calibrate(function, min_run_s)
+    reference_number = calibrate(reference, min_run_s)
+
+    case_runs, reference_runs = [], []
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            case_runs.append(time_calls(function, number) / number)
+            reference_runs.append(time_calls(reference, reference_number) / reference_number)
+    finally:
+        gc.enable()
+    ns_per_op = min(case_runs) * 1e9
+    normalized = min(case_runs) / min(reference_runs)
+
+    # Enough calls that a few blocks kept by the interpreter itself round away.
+    calls = max(number, 100)
+    gc.collect()
+    blocks = sys.getallocatedblocks()
+    for _ in range(calls):
+        function()
+    gc.collect()
+    kept_per_op = (sys.getallocatedblocks() - blocks) / calls
+
+    peaks = []
+    tracemalloc.start()
+    try:
+        for _ in range(min(number, 200)):
+            current, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            function()
+            peaks.append(tracemalloc.get_traced_memory()[1] - current)
+    finally:
+        tracemalloc.stop()
+    return {"ns_per_op": round(ns_per_op, 1), "normalized": round(normalized, 3), "peak_bytes_per_op": int(statistics.median(peaks)),
+            "kept_blocks_per_op": round(kept_per_op, 3)}
+
+
+def regressions(result, baseline, time_threshold, alloc_threshold):
+    """Reasons `result` is a regression against `baseline` (empty if none)."""
+    reasons = []
+    if result["normalized"] > baseline["normalized"] * (1 + time_threshold):
+        reasons.append("time")
+    if result["peak_bytes_per_op"] > baseline["peak_bytes_per_op"] * (1 + alloc_threshold) + PEAK_SLACK_BYTES:
+        reasons.append("peak")
+    if result["kept_blocks_per_op"] > baseline["kept_blocks_per_op"] * (1 + alloc_threshold) + KEPT_SLACK_BLOCKS:
+        reasons.append("kept")
+    return reasons
+
+
+def environment():
+    return {"python": platform.python_version(), "machine": platform.machine(), "system": platform.system()}
+
+
+def main(args):
+    warnings.simplefilter("ignore", RuntimeWarning)
+    directory = tempfile.mkdtemp(prefix="manager-microbench-")
+    try:
+        write_configs(directory)
+        # Discovery and manager setup print; keep that out of the table.
+        with contextlib.redirect_stdout(open(os.devnull, "w")):
+            cases = build_cases(directory)
+            selected = {name: case for name, case in cases.items() if args.filter in name}
+            results = {}
+            for name, case in selected.items():
+                results[name] = measure(case, args.repeat)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    stored = load_json(args.baselines) if os.path.exists(args.baselines) else {"environment": {}, "cases": {}}
+    baselines = stored["cases"]
+    if not args.update and stored["environment"] and stored["environment"] != environment():
+        print(f"Note: baselines were recorded on {stored['environment']}, this is {environment()}")
+
+    failed = []
+    print(f"{'case':52} {'ns/op':>9} {'norm':>7} {'base':>7} {'diff':>6} {'peak B/op':>10} {'kept blk/op':>12}  status")
+    for name, result in results.items():
+        baseline = baselines.get(name)
+        if baseline is None:
+            diff, status = "", "new"
+        else:
+            diff = f"{result['normalized'] / baseline['normalized'] - 1:+.0%}"
+            reasons = regressions(result, baseline, args.time_threshold, args.alloc_threshold)
+            status = "REGRESSED (" + ", ".join(reasons) + ")" if reasons else "ok"
+            if reasons and not args.update:
+                failed.append(name)
+        base = f"{baseline['normalized']:.2f}" if baseline else ""
+        print(f"{name:52} {result['ns_per_op']:9.0f} {result['normalized']:7.2f} {base:>7} {diff:>6} "
+              f"{result['peak_bytes_per_op']:10d} {result['kept_blocks_per_op']:12.3f}  {status}")
+
+    if args.update:
+        baselines.update(results)
+        os.makedirs(os.path.dirname(args.baselines), exist_ok=True)
+        with open(args.baselines, "w") as f:
+            json.dump({"environment": environment(), "cases": dict(sorted(baselines.items()))}, f, indent=2)
+            f.write("\n")
+        print(f"Baselines written to {args.baselines}")
+        return 0
+    if failed:
+        print(f"{len(failed)} case(s) regressed past the thresholds "
+              f"(time +{args.time_threshold:.0%}, allocations +{args.alloc_threshold:.0%})")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="SpatManager/BsmManager microbenchmarks with regression baselines")
+    parser.add_argument("--filter", default="", help="Only run cases whose name contains this text.")
+    parser.add_argument("--repeat", type=int, default=15, help="Timed runs per case (the best one counts).")
+    parser.add_argument("--time-threshold", type=float, default=0.25, help="Allowed increase of normalized ns/op over the baseline (0.25 = 25%%).")
+    parser.add_argument("--alloc-threshold", type=float, default=0.10, help="Allowed increase of peak bytes and kept blocks per op.")
+    parser.add_argument("--baselines", default=BASELINES, help="Baseline file.")
+    parser.add_argument("--update", action="store_true", help="Store the results as the new baselines.")
+    sys.exit(main(parser.parse_args()))
@@ -0,0 +1,89 @@
+"""
+**********************************************************************************
+message-validation.py
+Created by: Debashis Das
+Argonne National Laboratory
+Transportation and Power Systems Division
+
+**********************************************************************************
+Description:
+------------
+Per-message cost of MessageValidator.py on the decoder samples, next to the
+cost of parsing the same message (json.loads) and of a straightforward
+validator that walks the schema for every message.
+
+Usage:
+    python3 message-validation.py
+    python3 message-validation.py --iterations 200000
+**********************************************************************************
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, ".."))
+from MessageValidator import SCHEMAS, Field, MessageValidator  # noqa: E402
+
+SAMPLES = os.path.join(HERE, "..", "..", "message-decoder")
+
+
+def interpret(schema, value) -> bool:
+    """Reference validator: walks the schema at runtime."""
+    if isinstance(schema, Field):
+        if schema.kind is str:
+            return type(value) is str
+        if type(value) is not int and (schema.kind is int or type(value) is not float):
+            return False
+        return (schema.low is None or value >= schema.low) and (schema.high is None or value <= schema.high)
+    if isinstance(schema, list):
+        return type(value) is list and all(interpret(schema[0], item) for item in value)
+    if type(value) is not dict:
+        return False
+    for key, child in schema.items():
+        if key not in value:
+            if isinstance(child, Field) and not child.required:
+                continue
+            return False
+        if not interpret(child, value[key]):
+            return False
+    return True
+
+
+def load_samples():
+    with open(os.path.join(SAMPLES, "sample-spat.json")) as f:
+        spat = json.load(f)
+    with open(os.path.join(SAMPLES, "sample-bsm.json")) as f:
+        bsm = json.load(f)
+    # Fields the vehicle server adds to decoded BSMs.
+    bsm["BasicVehicle"].update(intersectionID=29080, laneID=2, approachID=1, signalGroup=2, signalStatus="green")
+    return {"SPaT": spat, "BSM": bsm}
+
+
+def per_message_us(function, argument, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        function(argument)
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def main(args):
+    validator = MessageValidator(report_interval_s=1e9)
+    for msg_type, message in load_samples().items():
+        if validator.check(message) is not None:
+            raise ValueError(f"Sample {msg_type} does not validate: {validator.check(message)}")
+        raw = json.dumps(message)
+        compiled_us = per_message_us(validator.check, message, args.iterations)
+        interpreted_us = per_message_us(lambda m: interpret(SCHEMAS[m["MsgType"]], m), message, args.iterations)
+        parse_us = per_message_us(json.loads, raw, args.iterations)
+        print(f"{msg_type:<5} compiled {compiled_us:5.2f} us | schema walk {interpreted_us:5.2f} us | "
+              f"json.loads {parse_us:5.2f} us | validation = {compiled_us / parse_us:.0%} of parsing")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-message validation overhead")
+    parser.add_argument("--iterations", type=int, default=100000, help="Messages per measurement.")
+    main(parser.parse_args())
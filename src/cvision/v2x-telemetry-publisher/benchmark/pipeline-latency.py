@@ -0,0 +1,178 @@
+"""
+**********************************************************************************
+pipeline-latency.py
+Created by: Debashis Das
+Argonne National Laboratory
+Transportation and Power Systems Division
+
+**********************************************************************************
+Description:
+------------
+Latency and CPU per message of the process layouts, with the same stage code
+(InProcessPipeline.py, UperDecoder.py, SpatManager/BsmManager) in each:
+
+    multi-process   gateway (classify) --UDP hex--> decoder --UDP JSON--> publisher
+    queued          one process, a thread per stage, bounded queues
+    inline          one process, every stage on the receive thread
+
+The driver sends the SPaT/BSM samples as hex datagrams to the first
+process, one at a time. The publisher's sink answers each record with its
+time.perf_counter() (CLOCK_MONOTONIC, shared by all processes), so latency is
+datagram sent -> record written. CPU is the process time of the pipeline
+processes (not the driver) divided by the messages. Firebase is replaced by
+that sink; the decoder is the Python one in every layout, so the difference
+is the hops themselves.
+
+Usage:
+    python3 pipeline-latency.py
+    python3 pipeline-latency.py --messages 20000
+**********************************************************************************
+"""
+
+import argparse
+import multiprocessing
+import os
+import socket
+import struct
+import sys
+import time
+import warnings
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+PUBLISHER = os.path.join(HERE, "..")
+sys.path.insert(0, PUBLISHER)
+import JsonCodec  # noqa: E402
+from InProcessPipeline import InProcessPipeline, UdpForwarder, classify  # noqa: E402
+from ShardedDispatcher import build_managers, build_validator, dispatch_message  # noqa: E402
+from UperDecoder import decode  # noqa: E402
+
+LOCALHOST = "127.0.0.1"
+SPAT_SAMPLES = os.path.join(PUBLISHER, "..", "message-decoder", "test", "spat-sender", "spat-hex.txt")
+BSM_SAMPLES = os.path.join(PUBLISHER, "..", "conneted-vehicle-to-cloud-interface", "bsm-hex.txt")
+STOP = b"stop"
+
+
+class AckSink:
+    """Answers every record with the time it was written."""
+    def __init__(self, address):
+        self.address = address
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    def write(self, path, data):
+        self.socket.sendto(struct.pack("d", time.perf_counter()), self.address)
+
+
+def publish_stage(ack_address):
+    # SpatManager reads intersections-config.json from the working directory.
+    os.chdir(PUBLISHER)
+    # The samples carry phases 29080 does not have configured.
+    warnings.simplefilter("ignore", RuntimeWarning)
+    spat_manager, bsm_manager = build_managers({"use_cloud": False}, [AckSink(ack_address)])
+    validator = build_validator({})
+    return lambda message: dispatch_message(message, spat_manager, bsm_manager, None, validator)
+
+
+def decode_stage(item):
+    return decode(item[1])
+
+
+def stage_process(port, stages, queue_size, ready, results):
+    """Run `stages` behind a UDP socket on `port` until STOP; report CPU seconds."""
+    receive_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    receive_socket.bind((LOCALHOST, port))
+    pipeline = InProcessPipeline([(name, factory()) for name, factory in stages], queue_size)
+    pipeline.start()
+    ready.put(port)
+    start = time.process_time()
+    while True:
+        data, _ = receive_socket.recvfrom(4096)
+        if data == STOP:
+            break
+        pipeline.submit(data)
+    pipeline.stop()
+    results.put(time.process_time() - start)
+
+
+def free_port() -> int:
+    probe = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    probe.bind((LOCALHOST, 0))
+    port = probe.getsockname()[1]
+    probe.close()
+    return port
+
+
+def layouts(ack_address):
+    gateway, decoder, publisher = free_port(), free_port(), free_port()
+    hex_to = lambda port: lambda: UdpForwarder((LOCALHOST, port), lambda item: item[1].hex().encode())
+    json_to = lambda port: lambda: UdpForwarder((LOCALHOST, port))
+    in_process = [("classify", lambda: classify), ("decode", lambda: decode_stage),
+                  ("publish", lambda: publish_stage(ack_address))]
+    return {
+        "multi-process": [
+            (gateway, [("classify", lambda: classify), ("send", hex_to(decoder))], 0),
+            (decoder, [("receive", lambda: lambda data: (None, bytes.fromhex(data.decode()))),
+                       ("decode", lambda: decode_stage), ("send", json_to(publisher))], 0),
+            (publisher, [("receive", lambda: JsonCodec.loads), ("publish", lambda: publish_stage(ack_address))], 0),
+        ],
+        "queued": [(gateway, in_process, 1000)],
+        "inline": [(gateway, in_process, 0)],
+    }
+
+
+def percentile(values, fraction: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def run_layout(processes, payloads, ack_socket, messages: int):
+    # fork: the stage factories are lambdas and are not pickled.
+    context = multiprocessing.get_context("fork")
+    ready, results = context.Queue(), context.Queue()
+    children = [context.Process(target=stage_process, args=(port, stages, queue_size, ready, results))
+                for port, stages, queue_size in processes]
+    for child in children:
+        child.start()
+    for _ in children:
+        ready.get(timeout=30)
+    send_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    entry = (LOCALHOST, processes[0][0])
+
+    latencies, lost = [], 0
+    for index in range(messages):
+        sent = time.perf_counter()
+        send_socket.sendto(payloads[index % len(payloads)], entry)
+        try:
+            written, = struct.unpack("d", ack_socket.recv(64))
+            latencies.append(written - sent)
+        except socket.timeout:
+            lost += 1
+
+    for port, _, _ in processes:
+        send_socket.sendto(STOP, (LOCALHOST, port))
+    cpu_s = sum(results.get(timeout=30) for _ in children)
+    for child in children:
+        child.join()
+    return latencies, lost, cpu_s
+
+
+def main(args):
+    payloads = []
+    for path in (SPAT_SAMPLES, BSM_SAMPLES):
+        with open(path) as f:
+            payloads.extend(line.strip().encode() for line in f if line.strip())
+    ack_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    ack_socket.bind((LOCALHOST, 0))
+    ack_socket.settimeout(1.0)
+
+    print(f"{args.messages} messages ({len(payloads)} SPaT/BSM samples), one in flight")
+    print(f"{'layout':<14} {'p50 us':>8} {'p99 us':>8} {'mean us':>8} {'CPU us/msg':>11} {'lost':>5}")
+    for name, processes in layouts(ack_socket.getsockname()).items():
+        latencies, lost, cpu_s = run_layout(processes, payloads, ack_socket, args.messages)
+        print(f"{name:<14} {percentile(latencies, 0.5) * 1e6:8.1f} {percentile(latencies, 0.99) * 1e6:8.1f} "
+              f"{sum(latencies) / len(latencies) * 1e6:8.1f} {cpu_s / args.messages * 1e6:11.1f} {lost:5d}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pipeline layout latency benchmark")
+    parser.add_argument("--messages", type=int, default=5000, help="Messages per layout.")
+    main(parser.parse_args())
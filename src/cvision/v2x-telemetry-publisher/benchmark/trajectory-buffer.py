@@ -0,0 +1,98 @@
+"""
+**********************************************************************************
+trajectory-buffer.py
+Created by: Debashis Das
+Argonne National Laboratory
+Transportation and Power Systems Division
+
+**********************************************************************************
+Description:
+------------
+Memory and throughput of TrajectoryBuffer.py for a large fleet: every vehicle
+sends noisy 10 Hz BSMs along a straight line. Reports the buffer footprint,
+BSM ingest rate, per-vehicle and all-vehicle estimate cost, and the
+dead-reckoning position error against the noise-free track.
+
+Usage:
+    python3 trajectory-buffer.py
+    python3 trajectory-buffer.py --vehicles 10000 --seconds 5
+**********************************************************************************
+"""
+
+import argparse
+import math
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from TrajectoryBuffer import EARTH_RADIUS_M, TrajectoryBuffer  # noqa: E402
+
+RATE_HZ = 10
+POSITION_NOISE_M = 1.0
+
+
+def main(args):
+    random.seed(1)
+    buffer = TrajectoryBuffer(max_vehicles=args.vehicles)
+    print(f"Buffer: {args.vehicles} vehicles x {buffer.history} samples = {buffer.data.nbytes / 1e6:.1f} MB (fixed)")
+
+    vehicles = [{
+        "id": str(index),
+        "lat": 42.30 + random.uniform(-0.01, 0.01),
+        "lon": -83.70 + random.uniform(-0.01, 0.01),
+        "speed": random.uniform(5.0, 20.0),
+        "heading": random.uniform(0.0, 360.0),
+    } for index in range(args.vehicles)]
+
+    start_time = 1_700_000_000.0
+    steps = int(args.seconds * RATE_HZ)
+    noise_deg = math.degrees(POSITION_NOISE_M / EARTH_RADIUS_M)
+
+    ingest_start = time.perf_counter()
+    for step in range(steps):
+        now = start_time + step / RATE_HZ
+        for vehicle in vehicles:
+            distance = vehicle["speed"] / RATE_HZ
+            heading = math.radians(vehicle["heading"])
+            vehicle["lat"] += math.degrees(distance * math.cos(heading) / EARTH_RADIUS_M)
+            vehicle["lon"] += math.degrees(distance * math.sin(heading) / (EARTH_RADIUS_M * math.cos(math.radians(vehicle["lat"]))))
+            buffer.add(vehicle["id"], now % 60.0,
+                       vehicle["lat"] + random.gauss(0.0, noise_deg), vehicle["lon"] + random.gauss(0.0, noise_deg),
+                       vehicle["speed"], vehicle["heading"], now)
+    ingest_s = time.perf_counter() - ingest_start
+    print(f"Ingest: {steps * args.vehicles / ingest_s:,.0f} BSM/s")
+
+    at_time = start_time + (steps - 1) / RATE_HZ + 0.5  # half a second after the last BSM
+    single_start = time.perf_counter()
+    for vehicle in vehicles[:1000]:
+        buffer.estimate(vehicle["id"], at_time)
+    single_us = (time.perf_counter() - single_start) / min(1000, len(vehicles)) * 1e6
+    print(f"estimate(): {single_us:.1f} us per vehicle")
+
+    all_start = time.perf_counter()
+    vehicle_ids, states = buffer.estimate_all(at_time)
+    all_ms = (time.perf_counter() - all_start) * 1000
+    print(f"estimate_all(): {all_ms:.1f} ms for {len(vehicle_ids)} vehicles")
+
+    errors = []
+    for vehicle, state in zip(vehicles, states):
+        distance = vehicle["speed"] * 0.5
+        heading = math.radians(vehicle["heading"])
+        true_lat = vehicle["lat"] + math.degrees(distance * math.cos(heading) / EARTH_RADIUS_M)
+        true_lon = vehicle["lon"] + math.degrees(distance * math.sin(heading) / (EARTH_RADIUS_M * math.cos(math.radians(true_lat))))
+        d_north = math.radians(state[1] - true_lat) * EARTH_RADIUS_M
+        d_east = math.radians(state[2] - true_lon) * EARTH_RADIUS_M * math.cos(math.radians(true_lat))
+        errors.append(math.hypot(d_north, d_east))
+    errors.sort()
+    print(f"Dead-reckoning error at +0.5 s (noise {POSITION_NOISE_M} m): "
+          f"median {errors[len(errors) // 2]:.2f} m, p95 {errors[int(len(errors) * 0.95)]:.2f} m")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="TrajectoryBuffer memory/throughput benchmark")
+    parser.add_argument("--vehicles", type=int, default=10000)
+    parser.add_argument("--seconds", type=float, default=3.0)
+    args = parser.parse_args()
+    main(args)
@@ -0,0 +1,114 @@
+"""
+**********************************************************************************
+fanout-client.py
+Created by: Debashis Das
+Argonne National Laboratory
+Transportation and Power Systems Division
+
+**********************************************************************************
+Description:
+------------
+Local subscriber for the publisher's fan-out server (FanoutServer.py). It has
+no cloud connection: it subscribes over UDP, applies the snapshots/deltas to a
+local mirror and prints every change.
+
+Usage:
+    python3 fanout-client.py
+    python3 fanout-client.py --intersection 29080
+    python3 fanout-client.py --vehicle 601 --paths vehicle_status
+    python3 fanout-client.py --near 41.7107 -87.9920 150
+**********************************************************************************
+"""
+
+import argparse
+import json
+import os
+import platform
+import socket
+import time
+from DeltaEncoder import apply_patch
+import JsonCodec
+
+RENEW_PERIOD_S = 10.0
+
+
+def load_config():
+    current_os = platform.system()
+
+    if current_os == "Linux":
+        config_file_path = os.path.join(os.path.expanduser("~"), "Desktop", "c-vision", "config", "anl-master-config.json")
+
+    elif current_os == "Windows":
+        config_file_path = os.path.join("C:\\", "Users", "ddas", "Documents", "c-vision", "config", "anl-master-config.json")
+
+    else:
+        raise OSError(f"Unsupported operating system: {current_os}")
+
+    with open(config_file_path, "r", encoding="utf-8") as config_file:
+        return json.load(config_file)
+
+
+def build_filters(args) -> dict:
+    filters = {}
+    if args.paths:
+        filters["paths"] = args.paths
+    if args.intersection:
+        filters["intersectionIds"] = args.intersection
+    if args.vehicle:
+        filters["vehicleIds"] = args.vehicle
+    if args.near:
+        lat, lon, radius_m = args.near
+        filters["near"] = {"lat": lat, "lon": lon, "radius_m": radius_m}
+    return filters
+
+
+def main(args):
+    config = load_config()
+    server = (config["IPAddress"]["HostIp"], config["PortNumber"]["FanoutServer"])
+
+    client_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    client_socket.settimeout(1.0)
+
+    subscribe_message = JsonCodec.dumps({"type": "subscribe", "filters": build_filters(args)})
+    mirror = {}
+    last_renew = 0.0
+
+    print(f"Subscribing to {server[0]}:{server[1]}")
+    try:
+        while True:
+            if time.monotonic() - last_renew >= RENEW_PERIOD_S:
+                client_socket.sendto(subscribe_message, server)
+                last_renew = time.monotonic()
+
+            try:
+                data, _ = client_socket.recvfrom(65535)
+            except socket.timeout:
+                continue
+
+            update = JsonCodec.loads(data)
+            path = update["path"]
+            if update["snapshot"]:
+                mirror[path] = update["data"]
+            else:
+                mirror[path] = apply_patch(mirror.get(path), update["data"])
+
+            receive_latency_ms = time.time() * 1000 - mirror[path].get("timestamp", time.time() * 1000)
+            kind = "snapshot" if update["snapshot"] else "delta"
+            print(f"{path} ({kind}, {receive_latency_ms:.1f} ms): {update['data']}")
+
+    except KeyboardInterrupt:
+        print("\nStopped by user.")
+
+    finally:
+        client_socket.sendto(JsonCodec.dumps({"type": "unsubscribe"}), server)
+        client_socket.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local fan-out subscriber (no cloud connection)")
+    parser.add_argument("--paths", nargs="+", choices=["vehicle_status", "intersection_status"], help="Record types to receive.")
+    parser.add_argument("--intersection", nargs="+", help="Only these intersection IDs.")
+    parser.add_argument("--vehicle", nargs="+", help="Only these vehicle IDs.")
+    parser.add_argument("--near", nargs=3, type=float, metavar=("LAT", "LON", "RADIUS_M"), help="Only vehicles within a radius.")
+    args = parser.parse_args()
+    main(args)
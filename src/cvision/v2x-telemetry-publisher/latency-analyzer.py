@@ -0,0 +1,178 @@
+"""
+**********************************************************************************
+latency-analyzer.py
+Created by: Debashis Das
+Argonne National Laboratory
+Transportation and Power Systems Division
+
+**********************************************************************************
+Description:
+------------
+Collects the hop records sent by the pipeline stages started with `--trace`
+(map-spat-sender.py, listener.js, v2x-telemetry-publisher.py; see
+LatencyTrace.py) and breaks the end-to-end latency down per hop.
+
+Records are grouped by trace key. A trace is closed once no new hop has
+arrived for `--settle` seconds; every pair of consecutive hops present in it
+gives one leg sample. Legs measured inside one process use the monotonic
+timestamps, legs that cross processes/hosts use wall clocks (so they include
+clock offset between hosts - keep them NTP-synced).
+
+Usage:
+    python3 latency-analyzer.py
+    python3 latency-analyzer.py --report 30 --csv latency.csv
+**********************************************************************************
+"""
+
+import argparse
+import collections
+import json
+import math
+import os
+import platform
+import socket
+import time
+from typing import Dict, List
+from LatencyTrace import HOPS
+import JsonCodec
+
+HOP_ORDER = {hop: index for index, hop in enumerate(HOPS)}
+END_TO_END = "end_to_end"
+
+
+def load_config():
+    current_os = platform.system()
+
+    if current_os == "Linux":
+        config_file_path = os.path.join(os.path.expanduser("~"), "Desktop", "c-vision", "config", "anl-master-config.json")
+
+    elif current_os == "Windows":
+        config_file_path = os.path.join("C:\\", "Users", "ddas", "Documents", "c-vision", "config", "anl-master-config.json")
+
+    else:
+        raise OSError(f"Unsupported operating system: {current_os}")
+
+    with open(config_file_path, "r", encoding="utf-8") as config_file:
+        return json.load(config_file)
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    index = min(len(sorted_values) - 1, max(0, math.ceil(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def leg_samples(hops: Dict[str, dict]) -> Dict[str, float]:
+    """Return {leg name: milliseconds} for one closed trace."""
+    present = sorted((hop for hop in hops if hop in HOP_ORDER), key=HOP_ORDER.get)
+    samples = {}
+    for earlier, later in zip(present, present[1:]):
+        first, second = hops[earlier], hops[later]
+        if first["source"] == second["source"] and first.get("mono") is not None and second.get("mono") is not None:
+            delta = second["mono"] - first["mono"]
+        else:
+            delta = second["wall"] - first["wall"]
+        samples[f"{earlier}->{later}"] = delta * 1000.0
+    if len(present) > 1:
+        samples[END_TO_END] = (hops[present[-1]]["wall"] - hops[present[0]]["wall"]) * 1000.0
+    return samples
+
+
+class LatencyAnalyzer:
+    """Groups hop records into traces and keeps per-leg latency samples."""
+    def __init__(self, settle_s: float = 2.0, max_samples: int = 100000, csv_file=None):
+        self.settle_s = settle_s
+        self.open_traces: Dict[str, dict] = {}
+        self.last_hop_time: Dict[str, float] = {}
+        self.samples_by_leg: Dict[str, collections.deque] = collections.defaultdict(
+            lambda: collections.deque(maxlen=max_samples))
+        self.csv_file = csv_file
+        if csv_file is not None:
+            csv_file.write("key,leg,latency_ms\n")
+
+    def add(self, record: dict, now: float):
+        key, hop = record.get("key"), record.get("hop")
+        if key is None or hop is None or record.get("wall") is None:
+            return
+        # The first report of a hop wins (e.g. retransmitted MAPs).
+        self.open_traces.setdefault(key, {}).setdefault(hop, record)
+        self.last_hop_time[key] = now
+
+    def close_idle(self, now: float) -> int:
+        """Close traces without new hops for `settle_s`; return how many were closed."""
+        idle = [key for key, last in self.last_hop_time.items() if now - last >= self.settle_s]
+        for key in idle:
+            del self.last_hop_time[key]
+            for leg, value in leg_samples(self.open_traces.pop(key)).items():
+                self.samples_by_leg[leg].append(value)
+                if self.csv_file is not None:
+                    self.csv_file.write(f"{key},{leg},{value:.3f}\n")
+        return len(idle)
+
+    def report(self) -> str:
+        def leg_order(leg):
+            if leg == END_TO_END:
+                return (len(HOPS), 0)
+            earlier, later = leg.split("->")
+            return (HOP_ORDER[earlier], HOP_ORDER[later])
+
+        lines = [f"{'leg':<40}{'count':>8}{'p50':>10}{'p90':>10}{'p99':>10}{'max':>10}   (ms)"]
+        for leg in sorted(self.samples_by_leg, key=leg_order):
+            values = sorted(self.samples_by_leg[leg])
+            if not values:
+                continue
+            lines.append(f"{leg:<40}{len(values):>8}{percentile(values, 0.5):>10.1f}"
+                         f"{percentile(values, 0.9):>10.1f}{percentile(values, 0.99):>10.1f}{values[-1]:>10.1f}")
+        return "\n".join(lines)
+
+
+def main(args):
+    config = load_config()
+    host_ip = config["IPAddress"]["HostIp"]
+    port = args.port or config["PortNumber"]["LatencyAnalyzer"]
+
+    analyzer_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    analyzer_socket.bind((host_ip, port))
+    analyzer_socket.settimeout(0.5)
+
+    csv_file = open(args.csv, "w", encoding="utf-8") if args.csv else None
+    analyzer = LatencyAnalyzer(args.settle, csv_file=csv_file)
+    print(f"Collecting hop records on {host_ip}:{port}")
+
+    next_report = time.monotonic() + args.report
+    next_close = 0.0
+    try:
+        while True:
+            try:
+                data, _ = analyzer_socket.recvfrom(2048)
+                analyzer.add(JsonCodec.loads(data), time.monotonic())
+            except socket.timeout:
+                pass
+            except ValueError:
+                continue
+
+            now = time.monotonic()
+            if now >= next_close:
+                analyzer.close_idle(now)
+                next_close = now + 0.5
+            if now >= next_report:
+                print(analyzer.report(), "\n")
+                next_report = now + args.report
+
+    except KeyboardInterrupt:
+        analyzer.close_idle(float("inf"))
+        print(analyzer.report())
+    finally:
+        analyzer_socket.close()
+        if csv_file is not None:
+            csv_file.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-hop latency breakdown of traced V2X messages")
+    parser.add_argument("--port", type=int, default=0, help="UDP port (default: PortNumber.LatencyAnalyzer in the config).")
+    parser.add_argument("--report", type=float, default=10.0, help="Seconds between percentile reports.")
+    parser.add_argument("--settle", type=float, default=2.0, help="Close a trace after this many seconds without new hops.")
+    parser.add_argument("--csv", help="Also write every leg sample to this CSV file.")
+    args = parser.parse_args()
+    main(args)
@@ -0,0 +1,61 @@
+"""
+**********************************************************************************
+test_bsm_batch.py
+Created by: Debashis Das
+Argonne National Laboratory
+Transportation and Power Systems Division
+
+**********************************************************************************
+Description:
+------------
+Vehicle slots of BsmBatch.py: vehicles silent for `forget_after_s` are
+forgotten and their slots reused, so the per-vehicle state stays bounded
+by the vehicles seen recently.
+
+Usage:
+    python3 -m pytest test/test_bsm_batch.py
+**********************************************************************************
+"""
+
+import json
+import os
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, ".."))
+from BsmBatch import BsmBatchProcessor  # noqa: E402
+
+DECODER = os.path.join(HERE, "..", "..", "message-decoder")
+
+
+def bsms(vehicle_ids):
+    with open(os.path.join(DECODER, "sample-bsm.json")) as f:
+        sample = json.load(f)
+    messages = []
+    for vehicle_id in vehicle_ids:
+        message = json.loads(json.dumps(sample))
+        message["BasicVehicle"]["temporaryID"] = vehicle_id
+        messages.append(message)
+    return messages
+
+
+def test_silent_vehicles_are_forgotten_and_slots_reused():
+    processor = BsmBatchProcessor(refresh_s=1.0, capacity=4, forget_after_s=10.0)
+    assert set(processor.process(bsms(range(1, 9)), now=100.0)) == {str(i) for i in range(1, 9)}
+    assert len(processor.slot_by_id) == 8
+
+    # Vehicles 1-4 keep sending, 5-8 went away.
+    for second in range(1, 12):
+        processor.process(bsms(range(1, 5)), now=100.0 + second)
+    assert sorted(processor.slot_by_id) == [1, 2, 3, 4]
+    assert processor.forgotten == 4
+
+    # New vehicles take the freed slots instead of growing the arrays.
+    capacity = len(processor.last_write)
+    records = processor.process(bsms(range(11, 15)), now=112.0)
+    assert set(records) == {"11", "12", "13", "14"}
+    assert len(processor.slot_by_id) == 8 and len(processor.last_write) == capacity
+    assert sorted(processor.slot_by_id.values()) == list(range(8))
+
+    # A forgotten vehicle that comes back is published as new.
+    assert "5" in processor.process(bsms([5]), now=113.0)
@@ -0,0 +1,109 @@
+"""
+**********************************************************************************
+test_delta_encoder.py
+Created by: Debashis Das
+Argonne National Laboratory
+Transportation and Power Systems Division
+
+**********************************************************************************
+Description:
+------------
+DeltaEncoder.py: patches applied with `apply_patch` reproduce the encoded
+records (changed, added and removed leaves, lists), snapshots are sent first
+and every `snapshot_interval_s`, and paths that are no longer written expire.
+
+Usage:
+    python3 -m pytest test/test_delta_encoder.py
+**********************************************************************************
+"""
+
+import copy
+import os
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, ".."))
+from DeltaEncoder import DeltaEncoder, DeltaSink, apply_patch, diff, flatten  # noqa: E402
+
+RECORDS = [
+    {"timestamp": 1, "phaseStates": [{"phase": 2, "state": "red", "minEndTime": 5.0},
+                                     {"phase": 4, "state": "protected_green", "minEndTime": 12.5}]},
+    {"timestamp": 2, "phaseStates": [{"phase": 2, "state": "red", "minEndTime": 4.9},
+                                     {"phase": 4, "state": "yellow", "minEndTime": 3.0}]},
+    {"timestamp": 3, "phaseStates": [{"phase": 2, "state": "protected_green"},
+                                     {"phase": 4, "state": "yellow", "minEndTime": 2.9}],
+     "stale": True},
+    {"timestamp": 4, "phaseStates": [{"phase": 2, "state": "protected_green"},
+                                     {"phase": 4, "state": "red", "minEndTime": 30.0}]},
+]
+
+
+def test_flatten_and_diff():
+    leaves = flatten(RECORDS[0])
+    assert leaves["phaseStates/1/state"] == "protected_green"
+    patch = diff(leaves, flatten(RECORDS[2]))
+    assert patch["phaseStates/0/minEndTime"] is None
+    assert patch["stale"] is True
+    assert "phaseStates/0/phase" not in patch
+
+
+def test_patches_reproduce_the_records():
+    encoder = DeltaEncoder(snapshot_interval_s=30.0)
+    mirror = None
+    for now, record in enumerate(RECORDS):
+        is_snapshot, payload = encoder.encode("intersection_status/1", copy.deepcopy(record), now=float(now))
+        assert is_snapshot == (now == 0)
+        mirror = copy.deepcopy(payload) if is_snapshot else apply_patch(mirror, payload)
+        assert mirror == record
+
+
+def test_unchanged_record_gives_an_empty_patch():
+    encoder = DeltaEncoder()
+    encoder.encode("vehicle_status/1", RECORDS[0], now=0.0)
+    assert encoder.encode("vehicle_status/1", RECORDS[0], now=1.0) == (False, {})
+
+
+def test_snapshot_every_interval():
+    encoder = DeltaEncoder(snapshot_interval_s=30.0)
+    assert encoder.encode("vehicle_status/1", RECORDS[0], now=0.0)[0]
+    assert not encoder.encode("vehicle_status/1", RECORDS[1], now=29.0)[0]
+    assert encoder.encode("vehicle_status/1", RECORDS[2], now=30.0) == (True, RECORDS[2])
+
+
+class UpdateSink:
+    """Records the multi-path updates a DeltaSink sends."""
+    def __init__(self):
+        self.updates = []
+
+    def write(self, path: str, data: dict):
+        self.updates.append((path, {"": data}))
+
+    def update(self, path: str, patch: dict):
+        self.updates.append((path, patch))
+
+
+def test_delta_sink_sends_a_batch_as_one_update():
+    sink = UpdateSink()
+    delta = DeltaSink(sink)
+    delta.write_many("vehicle_status", {"1": {"speed": 1.0, "lane": 2}, "2": {"speed": 3.0}})
+    delta.write_many("vehicle_status", {"1": {"speed": 1.5, "lane": 2}, "2": {"speed": 3.0}, "3": {"speed": 0.0}})
+
+    assert sink.updates == [
+        ("vehicle_status", {"1": {"speed": 1.0, "lane": 2}, "2": {"speed": 3.0}}),
+        ("vehicle_status", {"1/speed": 1.5, "3": {"speed": 0.0}}),
+    ]
+
+
+def test_paths_not_written_expire():
+    encoder = DeltaEncoder(forget_after_s=300.0)
+    for vehicle_id in range(100):
+        encoder.encode(f"vehicle_status/{vehicle_id}", RECORDS[0], now=float(vehicle_id))
+    encoder.encode("intersection_status/1", RECORDS[0], now=350.0)
+
+    # Vehicles 0-49 were last written more than 300 s before t=350.
+    assert len(encoder.last_leaves) == 51
+    assert "vehicle_status/49" not in encoder.last_snapshot_time
+    assert "vehicle_status/50" in encoder.last_leaves
+    assert encoder.expired == 50
+    # An expired vehicle that comes back starts with a snapshot.
+    assert encoder.encode("vehicle_status/0", RECORDS[1], now=351.0) == (True, RECORDS[1])
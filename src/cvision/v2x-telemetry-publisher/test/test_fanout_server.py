@@ -0,0 +1,108 @@
+"""
+**********************************************************************************
+test_fanout_server.py
+Created by: Debashis Das
+Argonne National Laboratory
+Transportation and Power Systems Division
+
+**********************************************************************************
+Description:
+------------
+FanoutServer.py over a loopback socket: the snapshot on subscribe, deltas
+after it, the snapshot of newly matching records when a renewal changes the
+filters, the periodic resync snapshot and the expiry of records that are no
+longer written.
+
+Usage:
+    python3 -m pytest test/test_fanout_server.py
+**********************************************************************************
+"""
+
+import os
+import socket
+import sys
+import time
+
+import pytest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, ".."))
+from FanoutServer import FORGET_AFTER_S, SNAPSHOT_INTERVAL_S, FanoutServer  # noqa: E402
+import JsonCodec  # noqa: E402
+
+
+@pytest.fixture
+def server():
+    server = FanoutServer("127.0.0.1", 0)
+    yield server
+    server.socket.close()
+
+
+@pytest.fixture
+def client():
+    client = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    client.bind(("127.0.0.1", 0))
+    client.settimeout(0.2)
+    yield client
+    client.close()
+
+
+def receive_all(client) -> list:
+    updates = []
+    while True:
+        try:
+            data, _ = client.recvfrom(65535)
+        except socket.timeout:
+            return updates
+        update = JsonCodec.loads(data)
+        updates.append((update["path"], update["snapshot"], update["data"]))
+
+
+def test_snapshot_then_deltas(server, client):
+    server.write("vehicle_status/1", {"speed": 1.0, "lane": 2})
+    server.subscribe(client.getsockname(), {})
+    assert receive_all(client) == [("vehicle_status/1", True, {"speed": 1.0, "lane": 2})]
+
+    server.write("vehicle_status/1", {"speed": 2.0, "lane": 2})
+    server.write("vehicle_status/1", {"speed": 2.0, "lane": 2})
+    assert receive_all(client) == [("vehicle_status/1", False, {"speed": 2.0})]
+
+
+def test_renewal_with_new_filters_sends_newly_matching_records(server, client):
+    server.write("vehicle_status/1", {"speed": 1.0})
+    server.write("vehicle_status/2", {"speed": 3.0})
+    server.subscribe(client.getsockname(), {"vehicleIds": ["1"]})
+    assert receive_all(client) == [("vehicle_status/1", True, {"speed": 1.0})]
+
+    # Same filters: a plain renewal.
+    server.subscribe(client.getsockname(), {"vehicleIds": ["1"]})
+    assert receive_all(client) == []
+
+    server.subscribe(client.getsockname(), {"vehicleIds": ["1", "2"]})
+    assert receive_all(client) == [("vehicle_status/2", True, {"speed": 3.0})]
+    server.write("vehicle_status/2", {"speed": 4.0})
+    assert receive_all(client) == [("vehicle_status/2", False, {"speed": 4.0})]
+
+
+def test_subscribers_are_resynced_periodically(server, client):
+    server.write("intersection_status/29080", {"phaseStates": [{"phase": 2, "state": "red"}]})
+    server.subscribe(client.getsockname(), {"paths": ["intersection_status"]})
+    receive_all(client)
+
+    server.service(time.monotonic() + SNAPSHOT_INTERVAL_S / 2)
+    assert receive_all(client) == []
+    server.service(time.monotonic() + SNAPSHOT_INTERVAL_S)
+    assert receive_all(client) == [("intersection_status/29080", True, {"phaseStates": [{"phase": 2, "state": "red"}]})]
+
+
+def test_records_not_written_expire(server):
+    for vehicle_id in range(100):
+        server.write(f"vehicle_status/{vehicle_id}", {"speed": 0.0})
+    server.written_at["vehicle_status/0"] -= FORGET_AFTER_S + 1.0
+    server.written_at.move_to_end("vehicle_status/0", last=False)
+
+    server.service(time.monotonic())
+    assert len(server.records) == 99 and "vehicle_status/0" not in server.records
+    server.service(time.monotonic() + FORGET_AFTER_S + 1.0)
+    assert not server.records and not server.written_at
+    assert server.expired == 100
@@ -0,0 +1,104 @@
+"""
+**********************************************************************************
+test_geofence_subscriptions.py
+Created by: Debashis Das
+Argonne National Laboratory
+Transportation and Power Systems Division
+
+**********************************************************************************
+Description:
+------------
+GeofenceIndex.py (vehicle-listener.py, infrastructure-to-cloud-interface):
+enter/update/leave events of radius, region and vehicle-following
+subscriptions, removal of vehicles, and grid queries that agree with a scan
+of all vehicles.
+
+Usage:
+    python3 -m pytest test/test_geofence_subscriptions.py
+**********************************************************************************
+"""
+
+import os
+import random
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "..", "infrastructure-to-cloud-interface"))
+from GeofenceIndex import METERS_PER_DEGREE, GeofenceIndex, GeofenceSubscriptions, distance_m  # noqa: E402
+
+CENTER = (41.7107, -87.9920)
+
+
+def north_of_center(meters: float) -> dict:
+    return {"lat": CENTER[0] + meters / METERS_PER_DEGREE, "lon": CENTER[1]}
+
+
+class Events:
+    def __init__(self):
+        self.events = []
+
+    def __call__(self, name, event, vehicle_id, record):
+        self.events.append((name, event, vehicle_id))
+
+    def take(self) -> list:
+        events, self.events = self.events, []
+        return events
+
+
+def test_radius_enter_update_leave():
+    events = Events()
+    subscriptions = GeofenceSubscriptions(GeofenceIndex(cell_size_m=50.0))
+    subscriptions.add_radius("stop-bar", 100.0, events, center=CENTER)
+
+    subscriptions.on_vehicle("601", north_of_center(300.0))
+    assert events.take() == []
+    subscriptions.on_vehicle("601", north_of_center(80.0))
+    subscriptions.on_vehicle("601", north_of_center(20.0))
+    assert events.take() == [("stop-bar", "enter", "601"), ("stop-bar", "update", "601")]
+    subscriptions.on_vehicle("601", north_of_center(150.0))
+    assert events.take() == [("stop-bar", "leave", "601")]
+    assert subscriptions.members("stop-bar") == set()
+
+
+def test_region_and_removed_vehicles():
+    events = Events()
+    subscriptions = GeofenceSubscriptions()
+    subscriptions.on_vehicle("601", north_of_center(10.0))
+    # Vehicles already inside enter when the region is registered.
+    subscriptions.add_region("campus", CENTER[0] - 0.001, CENTER[1] - 0.001, CENTER[0] + 0.001, CENTER[1] + 0.001, events)
+    assert events.take() == [("campus", "enter", "601")]
+
+    subscriptions.on_vehicle("601", None)
+    assert events.take() == [("campus", "leave", "601")]
+    assert "601" not in subscriptions.index.positions
+
+
+def test_following_fence_moves_with_its_vehicle():
+    events = Events()
+    subscriptions = GeofenceSubscriptions(GeofenceIndex(cell_size_m=50.0))
+    subscriptions.add_radius("ego-100m", 100.0, events, follow_vehicle="265012")
+    subscriptions.on_vehicle("601", north_of_center(500.0))
+    subscriptions.on_vehicle("265012", north_of_center(0.0))
+    assert events.take() == []
+
+    # The ego vehicle drives up to the other one, then past it.
+    subscriptions.on_vehicle("265012", north_of_center(450.0))
+    assert events.take() == [("ego-100m", "enter", "601")]
+    subscriptions.on_vehicle("265012", north_of_center(700.0))
+    assert events.take() == [("ego-100m", "leave", "601")]
+    assert "265012" not in subscriptions.members("ego-100m")
+
+
+def test_grid_queries_match_a_full_scan():
+    rng = random.Random(7)
+    index = GeofenceIndex(cell_size_m=100.0)
+    positions = {str(i): (CENTER[0] + rng.uniform(-0.01, 0.01), CENTER[1] + rng.uniform(-0.01, 0.01))
+                 for i in range(2000)}
+    for vehicle_id, (lat, lon) in positions.items():
+        index.update(vehicle_id, lat, lon)
+
+    expected = {v for v, (lat, lon) in positions.items() if distance_m(CENTER[0], CENTER[1], lat, lon) <= 250.0}
+    assert set(index.query_radius(CENTER[0], CENTER[1], 250.0)) == expected
+    box = (CENTER[0] - 0.002, CENTER[1] - 0.003, CENTER[0] + 0.001, CENTER[1])
+    expected = {v for v, (lat, lon) in positions.items() if box[0] <= lat <= box[2] and box[1] <= lon <= box[3]}
+    assert set(index.query_box(*box)) == expected
@@ -0,0 +1,108 @@
+"""
+**********************************************************************************
+test_history_writer.py
+Created by: Debashis Das
+Argonne National Laboratory
+Transportation and Power Systems Division
+
+**********************************************************************************
+Description:
+------------
+HistoryWriter.py (v2x-data-sender.py, infrastructure-to-cloud-interface):
+hour/day bucket names and bounds, keys that sort by time and stay unique and
+monotonic, buffered records written as one update, and retention deleting
+whole expired buckets and legacy entries. Firebase is replaced by a recording
+reference.
+
+Usage:
+    python3 -m pytest test/test_history_writer.py
+**********************************************************************************
+"""
+
+import os
+import sys
+from datetime import datetime, timezone
+
+import pytest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "..", "infrastructure-to-cloud-interface"))
+import HistoryWriter  # noqa: E402
+from HistoryWriter import HistoryWriter as Writer, bucket_end, bucket_name, bucket_start, expire  # noqa: E402
+
+# 2026-10-19 14:59:59.999 UTC
+LAST_MS_OF_HOUR = int(datetime(2026, 10, 19, 14, 59, 59, 999000, tzinfo=timezone.utc).timestamp() * 1000)
+
+
+class RecordingDb:
+    """Stands in for `firebase_admin.db`: one tree of child names and a log of updates."""
+    def __init__(self, children=None):
+        self.children = children or {}
+        self.updates = []
+
+    def reference(self, path):
+        return RecordingReference(self, path)
+
+
+class RecordingReference:
+    def __init__(self, database, path):
+        self.database = database
+        self.path = path
+
+    def update(self, values):
+        self.database.updates.append((self.path, values))
+
+    def get(self, shallow=False):
+        return self.database.children
+
+
+def test_bucket_names_and_bounds():
+    assert bucket_name(LAST_MS_OF_HOUR) == "2026-10-19T14"
+    assert bucket_name(LAST_MS_OF_HOUR + 1) == "2026-10-19T15"
+    assert bucket_name(LAST_MS_OF_HOUR, "day") == "2026-10-19"
+    assert bucket_start("2026-10-19T14") == datetime(2026, 10, 19, 14, tzinfo=timezone.utc)
+    assert bucket_end("2026-10-19T14") == datetime(2026, 10, 19, 15, tzinfo=timezone.utc)
+    assert bucket_end("2026-10-19") == datetime(2026, 10, 20, tzinfo=timezone.utc)
+    assert bucket_start("1758223899") is None
+
+
+def test_keys_sort_by_time_and_never_collide():
+    writer = Writer("192.168.26.103", max_pending=1000, flush_interval_s=3600.0)
+    paths = [writer.append({"n": n}, timestamp_ms) for n, timestamp_ms in
+             enumerate([LAST_MS_OF_HOUR - 5, LAST_MS_OF_HOUR - 5, LAST_MS_OF_HOUR, LAST_MS_OF_HOUR + 1])]
+    assert len(set(paths)) == 4 and paths == sorted(paths)
+    assert paths[0] == f"2026-10-19T14/{LAST_MS_OF_HOUR - 5:013d}-192_168_26_103-000001"
+    assert paths[3].startswith("2026-10-19T15/")
+
+    # A wall clock that steps back does not move keys back in time.
+    earlier = writer.append({"n": 4}, LAST_MS_OF_HOUR - 60_000)
+    assert earlier > paths[3]
+
+
+def test_buffered_records_go_out_as_one_update(monkeypatch):
+    database = RecordingDb()
+    monkeypatch.setattr(HistoryWriter, "db", database)
+    writer = Writer("gw", max_pending=3, flush_interval_s=3600.0)
+    paths = [writer.append({"n": n}, LAST_MS_OF_HOUR + n) for n in range(3)]
+
+    assert database.updates == [("v2x_data", {path: {"n": n} for n, path in enumerate(paths)})]
+    assert writer.written == 3 and not writer.pending
+    assert writer.flush() == 0
+
+
+def test_expire_deletes_whole_buckets_and_legacy_entries(monkeypatch):
+    database = RecordingDb({"2026-10-17": True, "2026-10-19T13": True, "2026-10-19T14": True,
+                            "1760000000": True, "1900000000": True})
+    monkeypatch.setattr(HistoryWriter, "db", database)
+    now = datetime(2026, 10, 19, 15, 30, tzinfo=timezone.utc).timestamp()
+
+    expired = expire(3600.0, now=now)
+
+    # The cut-off is 14:30: the 14:00 bucket still holds records younger than that.
+    assert sorted(expired) == ["1760000000", "2026-10-17", "2026-10-19T13"]
+    assert database.updates == [("v2x_data", {name: None for name in expired})]
+
+
+def test_unknown_bucket_size_is_rejected():
+    with pytest.raises(ValueError):
+        Writer("gw", bucket="minute")
@@ -0,0 +1,71 @@
+"""
+**********************************************************************************
+test_intersection_analytics.py
+Created by: Debashis Das
+Argonne National Laboratory
+Transportation and Power Systems Division
+
+**********************************************************************************
+Description:
+------------
+IntersectionAnalytics.py: `write` on the message path only stores records,
+the tick publishes an intersection's result only when it changed, and the
+timer thread runs the tick.
+
+Usage:
+    python3 -m pytest test/test_intersection_analytics.py
+**********************************************************************************
+"""
+
+import os
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, ".."))
+from IntersectionAnalytics import IntersectionAnalytics, IntersectionModel  # noqa: E402
+from TelemetrySink import MemorySink  # noqa: E402
+
+# One northbound-ingress lane, about 111 m long, stop bar at the reference point.
+MODEL = IntersectionModel("1", 0, 41.0, -87.0, [
+    {"laneId": 1, "approachId": 1, "signalGroups": [2], "points": [(41.0, -87.0), (41.001, -87.0)]}])
+RED = {"phaseStates": [{"phase": 2, "state": "stopAndRemain"}]}
+
+
+def stopped_vehicle(lat: float) -> dict:
+    return {"lat": lat, "lon": -87.0, "speed": 0.0, "heading": 180.0, "timestamp": int(time.time() * 1000)}
+
+
+def test_write_does_not_publish_and_unchanged_results_are_skipped():
+    output = MemorySink()
+    analytics = IntersectionAnalytics({"1": MODEL}, output)
+    analytics.write("intersection_status/1", RED)
+    analytics.write("vehicle_status/7", stopped_vehicle(41.0002))
+    assert output.writes == 0
+
+    analytics.tick(time.time())
+    queues = output.records["intersection_analytics/1"]["queues"]
+    assert queues == [{"approachId": 1, "vehicles": 1, "lengthM": 22.3}]
+
+    analytics.tick(time.time())
+    assert (output.writes, analytics.skipped) == (1, 1)
+
+    analytics.write("vehicle_status/8", stopped_vehicle(41.0004))
+    analytics.tick(time.time())
+    assert output.writes == 2
+    assert output.records["intersection_analytics/1"]["queues"][0]["vehicles"] == 2
+
+
+def test_timer_thread_runs_the_tick():
+    output = MemorySink()
+    analytics = IntersectionAnalytics({"1": MODEL}, output, interval_s=0.05)
+    analytics.write("intersection_status/1", RED)
+    analytics.start()
+    try:
+        deadline = time.monotonic() + 2.0
+        while output.writes == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        analytics.close()
+    assert "intersection_analytics/1" in output.records
+    assert not analytics.thread.is_alive()
@@ -0,0 +1,91 @@
+"""
+**********************************************************************************
+test_intersection_eviction.py
+Created by: Debashis Das
+Argonne National Laboratory
+Transportation and Power Systems Division
+
+**********************************************************************************
+Description:
+------------
+A discovered intersection that IntersectionDiscovery evicts must leave no
+per-intersection state behind in SpatManager, PhasePredictor,
+SequenceTracker, LivenessMonitor, DeltaSink or PublishScheduler.
+
+Usage:
+    python3 -m pytest test/test_intersection_eviction.py
+**********************************************************************************
+"""
+
+import json
+import os
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+PUBLISHER = os.path.join(HERE, "..")
+sys.path.insert(0, PUBLISHER)
+from DeltaEncoder import DeltaSink  # noqa: E402
+from LivenessMonitor import LivenessMonitor  # noqa: E402
+from PhasePredictor import PhasePredictor  # noqa: E402
+from PublishScheduler import PublishScheduler  # noqa: E402
+from SequenceTracker import SequenceTracker  # noqa: E402
+from SpatManager import SpatManager  # noqa: E402
+from TelemetrySink import MultiSink  # noqa: E402
+
+EVICTED = "2351"
+KEPT = "2352"
+
+
+class RecordingSink:
+    """Accepts both snapshots and patches, like FirebaseSink."""
+    def __init__(self):
+        self.paths = set()
+
+    def write(self, path: str, data: dict):
+        self.paths.add(path)
+
+    def update(self, path: str, patch: dict):
+        self.paths.add(path)
+
+
+def spat_for(intersection_id: str) -> dict:
+    with open(os.path.join(PUBLISHER, "sample-spat.json")) as f:
+        message = json.load(f)
+    message["Spat"]["intersectionState"]["intersectionID"] = int(intersection_id)
+    return message
+
+
+def test_eviction_releases_all_intersection_state(monkeypatch):
+    # SpatManager reads intersections-config.json from the working directory.
+    monkeypatch.chdir(PUBLISHER)
+    delta = DeltaSink(RecordingSink())
+    scheduler = PublishScheduler(RecordingSink(), budget_per_s=1000.0)
+    predictor = PhasePredictor()
+    tracker = SequenceTracker()
+    liveness = LivenessMonitor()
+    try:
+        manager = SpatManager(MultiSink([delta, scheduler]), phase_predictor=predictor,
+                              sequence_tracker=tracker, discovery_limit=1, liveness=liveness)
+        manager.manage_spat_data(spat_for(EVICTED))
+        path = f"intersection_status/{EVICTED}"
+        assert path in delta.encoder.last_leaves
+        assert EVICTED in predictor.tracks
+        assert ("intersections", EVICTED) in tracker.sources
+        assert liveness.status("intersections", EVICTED) == "alive"
+
+        # The limit is one discovered intersection: the second one evicts the first.
+        manager.manage_spat_data(spat_for(KEPT))
+
+        assert manager.get_intersection_snapshot(EVICTED) is None
+        assert EVICTED not in predictor.tracks
+        assert ("intersections", EVICTED) not in tracker.sources
+        assert liveness.status("intersections", EVICTED) is None
+        assert path not in delta.encoder.last_leaves
+        assert path not in delta.encoder.last_snapshot_time
+        assert path not in scheduler.last_sent and path not in scheduler.pending
+        assert EVICTED not in scheduler.last_phases
+
+        assert KEPT in predictor.tracks
+        assert f"intersection_status/{KEPT}" in delta.encoder.last_leaves
+    finally:
+        scheduler.stop()
@@ -0,0 +1,73 @@
+"""
+**********************************************************************************
+test_latest_slots.py
+Created by: Debashis Das
+Argonne National Laboratory
+Transportation and Power Systems Division
+
+**********************************************************************************
+Description:
+------------
+LatestSlots.py and the SlotUploader of ControllerRouter.py (gateway,
+infrastructure-to-cloud-interface): per-slot `seq`, the writer `epoch`, ring
+entries, and the `coalesced` count that makes a seq jump caused by coalescing
+add up for `listener.js --slots`.
+
+Usage:
+    python3 -m pytest test/test_latest_slots.py
+**********************************************************************************
+"""
+
+import os
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "..", "infrastructure-to-cloud-interface"))
+from ControllerRouter import SlotUploader  # noqa: E402
+from LatestSlots import LatestSlotWriter  # noqa: E402
+
+PAYLOAD = "0013" + "00" * 16
+
+
+def test_seq_counts_per_slot_within_one_epoch():
+    writer = LatestSlotWriter(ring_size=4)
+    records = [writer.build_update("SPaT", "29080", PAYLOAD) for _ in range(5)]
+    other = writer.build_update("SPaT", "2351", PAYLOAD)
+
+    slots = [update["latest/SPaT/29080"] for update in records]
+    assert [record["seq"] for record in slots] == [1, 2, 3, 4, 5]
+    assert {record["epoch"] for record in slots} == {writer.epoch}
+    assert other["latest/SPaT/2351"]["seq"] == 1
+    # The ring entry is the same record, at seq modulo the ring size.
+    assert records[4]["latest_ring/SPaT/29080/1"] is slots[4]
+    assert "encoding" not in slots[0] and slots[0]["payload"] == PAYLOAD
+
+
+def test_a_restarted_writer_has_a_new_epoch():
+    first = LatestSlotWriter()
+    time.sleep(0.002)
+    second = LatestSlotWriter(encoding="b64")
+    record = second.build_update("BSM", "601", PAYLOAD)["latest/BSM/601"]
+    assert (record["seq"], record["encoding"]) == (1, "b64")
+    assert record["epoch"] > first.epoch
+
+
+def test_coalesced_messages_are_counted_in_the_record():
+    writer = LatestSlotWriter()
+    uploader = SlotUploader()
+    try:
+        # Submitted while the upload thread waits for the lock, as during a slow upload.
+        with uploader.condition:
+            for _ in range(4):
+                uploader.submit(writer.build_update("SPaT", "29080", PAYLOAD))
+            record = uploader.pending["latest/SPaT/29080"]
+            uploader.pending.clear()
+    finally:
+        uploader.stop()
+
+    assert (record["seq"], record["coalesced"]) == (4, 3)
+    # listener.js --slots, after seq 0: missed = seq - last seq - 1 - coalesced.
+    last_seq = 0
+    assert record["seq"] - last_seq - 1 - record["coalesced"] == 0
+    assert uploader.coalesced == 3
@@ -0,0 +1,109 @@
+"""
+**********************************************************************************
+test_liveness_monitor.py
+Created by: Debashis Das
+Argonne National Laboratory
+Transportation and Power Systems Division
+
+**********************************************************************************
+Description:
+------------
+LivenessMonitor.py: timers of every wheel level cascade down and fire on
+their tick, sources turn stale after the timeout and alive on return, lazy
+re-arming, `forget`, and SpatManager only counting accepted SPaT.
+
+Usage:
+    python3 -m pytest test/test_liveness_monitor.py
+**********************************************************************************
+"""
+
+import json
+import os
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+PUBLISHER = os.path.join(HERE, "..")
+sys.path.insert(0, PUBLISHER)
+from LivenessMonitor import ALIVE, STALE, LivenessMonitor, TimerWheel  # noqa: E402
+from SpatManager import SpatManager  # noqa: E402
+
+
+class NullSink:
+    def write(self, path: str, data: dict):
+        pass
+
+
+def test_timers_cascade_and_fire_on_their_tick():
+    start = 12345  # not aligned to any level
+    wheel = TimerWheel(start)
+    # Delays in every level: < 256, < 2^14, < 2^20 and beyond.
+    delays = [1, 200, 255, 256, 300, 5000, 16383, 16384, 70000, (1 << 20) + 5]
+    for delay in delays:
+        wheel.schedule(start + delay, delay)
+
+    fired = {}
+    while wheel.tick < start + delays[-1]:
+        for delay in wheel.advance():
+            fired[delay] = wheel.tick - start
+    assert fired == {delay: delay for delay in delays}
+
+
+def test_stale_after_timeout_and_alive_on_return():
+    changes = []
+    monitor = LivenessMonitor(5.0, tick_s=0.1, now=0.0,
+                              on_change=lambda kind, source_id, status, _: changes.append((source_id, status)))
+    monitor.seen("vehicles", "1", now=0.0)
+    # Seen every second: the one timer re-arms itself and nothing changes.
+    for second in range(1, 20):
+        monitor.seen("vehicles", "1", now=float(second))
+        monitor.poll(float(second))
+    assert changes == [("1", ALIVE)]
+
+    monitor.poll(23.95)
+    assert monitor.status("vehicles", "1") == ALIVE
+    monitor.poll(24.05)
+    assert changes[-1] == ("1", STALE) and monitor.stats()["stale"] == 1
+
+    monitor.seen("vehicles", "1", now=30.0)
+    assert changes[-1] == ("1", ALIVE) and monitor.stats()["stale"] == 0
+
+
+def test_stale_sources_are_forgotten():
+    monitor = LivenessMonitor(5.0, tick_s=0.1, forget_after_s=60.0, now=0.0)
+    monitor.seen("vehicles", "1", now=0.0)
+    monitor.poll(70.0)
+    assert monitor.status("vehicles", "1") is None
+    assert monitor.stats()["forgotten"] == 1
+
+
+def test_forget_drops_a_source_and_ignores_its_timer():
+    changes = []
+    monitor = LivenessMonitor(5.0, tick_s=0.1, now=0.0,
+                              on_change=lambda kind, source_id, status, _: changes.append((source_id, status)))
+    monitor.seen("intersections", "2351", now=0.0)
+    monitor.forget("intersections", "2351")
+    assert monitor.status("intersections", "2351") is None
+
+    # Back before the old timer fires: only the new timer may count.
+    monitor.seen("intersections", "2351", now=1.0)
+    monitor.poll(5.5)
+    assert monitor.status("intersections", "2351") == ALIVE
+    monitor.poll(6.5)
+    assert changes == [("2351", ALIVE), ("2351", ALIVE), ("2351", STALE)]
+    assert monitor.stats() == {"tracked": 1, "stale": 1, "changes": 3, "forgotten": 1}
+
+
+def test_rejected_spat_is_not_a_sign_of_life(monkeypatch):
+    # SpatManager reads intersections-config.json from the working directory.
+    monkeypatch.chdir(PUBLISHER)
+    with open(os.path.join(PUBLISHER, "sample-spat.json")) as f:
+        message = json.load(f)
+    message["Spat"]["intersectionState"]["intersectionID"] = 2351
+
+    monitor = LivenessMonitor()
+    manager = SpatManager(NullSink(), discovery_limit=0, liveness=monitor)
+    try:
+        manager.manage_spat_data(message)
+    except KeyError:
+        pass
+    assert monitor.status("intersections", "2351") is None
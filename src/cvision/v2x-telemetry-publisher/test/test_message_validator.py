@@ -0,0 +1,76 @@
+"""
+**********************************************************************************
+test_message_validator.py
+Created by: Debashis Das
+Argonne National Laboratory
+Transportation and Power Systems Division
+
+**********************************************************************************
+Description:
+------------
+MessageValidator.py against real decoder output: every SPaT the decoder
+wrote in this repo, and the decoder's BSM with the fields the vehicle server
+adds, must be accepted (validation is on by default in the publisher).
+
+Usage:
+    python3 -m pytest test/test_message_validator.py
+**********************************************************************************
+"""
+
+import copy
+import glob
+import json
+import os
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, ".."))
+from MessageValidator import MessageValidator  # noqa: E402
+
+DECODER = os.path.join(HERE, "..", "..", "message-decoder")
+# Fields the vehicle server adds to a BSM after MAP matching.
+VEHICLE_SERVER_FIELDS = {"intersectionID": 29080, "laneID": 3, "approachID": 1,
+                         "signalGroup": 2, "signalStatus": "red"}
+
+
+def load_json(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def decoder_spats():
+    paths = [os.path.join(DECODER, "sample-spat.json")] + sorted(glob.glob(os.path.join(DECODER, "test", "spat-sender", "*.json")))
+    return [(os.path.relpath(path, DECODER), load_json(path)) for path in paths]
+
+
+def test_decoder_spats_are_accepted():
+    validator = MessageValidator()
+    spats = decoder_spats()
+    assert len(spats) >= 2
+    for name, message in spats:
+        assert validator.check(message) is None, name
+
+
+def test_unknown_and_previous_hour_start_times_are_accepted():
+    # The decoder writes -1 for an unknown start and a negative time for a start in the previous hour.
+    validator = MessageValidator()
+    message = load_json(os.path.join(DECODER, "sample-spat.json"))
+    for start_time in (-1.0, -1200.5):
+        spat = copy.deepcopy(message)
+        spat["Spat"]["phaseState"][0]["startTime"] = start_time
+        assert validator.check(spat) is None, start_time
+
+
+def test_vehicle_server_bsm_is_accepted():
+    validator = MessageValidator()
+    bsm = load_json(os.path.join(DECODER, "sample-bsm.json"))
+    bsm["BasicVehicle"].update(VEHICLE_SERVER_FIELDS)
+    assert validator.check(bsm) is None
+
+
+def test_out_of_range_start_time_is_rejected():
+    validator = MessageValidator()
+    spat = load_json(os.path.join(DECODER, "sample-spat.json"))
+    spat["Spat"]["phaseState"][0]["startTime"] = 40000.0
+    error = validator.check(spat)
+    assert error is not None and error.path == "Spat.phaseState[0].startTime"
@@ -0,0 +1,131 @@
+"""
+**********************************************************************************
+test_publish_scheduler.py
+Created by: Debashis Das
+Argonne National Laboratory
+Transportation and Power Systems Division
+
+**********************************************************************************
+Description:
+------------
+PublishScheduler.py: the write budget, priority order (SPaT phase changes
+first), coalescing, batched sends through `write_many`, expiry of paths that
+are no longer written, and the flush of pending records on `stop()`.
+
+Usage:
+    python3 -m pytest test/test_publish_scheduler.py
+**********************************************************************************
+"""
+
+import os
+import sys
+import threading
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, ".."))
+from PublishScheduler import PublishScheduler  # noqa: E402
+
+PHASES_RED = {"phaseStates": [{"phase": 2, "state": "red"}]}
+MOVING_NEAR_INTERSECTION = {"speed": 8.0, "intersection_id": 29080}
+PARKED = {"speed": 0.0, "intersection_id": None}
+
+
+class RecordingSink:
+    """Records every written path, in order, and every multi-path write."""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.paths = []
+        self.batches = []
+
+    def write(self, path: str, data: dict):
+        with self.lock:
+            self.paths.append(path)
+
+    def write_many(self, parent: str, records: dict):
+        with self.lock:
+            self.batches.append((parent, len(records)))
+            self.paths.extend(f"{parent}/{key}" for key in records)
+
+
+def wait_for(condition, timeout: float = 2.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def test_budget_limits_the_write_rate():
+    sink = RecordingSink()
+    scheduler = PublishScheduler(sink, budget_per_s=20.0)
+    try:
+        for index in range(100):
+            scheduler.write(f"map/{index}", {"index": index})
+        time.sleep(0.5)
+        sent = len(sink.paths)
+    finally:
+        scheduler.stop()
+    # A one-second burst, then 20 per second.
+    assert 20 <= sent <= 32
+
+
+def test_phase_changes_go_first():
+    sink = RecordingSink()
+    scheduler = PublishScheduler(sink, budget_per_s=2.0)
+    try:
+        # Queued while the writer thread waits for the lock, so it sees all four at once.
+        with scheduler.condition:
+            scheduler.write("map/1", {"bulk": True})
+            scheduler.write("vehicle_status/1", PARKED)
+            scheduler.write("vehicle_status/2", MOVING_NEAR_INTERSECTION)
+            scheduler.write("intersection_status/1", PHASES_RED)
+        wait_for(lambda: len(sink.paths) >= 2)
+        assert set(sink.paths[:2]) == {"intersection_status/1", "vehicle_status/2"}
+    finally:
+        scheduler.stop()
+    assert sink.paths[2:] == ["vehicle_status/1", "map/1"]
+
+
+def test_pending_records_are_coalesced_per_path():
+    sink = RecordingSink()
+    scheduler = PublishScheduler(sink, budget_per_s=100.0)
+    with scheduler.condition:
+        for speed in range(10):
+            scheduler.write("vehicle_status/1", {"speed": float(speed)})
+    scheduler.stop()
+    assert sink.paths == ["vehicle_status/1"]
+    assert scheduler.stats()["background"]["coalesced"] + scheduler.stats()["active"]["coalesced"] == 9
+
+
+def test_write_many_is_sent_as_one_batch():
+    sink = RecordingSink()
+    scheduler = PublishScheduler(sink, budget_per_s=1000.0)
+    try:
+        scheduler.write_many("vehicle_status", {str(index): PARKED for index in range(50)})
+        wait_for(lambda: len(sink.paths) >= 50)
+    finally:
+        scheduler.stop()
+    assert sink.batches == [("vehicle_status", 50)]
+
+
+def test_stop_writes_pending_records():
+    sink = RecordingSink()
+    scheduler = PublishScheduler(sink, budget_per_s=1.0)
+    for index in range(5):
+        scheduler.write(f"map/{index}", {"index": index})
+    scheduler.stop()
+    assert sorted(sink.paths) == [f"map/{index}" for index in range(5)]
+
+
+def test_paths_not_sent_expire():
+    sink = RecordingSink()
+    scheduler = PublishScheduler(sink, budget_per_s=1000.0, forget_after_s=300.0)
+    try:
+        scheduler.write("intersection_status/1", PHASES_RED)
+        scheduler.write_many("vehicle_status", {str(index): PARKED for index in range(20)})
+        wait_for(lambda: len(sink.paths) >= 21)
+        with scheduler.condition:
+            assert len(scheduler.last_sent) == 21 and "1" in scheduler.last_phases
+            scheduler.expire(time.monotonic() + 301.0)
+            assert not scheduler.last_sent and not scheduler.last_phases
+    finally:
+        scheduler.stop()
@@ -0,0 +1,77 @@
+"""
+**********************************************************************************
+test_sampling_profiler.py
+Created by: Debashis Das
+Argonne National Laboratory
+Transportation and Power Systems Division
+
+**********************************************************************************
+Description:
+------------
+Wait detection of SamplingProfiler.py: an idle worker blocked in a
+multiprocessing Queue.get() (innermost frame Connection._recv, inside
+`read(handle, remaining)`), in time.sleep or in a socket's recvfrom counts
+as `wait`, and a busy thread does not.
+
+Usage:
+    python3 -m pytest test/test_sampling_profiler.py
+**********************************************************************************
+"""
+
+import multiprocessing
+import os
+import socket
+import sys
+import threading
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, ".."))
+from SamplingProfiler import SamplingProfiler  # noqa: E402
+
+
+def sleeper():
+    time.sleep(60)
+
+
+def receive(receiver):
+    while True:
+        data, _ = receiver.recvfrom(65535)
+        if not data:
+            return
+
+
+def busy(running):
+    count = 0
+    while running[0]:
+        count += 1
+
+
+def test_idle_threads_count_as_wait(tmp_path):
+    queue = multiprocessing.Queue()
+    receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    receiver.bind(("127.0.0.1", 0))
+    running = [True]
+    targets = {"queue-worker": (queue.get, ()), "sleeper": (sleeper, ()),
+               "udp-receiver": (receive, (receiver,)), "busy": (busy, (running,))}
+    for name, (target, args) in targets.items():
+        threading.Thread(target=target, args=args, name=name, daemon=True).start()
+    time.sleep(0.2)
+
+    # Samples are taken by hand: the timer would fire only after the test.
+    profiler = SamplingProfiler("test", str(tmp_path), interval_s=60.0)
+    assert profiler.start(120.0)
+    try:
+        for _ in range(5):
+            profiler.sample(sys._getframe())
+            time.sleep(0.01)
+    finally:
+        profiler.stop()
+        running[0] = False
+        queue.put(None)
+        receiver.sendto(b"", receiver.getsockname())
+
+    assert profiler.stage_samples["queue-worker"] == {"wait": 5}
+    assert profiler.stage_samples["sleeper"] == {"wait": 5}
+    assert profiler.stage_samples["udp-receiver"] == {"wait": 5}
+    assert profiler.stage_samples["busy"] == {"other": 5}
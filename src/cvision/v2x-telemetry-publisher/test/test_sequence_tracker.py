@@ -0,0 +1,90 @@
+"""
+**********************************************************************************
+test_sequence_tracker.py
+Created by: Debashis Das
+Argonne National Laboratory
+Transportation and Power Systems Division
+
+**********************************************************************************
+Description:
+------------
+SequenceTracker.py: duplicate, stale and lost frame accounting per source,
+secMark wrap-around, and the periodic report, which runs on the message path
+and must go out as one multi-path write per kind instead of one write per
+source.
+
+Usage:
+    python3 -m pytest test/test_sequence_tracker.py
+**********************************************************************************
+"""
+
+import os
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, ".."))
+from SequenceTracker import MINUTE_MS, SequenceTracker  # noqa: E402
+
+
+class CountingSink:
+    """Counts single writes and multi-path writes separately."""
+    def __init__(self):
+        self.writes = []
+        self.batches = {}
+
+    def write(self, path: str, data: dict):
+        self.writes.append(path)
+
+    def write_many(self, parent: str, records: dict):
+        self.batches[parent] = records
+
+
+def test_duplicates_stale_and_loss_are_counted():
+    tracker = SequenceTracker()
+    accepted = [tracker.accept("intersections", "1", time_ms, now=now) for time_ms, now in
+                [(0, 0.0), (100, 0.1), (100, 0.15), (400, 0.4), (300, 0.45), (500, 0.5)]]
+    assert accepted == [True, True, False, True, False, True]
+    stats = tracker.stats("intersections", "1")
+    # 100 -> 400 at a 100 ms rate misses two frames; 300 arrived late, so one was only reordered.
+    assert stats["intervalMs"] == 100
+    assert (stats["duplicates"], stats["stale"], stats["missed"]) == (1, 1, 1)
+    assert (stats["received"], stats["accepted"]) == (6, 4)
+
+
+def test_sec_mark_wraps_at_the_minute():
+    tracker = SequenceTracker()
+    assert tracker.accept("vehicles", "7", MINUTE_MS - 100, MINUTE_MS, now=0.0)
+    assert tracker.accept("vehicles", "7", 0, MINUTE_MS, now=0.1)
+    stats = tracker.stats("vehicles", "7")
+    assert (stats["stale"], stats["missed"], stats["resets"]) == (0, 0, 0)
+
+
+def test_silence_and_time_jumps_restart_the_source():
+    tracker = SequenceTracker(reset_after_s=30.0)
+    tracker.accept("intersections", "1", 0, now=0.0)
+    assert tracker.accept("intersections", "1", 0, now=40.0)          # silent too long
+    assert tracker.accept("intersections", "1", 3_600_000, now=40.1)  # clock jump
+    assert tracker.stats("intersections", "1")["resets"] == 2
+
+
+def test_report_is_one_write_per_kind():
+    sink = CountingSink()
+    tracker = SequenceTracker(sink, report_interval_s=30.0)
+    for vehicle_id in range(2000):
+        tracker.accept("vehicles", str(vehicle_id), 0, MINUTE_MS, now=0.0)
+    tracker.accept("intersections", "29080", 0, now=0.0)
+
+    tracker.maybe_report(now=tracker.next_report)
+
+    assert sink.writes == []
+    assert len(sink.batches["link_quality/vehicles"]) == 2000
+    assert sink.batches["link_quality/intersections"]["29080"]["accepted"] == 1
+
+
+def test_silent_sources_are_dropped_after_a_report():
+    tracker = SequenceTracker(forget_after_s=300.0)
+    tracker.accept("vehicles", "1", 0, MINUTE_MS, now=0.0)
+    tracker.accept("vehicles", "2", 0, MINUTE_MS, now=290.0)
+    tracker.report(now=310.0)
+    assert tracker.stats("vehicles", "1") is None
+    assert tracker.stats("vehicles", "2") is not None
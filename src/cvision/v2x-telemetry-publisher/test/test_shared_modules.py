@@ -0,0 +1,42 @@
+"""
+**********************************************************************************
+test_shared_modules.py
+Created by: Debashis Das
+Argonne National Laboratory
+Transportation and Power Systems Division
+
+**********************************************************************************
+Description:
+------------
+Modules used by several components are kept as identical copies in each
+component directory, so every component runs from its own directory. This
+test fails as soon as one copy is changed without the others.
+
+Usage:
+    python3 -m pytest test/test_shared_modules.py
+**********************************************************************************
+"""
+
+import filecmp
+import os
+
+import pytest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+CVISION = os.path.join(HERE, "..", "..")
+
+SHARED_MODULES = {
+    "DeltaEncoder.py": ["v2x-telemetry-publisher", "infrastructure-to-cloud-interface"],
+    "JsonCodec.py": ["v2x-telemetry-publisher", "infrastructure-to-cloud-interface"],
+    "LatencyTrace.py": ["v2x-telemetry-publisher", "infrastructure-to-cloud-interface"],
+    "LivenessMonitor.py": ["v2x-telemetry-publisher", "infrastructure-to-cloud-interface"],
+    "SamplingProfiler.py": ["v2x-telemetry-publisher", "infrastructure-to-cloud-interface"],
+    "UplinkCodec.py": ["infrastructure-to-cloud-interface", "conneted-vehicle-to-cloud-interface"],
+}
+
+
+@pytest.mark.parametrize("module", sorted(SHARED_MODULES))
+def test_copies_are_identical(module):
+    first, *others = [os.path.join(CVISION, directory, module) for directory in SHARED_MODULES[module]]
+    for other in others:
+        assert filecmp.cmp(first, other, shallow=False), f"{other} differs from {first}"
@@ -0,0 +1,70 @@
+"""
+**********************************************************************************
+test_status_mirror.py
+Created by: Debashis Das
+Argonne National Laboratory
+Transportation and Power Systems Division
+
+**********************************************************************************
+Description:
+------------
+Round trip from the publisher's `--delta` output (DeltaSink) to the gateway's
+StatusMirror.py (infrastructure-to-cloud-interface): the snapshots and patches
+DeltaSink writes, delivered as the put/patch events Firebase would send to a
+listener, rebuild every record exactly.
+
+Usage:
+    python3 -m pytest test/test_status_mirror.py
+**********************************************************************************
+"""
+
+import copy
+import os
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, ".."))
+sys.path.insert(1, os.path.join(HERE, "..", "..", "infrastructure-to-cloud-interface"))
+from DeltaEncoder import DeltaSink  # noqa: E402
+from StatusMirror import StatusMirror  # noqa: E402
+from test_delta_encoder import RECORDS  # noqa: E402
+
+ROOT = "intersection_status"
+
+
+class ListenerEvents:
+    """Turns sink calls below ROOT into the events `db.reference(ROOT).listen` delivers."""
+    def __init__(self, mirror: StatusMirror):
+        self.mirror = mirror
+
+    def relative(self, path: str) -> str:
+        assert path == ROOT or path.startswith(ROOT + "/")
+        return "/" + path[len(ROOT):].lstrip("/")
+
+    def write(self, path: str, data: dict):
+        self.mirror.apply_event("put", self.relative(path), copy.deepcopy(data))
+
+    def update(self, path: str, patch: dict):
+        self.mirror.apply_event("patch", self.relative(path), copy.deepcopy(patch))
+
+
+def test_delta_writes_rebuild_the_records():
+    mirror = StatusMirror()
+    delta = DeltaSink(ListenerEvents(mirror))
+    for record in RECORDS:
+        delta.write(f"{ROOT}/29080", copy.deepcopy(record))
+        assert mirror.get("29080") == record
+
+
+def test_batched_delta_writes_rebuild_the_records():
+    mirror = StatusMirror()
+    delta = DeltaSink(ListenerEvents(mirror))
+    for first, second in zip(RECORDS, reversed(RECORDS)):
+        delta.write_many(ROOT, {"1": copy.deepcopy(first), "2": copy.deepcopy(second)})
+        assert (mirror.get("1"), mirror.get("2")) == (first, second)
+
+
+def test_patch_into_a_missing_list_creates_a_list():
+    mirror = StatusMirror()
+    mirror.apply_event("patch", "/", {"29080/phaseStates/0/state": "red"})
+    assert mirror.get("29080") == {"phaseStates": [{"state": "red"}]}
@@ -0,0 +1,84 @@
+"""
+**********************************************************************************
+test_trajectory_buffer.py
+Created by: Debashis Das
+Argonne National Laboratory
+Transportation and Power Systems Division
+
+**********************************************************************************
+Description:
+------------
+TrajectoryBuffer.py: the per-vehicle ring wraps and keeps the newest samples
+in order, secMark times unwrap across the minute, duplicates are rejected,
+the least recently updated vehicle is evicted when all slots are taken, and
+dead-reckoning follows a constant-velocity track.
+
+Usage:
+    python3 -m pytest test/test_trajectory_buffer.py
+**********************************************************************************
+"""
+
+import os
+import sys
+
+import pytest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, ".."))
+from TrajectoryBuffer import LAT, TIME, TrajectoryBuffer, sec_mark_time  # noqa: E402
+
+NOW = 1_700_000_010.0  # 10 s into a minute
+
+
+def test_ring_wraps_and_keeps_the_newest_samples_in_order():
+    buffer = TrajectoryBuffer(history=4, max_vehicles=2)
+    for index in range(6):
+        assert buffer.add("601", 1.0 + index * 0.1, 41.0 + index, -87.0, 5.0, 0.0, now=NOW)
+    samples = buffer.samples("601")
+    assert samples[:, LAT].tolist() == [43.0, 44.0, 45.0, 46.0]
+    assert list(samples[:, TIME]) == sorted(samples[:, TIME])
+
+
+def test_duplicates_and_older_samples_are_rejected():
+    buffer = TrajectoryBuffer(history=4, max_vehicles=2)
+    assert buffer.add("601", 5.0, 41.0, -87.0, 5.0, 0.0, now=NOW)
+    assert not buffer.add("601", 5.0, 41.0, -87.0, 5.0, 0.0, now=NOW)
+    assert not buffer.add("601", 4.9, 41.0, -87.0, 5.0, 0.0, now=NOW)
+    assert len(buffer.samples("601")) == 1
+
+
+def test_sec_mark_unwraps_across_the_minute():
+    minute = 1_700_000_040.0  # 1_700_000_040 is a whole minute
+    assert sec_mark_time(59.9, minute + 0.05) == pytest.approx(minute - 0.1)
+    assert sec_mark_time(0.1, minute - 0.05) == pytest.approx(minute + 0.1)
+    assert sec_mark_time(65.535, minute) == minute
+
+
+def test_least_recently_updated_vehicle_is_evicted():
+    buffer = TrajectoryBuffer(history=4, max_vehicles=2)
+    buffer.add("1", 1.0, 41.0, -87.0, 5.0, 0.0, now=NOW)
+    buffer.add("2", 1.0, 42.0, -87.0, 5.0, 0.0, now=NOW)
+    buffer.add("1", 1.1, 41.1, -87.0, 5.0, 0.0, now=NOW)
+    buffer.add("3", 1.0, 43.0, -87.0, 5.0, 0.0, now=NOW)
+
+    assert sorted(buffer.slot_by_vehicle) == ["1", "3"]
+    # The new vehicle starts from an empty ring in the reused slot.
+    assert buffer.samples("3")[:, LAT].tolist() == [43.0]
+    assert len(buffer.samples("2")) == 0
+
+    buffer.remove("1")
+    buffer.add("4", 1.0, 44.0, -87.0, 5.0, 0.0, now=NOW)
+    assert sorted(buffer.slot_by_vehicle) == ["3", "4"]
+
+
+def test_dead_reckoning_follows_a_constant_velocity_track():
+    buffer = TrajectoryBuffer(history=10, max_vehicles=1)
+    meters_per_degree = 111194.9  # EARTH_RADIUS_M in radians per degree
+    # Northbound at 10 m/s, one sample every 0.1 s.
+    for index in range(10):
+        buffer.add("601", 1.0 + index * 0.1, 41.0 + index / meters_per_degree, -87.0, 10.0, 0.0, now=NOW)
+    newest = buffer.estimate("601")
+    ahead = buffer.estimate("601", at_time=newest["time"] + 0.5)
+    assert ahead["speed"] == pytest.approx(10.0)
+    assert (ahead["lat"] - newest["lat"]) * meters_per_degree == pytest.approx(5.0, abs=0.05)
+    assert ahead["lon"] == pytest.approx(-87.0)
@@ -0,0 +1,81 @@
+"""
+**********************************************************************************
+test_uplink_codec.py
+Created by: Debashis Das
+Argonne National Laboratory
+Transportation and Power Systems Division
+
+**********************************************************************************
+Description:
+------------
+UplinkCodec.py (gateway, infrastructure-to-cloud-interface): single-message
+encodings and batch pack/unpack round trips, the batch index check, and the
+batch numbering and final flush of UplinkBatcher.
+
+Usage:
+    python3 -m pytest test/test_uplink_codec.py
+**********************************************************************************
+"""
+
+import os
+import sys
+
+import pytest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+GATEWAY = os.path.join(HERE, "..", "..", "infrastructure-to-cloud-interface")
+sys.path.insert(0, GATEWAY)
+from UplinkCodec import (BATCH_ENCODINGS, UplinkBatcher, decode_payload, encode_payload,  # noqa: E402
+                         pack_batch, unpack_batch)
+
+
+def payloads() -> list:
+    messages = []
+    for name in ("map.txt", "spat.txt"):
+        with open(os.path.join(GATEWAY, "test", name)) as f:
+            messages.extend(line.strip() for line in f if line.strip())
+    return messages
+
+
+def test_single_message_encodings_round_trip():
+    payload = payloads()[0]
+    assert decode_payload({"payload": payload}) == payload
+    record = {"payload": encode_payload(payload, "b64"), "encoding": "b64"}
+    assert decode_payload(record) == payload
+    assert len(record["payload"]) < len(payload)
+    with pytest.raises(ValueError):
+        encode_payload(payload, "zlib")
+
+
+@pytest.mark.parametrize("encoding", BATCH_ENCODINGS)
+def test_batches_round_trip(encoding):
+    messages = payloads()
+    record = pack_batch(messages, encoding, timestamp=0.0)
+    assert record["count"] == len(messages)
+    assert unpack_batch(record) == [({"0012": "MAP", "0013": "SPaT"}[m[:4]], m) for m in messages]
+    assert unpack_batch(pack_batch([], encoding)) == []
+
+
+def test_index_must_cover_the_blob():
+    record = pack_batch(payloads()[:2], "zlib")
+    record["index"] = record["index"].split(",")[0]
+    with pytest.raises(ValueError):
+        unpack_batch(record)
+
+
+def test_batcher_numbers_batches_and_flushes_the_rest():
+    messages = payloads()
+    batcher = UplinkBatcher("zlib", window_s=60.0, max_messages=2)
+    batcher.add(messages[0])
+    assert not batcher.due(now=batcher.first_added + 1.0)
+    batcher.add(messages[1])
+    assert batcher.due()
+    first, _ = batcher.flush()
+
+    # The open batch at shutdown: not due yet, flushed anyway.
+    batcher.add(messages[2], trace="29080:1")
+    assert not batcher.due()
+    last, traces = batcher.flush()
+    assert (first["seq"], last["seq"]) == (1, 2) and first["epoch"] == last["epoch"]
+    assert [m for _, m in unpack_batch(last)] == [messages[2]] and traces == ["29080:1"]
+    assert batcher.flush() == (None, [])
@@ -0,0 +1,145 @@
+"""
+**********************************************************************************
+v2x-pipeline.py
+Created by: Debashis Das
+Argonne National Laboratory
+Transportation and Power Systems Division
+
+**********************************************************************************
+Description:
+------------
+Single-process replacement of the message decoder + telemetry publisher
+chain (InProcessPipeline.py): UPER datagrams are classified, decoded in
+Python (UperDecoder.py) and published through SpatManager/BsmManager without
+a loopback UDP hop or JSON round trip in between.
+
+It listens on PortNumber.MessageDecoder by default, so `node listener.js`
+(or a controller pointed at that port) feeds it unchanged. Either boundary
+can still be UDP:
+
+    --decoder udp   send the frames to the C++ message decoder (pass --port,
+                    the decoder owns PortNumber.MessageDecoder) and publish its
+                    JSON received on PortNumber.V2XDataManager; MAPs and the
+                    vehicle server's lane matching then work as before
+    --sink udp      decode here, send the JSON to a v2x-telemetry-publisher.py
+                    listening on PortNumber.V2XDataManager
+
+With the Python decoder MAPs are dropped and BSMs are published as if the
+vehicle were on no MAP (no vehicle server in the chain).
+
+Usage:
+    python3 v2x-pipeline.py                          # queued stages, Firebase
+    python3 v2x-pipeline.py --queue 0                # all stages inline on the receive thread
+    python3 v2x-pipeline.py --fanout --no-cloud
+    python3 v2x-pipeline.py --decoder udp --port 50012
+    python3 v2x-pipeline.py --sink udp
+**********************************************************************************
+"""
+
+import argparse
+import json
+import os
+import platform
+import socket
+import sys
+from FanoutServer import FanoutServer
+from InProcessPipeline import InProcessPipeline, UdpForwarder, UdpReceiver, classify
+from ShardedDispatcher import build_managers, build_tracer, build_validator, dispatch_message, shutdown_managers
+from UperDecoder import decode
+
+
+def main(args):
+    current_os = platform.system()
+    if current_os == "Linux":
+        config_file_path = os.path.join(os.path.expanduser("~"), "Desktop", "debashis-workspace", "config", "anl-master-config.json")
+    elif current_os == "Windows":
+        config_file_path = os.path.join("C:\\", "Users", "ddas", "debashis-workspace", "config", "anl-master-config.json")
+    else:
+        raise OSError(f"Unsupported operating system: {current_os}")
+
+    with open(config_file_path, "r") as config_file:
+        config = json.load(config_file)
+    host_ip = config["IPAddress"]["HostIp"]
+    ports = config["PortNumber"]
+
+    if args.decoder == "udp" and args.sink == "udp":
+        raise ValueError("--decoder udp with --sink udp leaves nothing to run in process; use the separate processes.")
+    port = args.port or ports["MessageDecoder"]
+    if args.decoder == "udp" and port == ports["MessageDecoder"]:
+        raise ValueError("--decoder udp: the C++ decoder owns PortNumber.MessageDecoder; pass another --port.")
+
+    fanout_server = None
+    spat_manager = bsm_manager = None
+    stages = [("classify", classify)]
+    if args.decoder == "python":
+        stages.append(("decode", lambda item: decode(item[1])))
+    else:
+        stages.append(("decode", UdpForwarder((host_ip, ports["MessageDecoder"]), lambda item: item[1].hex().encode())))
+
+    if args.sink == "udp":
+        stages.append(("publish", UdpForwarder((host_ip, ports["V2XDataManager"]))))
+    else:
+        local_sinks = []
+        if args.fanout:
+            fanout_server = FanoutServer(host_ip, ports["FanoutServer"])
+            fanout_server.start()
+            local_sinks.append(fanout_server)
+            print(f"Fan-out server listening on {host_ip}:{ports['FanoutServer']}")
+        if args.no_cloud and not local_sinks:
+            raise ValueError("--no-cloud requires at least one local output (e.g. --fanout).")
+        manager_options = {"use_cloud": not args.no_cloud, "delta": args.delta, "predict": args.predict,
+                           "sequence": args.sequence, "validate": not args.no_validate}
+        if args.trace:
+            manager_options["trace_address"] = (host_ip, ports["LatencyAnalyzer"])
+        spat_manager, bsm_manager = build_managers(manager_options, local_sinks)
+        tracer = build_tracer(manager_options, "v2x-pipeline")
+        validator = build_validator(manager_options)
+        stages.append(("publish", lambda message: dispatch_message(message, spat_manager, bsm_manager, tracer, validator)))
+
+    pipeline = InProcessPipeline(stages, args.queue)
+    pipeline.start()
+    decoder_receiver = None
+    if args.decoder == "udp":
+        decoder_receiver = UdpReceiver((host_ip, ports["V2XDataManager"]), pipeline, pipeline.stage_index("publish"))
+        decoder_receiver.start()
+
+    ingress_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    ingress_socket.bind((host_ip, port))
+    print(f"Pipeline listening on {host_ip}:{port} ({'inline' if args.queue <= 0 else f'queues of {args.queue}'}, "
+          f"decoder: {args.decoder}, sink: {args.sink})")
+
+    try:
+        while True:
+            data, _ = ingress_socket.recvfrom(4096)
+            pipeline.submit(data)
+
+    except KeyboardInterrupt:
+        print("\nKeyboardInterrupt received. Shutting down gracefully...")
+
+    finally:
+        ingress_socket.close()
+        pipeline.stop()
+        if spat_manager is not None:
+            shutdown_managers(spat_manager, bsm_manager)
+        if decoder_receiver is not None:
+            decoder_receiver.close()
+        if fanout_server is not None:
+            fanout_server.stop()
+        print(f"Pipeline totals: {pipeline.stats()}")
+        sys.exit(0)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Single-process V2X decode and publish pipeline")
+    parser.add_argument("--port", type=int, help="Ingress UDP port (default: PortNumber.MessageDecoder).")
+    parser.add_argument("--queue", type=int, default=1000, help="Bounded queue in front of every stage (0 = run stages inline).")
+    parser.add_argument("--decoder", choices=["python", "udp"], default="python", help="Decode in process or with the C++ message decoder.")
+    parser.add_argument("--sink", choices=["local", "udp"], default="local", help="Publish in process or send JSON to v2x-telemetry-publisher.py.")
+    parser.add_argument("--fanout", action="store_true", help="Serve records to local UDP subscribers (see FanoutServer.py).")
+    parser.add_argument("--delta", action="store_true", help="Write snapshot/patch updates to Firebase instead of full objects.")
+    parser.add_argument("--predict", action="store_true", help="Attach phase countdown predictions to intersection records.")
+    parser.add_argument("--sequence", action="store_true", help="Drop duplicate/out-of-order frames and report loss per source (SequenceTracker.py).")
+    parser.add_argument("--trace", action="store_true", help="Send per-hop timestamps to latency-analyzer.py.")
+    parser.add_argument("--no-validate", action="store_true", help="Do not schema-check decoded messages (MessageValidator.py).")
+    parser.add_argument("--no-cloud", action="store_true", help="Do not write to Firebase (local outputs only).")
+    main(parser.parse_args())
@@ -11,7 +11,22 @@ Description:
 Listens for V2X messages forwarded from Firebase by listener.js over UDP.
 
 Usage:
-    python3 v2x-data-manager.py
+    python3 v2x-data-manager.py                 # single process
+    python3 v2x-data-manager.py --workers 4     # 4 worker processes sharded by intersection/vehicle ID
+    python3 v2x-data-manager.py --fanout        # also serve local subscribers (fanout-client.py)
+    python3 v2x-data-manager.py --fanout --no-cloud
+    python3 v2x-data-manager.py --delta         # only changed fields go to Firebase (periodic snapshots)
+    python3 v2x-data-manager.py --predict       # add time-to-change predictions per phase
+    python3 v2x-data-manager.py --trace         # send hop timestamps to latency-analyzer.py
+    python3 v2x-data-manager.py --smooth --bsm-interval 0.5   # smoothed vehicle positions, 2 Hz per vehicle
+    python3 v2x-data-manager.py --sequence      # drop duplicate/stale frames, report loss per source
+    python3 v2x-data-manager.py --analytics     # red-light risk, queues, arrival on green per intersection
+    python3 v2x-data-manager.py --budget 1000   # at most 1000 Firebase writes/s, SPaT phase changes first
+    python3 v2x-data-manager.py --bsm-batch 0.1 # publish BSMs in 100 ms columnar batches
+    python3 v2x-data-manager.py --no-validate   # skip schema validation of incoming messages
+    python3 v2x-data-manager.py --liveness 5     # report intersections/vehicles silent for 5 s as stale
+    python3 v2x-data-manager.py --max-discovered 0   # reject intersections missing from intersections-config.json
+    python3 v2x-data-manager.py --profile-seconds 60 # `kill -USR1 <pid>` then samples for 60 s (SamplingProfiler.py)
 **********************************************************************************
 """
 
@@ -20,15 +35,28 @@ import json
 import os
 import platform
 import sys 
-from SpatManager import SpatManager
-from BsmManager import BsmManager
-
-def main():
+import argparse
+import multiprocessing
+import threading
+from ShardedDispatcher import (ShardedDispatcher, build_managers, build_profiler, build_tracer, build_validator,
+                               dispatch_message, idle_timeout, service_idle, shutdown_managers)
+from SamplingProfiler import udp_receive_queue
+from FanoutServer import FanoutServer
+import JsonCodec
+
+def forward_records(record_queue, sink):
+    """Drain `(path, data)` records produced by worker processes into `sink`."""
+    while True:
+        path, data = record_queue.get()
+        sink.write(path, data)
+
+def main(args):
     """Entry point for the V2X data manager.
 
     Creates managers (SPaT/BSM), then listens for incoming messages and dispatches
-    them to the appropriate handler. This function is intended to be invoked from
-    the module `__main__` guard.
+    them to the appropriate handler. With `--workers N` the messages are instead
+    sharded over N worker processes (see ShardedDispatcher.py). This function is
+    intended to be invoked from the module `__main__` guard.
     """
     current_os = platform.system()
         
@@ -51,22 +79,81 @@ def main():
     v2x_data_manager_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
     v2x_data_manager_socket.bind((host_ip, port))
 
-    spatManager = SpatManager()
-    bsmManager = BsmManager()
+    use_cloud = not args.no_cloud
+    local_sinks = []
+    fanout_server = None
+    if args.fanout:
+        fanout_server = FanoutServer(host_ip, config["PortNumber"]["FanoutServer"])
+        fanout_server.start()
+        local_sinks.append(fanout_server)
+        print(f"Fan-out server listening on {host_ip}:{config['PortNumber']['FanoutServer']}")
+
+    if not use_cloud and not local_sinks:
+        raise ValueError("--no-cloud requires at least one local output (e.g. --fanout).")
+    if args.analytics and args.workers > 0:
+        # Workers each see only their shard of vehicles and intersections.
+        raise ValueError("--analytics needs all records in one process; it cannot be combined with --workers.")
+    if args.bsm_batch > 0 and (args.smooth or args.bsm_interval > 0):
+        raise ValueError("--bsm-batch cannot be combined with --smooth or --bsm-interval.")
+
+    manager_options = {"use_cloud": use_cloud, "delta": args.delta, "predict": args.predict,
+                       "smooth": args.smooth, "bsm_interval": args.bsm_interval, "sequence": args.sequence,
+                       "bsm_batch": args.bsm_batch, "validate": not args.no_validate,
+                       "discovery_limit": args.max_discovered, "discovery_ttl": args.discovered_ttl,
+                       "liveness": args.liveness, "profile_seconds": args.profile_seconds,
+                       "profile_dir": args.profile_dir}
+    if args.budget > 0:
+        # Each worker process gets an equal share of the write budget.
+        manager_options["budget"] = args.budget / max(1, args.workers)
+    if args.analytics:
+        manager_options["analytics"] = args.maps or os.path.join(os.path.dirname(config_file_path), "maps")
+    if args.trace:
+        manager_options["trace_address"] = (host_ip, config["PortNumber"]["LatencyAnalyzer"])
+    dispatcher = None
+    if args.workers > 0:
+        # Workers hand their records back here, because the fan-out server owns
+        # a single UDP port in this process.
+        record_queue = multiprocessing.Queue() if fanout_server is not None else None
+        dispatcher = ShardedDispatcher(args.workers, manager_options, record_queue=record_queue)
+        dispatcher.start()
+        if record_queue is not None:
+            threading.Thread(target=forward_records, args=(record_queue, fanout_server), daemon=True).start()
+        print(f"Sharding messages over {args.workers} worker processes")
+        # Each worker has its own profiler; `pkill -USR1 -f v2x-telemetry-publisher` profiles all processes.
+        profiler = build_profiler(manager_options, "v2x-telemetry-publisher")
+        if profiler is not None:
+            for index, queue in enumerate(dispatcher.queues):
+                profiler.add_gauge(f"worker_queue/{index}", queue.qsize)
+    else:
+        spatManager, bsmManager = build_managers(manager_options, local_sinks)
+        tracer = build_tracer(manager_options, "v2x-telemetry-publisher")
+        validator = build_validator(manager_options)
+        profiler = build_profiler(manager_options, "v2x-telemetry-publisher", bsmManager)
+        # Wake up when idle so a partial batch is not held back and silent sources turn stale.
+        v2x_data_manager_socket.settimeout(idle_timeout(manager_options))
+
+    if profiler is not None:
+        profiler.add_gauge("socket_rx_bytes", lambda: udp_receive_queue(v2x_data_manager_socket))
 
     try:
         while True:
-            data, addr = v2x_data_manager_socket.recvfrom(4096)
-            data = data.decode()
-            receivedMessage = json.loads(data)
-            print("Received following message:\n", receivedMessage)
-            
-            if receivedMessage["MsgType"]== "SPaT":
-                spatManager.manage_spat_data(receivedMessage)
-
-            elif receivedMessage["MsgType"]== "BSM":
-                print("Received BSM")
-                bsmManager.manage_bsm_data(receivedMessage)
+            try:
+                data, addr = v2x_data_manager_socket.recvfrom(4096)
+            except socket.timeout:
+                service_idle(spatManager, bsmManager)
+                continue
+
+            if dispatcher is not None:
+                dispatcher.dispatch(data)
+                continue
+
+            # One bad message must not stop the publisher.
+            try:
+                receivedMessage = JsonCodec.loads(data)
+                print("Received following message:\n", receivedMessage)
+                dispatch_message(receivedMessage, spatManager, bsmManager, tracer, validator)
+            except Exception as e:
+                print(f"Failed to process message: {e!r}")
 
     except KeyboardInterrupt:
         print("\nKeyboardInterrupt received. Shutting down gracefully...")
@@ -76,6 +163,13 @@ def main():
 
     finally:
         try:
+            if dispatcher is not None:
+                dispatcher.stop()
+            else:
+                # Publish what --bsm-batch and --budget still hold (the workers do this on stop).
+                shutdown_managers(spatManager, bsmManager)
+            if fanout_server is not None:
+                fanout_server.stop()
             v2x_data_manager_socket.close()
             print("Socket closed.")
         finally:
@@ -86,4 +180,25 @@ def main():
     v2x_data_manager_socket.close()
     
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="V2X telemetry publisher")
+    parser.add_argument("--workers", type=int, default=0, help="Number of worker processes (0 = single process).")
+    parser.add_argument("--fanout", action="store_true", help="Serve records to local UDP subscribers (see FanoutServer.py).")
+    parser.add_argument("--delta", action="store_true", help="Write snapshot/patch updates to Firebase instead of full objects.")
+    parser.add_argument("--predict", action="store_true", help="Attach phase countdown predictions to intersection records.")
+    parser.add_argument("--smooth", action="store_true", help="Publish smoothed, dead-reckoned vehicle positions (TrajectoryBuffer.py, needs numpy).")
+    parser.add_argument("--bsm-interval", type=float, default=0.0, help="Publish each vehicle at most every N seconds (implies --smooth).")
+    parser.add_argument("--sequence", action="store_true", help="Drop duplicate/out-of-order frames and report loss per source (SequenceTracker.py).")
+    parser.add_argument("--analytics", action="store_true", help="Publish intersection_analytics/{id} (IntersectionAnalytics.py, needs numpy).")
+    parser.add_argument("--maps", help="Directory of intersection geojson files (default: config/maps next to the config file).")
+    parser.add_argument("--budget", type=float, default=0.0, help="Firebase write budget in writes/s, scheduled by priority (PublishScheduler.py; 0 = unlimited).")
+    parser.add_argument("--bsm-batch", type=float, default=0.0, help="Publish BSMs in columnar batches of N seconds (BsmBatch.py, needs numpy; 0 = per message).")
+    parser.add_argument("--trace", action="store_true", help="Send per-hop timestamps to latency-analyzer.py.")
+    parser.add_argument("--no-validate", action="store_true", help="Do not schema-check incoming messages (MessageValidator.py).")
+    parser.add_argument("--max-discovered", type=int, default=1000, help="Intersections not in intersections-config.json kept at most (IntersectionDiscovery.py; 0 = reject them).")
+    parser.add_argument("--discovered-ttl", type=float, default=3600.0, help="Forget discovered intersections after this many silent seconds.")
+    parser.add_argument("--liveness", type=float, default=0.0, help="Mark intersections/vehicles stale after N silent seconds and publish source_status/ (LivenessMonitor.py; 0 = off).")
+    parser.add_argument("--profile-seconds", type=float, default=30.0, help="Length of the profile started by SIGUSR1 (SamplingProfiler.py; 0 = ignore SIGUSR1).")
+    parser.add_argument("--profile-dir", help="Directory for profiles (default: current directory).")
+    parser.add_argument("--no-cloud", action="store_true", help="Do not write to Firebase (local outputs only).")
+    args = parser.parse_args()
+    main(args)
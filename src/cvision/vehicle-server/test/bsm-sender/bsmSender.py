@@ -36,6 +36,8 @@ def main(loop=True):
         obj = json.load(f)
     encoded_data = json.dumps(obj).encode("utf-8")
 
+    # fname -> (mtime, encoded payload): read once per file version, not per send
+    payload_cache = {}
     send_period = 0.1  # 10 Hz
     next_time = time.perf_counter()
 
@@ -51,9 +53,13 @@ def main(loop=True):
             next_time += send_period
 
             try:
-                with open(fname, "r", encoding="utf-8") as f:
-                    data = f.read()
-                bsm_sender_socket.sendto(data.encode("utf-8"), client_info)
+                mtime = os.stat(fname).st_mtime_ns
+                cached = payload_cache.get(fname)
+                if cached is None or cached[0] != mtime:
+                    with open(fname, "r", encoding="utf-8") as f:
+                        data = f.read()
+                    cached = payload_cache[fname] = (mtime, data.encode("utf-8"))
+                bsm_sender_socket.sendto(cached[1], client_info)
                 print(f"Sent {fname} at {time.time():.3f}")
             except FileNotFoundError:
                 print(f"[WARN] {fname} not found; skipping.")
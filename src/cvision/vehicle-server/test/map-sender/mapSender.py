@@ -34,6 +34,8 @@ def main(loop=True):
     vehicleServerPort = config["PortNumber"]["VehicleServer"]
     client_info = (hostIp, vehicleServerPort)
 
+    # fname -> (mtime, encoded payload): read once per file version, not per send
+    payload_cache = {}
     send_period = 1.0  # seconds
     next_time = time.perf_counter()
 
@@ -50,9 +52,13 @@ def main(loop=True):
 
             # read & send
             try:
-                with open(fname, "r", encoding="utf-8") as f:
-                    data = f.read()
-                map_sender_socket.sendto(data.encode("utf-8"), client_info)
+                mtime = os.stat(fname).st_mtime_ns
+                cached = payload_cache.get(fname)
+                if cached is None or cached[0] != mtime:
+                    with open(fname, "r", encoding="utf-8") as f:
+                        data = f.read()
+                    cached = payload_cache[fname] = (mtime, data.encode("utf-8"))
+                map_sender_socket.sendto(cached[1], client_info)
                 print(f"Sent {fname} at {time.time():.3f}")
             except FileNotFoundError:
                 print(f"[WARN] {fname} not found; skipping.")
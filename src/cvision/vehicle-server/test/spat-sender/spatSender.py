@@ -30,6 +30,8 @@ def main(loop=True):
     vehicleServerPort = config["PortNumber"]["VehicleServer"]
     client_info = (hostIp, vehicleServerPort)
 
+    # fname -> (mtime, encoded payload): parsed and re-serialized once per file version, not per send
+    payload_cache = {}
     send_period = 0.1  # 10 Hz
     next_time = time.perf_counter()
 
@@ -47,12 +49,16 @@ def main(loop=True):
                 time.sleep(sleep_s)
 
             try:
-                # validate JSON and re-serialize (ensures well-formed payload)
-                with open(fname, "r", encoding="utf-8") as f:
-                    obj = json.load(f)
-                data = json.dumps(obj, separators=(",", ":"), ensure_ascii=False)
+                mtime = os.stat(fname).st_mtime_ns
+                cached = payload_cache.get(fname)
+                if cached is None or cached[0] != mtime:
+                    # validate JSON and re-serialize (ensures well-formed payload)
+                    with open(fname, "r", encoding="utf-8") as f:
+                        obj = json.load(f)
+                    data = json.dumps(obj, separators=(",", ":"), ensure_ascii=False)
+                    cached = payload_cache[fname] = (mtime, data.encode("utf-8"))
 
-                spat_sender_socket.sendto(data.encode("utf-8"), client_info)
+                spat_sender_socket.sendto(cached[1], client_info)
                 print(f"Sent {fname} to {client_info[0]}:{client_info[1]} at {time.time():.3f}")
             except FileNotFoundError:
                 print(f"[WARN] {fname} not found; skipping.")